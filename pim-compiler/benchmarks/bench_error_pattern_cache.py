@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+错误模式缓存基准测试
+
+构造 --patterns 个错误模式、--fixes 个缓存的修复方案和一份有 --failures 个失败测试的
+pytest 输出，测量：
+- find_pattern_match: 对每个失败的 traceback 以及整份输出查找匹配的模式
+- find_cached_fix: 按错误哈希查找修复方案
+- 修复循环中的一轮（每个错误查找模式和修复、更新成功率、记录修复结果）
+
+并与原来的实现对比（逐个 re.search 所有模式、倒序扫描修复列表、每次更新都重写 JSON）。
+
+用法:
+    python benchmarks/bench_error_pattern_cache.py [--patterns 500] [--fixes 10000] [--failures 300]
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from src.compiler.core.error_pattern_cache import ErrorPatternCache, ErrorPattern, CachedFix
+
+EXCEPTIONS = ["AttributeError", "TypeError", "KeyError", "ValueError", "ImportError",
+              "sqlalchemy.exc.IntegrityError", "pydantic_core.ValidationError", "AssertionError"]
+WORDS = ["user", "order", "product", "invoice", "session", "token", "schema", "router",
+         "engine", "model", "field", "column", "payload", "response", "config", "service"]
+
+
+def make_patterns(count: int, rng: random.Random):
+    """模拟积累的错误模式（大多含有固定的异常名或消息），同时返回每个模式能匹配的一行错误"""
+    patterns, samples = [], []
+    for i in range(count):
+        exc = rng.choice(EXCEPTIONS)
+        word, other = rng.sample(WORDS, 2)
+        kind = i % 5
+        if kind == 0:
+            regex = rf"{re.escape(exc)}.*'{word}_{i}' object has no attribute '(\w+)'"
+            sample = f"{exc}: '{word}_{i}' object has no attribute 'id'"
+        elif kind == 1:
+            regex = rf"{word}_{i}\(\) got an unexpected keyword argument '{other}'"
+            sample = f"TypeError: {word}_{i}() got an unexpected keyword argument '{other}'"
+        elif kind == 2:
+            regex = rf"NOT NULL constraint failed: {word}s_{i}\.{other}"
+            sample = f"sqlite3.IntegrityError: NOT NULL constraint failed: {word}s_{i}.{other}"
+        elif kind == 3:
+            regex = rf"(?:cannot import name|No module named) '?{word}_{i}'?"
+            sample = f"ImportError: cannot import name '{word}_{i}'"
+        else:
+            regex = rf"\b{word}{i}\w*\s*=\s*\d+"
+            sample = f"AssertionError: {word}{i}_count = 3"
+        patterns.append(ErrorPattern(pattern=regex, error_type=f"synthetic_{i}",
+                                     fix_template="# fix", description=f"synthetic pattern {i}"))
+        samples.append(sample)
+    return patterns, samples
+
+
+def make_traceback(i: int, rng: random.Random) -> str:
+    word = rng.choice(WORDS)
+    frames = "\n".join(
+        f"app/services/{word}_service.py:{rng.randint(10, 400)}: in {word}_{rng.choice(['get', 'create', 'update'])}\n"
+        f"    result = self.db.query({word.title()}).filter_by(id=item_id).first()"
+        for _ in range(rng.randint(3, 12))
+    )
+    return (f"_________________________ test_{word}_{i} _________________________\n"
+            f"tests/test_{word}.py:{rng.randint(10, 200)}: in test_{word}_{i}\n"
+            f"    response = client.post('/api/{word}s', json=payload)\n{frames}\n"
+            f"E   {rng.choice(EXCEPTIONS)}: unexpected state for {word} #{i} (line {rng.randint(1, 999)})")
+
+
+class LegacyCache:
+    """原来的实现：逐个 re.search、倒序扫描、每次更新都重写 JSON"""
+
+    def __init__(self, cache: ErrorPatternCache):
+        self.cache = cache
+        self.patterns = dict(cache.patterns)
+        self.fixes = list(cache.fixes)
+
+    def _save_patterns(self):
+        with open(self.cache.patterns_file, 'w', encoding='utf-8') as f:
+            json.dump([asdict(p) for p in self.patterns.values()], f, indent=2, ensure_ascii=False)
+
+    def _save_fixes(self):
+        self.fixes = self.fixes[-1000:]
+        with open(self.cache.fixes_file, 'w', encoding='utf-8') as f:
+            json.dump([asdict(fix) for fix in self.fixes], f, indent=2, ensure_ascii=False)
+
+    def find_pattern_match(self, error_text):
+        for pattern in self.patterns.values():
+            if re.search(pattern.pattern, error_text, re.IGNORECASE | re.MULTILINE):
+                pattern.use_count += 1
+                self._save_patterns()
+                return pattern
+        return None
+
+    def find_cached_fix(self, error_text, file_path):
+        error_hash = self.cache._compute_error_hash(error_text, file_path)
+        for fix in reversed(self.fixes):
+            if fix.error_hash == error_hash and fix.success:
+                return fix
+        return None
+
+    def update_pattern_success_rate(self, pattern, success):
+        pattern.success_rate = 0.9 * pattern.success_rate + 0.1 * (1.0 if success else 0.0)
+        self._save_patterns()
+
+    def add_fix_result(self, error_text, file_path, fix_content, success):
+        self.fixes.append(CachedFix(self.cache._compute_error_hash(error_text, file_path),
+                                    fix_content, file_path, success, "now"))
+        self._save_fixes()
+
+
+def timed(func, repeat: int = 1) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fix_round(cache, tracebacks):
+    """修复循环中的一轮：与 PureGeminiCompiler._run_incremental_test_loop 的调用方式一致"""
+    for i, traceback in enumerate(tracebacks):
+        match = cache.find_pattern_match(traceback)
+        if match:
+            cache.update_pattern_success_rate(match, True)
+            continue
+        if cache.find_cached_fix(traceback, f"app/file_{i}.py") is None:
+            cache.add_fix_result(traceback, f"app/file_{i}.py", "fix_applied", True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ErrorPatternCache benchmark")
+    parser.add_argument("--patterns", type=int, default=500)
+    parser.add_argument("--fixes", type=int, default=10000)
+    parser.add_argument("--failures", type=int, default=300, help="pytest 输出中的失败测试数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache_dir = Path(tempfile.mkdtemp(prefix="bench_error_cache_"))
+    try:
+        cache = ErrorPatternCache(cache_dir, save_delay=3600)
+        patterns, samples = make_patterns(args.patterns, rng)
+        for pattern in patterns:
+            cache.add_pattern(pattern)
+        tracebacks = [make_traceback(i, rng) for i in range(args.failures)]
+        # 每 10 个失败中有一个命中某个模式，其余不命中任何模式（需要检查所有模式）
+        for i in range(0, len(tracebacks), 10):
+            tracebacks[i] += "\nE   " + rng.choice(samples)
+        output = "\n".join(tracebacks)
+
+        cache.fixes = [CachedFix(f"{i:032x}", "fix", f"app/file_{i}.py", i % 7 != 0, "2025-01-01")
+                       for i in range(args.fixes - len(tracebacks) // 2)]
+        cache.fixes += [CachedFix(cache._compute_error_hash(t, f"app/file_{i}.py"), "fix", f"app/file_{i}.py",
+                                  True, "2025-01-01") for i, t in enumerate(tracebacks) if i % 2 == 0]
+        cache._rebuild_fix_index()
+        legacy = LegacyCache(cache)
+
+        print(f"{len(cache.patterns)} patterns, {len(cache.fixes)} cached fixes, "
+              f"pytest output {len(output) / 1024:.0f} KB with {len(tracebacks)} failures")
+        assert [cache.find_pattern_match(t) for t in tracebacks] == [legacy.find_pattern_match(t) for t in tracebacks]
+
+        rows = [
+            ("find_pattern_match (each traceback)",
+             lambda c: [c.find_pattern_match(t) for t in tracebacks]),
+            ("find_pattern_match (whole output)", lambda c: c.find_pattern_match(output)),
+            ("find_cached_fix (each traceback)",
+             lambda c: [c.find_cached_fix(t, f"app/file_{i}.py") for i, t in enumerate(tracebacks)]),
+        ]
+        print(f"\n{'operation':<40} {'legacy (s)':>12} {'indexed (s)':>12} {'speedup':>9}")
+        for name, op in rows:
+            old = timed(lambda: op(legacy), args.repeat)
+            new = timed(lambda: op(cache), args.repeat)
+            print(f"{name:<40} {old:>12.4f} {new:>12.4f} {old / new:>8.1f}x")
+
+        old = timed(lambda: fix_round(LegacyCache(cache), tracebacks))
+        new = timed(lambda: (fix_round(cache, tracebacks), cache.flush()))
+        print(f"{'fix round incl. persistence':<40} {old:>12.4f} {new:>12.4f} {old / new:>8.1f}x")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+模板 + LLM 混合生成器基准测试
+
+在 examples/user_management.md 上测量 hybrid-template 生成器的端到端编译时间
+（PIM -> PSM -> 代码），并统计有多少方法来自模板、有多少交给 LLM、发了几个请求。
+
+默认用模拟的 LLM（每个请求固定延迟 --latency 秒）以便在没有 API key 时复现；
+加 --real 时使用 DEEPSEEK_API_KEY 调用真实的 LLM。请求仍经过提供商的速率限制，
+可以用 PIM_RATE_LIMIT_DEEPSEEK=0 关闭。
+
+用法:
+    python benchmarks/bench_hybrid_template.py [--pim 文件] [--repeat 次数] [--latency 秒] [--real]
+"""
+
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from src.compiler.generators.base_generator import GeneratorConfig
+from src.compiler.generators.impl.hybrid_template_generator import HybridTemplateGenerator
+from src.compiler.generators.structured_psm import load_psm
+
+
+class SimulatedLLM:
+    """模拟 OpenAI 兼容客户端：固定延迟后为请求中的每个方法返回一个简单实现"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.requests += 1
+        time.sleep(self.latency)
+        names = re.findall(r'`async def (\w+)\(self', messages[-1]["content"])
+        methods = {
+            name: f"async def {name}(self, data: Dict[str, Any]) -> Any:\n    return data\n"
+            for name in names
+        }
+        message = SimpleNamespace(content=json.dumps(methods))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def compile_once(generator: HybridTemplateGenerator, pim_content: str, output_dir: Path) -> dict:
+    start = time.perf_counter()
+    psm_result = generator.generate_psm(pim_content, "fastapi", output_dir)
+    psm_time = time.perf_counter() - start
+    code_result = generator.generate_code(psm_result.psm_content, output_dir / "generated", "fastapi")
+    total = time.perf_counter() - start
+    if not code_result.success:
+        raise RuntimeError(code_result.error_message)
+    return {"psm": psm_time, "code": total - psm_time, "total": total,
+            "files": len(code_result.code_files), "logs": code_result.logs,
+            "psm_content": psm_result.psm_content}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="hybrid-template generator benchmark")
+    parser.add_argument("--pim", default=str(Path(__file__).parent.parent / "examples" / "user_management.md"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=5.0, help="模拟的 LLM 请求延迟（秒）")
+    parser.add_argument("--real", action="store_true", help="使用真实的 LLM（需要 DEEPSEEK_API_KEY）")
+    args = parser.parse_args()
+
+    pim_content = Path(args.pim).read_text(encoding="utf-8")
+    generator = HybridTemplateGenerator(GeneratorConfig(name="hybrid-template"))
+    simulated = None
+    if not args.real:
+        simulated = generator.client = SimulatedLLM(args.latency)
+    elif generator.client is None:
+        sys.exit("--real requires DEEPSEEK_API_KEY and the openai package")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_hybrid_"))
+    try:
+        runs = [compile_once(generator, pim_content, work_dir / f"run_{i}") for i in range(args.repeat)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    psm_model = load_psm(runs[0]["psm_content"])
+    methods = [m for service in psm_model.services for m in service.methods]
+    complex_methods = [m for m in methods if m["complex"]]
+    services = sum(1 for s in psm_model.services if any(m["complex"] for m in s.methods))
+
+    print(f"PIM: {args.pim}")
+    print(f"  实体 {len(psm_model.entities)} 个，服务 {len(psm_model.services)} 个，"
+          f"方法 {len(methods)} 个（模板 {len(methods) - len(complex_methods)}，LLM {len(complex_methods)}）")
+    print(f"  LLM 请求: 每次编译 {services} 个（每个服务一个），逐方法请求需要 {len(complex_methods)} 个")
+    if simulated:
+        print(f"  模拟 LLM 延迟: {args.latency:.1f}s/请求，共 {simulated.requests} 个请求")
+    print(f"  生成文件: {runs[0]['files']} 个 - {runs[0]['logs']}")
+    print()
+    print(f"{'run':>4} {'PSM (s)':>10} {'code (s)':>10} {'total (s)':>10}")
+    for i, run in enumerate(runs, 1):
+        print(f"{i:>4} {run['psm']:>10.3f} {run['code']:>10.3f} {run['total']:>10.3f}")
+    best = min(runs, key=lambda run: run["total"])
+    print(f"best {best['psm']:>10.3f} {best['code']:>10.3f} {best['total']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
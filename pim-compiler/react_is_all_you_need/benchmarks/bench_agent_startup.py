@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Agent启动基准测试 - 测量每秒可构造的ReactAgentMinimal数量
+
+对比两种情况：
+- 延迟构造：只调用__init__（知识、工具、记忆在首次execute时才加载）
+- 完整初始化：__init__ + _ensure_initialized（等价于旧的立即加载）
+
+用法:
+    python benchmarks/bench_agent_startup.py [数量]
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 基准测试不调用API，没有密钥时使用占位值
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-placeholder")
+os.environ.setdefault("SERPER_API_KEY", "benchmark-placeholder")
+
+from core.react_agent_minimal import ReactAgentMinimal
+
+
+def construct_agents(count: int, work_dir: str, initialize: bool) -> float:
+    """构造count个Agent，返回每秒构造数"""
+    start = time.perf_counter()
+    # 屏蔽构造时的横幅输出，避免打印开销影响测量
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count):
+            agent = ReactAgentMinimal(
+                work_dir=work_dir,
+                name=f"bench_startup_{i % 10}",
+                knowledge_files=["knowledge/minimal/system"],
+            )
+            if initialize:
+                agent._ensure_initialized()
+    elapsed = time.perf_counter() - start
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # Agent的home目录在~/.agent下，基准测试使用临时HOME避免污染真实记忆
+    with tempfile.TemporaryDirectory() as temp_home:
+        os.environ["HOME"] = temp_home
+        work_dir = str(Path(temp_home) / "work")
+
+        # 预热：第一次构造会加载模块并填充进程级知识文件缓存
+        construct_agents(10, work_dir, initialize=True)
+
+        lazy_rate = construct_agents(count, work_dir, initialize=False)
+        full_rate = construct_agents(count, work_dir, initialize=True)
+
+    print("=" * 60)
+    print(f"Agent启动基准测试（{count}个Agent）")
+    print("=" * 60)
+    print(f"  延迟构造:   {lazy_rate:10.1f} agents/s")
+    print(f"  完整初始化: {full_rate:10.1f} agents/s")
+    print(f"  加速比:     {lazy_rate / full_rate:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+知识索引启动基准测试
+
+生成一个知识目录树（默认5000个.md文件），对比加载器启动耗时：
+- 冷启动：缓存为空，解析所有文件（等价于旧实现每次启动的开销）
+- 热启动：所有文件未变化，直接使用缓存
+- 增量：修改一个文件后启动，只重新解析该文件
+
+用法:
+    python benchmarks/bench_knowledge_index.py [文件数]
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.knowledge_function_loader import KnowledgeFunctionLoader
+from core.knowledge_concept_loader import KnowledgeConceptLoader
+
+
+def generate_tree(root: Path, file_count: int):
+    """生成按领域分目录的知识文件，每个文件包含若干函数和概念"""
+    for i in range(file_count):
+        domain_dir = root / f"domain_{i % 50}" / f"topic_{i % 7}"
+        domain_dir.mkdir(parents=True, exist_ok=True)
+        sections = [f"# 知识文件 {i}\n\n本文件描述第{i}个领域的工作流程。\n"]
+        for j in range(4):
+            kind = "契约函数" if j == 0 else "函数"
+            sections.append(
+                f"## {kind} @task_{i}_{j}(input, options)\n"
+                f"处理第{i}个任务的第{j}个步骤，返回结构化结果。\n\n"
+                "```python\ndef step(input):\n    return input\n```\n"
+            )
+        sections.append(f"## 概念 @concept_{i}\n领域概念{i}的定义与边界。\n")
+        sections.append(f"## 原理 @principle_{i}\n\"\"\"第{i}条设计原理\"\"\"\n")
+        (domain_dir / f"knowledge_{i}.md").write_text("\n".join(sections), encoding="utf-8")
+
+
+def time_startup(knowledge_dir: Path) -> float:
+    start = time.perf_counter()
+    # 屏蔽加载器的统计输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        KnowledgeFunctionLoader([str(knowledge_dir)])
+        KnowledgeConceptLoader([str(knowledge_dir)])
+    return time.perf_counter() - start
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 缓存在~/.agent下，基准测试使用临时HOME
+        os.environ["HOME"] = temp_dir
+        knowledge_dir = Path(temp_dir) / "project" / "knowledge"
+        print(f"生成{file_count}个知识文件...")
+        generate_tree(knowledge_dir, file_count)
+
+        cold = time_startup(knowledge_dir)
+        warm = min(time_startup(knowledge_dir) for _ in range(3))
+
+        changed = next(knowledge_dir.rglob("*.md"))
+        changed.write_text(changed.read_text(encoding="utf-8") + "\n## 函数 @added()\n新增函数\n",
+                           encoding="utf-8")
+        incremental = time_startup(knowledge_dir)
+
+    print("=" * 60)
+    print(f"知识索引启动基准测试（{file_count}个文件，函数+概念两个加载器）")
+    print("=" * 60)
+    print(f"  冷启动（全量解析）: {cold * 1000:10.1f}ms")
+    print(f"  热启动（全部缓存）: {warm * 1000:10.1f}ms")
+    print(f"  修改1个文件后启动:  {incremental * 1000:10.1f}ms")
+    print(f"  加速比:             {cold / warm:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ReadFileTool大文件分页基准测试
+
+生成一个大日志文件（默认1GB），对比：
+- 整体读取：旧实现，每页都把整个文件读入内存再切片
+- 索引读取：首次建立偏移索引，之后每页seek到检查点只读需要的片段
+
+用法:
+    python benchmarks/bench_read_file.py [大小MB] [页数]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import file_index
+from core.tool_base import ReadFileTool
+
+
+def generate_log(path: Path, size_mb: int):
+    """生成混合中英文的日志文件"""
+    line_templates = [
+        "2025-01-01 12:00:{sec:02d} INFO  [worker-{n}] 请求处理完成 status=200 latency={ms}ms\n",
+        "2025-01-01 12:00:{sec:02d} WARN  [worker-{n}] slow query detected, 耗时{ms}ms\n",
+        "2025-01-01 12:00:{sec:02d} ERROR [worker-{n}] Traceback (most recent call last): 连接超时\n",
+    ]
+    block = "".join(
+        random.choice(line_templates).format(sec=i % 60, n=i % 16, ms=random.randint(1, 999))
+        for i in range(20000)
+    ).encode("utf-8")
+    target = size_mb * 1024 * 1024
+    with open(path, "wb") as f:
+        written = 0
+        while written < target:
+            f.write(block)
+            written += len(block)
+
+
+def time_pages(tool: ReadFileTool, path: Path, pages, **kwargs) -> float:
+    start = time.perf_counter()
+    for offset in pages:
+        tool.execute(file_path=str(path), offset=offset, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    page_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 索引持久化在~/.agent下，基准测试使用临时HOME
+        os.environ["HOME"] = temp_dir
+        log_path = Path(temp_dir) / "big.log"
+        print(f"生成{size_mb}MB日志文件...")
+        generate_log(log_path, size_mb)
+        file_size = log_path.stat().st_size
+
+        tool = ReadFileTool(temp_dir)
+
+        # 首次访问建立索引
+        start = time.perf_counter()
+        index = file_index.get_index(log_path)
+        build_time = time.perf_counter() - start
+
+        char_pages = [random.randrange(index.total_chars) for _ in range(page_count)]
+        line_pages = [random.randrange(index.total_lines) for _ in range(page_count)]
+
+        indexed_chars = time_pages(tool, log_path, char_pages, limit=2000)
+        indexed_lines = time_pages(tool, log_path, line_pages, limit=200, unit="lines")
+        start = time.perf_counter()
+        tool.execute(file_path=str(log_path), mode="tail", limit=50)
+        tail_time = time.perf_counter() - start
+
+        # 旧实现：每页读取整个文件（只测少量页，按页数折算）
+        full_pages = char_pages[:3]
+        start = time.perf_counter()
+        for offset in full_pages:
+            with open(log_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            content[offset:offset + 2000]
+        full_per_page = (time.perf_counter() - start) / len(full_pages)
+
+    print("=" * 60)
+    print(f"ReadFileTool分页基准测试（{file_size / 1024 / 1024:.0f}MB，{index.total_lines}行）")
+    print("=" * 60)
+    print(f"  建立索引（一次）:     {build_time:8.2f}s")
+    print(f"  索引读取 按字符/页:   {indexed_chars / page_count * 1000:8.2f}ms")
+    print(f"  索引读取 按行/页:     {indexed_lines / page_count * 1000:8.2f}ms")
+    print(f"  tail 50行:            {tail_time * 1000:8.2f}ms")
+    print(f"  整体读取/页（旧实现）: {full_per_page * 1000:8.2f}ms")
+    print(f"  {page_count}页总耗时: 旧实现≈{full_per_page * page_count:.1f}s，"
+          f"索引={build_time + indexed_chars:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
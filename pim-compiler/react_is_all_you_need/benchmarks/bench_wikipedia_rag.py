@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+WikipediaRAG检索基准测试
+
+生成一个合成知识库（分类索引、字母索引、知识图谱、页面），测量：
+- 召回率：标题查询和正文查询的recall@5
+- 延迟：建立索引耗时、每次查询的p50/p95
+- 图谱遍历：有节点预算的加权BFS vs 旧的无限制递归（访问实体数和耗时）
+
+旧实现的关键词检索只比较分类索引中的标题，正文查询无法命中。
+旧实现的计时只包含匹配/遍历本身，不包含它随后加载的页面（实际开销更大）。
+
+用法:
+    python benchmarks/bench_wikipedia_rag.py [页面数] [查询数]
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.tools.wikipedia_rag import WikipediaRAG
+
+CHAR_POOL = "数据模型架构服务接口协议缓存索引图谱实体关系编译验证测试部署调度队列存储检索计算网络"
+RELATION_TYPES = ["is_a", "part_of", "depends_on", "uses", "related_to"]
+
+
+def random_phrase(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(CHAR_POOL) for _ in range(length))
+
+
+def generate_corpus(wiki_dir: Path, page_count: int, rng: random.Random):
+    """生成页面，返回每页的(文件名, 标题, 正文独有短语)"""
+    categories = [f"分类{c}" for c in range(20)]
+    pages = []
+    for i in range(page_count):
+        filename = f"entity_{i}.md"
+        title = f"{random_phrase(rng, 4)}{i}"
+        marker = f"{random_phrase(rng, 6)}"
+        category = categories[i % len(categories)]
+        body = "\n\n".join(random_phrase(rng, 40) for _ in range(8))
+        links = " ".join(f"[相关](entity_{rng.randrange(page_count)}.md)" for _ in range(3))
+        (wiki_dir / filename).write_text(
+            f"# {title}\n\n分类：{category}\n\n{body}\n\n关键发现：{marker}\n\n{links}\n",
+            encoding="utf-8"
+        )
+        pages.append((filename, title, marker, category))
+
+    lines = []
+    for category in categories:
+        lines.append(f"## {category}")
+        lines.extend(f"- [{title}]({filename})" for filename, title, _, cat in pages if cat == category)
+    (wiki_dir / "CATEGORY_INDEX.md").write_text("\n".join(lines), encoding="utf-8")
+    (wiki_dir / "ALPHABETICAL_INDEX.md").write_text(
+        "\n".join(f"- **[{title}]({filename})**" for filename, title, _, _ in pages), encoding="utf-8")
+
+    graph = {
+        "entities": [{"name": f"entity_{i}", "type": "concept"} for i in range(page_count)],
+        "relations": [
+            {"source": f"entity_{i}", "target": f"entity_{rng.randrange(page_count)}",
+             "type": rng.choice(RELATION_TYPES)}
+            for i in range(page_count) for _ in range(5)
+        ],
+    }
+    (wiki_dir / "docs_knowledge_graph.json").write_text(json.dumps(graph), encoding="utf-8")
+    return pages
+
+
+def legacy_keyword(rag: WikipediaRAG, keyword: str):
+    """旧实现：线性扫描分类索引中的标题"""
+    keyword_lower = keyword.lower()
+    return [page_info['file'] for items in rag.category_index.values()
+            for page_info in items if keyword_lower in page_info['title'].lower()]
+
+
+def legacy_relation_count(rag: WikipediaRAG, entity: str, max_depth: int) -> int:
+    """旧实现：无节点上限的递归遍历，返回访问的实体数"""
+    visited = set()
+
+    def traverse(name, depth):
+        if depth > max_depth or name in visited:
+            return
+        visited.add(name)
+        if name in rag.knowledge_graph:
+            for _, target in rag.knowledge_graph[name].relations:
+                traverse(target, depth + 1)
+
+    traverse(entity, 0)
+    return len(visited)
+
+
+def measure(queries, run):
+    """返回(recall@5, p50毫秒, p95毫秒)"""
+    latencies, hits = [], 0
+    for query, expected in queries:
+        start = time.perf_counter()
+        files = run(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += expected in files[:5]
+    latencies.sort()
+    return hits / len(queries), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wiki_dir = Path(temp_dir)
+        pages = generate_corpus(wiki_dir, page_count, rng)
+        sample = rng.sample(pages, query_count)
+        title_queries = [(title, filename) for filename, title, _, _ in sample]
+        body_queries = [(marker, filename) for filename, _, marker, _ in sample]
+
+        rag = WikipediaRAG(str(wiki_dir))
+        start = time.perf_counter()
+        rag._ensure_search_index()
+        build_time = time.perf_counter() - start
+
+        def indexed(query):
+            return [Path(page.source_path).name for page in rag.retrieve_by_keyword(query, top_k=5)]
+
+        def hybrid(query):
+            return [Path(page.source_path).name for page, _ in rag.retrieve(query, top_k=5)]
+
+        def legacy(query):
+            return legacy_keyword(rag, query)
+
+        results = {
+            "旧实现 标题查询": measure(title_queries, legacy),
+            "旧实现 正文查询": measure(body_queries, legacy),
+            "倒排索引 标题查询": measure(title_queries, indexed),
+            "倒排索引 正文查询": measure(body_queries, indexed),
+            "混合检索 正文查询": measure(body_queries, hybrid),
+        }
+
+        seeds = [f"entity_{rng.randrange(page_count)}" for _ in range(20)]
+        start = time.perf_counter()
+        legacy_nodes = sum(legacy_relation_count(rag, seed, 4) for seed in seeds)
+        legacy_graph = (time.perf_counter() - start) / len(seeds) * 1000
+        start = time.perf_counter()
+        bfs_nodes = sum(len(rag._graph_hits([seed], max_depth=4, max_nodes=50)) for seed in seeds)
+        bfs_graph = (time.perf_counter() - start) / len(seeds) * 1000
+
+    print("=" * 64)
+    print(f"WikipediaRAG检索基准测试（{page_count}页，{query_count}个查询）")
+    print("=" * 64)
+    print(f"  建立倒排索引: {build_time * 1000:.0f}ms")
+    print(f"  {'':20s} {'recall@5':>9s} {'p50':>9s} {'p95':>9s}")
+    for name, (recall, p50, p95) in results.items():
+        print(f"  {name:20s} {recall:9.2%} {p50:7.2f}ms {p95:7.2f}ms")
+    print(f"  图谱遍历（深度4）: 旧实现平均访问{legacy_nodes / len(seeds):.0f}个实体 {legacy_graph:.2f}ms，"
+          f"BFS预算50: {bfs_nodes / len(seeds):.0f}个实体 {bfs_graph:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+本地语义向量 - 可插拔嵌入后端 + 紧凑向量索引
+
+替代RDF转换器中用SHA-256播种随机数生成的"模拟"向量：
+- 嵌入后端：
+  - hash（默认）：中英文分词后的哈希词频向量，纯CPU、无需模型，
+    相同词汇的文本向量相近
+  - sentence-transformers：本地小模型（需要安装sentence-transformers）
+  通过环境变量AGENT_EMBEDDING_BACKEND选择
+- 嵌入缓存：按(后端, 文本)的内容哈希缓存在~/.agent/.embedding_cache.sqlite
+- 向量索引：float16或int8紧凑矩阵；数据量大时用IVF（球面k-means粗聚类）
+  做近似检索，小数据量直接精确计算
+
+RDF转换器和知识加载器都通过SemanticIndex使用。
+"""
+
+import os
+import zlib
+import math
+import sqlite3
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .knowledge_search import tokenize
+except ImportError:
+    # 支持把core目录加入sys.path后直接import
+    from knowledge_search import tokenize
+
+__all__ = [
+    'HashingEmbeddingBackend',
+    'SentenceTransformerBackend',
+    'get_embedding_backend',
+    'EmbeddingCache',
+    'VectorIndex',
+    'SemanticIndex',
+]
+
+DEFAULT_DIM = 512
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+IVF_MIN_SIZE = 4096  # 少于此数量的向量直接精确检索
+MAX_MEMORY_ENTRIES = 10000  # 进程内嵌入缓存的容量（LRU淘汰，其余留在SQLite中）
+
+
+# ============= 嵌入后端 =============
+
+class HashingEmbeddingBackend:
+    """哈希词频向量（无需模型的兜底后端）
+
+    中文二元组+英文单词经crc32哈希到dim维（带符号，减少碰撞影响），
+    词频取1+log(tf)，最后L2归一化。结果跨进程确定。
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, tf in Counter(tokenize(text)).items():
+                h = zlib.crc32(token.encode('utf-8'))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * (1.0 + math.log(tf))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerBackend:
+    """本地sentence-transformers模型（CPU）"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        from sentence_transformers import SentenceTransformer  # 可选依赖
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def get_embedding_backend():
+    """进程内共享的嵌入后端（AGENT_EMBEDDING_BACKEND=hash|sentence-transformers）"""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            choice = os.getenv("AGENT_EMBEDDING_BACKEND", "hash")
+            if choice == "sentence-transformers":
+                try:
+                    _BACKEND = SentenceTransformerBackend(
+                        os.getenv("AGENT_EMBEDDING_MODEL", DEFAULT_MODEL))
+                except ImportError:
+                    print("  ⚠️ 未安装sentence-transformers，使用哈希向量")
+            if _BACKEND is None:
+                _BACKEND = HashingEmbeddingBackend()
+        return _BACKEND
+
+
+# ============= 嵌入缓存 =============
+
+class EmbeddingCache:
+    """按内容哈希缓存嵌入向量（float16存储）
+
+    进程内只保留最近使用的max_memory_entries个向量（LRU），淘汰的向量仍可从SQLite读取。
+    """
+
+    def __init__(self, backend=None, db_path: Optional[Path] = None,
+                 max_memory_entries: int = MAX_MEMORY_ENTRIES):
+        self.backend = backend or get_embedding_backend()
+        self.db_path = Path(db_path) if db_path else Path.home() / ".agent" / ".embedding_cache.sqlite"
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.backend.name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            return conn
+        except sqlite3.Error:
+            return None  # 缓存不可用时直接计算
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """返回(len(texts), dim)的float32矩阵，只计算未缓存的文本"""
+        keys = [self._key(text) for text in texts]
+        result = np.zeros((len(texts), self.backend.dim), dtype=np.float32)
+        missing = []
+
+        with self._lock:
+            for row, key in enumerate(keys):
+                cached = self._memory.get(key)
+                if cached is not None:
+                    self._memory.move_to_end(key)
+                    result[row] = cached
+                else:
+                    missing.append(row)
+
+        conn = self._connect() if missing else None
+        if conn is not None:
+            still_missing = []
+            for row in missing:
+                found = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (keys[row],)).fetchone()
+                if found:
+                    result[row] = np.frombuffer(found[0], dtype=np.float16)
+                else:
+                    still_missing.append(row)
+            missing = still_missing
+
+        if missing:
+            computed = self.backend.embed([texts[row] for row in missing])
+            result[missing] = computed
+            if conn is not None:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                            [(keys[row], computed[i].astype(np.float16).tobytes())
+                             for i, row in enumerate(missing)]
+                        )
+                except sqlite3.Error:
+                    pass
+        if conn is not None:
+            conn.close()
+
+        with self._lock:
+            for row, key in enumerate(keys):
+                # 复制出单行，避免缓存的视图让整个result矩阵无法释放
+                self._memory[key] = result[row].copy()
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+        return result
+
+
+# ============= 向量索引 =============
+
+class VectorIndex:
+    """紧凑存储的归一化向量索引（内积=余弦相似度）
+
+    dtype='float16'：每维2字节；dtype='int8'：每维1字节（归一化向量各维在[-1,1]，
+    按127量化）。向量数达到IVF_MIN_SIZE后训练IVF，检索时只扫描nprobe个聚类。
+    """
+
+    def __init__(self, dim: int, dtype: str = "float16", nprobe: int = 8):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"不支持的存储类型: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.nprobe = nprobe
+        self.ids: List[str] = []
+        self._matrix = np.zeros((0, dim), dtype=np.int8 if dtype == "int8" else np.float16)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._indexed = 0  # 已纳入IVF的向量数（之后追加的向量精确扫描）
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dtype == "int8":
+            return np.clip(np.round(vectors * 127), -127, 127).astype(np.int8)
+        return vectors.astype(np.float16)
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        if self.dtype == "int8":
+            return rows.astype(np.float32) / 127.0
+        return rows.astype(np.float32)
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        self.ids.extend(ids)
+        self._matrix = np.vstack([self._matrix, self._encode(np.asarray(vectors, dtype=np.float32))])
+        # 新增过多时重新训练IVF
+        pending = len(self.ids) - self._indexed
+        if self._centroids is not None and pending > max(1024, self._indexed // 5):
+            self._centroids = None
+
+    def build(self, iterations: int = 10, seed: int = 0):
+        """训练IVF（球面k-means），少于IVF_MIN_SIZE个向量时不需要"""
+        count = len(self.ids)
+        if count < IVF_MIN_SIZE:
+            self._centroids = None
+            return
+        rng = np.random.default_rng(seed)  # 局部随机数生成器，不影响全局状态
+        nlist = int(math.sqrt(count))
+        sample_size = min(count, nlist * 64)
+        sample = self._decode(self._matrix[rng.choice(count, sample_size, replace=False)])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    center = members.sum(axis=0)
+                    centroids[c] = center / (np.linalg.norm(center) or 1.0)
+
+        # 分块分配全部向量，控制内存
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 8192):
+            block = self._decode(self._matrix[start:start + 8192])
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [np.flatnonzero(assign == c) for c in range(nlist)]
+        self._indexed = count
+
+    def search(self, query: np.ndarray, top_k: int = 10) -> List[Tuple[str, float]]:
+        """返回[(id, 相似度)]，相似度从高到低"""
+        if not self.ids:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if self._centroids is None and len(self.ids) >= IVF_MIN_SIZE:
+            self.build()
+
+        if self._centroids is None:
+            candidates = np.arange(len(self.ids))
+        else:
+            nprobe = min(self.nprobe, len(self._lists))
+            probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+            pending = np.arange(self._indexed, len(self.ids))
+            candidates = np.concatenate([self._lists[p] for p in probes] + [pending])
+
+        scores = self._decode(self._matrix[candidates]) @ query
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in best]
+
+    def save(self, path: Path):
+        np.savez(path, ids=np.array(self.ids), matrix=self._matrix,
+                 dtype=np.array(self.dtype), nprobe=np.array(self.nprobe))
+
+    @classmethod
+    def load(cls, path: Path) -> "VectorIndex":
+        data = np.load(path, allow_pickle=False)
+        index = cls(data["matrix"].shape[1], str(data["dtype"]), int(data["nprobe"]))
+        index.ids = [str(i) for i in data["ids"]]
+        index._matrix = data["matrix"]
+        return index
+
+
+class SemanticIndex:
+    """文本语义检索：嵌入后端 + 内容哈希缓存 + 向量索引"""
+
+    def __init__(self, backend=None, dtype: str = "float16"):
+        self.cache = EmbeddingCache(backend)
+        self.index = VectorIndex(self.cache.backend.dim, dtype)
+        self._ids = set()
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._ids
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.cache.embed([text])[0]
+
+    def add_texts(self, ids: Sequence[str], texts: Sequence[str]):
+        if ids:
+            self.index.add(ids, self.cache.embed(texts))
+            self._ids.update(ids)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        return self.index.search(self.embed(query), top_k)
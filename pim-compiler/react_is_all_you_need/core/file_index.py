@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+大文件范围读取 - 字符/行偏移索引
+
+ReadFileTool分页读取几百MB的日志时，不再每页都把整个文件读入内存：
+- 每个文件（按路径+mtime+大小）只扫描一次，建立稀疏索引：
+  每CHAR_STEP个字符、每LINE_STEP行记录一次字节偏移
+- 索引缓存在进程内存中，并持久化到~/.agent/.file_index/（跨进程复用）
+- 读取时seek到最近的检查点，只解码需要的那一段
+- 超大文件使用mmap读取
+- 按surrogateescape解码：每个非法UTF-8字节算一个字符，重新编码时字节数与原文一致，
+  检查点偏移不会漂移；返回给调用方前再替换为U+FFFD
+"""
+
+import os
+import re
+import json
+import mmap
+import codecs
+import hashlib
+import threading
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List, Optional
+
+__all__ = [
+    'FileRangeIndex',
+    'read_char_range',
+    'read_line_range',
+    'read_tail',
+]
+
+CHAR_STEP = 65536  # 每隔多少字符记录一个检查点
+LINE_STEP = 1024  # 每隔多少行记录一个检查点
+BLOCK_SIZE = 1 << 20  # 建索引时每次读取的字节数
+MMAP_MIN_SIZE = 64 * 1024 * 1024  # 超过此大小的文件用mmap读取
+INDEX_VERSION = 2
+
+_ESCAPED_BYTE = re.compile('[\udc80-\udcff]')
+
+
+class FileRangeIndex:
+    """单个文件的稀疏偏移索引
+
+    char_offsets[i] = 第 i*CHAR_STEP 个字符的字节偏移
+    line_offsets[i] = 第 i*LINE_STEP 行行首的字节偏移
+    """
+
+    def __init__(self, path: str, mtime_ns: int, size: int,
+                 total_chars: int, total_lines: int,
+                 char_offsets: List[int], line_offsets: List[int]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.total_chars = total_chars
+        self.total_lines = total_lines
+        self.char_offsets = char_offsets
+        self.line_offsets = line_offsets
+
+    @classmethod
+    def build(cls, path: Path) -> "FileRangeIndex":
+        """扫描一次文件，建立字符和行的检查点"""
+        stat = path.stat()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='surrogateescape')
+        char_offsets = [0]
+        line_offsets = [0]
+        total_chars = 0
+        newline_count = 0
+        text_start = 0  # 当前块解码文本对应的起始字节
+        block_start = 0
+
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(BLOCK_SIZE)
+                final = not block
+                text = decoder.decode(block, final=final)
+                # 解码器缓存的不完整字符属于下一块
+                text_end = block_start + len(block) - len(decoder.getstate()[0])
+
+                # 字符检查点
+                next_char = len(char_offsets) * CHAR_STEP
+                if text and total_chars + len(text) > next_char:
+                    if text.isascii():
+                        while total_chars + len(text) > next_char:
+                            char_offsets.append(text_start + next_char - total_chars)
+                            next_char += CHAR_STEP
+                    else:
+                        prev_k, byte_pos = 0, text_start
+                        while total_chars + len(text) > next_char:
+                            k = next_char - total_chars
+                            byte_pos += len(text[prev_k:k].encode('utf-8', errors='surrogateescape'))
+                            char_offsets.append(byte_pos)
+                            prev_k = k
+                            next_char += CHAR_STEP
+                total_chars += len(text)
+
+                # 行检查点（'\n'不会出现在UTF-8多字节字符内部，直接按字节统计）
+                block_newlines = block.count(b'\n')
+                next_line = len(line_offsets) * LINE_STEP
+                if newline_count + block_newlines >= next_line:
+                    # 各行结束位置（块内相对偏移）
+                    line_ends = list(accumulate(len(part) + 1 for part in block.split(b'\n')[:-1]))
+                    while newline_count + block_newlines >= next_line:
+                        line_offsets.append(block_start + line_ends[next_line - newline_count - 1])
+                        next_line += LINE_STEP
+                newline_count += block_newlines
+
+                if final:
+                    break
+                block_start += len(block)
+                text_start = text_end
+
+        # 最后一行没有换行符时也算一行
+        total_lines = newline_count
+        if stat.st_size and not _ends_with_newline(path):
+            total_lines += 1
+
+        return cls(str(path), stat.st_mtime_ns, stat.st_size,
+                   total_chars, total_lines, char_offsets, line_offsets)
+
+    def is_valid_for(self, stat: os.stat_result) -> bool:
+        """文件未变化（mtime和大小都一致）时索引有效"""
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": INDEX_VERSION,
+            "path": self.path,
+            "mtime_ns": self.mtime_ns,
+            "size": self.size,
+            "total_chars": self.total_chars,
+            "total_lines": self.total_lines,
+            "char_step": CHAR_STEP,
+            "line_step": LINE_STEP,
+            "char_offsets": self.char_offsets,
+            "line_offsets": self.line_offsets,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> Optional["FileRangeIndex"]:
+        if (data.get("version") != INDEX_VERSION
+                or data.get("char_step") != CHAR_STEP
+                or data.get("line_step") != LINE_STEP):
+            return None
+        return cls(data["path"], data["mtime_ns"], data["size"],
+                   data["total_chars"], data["total_lines"],
+                   data["char_offsets"], data["line_offsets"])
+
+
+# ============= 索引缓存 =============
+
+_INDEX_CACHE: Dict[str, FileRangeIndex] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def _sidecar_path(path: Path) -> Path:
+    """索引的持久化位置：~/.agent/.file_index/<路径哈希>.json"""
+    digest = hashlib.sha1(str(path).encode('utf-8')).hexdigest()
+    return Path.home() / ".agent" / ".file_index" / f"{digest}.json"
+
+
+def get_index(path: Path) -> FileRangeIndex:
+    """获取文件索引：内存缓存 → 磁盘索引 → 重新扫描"""
+    path = path.resolve()
+    stat = path.stat()
+    key = str(path)
+
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(key)
+    if index and index.is_valid_for(stat):
+        return index
+
+    sidecar = _sidecar_path(path)
+    index = None
+    if sidecar.exists():
+        try:
+            index = FileRangeIndex.from_dict(json.loads(sidecar.read_text(encoding='utf-8')))
+        except (ValueError, KeyError, OSError):
+            index = None
+    if index is None or index.path != key or not index.is_valid_for(stat):
+        index = FileRangeIndex.build(path)
+        try:
+            sidecar.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = sidecar.with_suffix('.tmp')
+            temp_file.write_text(json.dumps(index.to_dict()), encoding='utf-8')
+            temp_file.replace(sidecar)  # 原子操作
+        except OSError:
+            pass  # 索引持久化失败不影响读取
+
+    with _INDEX_LOCK:
+        _INDEX_CACHE[key] = index
+    return index
+
+
+# ============= 范围读取 =============
+
+def _ends_with_newline(path: Path) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _open_reader(path: Path, size: int):
+    """超大文件用mmap，否则用普通文件（两者都支持seek/read）"""
+    f = open(path, 'rb')
+    if size >= MMAP_MIN_SIZE:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f.close()
+            return mm
+        except (ValueError, OSError):
+            pass
+    return f
+
+
+def _printable(text: str) -> str:
+    """把surrogateescape解码出的非法字节逐个替换为U+FFFD（字符数不变）"""
+    return _ESCAPED_BYTE.sub('\ufffd', text)
+
+
+def _decode_chars(reader, byte_start: int, skip: int, count: Optional[int]) -> str:
+    """从byte_start开始解码，跳过skip个字符后读取count个字符（None表示读到末尾）"""
+    reader.seek(byte_start)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='surrogateescape')
+    parts = []
+    collected = 0
+    wanted = None if count is None else skip + count
+    while wanted is None or collected < wanted:
+        # UTF-8每个字符最多4字节，按剩余字符数估算读取量
+        need = BLOCK_SIZE if wanted is None else max(4096, (wanted - collected) * 4)
+        block = reader.read(need)
+        text = decoder.decode(block, final=not block)
+        parts.append(text)
+        collected += len(text)
+        if not block:
+            break
+    text = ''.join(parts)
+    return _printable(text[skip:] if wanted is None else text[skip:wanted])
+
+
+def read_char_range(path: Path, offset: int, limit: int) -> str:
+    """按字符读取 [offset, offset+limit)；offset为负数时从末尾倒数，limit=0读到末尾"""
+    index = get_index(path)
+    if offset < 0:
+        offset = max(0, index.total_chars + offset)
+    if offset >= index.total_chars:
+        return f"偏移量{offset}超过文件长度{index.total_chars}字符"
+
+    checkpoint = min(offset // CHAR_STEP, len(index.char_offsets) - 1)
+    reader = _open_reader(path, index.size)
+    try:
+        return _decode_chars(reader, index.char_offsets[checkpoint],
+                             offset - checkpoint * CHAR_STEP, limit or None)
+    finally:
+        reader.close()
+
+
+def read_line_range(path: Path, offset: int, limit: int) -> str:
+    """按行读取第offset行起的limit行（0起始）；offset为负数时从末尾倒数，limit=0读到末尾"""
+    index = get_index(path)
+    if offset < 0:
+        offset = max(0, index.total_lines + offset)
+    if offset >= index.total_lines:
+        return f"偏移量{offset}超过文件长度{index.total_lines}行"
+
+    checkpoint = min(offset // LINE_STEP, len(index.line_offsets) - 1)
+    skip = offset - checkpoint * LINE_STEP
+    reader = _open_reader(path, index.size)
+    try:
+        reader.seek(index.line_offsets[checkpoint])
+        lines = []
+        for _ in range(skip):
+            if not reader.readline():
+                break
+        while not limit or len(lines) < limit:
+            line = reader.readline()
+            if not line:
+                break
+            lines.append(line)
+        return b''.join(lines).decode('utf-8', errors='replace')
+    finally:
+        reader.close()
+
+
+def read_tail(path: Path, lines: int) -> str:
+    """读取文件最后lines行（从末尾向前按块读取，不需要索引）"""
+    size = path.stat().st_size
+    if size == 0 or lines <= 0:
+        return ""
+    with open(path, 'rb') as f:
+        end = size
+        chunks = []
+        newlines = 0
+        # 末尾的换行符不算作一行的分隔
+        f.seek(size - 1)
+        trailing = 1 if f.read(1) == b'\n' else 0
+        while end > 0 and newlines <= lines - 1 + trailing:
+            start = max(0, end - BLOCK_SIZE)
+            f.seek(start)
+            chunk = f.read(end - start)
+            chunks.append(chunk)
+            newlines += chunk.count(b'\n')
+            end = start
+    data = b''.join(reversed(chunks))
+    body = data[:-1] if trailing else data
+    tail_lines = body.split(b'\n')[-lines:]
+    return (b'\n'.join(tail_lines) + (b'\n' if trailing else b'')).decode('utf-8', errors='replace')
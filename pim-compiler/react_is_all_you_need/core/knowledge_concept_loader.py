@@ -11,10 +11,21 @@
 """
 
 import re
+import threading
 from pathlib import Path
-from typing import List, Set, Dict, Optional
+from typing import List, Set, Dict, Optional, Tuple
 from dataclasses import dataclass
 
+try:
+    from .knowledge_index import KnowledgeFileCache, watch_knowledge_dirs
+    from .knowledge_search import KnowledgeSearchIndex
+except ImportError:
+    # 支持把core目录加入sys.path后直接import
+    from knowledge_index import KnowledgeFileCache, watch_knowledge_dirs
+    from knowledge_search import KnowledgeSearchIndex
+
+BODY_LIMIT = 2000  # 每个知识项保留用于全文检索的正文长度
+
 
 @dataclass
 class KnowledgeItem:
@@ -24,13 +35,21 @@ class KnowledgeItem:
     docstring: str         # 描述
     item_type: str         # 类型：'function', 'contract', 'concept', 'pattern', 'principle'
     category: str          # 分类：'executable'（可执行）, 'theory'（理论）
+    body: str = ""         # 正文（截断，用于全文检索）
 
 
 class KnowledgeConceptLoader:
     """扩展的知识加载器 - 支持函数和概念"""
 
-    def __init__(self, knowledge_dirs: List[str], already_loaded: Set[str] = None):
-        """初始化加载器"""
+    def __init__(self, knowledge_dirs: List[str], already_loaded: Set[str] = None,
+                 watch: bool = False):
+        """初始化加载器
+
+        Args:
+            knowledge_dirs: 知识目录列表
+            already_loaded: 已加载的文件
+            watch: 是否监听目录变化自动刷新索引（需要watchdog）
+        """
         self.knowledge_dirs = [Path(d) for d in knowledge_dirs]
         self.knowledge_index: Dict[str, KnowledgeItem] = {}  # @名称 -> 知识项
         self.loaded_files: Set[str] = already_loaded or set()
@@ -39,36 +58,82 @@ class KnowledgeConceptLoader:
         self.functions: Dict[str, KnowledgeItem] = {}  # 可执行函数
         self.concepts: Dict[str, KnowledgeItem] = {}   # 理论概念
 
-        # 启动时建立索引
-        self._build_index()
-
-    def _build_index(self):
-        """扫描knowledge/目录，建立知识索引"""
-        for dir_path in self.knowledge_dirs:
-            if not dir_path.exists():
-                continue
+        self._cache = KnowledgeFileCache("concept")
+        self._lock = threading.Lock()
+        self._search_index: Optional[KnowledgeSearchIndex] = None
+        self._semantic_index = None  # 语义向量索引（首次语义检索时建立）
+        self._name_lengths: List[int] = []  # 索引中出现过的名称长度（降序）
 
-            # 递归扫描所有.md文件
-            for md_file in dir_path.rglob("*.md"):
-                if md_file.name == "__init__.md":
-                    continue
+        # 启动时建立索引（只解析变化过的文件）
+        self._build_index()
 
-                # 提取文件中定义的所有知识项
-                items = self._extract_knowledge_items(md_file)
+        self._observer = watch_knowledge_dirs(self) if watch else None
 
-                # 建立映射
-                for item in items:
-                    # 统一索引
-                    if item.name not in self.knowledge_index:
-                        self.knowledge_index[item.name] = item
+    def refresh(self):
+        """重新建立索引（增量：未变化的文件直接使用缓存）"""
+        with self._lock:
+            self._build_index()
 
-                    # 分类索引
-                    if item.category == 'executable':
-                        if item.name not in self.functions:
-                            self.functions[item.name] = item
-                    elif item.category == 'theory':
-                        if item.name not in self.concepts:
-                            self.concepts[item.name] = item
+    def _build_index(self):
+        """扫描knowledge/目录，建立知识索引"""
+        # 先建在局部变量中，刷新期间查询者仍看到完整的旧索引
+        knowledge_index: Dict[str, KnowledgeItem] = {}
+        functions: Dict[str, KnowledgeItem] = {}
+        concepts: Dict[str, KnowledgeItem] = {}
+
+        # 按目录优先级得到每个文件的知识项（未变化的文件来自缓存）
+        for md_file, items in self._cache.scan(self.knowledge_dirs, self._extract_item_dicts):
+            # 同一文件的知识项共享一个Path对象
+            item_path = Path(items[0]["path"]) if items else md_file
+            for data in items:
+                item = KnowledgeItem(
+                    name=data["name"],
+                    path=item_path,
+                    docstring=data["docstring"],
+                    item_type=data["item_type"],
+                    category=data["category"],
+                    body=data.get("body", "")
+                )
+
+                # 统一索引
+                if item.name not in knowledge_index:
+                    knowledge_index[item.name] = item
+
+                # 分类索引
+                if item.category == 'executable':
+                    if item.name not in functions:
+                        functions[item.name] = item
+                elif item.category == 'theory':
+                    if item.name not in concepts:
+                        concepts[item.name] = item
+
+        # 没有文件被重新解析或删除时沿用已建好的检索索引（比较内容以发现
+        # 其他进程已经写入缓存的修改）
+        changed = (self._cache.parsed_count or self._cache.removed_count
+                   or knowledge_index != self.knowledge_index)
+        if not changed:
+            return
+
+        self.knowledge_index = knowledge_index
+        self.functions = functions
+        self.concepts = concepts
+        self._name_lengths = sorted({len(name) for name in knowledge_index}, reverse=True)
+        self._search_index = None  # 检索索引在首次搜索时重建
+        self._semantic_index = None
+
+    def _extract_item_dicts(self, file_path: Path) -> List[Dict]:
+        """提取知识项并转换为可缓存的dict"""
+        return [
+            {
+                "name": item.name,
+                "path": str(item.path),
+                "docstring": item.docstring,
+                "item_type": item.item_type,
+                "category": item.category,
+                "body": item.body,
+            }
+            for item in self._extract_knowledge_items(file_path)
+        ]
 
     def _extract_knowledge_items(self, file_path: Path) -> List[KnowledgeItem]:
         """从.md文件中提取所有知识项
@@ -123,7 +188,8 @@ class KnowledgeConceptLoader:
                         path=file_path.resolve(),
                         docstring=docstring,
                         item_type=item_type,
-                        category=category
+                        category=category,
+                        body=section_content.strip()[:BODY_LIMIT]
                     )
                     items.append(item)
 
@@ -193,11 +259,13 @@ class KnowledgeConceptLoader:
         # 过滤出索引中存在的项
         valid_matches = []
         for match in all_matches:
-            # 尝试最长匹配
-            for i in range(len(match), 0, -1):
-                candidate = match[:i]
-                if candidate in self.knowledge_index:
-                    valid_matches.append(candidate)
+            if match in self.knowledge_index:
+                valid_matches.append(match)
+                continue
+            # 尝试最长匹配（只尝试索引中存在的名称长度）
+            for length in self._name_lengths:
+                if length < len(match) and match[:length] in self.knowledge_index:
+                    valid_matches.append(match[:length])
                     break
 
         return valid_matches
@@ -228,30 +296,66 @@ class KnowledgeConceptLoader:
 
         return "\n".join(lines)
 
-    def search_by_keyword(self, keyword: str) -> List[KnowledgeItem]:
-        """按关键词搜索知识项"""
-        results = []
-        keyword_lower = keyword.lower()
+    @property
+    def search_index(self) -> KnowledgeSearchIndex:
+        """BM25检索索引（知识变化后首次搜索时重建）"""
+        index = self._search_index
+        if index is None:
+            index = KnowledgeSearchIndex(self.knowledge_index.values())
+            self._search_index = index
+        return index
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[KnowledgeItem, float]]:
+        """按相关度检索知识项，返回[(知识项, 分数)]
 
-        for item in self.knowledge_index.values():
-            # 搜索名称和描述
-            if (keyword_lower in item.name.lower() or
-                keyword_lower in item.docstring.lower()):
-                results.append(item)
+        @开头的查询按名称模糊匹配（相似度0~1），否则按BM25全文检索。
+        """
+        query = query.strip()
+        if query.startswith('@'):
+            return [(self.knowledge_index[name], score)
+                    for name, score in self.search_index.fuzzy_names(query, top_k)]
+        return self.search_index.search(query, top_k)
+
+    def semantic_search(self, query: str, top_k: int = 10) -> List[Tuple[KnowledgeItem, float]]:
+        """按语义向量相似度检索知识项（需要numpy），返回[(知识项, 相似度)]"""
+        if self._semantic_index is None:
+            try:  # 可选依赖numpy，按需导入
+                from .embedding_index import SemanticIndex
+            except ImportError:
+                from embedding_index import SemanticIndex
+            semantic_index = SemanticIndex()
+            items = list(self.knowledge_index.values())
+            semantic_index.add_texts([item.name for item in items],
+                                     [f"{item.name} {item.docstring} {item.body}" for item in items])
+            self._semantic_index = semantic_index
+        return [(self.knowledge_index[name], score)
+                for name, score in self._semantic_index.search(query, top_k)
+                if name in self.knowledge_index]
+
+    def search_by_keyword(self, keyword: str) -> List[KnowledgeItem]:
+        """按关键词搜索知识项（按相关度排序）"""
+        results = [item for item, _ in self.search(keyword, top_k=50)]
+
+        # 名称拼写相近的也算命中
+        seen = {item.name for item in results}
+        for name, _ in self.search_index.fuzzy_names(keyword, top_k=5):
+            if name not in seen:
+                seen.add(name)
+                results.append(self.knowledge_index[name])
+
+        # 名称或描述包含关键词的子串也算命中（如valid匹配validate、单个汉字），
+        # 走子串索引而不是逐项扫描
+        for name in self.search_index.substring_names(keyword.strip()):
+            if name not in seen:
+                seen.add(name)
+                results.append(self.knowledge_index[name])
 
         return results
 
     def get_related_items(self, name: str) -> List[KnowledgeItem]:
-        """获取相关知识项（同文件或相似名称）"""
+        """获取相关知识项（同文件或互相@引用）"""
         if name not in self.knowledge_index:
             return []
 
-        target = self.knowledge_index[name]
-        related = []
-
-        # 同文件的其他项
-        for item in self.knowledge_index.values():
-            if item.path == target.path and item.name != name:
-                related.append(item)
-
-        return related
\ No newline at end of file
+        return [self.knowledge_index[related]
+                for related in self.search_index.related.get(name, [])]
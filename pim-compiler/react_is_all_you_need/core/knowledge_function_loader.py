@@ -11,10 +11,17 @@
 
 import re
 import json
+import threading
 from pathlib import Path
 from typing import List, Set, Dict, Optional
 from dataclasses import dataclass, asdict
 
+try:
+    from .knowledge_index import KnowledgeFileCache, watch_knowledge_dirs
+except ImportError:
+    # 支持把core目录加入sys.path后直接import
+    from knowledge_index import KnowledgeFileCache, watch_knowledge_dirs
+
 
 @dataclass
 class FunctionInfo:
@@ -49,74 +56,106 @@ class KnowledgeFunctionLoader:
     - 不是系统自动加载（避免剥夺智能体的主动性）
     """
 
-    def __init__(self, knowledge_dirs: List[str]):
+    def __init__(self, knowledge_dirs: List[str], watch: bool = False):
         """初始化索引构建器
 
         Args:
             knowledge_dirs: 知识目录列表（类似PATH环境变量）
+            watch: 是否监听目录变化自动刷新索引（需要watchdog）
         """
         self.knowledge_dirs = [Path(d) for d in knowledge_dirs]
         self.function_index: Dict[str, FunctionInfo] = {}  # @函数名 -> 函数信息
+        self._cache = KnowledgeFileCache("function")
+        self._lock = threading.Lock()
 
-        # 启动时建立索引
+        # 启动时建立索引（只解析变化过的文件）
         self._build_index()
 
-    def _build_index(self):
-        """扫描knowledge/目录，建立@函数名到函数信息的映射"""
-        for dir_path in self.knowledge_dirs:
-            if not dir_path.exists():
-                continue
-
-            # 递归扫描所有.md文件
-            for md_file in dir_path.rglob("*.md"):
-                # 跳过__init__.md和已索引的文件
-                if md_file.name == "__init__.md":
-                    continue
+        self._observer = watch_knowledge_dirs(self) if watch else None
 
-                # 提取文件中定义的所有@函数
-                functions = self._extract_functions(md_file)
+    def refresh(self):
+        """重新建立索引（增量：未变化的文件直接使用缓存）"""
+        with self._lock:
+            self._build_index()
 
-                # 建立映射（支持partial定义，类似C# partial class）
-                for func_info in functions:
-                    if func_info.name not in self.function_index:
-                        # 第一次遇到，添加到索引
-                        self.function_index[func_info.name] = func_info
-                    else:
-                        # 检测到重复定义（类似Unix PATH机制）
-                        existing = self.function_index[func_info.name]
-                        if existing.path != func_info.path:
-                            # 检查核心一致性：签名和类型（不验证docstring）
-                            signature_match = existing.signature == func_info.signature
-                            type_match = existing.func_type == func_info.func_type
-                            docstring_match = existing.docstring == func_info.docstring
-
-                            if signature_match and type_match:
-                                # ✅ Partial定义（类似C# partial class）
-                                # docstring可以不同（允许从不同角度解释）
-                                existing.all_locations.append(func_info.path)
-                                print(f"  ✅ Partial定义: @{func_info.name}")
-                                print(f"     主定义: {existing.path.name}")
-                                print(f"     也出现在: {func_info.path.name}")
-                                print(f"     验证核心: 签名✓ 类型✓")
-
-                                if not docstring_match:
-                                    print(f"     📝 docstring不同（允许，建议添加链接到主定义）")
-                            else:
-                                # ⚠️ 版本冲突（类似Unix PATH优先级）
-                                print(f"  ⚠️ 版本冲突: @{func_info.name}")
-                                print(f"     使用: {existing.path.name} (优先级高)")
-                                print(f"     忽略: {func_info.path.name} (优先级低)")
-
-                                # 详细差异报告（不抛出错误）
-                                if not signature_match:
-                                    print(f"        签名: ({existing.signature}) ≠ ({func_info.signature})")
-                                if not type_match:
-                                    print(f"        类型: {existing.func_type} ≠ {func_info.func_type}")
-
-                                print(f"     💡 类似Unix: /usr/bin/ls 优先于 /bin/ls")
-
-        # 保存索引到磁盘
-        self._save_index_to_disk()
+    def _build_index(self):
+        """扫描knowledge/目录，建立@函数名到函数信息的映射"""
+        # 先建在局部变量中，刷新期间查询者仍看到完整的旧索引
+        function_index: Dict[str, FunctionInfo] = {}
+
+        # 按目录优先级得到每个文件的函数定义（未变化的文件来自缓存）
+        for md_file, items in self._cache.scan(self.knowledge_dirs, self._extract_function_dicts):
+            # 同一文件的函数共享一个Path对象（热启动时Path构造是主要开销）
+            item_path = Path(items[0]["path"]) if items else md_file
+            functions = [self._function_from_dict(item, item_path) for item in items]
+
+            # 建立映射（支持partial定义，类似C# partial class）
+            for func_info in functions:
+                if func_info.name not in function_index:
+                    # 第一次遇到，添加到索引
+                    function_index[func_info.name] = func_info
+                else:
+                    # 检测到重复定义（类似Unix PATH机制）
+                    existing = function_index[func_info.name]
+                    if existing.path != func_info.path:
+                        # 检查核心一致性：签名和类型（不验证docstring）
+                        signature_match = existing.signature == func_info.signature
+                        type_match = existing.func_type == func_info.func_type
+                        docstring_match = existing.docstring == func_info.docstring
+
+                        if signature_match and type_match:
+                            # ✅ Partial定义（类似C# partial class）
+                            # docstring可以不同（允许从不同角度解释）
+                            existing.all_locations.append(func_info.path)
+                            print(f"  ✅ Partial定义: @{func_info.name}")
+                            print(f"     主定义: {existing.path.name}")
+                            print(f"     也出现在: {func_info.path.name}")
+                            print(f"     验证核心: 签名✓ 类型✓")
+
+                            if not docstring_match:
+                                print(f"     📝 docstring不同（允许，建议添加链接到主定义）")
+                        else:
+                            # ⚠️ 版本冲突（类似Unix PATH优先级）
+                            print(f"  ⚠️ 版本冲突: @{func_info.name}")
+                            print(f"     使用: {existing.path.name} (优先级高)")
+                            print(f"     忽略: {func_info.path.name} (优先级低)")
+
+                            # 详细差异报告（不抛出错误）
+                            if not signature_match:
+                                print(f"        签名: ({existing.signature}) ≠ ({func_info.signature})")
+                            if not type_match:
+                                print(f"        类型: {existing.func_type} ≠ {func_info.func_type}")
+
+                            print(f"     💡 类似Unix: /usr/bin/ls 优先于 /bin/ls")
+
+        self.function_index = function_index
+
+        # 保存索引到磁盘（知识文件没有变化且索引已是最新时跳过）
+        if self._cache.parsed_count or self._cache.removed_count or not self._index_is_current():
+            self._save_index_to_disk()
+
+    def _extract_function_dicts(self, file_path: Path) -> List[Dict]:
+        """提取函数定义并转换为可缓存的dict"""
+        return [
+            {
+                "name": func_info.name,
+                "path": str(func_info.path),
+                "docstring": func_info.docstring,
+                "func_type": func_info.func_type,
+                "signature": func_info.signature,
+            }
+            for func_info in self._extract_functions(file_path)
+        ]
+
+    @staticmethod
+    def _function_from_dict(item: Dict, path: Path) -> FunctionInfo:
+        return FunctionInfo(
+            name=item["name"],
+            path=path,
+            docstring=item["docstring"],
+            func_type=item["func_type"],
+            signature=item["signature"]
+        )
 
     def _extract_functions(self, file_path: Path) -> List[FunctionInfo]:
         """从.md文件中提取所有@函数的完整信息
@@ -283,6 +322,25 @@ class KnowledgeFunctionLoader:
             lines.append(f"    {func_info.docstring}")
         return "\n".join(lines)
 
+    def _index_file(self) -> Path:
+        """索引文件位置：项目根目录/knowledge_function_index.json"""
+        # 假设knowledge_dirs的第一个是 xxx/knowledge/，则项目根是上一级
+        if self.knowledge_dirs:
+            project_root = self.knowledge_dirs[0].parent
+        else:
+            project_root = Path.cwd()
+        return project_root / "knowledge_function_index.json"
+
+    def _index_is_current(self) -> bool:
+        """磁盘上的索引是否由相同的目录列表生成且函数数一致"""
+        try:
+            with open(self._index_file(), encoding='utf-8') as f:
+                metadata = json.load(f).get("metadata", {})
+        except (OSError, ValueError):
+            return False
+        return (metadata.get("knowledge_dirs") == [str(d) for d in self.knowledge_dirs]
+                and metadata.get("total_functions") == len(self.function_index))
+
     def _save_index_to_disk(self):
         """将索引保存到磁盘上的JSON文件
 
@@ -351,14 +409,7 @@ class KnowledgeFunctionLoader:
             # 按类型分组
             index_data["by_type"][func_info.func_type].append(func_name)
 
-        # 确定保存路径（项目根目录）
-        # 假设knowledge_dirs的第一个是 xxx/knowledge/，则项目根是上一级
-        if self.knowledge_dirs:
-            project_root = self.knowledge_dirs[0].parent
-        else:
-            project_root = Path.cwd()
-
-        index_file = project_root / "knowledge_function_index.json"
+        index_file = self._index_file()
 
         # 保存到文件
         try:
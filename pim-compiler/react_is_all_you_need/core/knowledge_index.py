@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+知识文件解析缓存 - 增量、跨进程共享
+
+KnowledgeFunctionLoader和KnowledgeConceptLoader启动时不再重新解析所有.md：
+- 每个文件的解析结果按(路径, mtime, 大小)缓存在SQLite中
+- 只重新解析新增或修改过的文件，已删除文件的缓存自动清除
+- SQLite(WAL)保证多个Agent进程同时启动时安全读写
+- 可选：watch_knowledge_dirs()用watchdog监听目录变化，自动刷新加载器
+
+缓存位置：~/.agent/.knowledge_index.sqlite
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+__all__ = [
+    'KnowledgeFileCache',
+    'watch_knowledge_dirs',
+]
+
+CACHE_VERSION = 2  # 解析规则变化时递增，旧缓存自动失效
+
+
+def _default_db_path() -> Path:
+    return Path.home() / ".agent" / ".knowledge_index.sqlite"
+
+
+class KnowledgeFileCache:
+    """按文件缓存知识项解析结果
+
+    kind区分不同的解析器（如'function'、'concept'），同一个文件
+    在不同解析器下的结果分别缓存。
+    """
+
+    def __init__(self, kind: str, db_path: Optional[Path] = None):
+        self.kind = f"{kind}:v{CACHE_VERSION}"
+        self.db_path = Path(db_path) if db_path else _default_db_path()
+        self.parsed_count = 0  # 最近一次scan重新解析的文件数
+        self.removed_count = 0  # 最近一次scan清除的文件数
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # 其他进程写入时最多等待30秒
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS knowledge_files (
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                items TEXT NOT NULL,
+                PRIMARY KEY (kind, path)
+            )""")
+            return conn
+        except sqlite3.Error as e:
+            print(f"  ⚠️ 知识索引缓存不可用，改为全量解析: {e}")
+            return None
+
+    @staticmethod
+    def _walk(dir_path: Path) -> List[Tuple[str, os.stat_result]]:
+        """递归列出目录下的.md文件（跳过__init__.md），同时拿到stat"""
+        files = []
+        for root, dirs, names in os.walk(dir_path):
+            for name in names:
+                if not name.endswith(".md") or name == "__init__.md":
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    files.append((path, os.stat(path)))
+                except OSError:
+                    continue
+        return files
+
+    def scan(self, knowledge_dirs: List[Path],
+             extract: Callable[[Path], List[Dict]]) -> List[Tuple[Path, List[Dict]]]:
+        """扫描知识目录，返回[(文件路径, 知识项列表)]（按目录优先级顺序）
+
+        extract只对新增或修改过的文件调用，返回值必须可JSON序列化。
+        """
+        self.parsed_count = 0
+        self.removed_count = 0
+        conn = self._connect()
+
+        cached: Dict[str, Tuple[int, int, str]] = {}
+        if conn is not None:
+            for path, mtime_ns, size, items in conn.execute(
+                    "SELECT path, mtime_ns, size, items FROM knowledge_files WHERE kind = ?",
+                    (self.kind,)):
+                cached[path] = (mtime_ns, size, items)
+
+        results = []
+        updates = []
+        seen = set()
+        roots = []
+        for dir_path in knowledge_dirs:
+            if not dir_path.exists():
+                continue
+            root = str(dir_path.resolve())
+            roots.append(root)
+            for path, stat in self._walk(Path(root)):
+                if path in seen:
+                    continue
+                seen.add(path)
+                entry = cached.get(path)
+                if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                    items = json.loads(entry[2])
+                else:
+                    items = extract(Path(path))
+                    updates.append((self.kind, path, stat.st_mtime_ns, stat.st_size,
+                                    json.dumps(items, ensure_ascii=False)))
+                results.append((Path(path), items))
+
+        # 已删除的文件（只清理本次扫描目录下的）
+        removed = [
+            path for path in cached
+            if path not in seen and any(path.startswith(root + os.sep) for root in roots)
+        ]
+        self.parsed_count = len(updates)
+        self.removed_count = len(removed)
+
+        if conn is not None:
+            try:
+                if updates or removed:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO knowledge_files VALUES (?, ?, ?, ?, ?)",
+                            updates
+                        )
+                        conn.executemany(
+                            "DELETE FROM knowledge_files WHERE kind = ? AND path = ?",
+                            [(self.kind, path) for path in removed]
+                        )
+            except sqlite3.Error as e:
+                print(f"  ⚠️ 保存知识索引缓存失败: {e}")
+            finally:
+                conn.close()
+
+        return results
+
+
+def watch_knowledge_dirs(loader, debounce: float = 0.5):
+    """用watchdog监听知识目录，.md文件变化时调用loader.refresh()
+
+    watchdog未安装时返回None。返回的Observer需要调用者stop()。
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        print("  ⚠️ 未安装watchdog，知识索引不会自动刷新")
+        return None
+
+    class _Handler(FileSystemEventHandler):
+        def __init__(self):
+            self._timer: Optional[threading.Timer] = None
+            self._lock = threading.Lock()
+
+        def on_any_event(self, event):
+            paths = [getattr(event, 'src_path', ''), getattr(event, 'dest_path', '')]
+            if event.is_directory or not any(str(p).endswith('.md') for p in paths):
+                return
+            # 合并短时间内的多次修改（编辑器保存通常触发多个事件）
+            with self._lock:
+                if self._timer:
+                    self._timer.cancel()
+                self._timer = threading.Timer(debounce, loader.refresh)
+                self._timer.daemon = True
+                self._timer.start()
+
+    observer = Observer()
+    handler = _Handler()
+    for dir_path in loader.knowledge_dirs:
+        if dir_path.exists():
+            observer.schedule(handler, str(dir_path), recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
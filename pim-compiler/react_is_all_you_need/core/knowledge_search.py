@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+知识检索索引 - BM25倒排索引 + @名称模糊匹配
+
+在KnowledgeConceptLoader的知识项之上建立：
+- 倒排索引：名称、描述、正文三个字段加权，按BM25排序
+- 分词：英文/数字按单词（下划线名称同时拆成子词），中文按二元组（bigram），
+  单个汉字保留为一元词
+- 名称三元组（trigram）索引：@名称拼写不完全一致时做模糊匹配
+- 子串索引：名称和描述的三元组/单字索引，按子串查找（如valid匹配validate、单个汉字）
+- 预计算的相关项：同文件的知识项 + 正文中互相@引用的知识项
+"""
+
+import re
+import math
+import heapq
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+__all__ = [
+    'tokenize',
+    'BM25Index',
+    'KnowledgeSearchIndex',
+]
+
+# 字段权重：名称命中最重要，其次是描述
+FIELD_WEIGHTS = {"name": 3.0, "docstring": 2.0, "body": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9_]+')
+_REFERENCE_RE = re.compile(r'@(\w+)')
+
+
+def tokenize(text: str) -> List[str]:
+    """中英文混合分词：中文二元组，英文单词（含下划线拆分）"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        run = match.group()
+        if run[0] >= '\u3400':
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            parts = [p for p in run.split('_') if p]
+            tokens.extend(parts)
+            if len(parts) > 1:
+                tokens.append(run)  # 完整名称也作为一个词
+    return tokens
+
+
+def _name_trigrams(name: str) -> Set[str]:
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _substring_grams(text: str) -> Set[str]:
+    """子串索引的键：不足三个字符时用单字，否则用三元组"""
+    if len(text) < 3:
+        return set(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class BM25Index:
+    """多字段加权的BM25倒排索引
+
+    文档号是0起始的整数，按add()的调用顺序分配。
+    """
+
+    def __init__(self, field_weights: Dict[str, float]):
+        self.field_weights = field_weights
+        # 倒排索引：词 -> {文档号: 加权词频}
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.doc_lengths: List[float] = []
+        self._total_length = 0.0
+
+    def add(self, fields: Dict[str, str]) -> int:
+        """加入一个文档，返回文档号"""
+        doc_id = len(self.doc_lengths)
+        weighted = Counter()
+        length = 0.0
+        for field, text in fields.items():
+            weight = self.field_weights.get(field, 1.0)
+            tokens = tokenize(text)
+            length += weight * len(tokens)
+            for token in tokens:
+                weighted[token] += weight
+        for token, tf in weighted.items():
+            self.postings[token][doc_id] = tf
+        self.doc_lengths.append(length)
+        self._total_length += length
+        return doc_id
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """BM25检索，返回[(文档号, 分数)]，分数从高到低"""
+        scores: Dict[int, float] = defaultdict(float)
+        doc_count = len(self.doc_lengths)
+        avg_length = (self._total_length / doc_count) if doc_count else 0.0
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / (avg_length or 1))
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda pair: pair[1])
+
+
+class KnowledgeSearchIndex:
+    """知识项的检索索引（建立后只读，知识变化时整体重建）"""
+
+    def __init__(self, items: Iterable):
+        self.items = list(items)
+        self.by_name = {item.name: item for item in self.items}
+
+        self.bm25 = BM25Index(FIELD_WEIGHTS)
+        for item in self.items:
+            self.bm25.add({
+                "name": item.name,
+                "docstring": item.docstring,
+                "body": getattr(item, 'body', ''),
+            })
+
+        # 名称三元组索引：三元组 -> 名称集合
+        self.trigrams: Dict[str, Set[str]] = defaultdict(set)
+        for name in self.by_name:
+            for gram in _name_trigrams(name):
+                self.trigrams[gram].add(name)
+
+        # 子串索引：名称+描述的三元组和单字 -> 名称集合
+        self._texts: Dict[str, Tuple[str, str]] = {}
+        self.substrings: Dict[str, Set[str]] = defaultdict(set)
+        for name, item in self.by_name.items():
+            texts = (name.lower(), item.docstring.lower())
+            self._texts[name] = texts
+            for text in texts:
+                for gram in set(text) | _substring_grams(text):
+                    self.substrings[gram].add(name)
+
+        # 相关项：同文件 + 正文中的@引用（双向）
+        by_file: Dict[Path, List[str]] = defaultdict(list)
+        for item in self.items:
+            by_file[item.path].append(item.name)
+        self.related: Dict[str, List[str]] = {}
+        references: Dict[str, Set[str]] = defaultdict(set)
+        for item in self.items:
+            for ref in _REFERENCE_RE.findall(getattr(item, 'body', '')):
+                if ref in self.by_name and ref != item.name:
+                    references[item.name].add(ref)
+                    references[ref].add(item.name)
+        for name, item in self.by_name.items():
+            same_file = [n for n in by_file[item.path] if n != name]
+            linked = sorted(references[name] - set(same_file))
+            self.related[name] = same_file + linked
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[object, float]]:
+        """BM25检索，返回[(知识项, 分数)]，分数从高到低"""
+        return [(self.items[doc_id], score) for doc_id, score in self.bm25.search(query, top_k)]
+
+    def substring_names(self, keyword: str) -> List[str]:
+        """名称或描述包含keyword子串的知识项名称（按名称排序）
+
+        用三元组（不足三个字符时用单字）索引求候选集的交集，再逐个确认。
+        """
+        keyword = keyword.lower()
+        if not keyword:
+            return []
+        candidates = None
+        for gram in sorted(_substring_grams(keyword), key=lambda g: len(self.substrings.get(g, ()))):
+            names = self.substrings.get(gram)
+            if not names:
+                return []
+            candidates = set(names) if candidates is None else candidates & names
+            if not candidates:
+                return []
+        return sorted(name for name in candidates
+                      if any(keyword in text for text in self._texts[name]))
+
+    def fuzzy_names(self, name: str, top_k: int = 5, threshold: float = 0.4) -> List[Tuple[str, float]]:
+        """按名称三元组的Dice系数做模糊匹配，返回[(名称, 相似度)]"""
+        name = name.lstrip('@')
+        if name in self.by_name:
+            return [(name, 1.0)]
+        query_grams = _name_trigrams(name)
+        overlap = Counter()
+        for gram in query_grams:
+            for candidate in self.trigrams.get(gram, ()):
+                overlap[candidate] += 1
+        scored = []
+        for candidate, shared in overlap.items():
+            similarity = 2 * shared / (len(query_grams) + len(_name_trigrams(candidate)))
+            if similarity >= threshold:
+                scored.append((candidate, similarity))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:top_k]
@@ -7,6 +7,8 @@ Agent自己就是智能压缩器，通过写笔记实现记忆
 import os
 import sys
 import json
+import time
+import threading
 import requests
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
@@ -58,6 +60,24 @@ def ensure_env_loaded():
 # 模块加载时即确保环境变量已加载
 ensure_env_loaded()
 
+# 进程级知识文件缓存：路径 → (mtime_ns, size, 内容)
+# 同一进程中的多个Agent共享，文件修改后按mtime自动失效
+_KNOWLEDGE_FILE_CACHE: Dict[str, Tuple[int, int, str]] = {}
+_KNOWLEDGE_FILE_CACHE_LOCK = threading.Lock()
+
+def read_knowledge_file(path: Path) -> str:
+    """读取知识文件（按路径和mtime缓存）"""
+    stat = path.stat()
+    key = str(path)
+    with _KNOWLEDGE_FILE_CACHE_LOCK:
+        cached = _KNOWLEDGE_FILE_CACHE.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    content = path.read_text(encoding='utf-8')
+    with _KNOWLEDGE_FILE_CACHE_LOCK:
+        _KNOWLEDGE_FILE_CACHE[key] = (stat.st_mtime_ns, stat.st_size, content)
+    return content
+
 # 不再需要外部记忆系统 - Agent自己做笔记
 try:
     from .tool_base import Function, ReadFileTool, WriteFileTool, AppendFileTool
@@ -135,8 +155,7 @@ class ReactAgentMinimal(Function):
         self.description = description
         self.parameters = parameters
         self.return_type = return_type
-        self.work_dir = Path(work_dir)
-        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.work_dir = Path(work_dir)  # 目录在首次使用时创建（见_ensure_initialized）
 
         self.model = model
         self.max_rounds = max_rounds
@@ -153,12 +172,21 @@ class ReactAgentMinimal(Function):
             "model": self.model,  # 使用当前Agent的模型
             "base_url": self.base_url,  # 使用当前Agent的base_url
             "api_key": self.api_key,  # 使用当前Agent的api_key
-            "threshold": 70000,  # 触发压缩的token数
+            "threshold": 70000,  # 硬阈值：同步压缩（兜底）
+            "soft_threshold": 55000,  # 软阈值：后台异步压缩
+            "keep_recent_rounds": 6,  # 原文保留的最近轮次数
+            "chunk_rounds": 8,  # 每个摘要分块的轮次数
+            "max_parallel_chunks": 4,  # 并行摘要的分块数
             "temperature": 0     # 确定性压缩
         }
         # 添加阈值属性方便访问
         self.compact_threshold = 70000
         self.compact_memory = None  # 存储压缩后的记忆
+
+        # 后台压缩状态：快照压缩在后台线程进行，在轮次边界原子替换
+        self._compact_lock = threading.Lock()
+        self._compact_generation = 0  # 每次替换messages时递增，用于丢弃过期的后台结果
+        self._background_compact = None  # 进行中/已完成的后台压缩任务
         
         # 设置agent_name（必须在加载知识文件之前，因为知识文件需要替换模板变量）
         self.agent_name = name  # 保留agent_name字段以兼容
@@ -191,8 +219,11 @@ class ReactAgentMinimal(Function):
         # 智能体直接用grep搜索knowledge/目录即可
 
         # Home目录: ~/.agent/[agent名]/
+        # Agent的大脑放在用户home目录，而不是工作目录
+        # 这样清空工作目录不会影响Agent的记忆
         agent_home = Path.home() / ".agent" / self.name
-        agent_home.mkdir(parents=True, exist_ok=True)  # 确保home目录存在
+        self.agent_home = agent_home
+        self.notes_dir = self.agent_home  # 兼容旧代码
 
         # 🌟 自我认知变量（Agent的核心自我意识）
         self.self_name = self.name  # 我的名字
@@ -205,18 +236,74 @@ class ReactAgentMinimal(Function):
         self.self_source_code = str(Path(__file__).resolve())  # 我的源代码位置（只读）
         # 知识目录位置（智能体用grep搜索）
         self.self_knowledge_dir = str(Path(__file__).parent.parent / "knowledge")
+        self.self_decisions_dir = str(agent_home / "decisions")  # 智能体的决策日志目录
+
+        # 知识文件路径
+        self.knowledge_file = self.agent_home / "knowledge.md"  # 统一的知识文件
+        # task_process_file 已废弃，ExecutionContext 现在只存在于内存中
+        self.world_state_file = self.agent_home / "world_state.md"
+        self.notes_file = self.notes_dir / "session_notes.md"  # 兼容性
+
+        # compact.md不作为知识文件加载，只作为压缩记忆使用
+
+        # 🎯 初始化拦截器系统
+        # 1. 系统拦截器（最高优先级）
+        from core.interceptors.system_interceptor import SystemInterceptor
+        self.system_interceptor = SystemInterceptor(self)
+
+        # 2. 斜杠命令拦截器（次优先级）
+        from core.interceptors.minimal_slash_interceptor import MinimalSlashInterceptor
+        self.slash_interceptor = MinimalSlashInterceptor(self.name)
+
+        # 函数定义（用于API调用）在首次访问self.functions时按需生成
+        self._schema_cache = {}  # 名称 → (实例, description, OpenAI schema)
+        self._tools_signature = None  # 上次生成时的(名称, description)序列
+        self._functions = []
+        self._tools_json = "[]"  # 预序列化的tools负载，跨轮次复用
+
+        # sessions_dir已废弃，不再需要
+        
+        # 初始化状态跟踪属性
+        self._previous_message_count = 0  # 用于检测消息增长
+
+        # ⚡ 延迟初始化：目录、知识、工具和记忆在首次使用时才加载
+        # （首次execute，或首次访问messages/function_instances等属性）
+        # 大量短命Agent（如每条消息一个Agent）的构造因此很轻
+        self._initialized = False
+
+        # 显示初始化信息（延迟到load方法，避免混淆）
+        if not _from_load:  # 只在非load创建时显示
+            print(f"🚀 极简Agent已初始化 [{self.agent_name}]")
+            print(f"  📍 API: {self._detect_service()}")
+            print(f"  🤖 模型: {self.model}")
+            print(f"  🧠 Compact记忆: 70k tokens触发压缩")
+            print(f"  ⚡ Compact记忆替代文件系统")
+            if self.knowledge_files:
+                print(f"  📚 知识文件: {len(self.knowledge_files)}个")
+            print(f"  ✨ Compact即注意力机制")
+    
+    def _ensure_initialized(self) -> None:
+        """首次使用时完成初始化：创建目录、加载知识、创建工具、加载记忆"""
+        if self._initialized:
+            return
+        self._initialized = True  # 先置位，避免加载过程中访问属性时重入
+        try:
+            self._initialize()
+        except BaseException:
+            # 初始化失败（如缺少API key）时复位，下次使用重新初始化而不是停留在半初始化状态
+            self._initialized = False
+            raise
 
-        # 确保工具箱目录存在
-        external_tools_dir = agent_home / "external_tools"
-        external_tools_dir.mkdir(parents=True, exist_ok=True)
+    def _initialize(self) -> None:
+        """_ensure_initialized的实际初始化步骤"""
+        self.work_dir.mkdir(parents=True, exist_ok=True)
 
-        # 确保decisions目录存在（智能体的决策日志）
-        decisions_dir = agent_home / "decisions"
-        decisions_dir.mkdir(parents=True, exist_ok=True)
-        self.self_decisions_dir = str(decisions_dir)  # 智能体的决策日志目录
+        # 确保home目录、工具箱目录和decisions目录（智能体的决策日志）存在
+        (self.agent_home / "external_tools").mkdir(parents=True, exist_ok=True)
+        (self.agent_home / "decisions").mkdir(parents=True, exist_ok=True)
 
         # 个体知识文件
-        knowledge = agent_home / "knowledge.md"
+        knowledge = self.agent_home / "knowledge.md"
         if knowledge.exists() and str(knowledge) not in self.knowledge_files:
             self.knowledge_files.append(str(knowledge))
             # 不在这里打印，统一在_load_all_knowledge_files中打印
@@ -230,70 +317,36 @@ class ReactAgentMinimal(Function):
                 )
                 print(f"  📚 创建统一知识文件: {knowledge}")
 
-        # compact.md不作为知识文件加载，只作为压缩记忆使用
-
-        # 🎯 初始化拦截器系统
-        # 1. 系统拦截器（最高优先级）
-        from core.interceptors.system_interceptor import SystemInterceptor
-        self.system_interceptor = SystemInterceptor(self)
-
-        # 2. 斜杠命令拦截器（次优先级）
-        from core.interceptors.minimal_slash_interceptor import MinimalSlashInterceptor
-        self.slash_interceptor = MinimalSlashInterceptor(self.name)
+        self._knowledge_content = self._load_knowledge()
 
-        self.knowledge_content = self._load_knowledge()
-
-        # 🌟 Compact记忆系统 - Agent自己就是智能压缩器！
-        # 不再需要滑动窗口，使用智能压缩
-        # 使用name创建独立的笔记目录
-        
-        # Agent的大脑放在用户home目录，而不是工作目录
-        # 这样清空工作目录不会影响Agent的记忆
-        home_dir = Path.home()
-        self.agent_home = home_dir / ".agent" / name
-        self.notes_dir = self.agent_home  # 兼容旧代码
-        
-        # 总是创建agent_home目录（即使在minimal模式下也需要）
-        # 创建Agent的home目录
-        self.agent_home.mkdir(parents=True, exist_ok=True)
-            
-        # 知识文件路径
-        self.knowledge_file = self.agent_home / "knowledge.md"  # 统一的知识文件
-        # task_process_file 已废弃，ExecutionContext 现在只存在于内存中
-        self.world_state_file = self.agent_home / "world_state.md"
-        self.notes_file = self.notes_dir / "session_notes.md"  # 兼容性
-        
         # 创建Function实例（包括工具和Agent）
-        self.function_instances = self._create_function_instances()
+        self._function_instances = self._create_function_instances()
 
         # 将Agent自己添加到functions列表（元认知：自己调用自己）
         # 注意：只暴露特定的自我管理方法，避免递归调用execute
         self._add_self_management_functions()
 
-        # 生成函数定义（用于API调用）
-        self.functions = [func.to_openai_function() for func in self.function_instances]
-
-        # sessions_dir已废弃，不再需要
-        
-        # 初始化状态跟踪属性
-        self._previous_message_count = 0  # 用于检测消息增长
+        # 名称→实例的分发表（与function_instances保持同步，同名时先注册的优先）
+        self._function_map = {}
+        for func in self._function_instances:
+            self._function_map.setdefault(func.name, func)
 
         # 自动加载记忆文件（基础设施保证）
         self._auto_load_memory()
 
-        # 初始化消息列表（在Agent初始化时，而不是任务执行时）
+        # 初始化消息列表（在首次使用时，而不是任务执行时）
         system_prompt = self._build_minimal_prompt()
-        self.messages = [
+        self._messages = [
             {"role": "system", "content": system_prompt}
         ]
         print(f"  📝 系统提示词: {len(system_prompt)}字符")
-        
+
         # 尝试加载compact.md（如果存在）
         if self._load_compact_memory():
             # 将compact记忆作为assistant消息添加到消息列表
             # 这样它会在对话中累积和演化
             if self.compact_memory:
-                self.messages.append({
+                self._messages.append({
                     "role": "assistant",
                     "content": f"[已加载历史压缩记忆]\n{self.compact_memory}"
                 })
@@ -301,18 +354,41 @@ class ReactAgentMinimal(Function):
 
         # 尝试加载project_notes.md（如果存在）
         self._load_project_notes()
-        
-        # 显示初始化信息（延迟到load方法，避免混淆）
-        if not _from_load:  # 只在非load创建时显示
-            print(f"🚀 极简Agent已初始化 [{self.agent_name}]")
-            print(f"  📍 API: {self._detect_service()}")
-            print(f"  🤖 模型: {self.model}")
-            print(f"  🧠 Compact记忆: 70k tokens触发压缩")
-            print(f"  ⚡ Compact记忆替代文件系统")
-            if self.knowledge_files:
-                print(f"  📚 知识文件: {len(self.knowledge_files)}个")
-            print(f"  ✨ Compact即注意力机制")
-    
+
+    @property
+    def messages(self) -> List[Dict]:
+        """对话消息列表（首次访问时完成初始化）"""
+        self._ensure_initialized()
+        return self._messages
+
+    @messages.setter
+    def messages(self, value: List[Dict]) -> None:
+        self._ensure_initialized()
+        self._messages = value
+
+    @property
+    def function_instances(self) -> List[Function]:
+        """Function实例列表（首次访问时完成初始化）"""
+        self._ensure_initialized()
+        return self._function_instances
+
+    @function_instances.setter
+    def function_instances(self, value: List[Function]) -> None:
+        self._ensure_initialized()
+        self._function_instances = value
+
+    @property
+    def function_map(self) -> Dict[str, Function]:
+        """名称→Function实例的分发表（首次访问时完成初始化）"""
+        self._ensure_initialized()
+        return self._function_map
+
+    @property
+    def knowledge_content(self) -> str:
+        """已加载的知识内容（首次访问时完成初始化）"""
+        self._ensure_initialized()
+        return self._knowledge_content
+
     def _auto_load_memory(self) -> None:
         """自动加载记忆文件"""
         # Compact哲学："遗忘即优化"、"当下即永恒"
@@ -408,9 +484,13 @@ class ReactAgentMinimal(Function):
                 return result
         # ===== 钩子结束 =====
 
+        # 首次执行时完成延迟初始化（知识、工具、记忆）
+        self._ensure_initialized()
+
         # 如果是无状态模式，清空消息历史（保留系统提示）
         if not self.stateful:
-            # 重新初始化消息列表，只保留系统提示
+            # 重新初始化消息列表，只保留系统提示（进行中的后台压缩随之作废）
+            self._compact_generation += 1
             self.messages = [
                 {"role": "system", "content": self._build_minimal_prompt()}
             ]
@@ -559,7 +639,12 @@ class ReactAgentMinimal(Function):
         # 执行循环
         for round_num in range(self.max_rounds):
             print(f"\n[{self.name}] 🤔 思考第{round_num + 1}轮...")
-            
+
+            # 轮次边界：替换已完成的后台压缩，超过软阈值则启动新的后台压缩
+            self._apply_background_compaction()
+            if self._count_tokens(self.messages) > self.compress_config["soft_threshold"]:
+                self._start_background_compaction()
+
             # 调用LLM（使用实例的消息列表）
             response = self._call_api(self.messages)
             if response is None:
@@ -569,7 +654,7 @@ class ReactAgentMinimal(Function):
             message = response["choices"][0]["message"]
             self.messages.append(message)  # 添加assistant消息到对话历史
             
-            # Compact记忆管理 - 智能压缩替代滑动窗口
+            # Compact记忆管理 - 超过硬阈值时同步压缩（后台压缩未及时完成的兜底）
             token_count = self._count_tokens(self.messages)
             if token_count > self.compress_config["threshold"]:
                 self.messages = self._compact_messages(self.messages)
@@ -743,7 +828,7 @@ class ReactAgentMinimal(Function):
 
         if prompt_template_path.exists():
             # 使用外部模板
-            template = prompt_template_path.read_text(encoding='utf-8')
+            template = read_knowledge_file(prompt_template_path)
 
             # 准备知识内容部分
             knowledge_section = ""
@@ -855,7 +940,7 @@ class ReactAgentMinimal(Function):
                             path = project_root / path
                 
                 if path.exists():
-                    content = path.read_text(encoding='utf-8')
+                    content = read_knowledge_file(path)
                     # 替换知识文件中的模板变量
                     content = content.replace('{agent_name}', self.agent_name)
                     content = content.replace('{work_dir}', str(self.work_dir))
@@ -883,15 +968,14 @@ class ReactAgentMinimal(Function):
 
         # 检查是否已存在同名工具（避免重复导致API错误）
         function_name = function.name if hasattr(function, 'name') else str(function)
-        for existing in self.function_instances:
-            existing_name = existing.name if hasattr(existing, 'name') else str(existing)
-            if existing_name == function_name:
-                # 工具已存在，跳过添加
-                print(f"  ℹ️ 工具已存在，跳过: {function_name}")
-                return
+        if function_name in self.function_map:
+            # 工具已存在，跳过添加
+            print(f"  ℹ️ 工具已存在，跳过: {function_name}")
+            return
 
+        # 函数定义在下次API调用时增量生成（已有工具的schema直接复用）
         self.function_instances.append(function)
-        self.functions = [f.to_openai_function() for f in self.function_instances]
+        self.function_map[function_name] = function
 
         # 如果是Agent实例，添加到children列表（维护父子关系）
         if hasattr(function, 'name') and hasattr(function, 'execute'):
@@ -911,6 +995,51 @@ class ReactAgentMinimal(Function):
             tool: Function实例（工具或另一个Agent）
         """
         return self.add_function(tool)
+
+    def remove_function(self, name: str) -> bool:
+        """从function列表和分发表中移除指定名称的Function
+
+        Args:
+            name: Function名称
+
+        Returns:
+            是否找到并移除
+        """
+        function = self.function_map.pop(name, None)
+        if function is None:
+            return False
+        self.function_instances = [f for f in self.function_instances if f is not function]
+        return True
+
+    @property
+    def functions(self) -> List[Dict]:
+        """OpenAI格式的函数定义（工具列表或description变化时增量更新）"""
+        self._refresh_functions()
+        return self._functions
+
+    def _refresh_functions(self) -> None:
+        """同步OpenAI函数定义和预序列化的tools负载
+
+        每个工具的schema按名称缓存，只有实例或description变化时才重新生成；
+        工具列表和description都未变化时，直接复用上一轮的tools负载。
+        """
+        signature = tuple((f.name, f.description) for f in self.function_instances)
+        if signature == self._tools_signature:
+            return
+
+        schema_cache = {}
+        functions = []
+        for func in self.function_instances:
+            cached = self._schema_cache.get(func.name)
+            if cached is None or cached[0] is not func or cached[1] != func.description:
+                cached = (func, func.description, func.to_openai_function())
+            schema_cache[func.name] = cached
+            functions.append(cached[2])
+
+        self._schema_cache = schema_cache
+        self._functions = functions
+        self._tools_json = json.dumps(functions, ensure_ascii=False)
+        self._tools_signature = signature
     
     def _create_function_instances(self) -> List[Function]:
         """创建Function实例（包括工具和Agent）"""
@@ -958,6 +1087,13 @@ class ReactAgentMinimal(Function):
             # 如果新闻搜索工具初始化失败，继续运行但不添加新闻搜索功能
             pass
 
+        # 知识检索工具（索引在首次检索时建立）
+        try:
+            from .tools.knowledge_search_tool import KnowledgeSearchTool
+            tools.append(KnowledgeSearchTool())
+        except ImportError:
+            pass
+
         # 分形同构：每个Agent默认都有CreateAgentTool能力
         # 让每个Agent都能创建子Agent，实现无限递归
         try:
@@ -972,16 +1108,16 @@ class ReactAgentMinimal(Function):
     def _execute_tool(self, tool_name: str, arguments: Dict) -> str:
         """执行工具 - 使用Tool实例"""
         try:
-            # 查找对应的工具实例
-            for tool in self.function_instances:  # 查找对应的function实例
-                if tool.name == tool_name:
-                    # 防止agent递归调用自己的execute_task
-                    # 但允许调用其他管理方法（如get_status、update_knowledge等）
-                    if tool is self and arguments.get("action") == "execute_task":
-                        return "❌ 错误：Agent不允许递归调用自己执行任务。请直接处理任务，而不是调用execute_task。"
-                    return tool.execute(**arguments)
+            # 通过分发表查找对应的function实例
+            tool = self.function_map.get(tool_name)
+            if tool is None:
+                return f"未知工具: {tool_name}"
 
-            return f"未知工具: {tool_name}"
+            # 防止agent递归调用自己的execute_task
+            # 但允许调用其他管理方法（如get_status、update_knowledge等）
+            if tool is self and arguments.get("action") == "execute_task":
+                return "❌ 错误：Agent不允许递归调用自己执行任务。请直接处理任务，而不是调用execute_task。"
+            return tool.execute(**arguments)
 
         except Exception as e:
             return f"工具执行错误: {str(e)}"
@@ -999,22 +1135,25 @@ class ReactAgentMinimal(Function):
         # 调试模式
         debug = os.getenv('AGENT_DEBUG') == '1'
 
+        # 工具未变化时复用预序列化的tools负载
+        self._refresh_functions()
+
         for attempt in range(max_retries):
             try:
-                # 准备请求数据
+                # 准备请求数据（tools负载已预序列化，直接拼接）
                 request_data = {
                     "model": self.model,
                     "messages": messages,
-                    "tools": self.functions,  # OpenAI API仍然使用"tools"参数名
                     "tool_choice": "auto",
                     "temperature": 0.3,
                     "max_tokens": 4096
                 }
+                # OpenAI API仍然使用"tools"参数名
+                payload = json.dumps(request_data, ensure_ascii=False)[:-1] + f', "tools": {self._tools_json}}}'
 
                 if debug:
-                    import json
                     msg_size = len(json.dumps(messages))
-                    tools_size = len(json.dumps(self.functions))
+                    tools_size = len(self._tools_json)
                     print(f"[DEBUG] Messages大小: {msg_size/1024:.1f}KB, Tools大小: {tools_size/1024:.1f}KB")
                     print(f"[DEBUG] 发送API请求到: {self.base_url}")
                     print(f"[DEBUG] 准备调用requests.post...")
@@ -1038,9 +1177,6 @@ class ReactAgentMinimal(Function):
                 # 否则使用系统代理（适用于OpenRouter、Gemini等国外API）
 
                 if debug:
-                    print(f"[DEBUG] 序列化request_data...")
-                    import json
-                    payload = json.dumps(request_data)
                     print(f"[DEBUG] Payload大小: {len(payload)/1024:.1f}KB")
                     print(f"[DEBUG] 调用requests.post (timeout=60)...")
 
@@ -1050,7 +1186,7 @@ class ReactAgentMinimal(Function):
                         "Authorization": f"Bearer {self.api_key}",
                         "Content-Type": "application/json"
                     },
-                    json=request_data,
+                    data=payload.encode('utf-8'),
                     proxies=proxies,  # 智能代理设置
                     timeout=60  # 恢复正常超时时间
                 )
@@ -1405,7 +1541,8 @@ class ReactAgentMinimal(Function):
         """
         try:
             # 1. 先保存compact记忆（压缩对话历史）
-            if hasattr(self, 'messages') and len(self.messages) > 1:  # 至少有系统消息+其他消息
+            # 尚未初始化的Agent没有新的对话，不为保存状态而触发初始化
+            if self._initialized and len(self.messages) > 1:  # 至少有系统消息+其他消息
                 self._save_compact_memory()
 
             # 2. 构建状态（不含messages）
@@ -1418,7 +1555,7 @@ class ReactAgentMinimal(Function):
                 "work_dir": str(self.work_dir),  # 保存工作目录
                 # "messages": self.messages,  # ← 不再保存messages！
                 "has_compact": True,  # 标记有compact.md存在
-                "message_count": len(self.messages) if hasattr(self, 'messages') else 0,  # 只记录数量
+                "message_count": len(self.messages) if self._initialized else self._previous_message_count,  # 只记录数量
                 "timestamp": datetime.now().isoformat(),
                 "task_count": getattr(self, '_task_count', 0) + 1,
                 "children": self.children  # 保存子Agent列表（金字塔结构）
@@ -1461,99 +1598,155 @@ class ReactAgentMinimal(Function):
         """
         try:
             # 查找ExecutionContext工具实例
-            for tool in self.function_instances:
-                if hasattr(tool, 'name') and tool.name == 'context':
-                    # 获取当前上下文（栈顶）
-                    context_info = tool.execute(action='get_context')
+            tool = self.function_map.get('context')
+            if tool is not None:
+                # 获取当前上下文（栈顶）
+                context_info = tool.execute(action='get_context')
 
-                    # 获取调用栈
-                    call_stack_info = tool.execute(action='get_call_stack')
+                # 获取调用栈
+                call_stack_info = tool.execute(action='get_call_stack')
 
-                    # 组合信息
-                    combined_info = []
-                    has_content = False
+                # 组合信息
+                combined_info = []
+                has_content = False
 
-                    # 解析当前上下文
-                    if context_info and context_info != "{}":
-                        try:
-                            context_data = json.loads(context_info)
-                            # 检查是否有实质内容
-                            if (context_data.get('目标') != '未设置' or
-                                context_data.get('任务详情') or
-                                context_data.get('当前状态') != '未设置' or
-                                context_data.get('数据存储')):
-                                combined_info.append("=== 当前执行上下文 ===")
-                                combined_info.append(context_info)
-                                has_content = True
-                        except:
-                            # 如果不是JSON格式，仍然保留
-                            if context_info.strip():
-                                combined_info.append("=== 当前执行上下文 ===")
-                                combined_info.append(context_info)
-                                has_content = True
-
-                    # 添加调用栈信息（如果不为空）
-                    if call_stack_info and "调用栈为空" not in call_stack_info:
-                        combined_info.append("\n=== 调用栈 ===")
-                        combined_info.append(call_stack_info)
-                        has_content = True
-
-                    # 返回组合的信息
-                    if has_content:
-                        return "\n".join(combined_info)
-
-                    break
+                # 解析当前上下文
+                if context_info and context_info != "{}":
+                    try:
+                        context_data = json.loads(context_info)
+                        # 检查是否有实质内容
+                        if (context_data.get('目标') != '未设置' or
+                            context_data.get('任务详情') or
+                            context_data.get('当前状态') != '未设置' or
+                            context_data.get('数据存储')):
+                            combined_info.append("=== 当前执行上下文 ===")
+                            combined_info.append(context_info)
+                            has_content = True
+                    except:
+                        # 如果不是JSON格式，仍然保留
+                        if context_info.strip():
+                            combined_info.append("=== 当前执行上下文 ===")
+                            combined_info.append(context_info)
+                            has_content = True
+
+                # 添加调用栈信息（如果不为空）
+                if call_stack_info and "调用栈为空" not in call_stack_info:
+                    combined_info.append("\n=== 调用栈 ===")
+                    combined_info.append(call_stack_info)
+                    has_content = True
+
+                # 返回组合的信息
+                if has_content:
+                    return "\n".join(combined_info)
         except Exception as e:
             print(f"  ⚠️ 获取ExecutionContext失败: {e}")
 
         return None
 
     def _compact_messages(self, messages: List[Dict], manual: bool = False) -> List[Dict]:
-        """智能压缩对话历史 - 使用description作为注意力先验
+        """智能压缩对话历史（同步） - 使用description作为注意力先验
 
         Args:
             messages: 消息列表
             manual: 是否手动触发（手动触发时不显示阈值信息）
         """
         if not manual:
-            print(f"\n🧠 触发Compact压缩（超过70k tokens）...")
+            print(f"\n🧠 触发Compact压缩（超过{self.compress_config['threshold'] // 1000}k tokens）...")
         else:
             print(f"\n🧠 执行Compact压缩...")
-        
-        # 构建压缩提示词 - 从外部文件加载
-        compress_prompt_file = Path(__file__).parent.parent / "knowledge" / "minimal" / "system" / "compact_prompt.md"
 
-        if compress_prompt_file.exists():
-            # 从外部文件读取压缩提示词
-            compress_prompt_template = compress_prompt_file.read_text(encoding='utf-8')
+        # 同步压缩会替换messages，进行中的后台压缩结果随之作废
+        with self._compact_lock:
+            self._compact_generation += 1
+            self._background_compact = None
 
-            # 替换description占位符
-            if self.description:
-                compress_prompt = compress_prompt_template.replace('{description}', self.description)
-            else:
-                # 无description时，移除注意力框架部分
-                compress_prompt = compress_prompt_template.replace(
-                    '## Agent注意力框架\n\n{description}\n\n基于上述Agent的专业身份和职责，压缩对话历史时请重点关注与其相关的内容。\n\n',
-                    ''
-                )
-        else:
-            # 降级到内置简单压缩（向后兼容）
-            print(f"  ⚠️ 未找到compact_prompt.md，使用内置简单压缩")
-            compress_prompt = """你是一个对话历史压缩专家。请将冗长的对话历史压缩成精炼的摘要。
+        start = time.time()
+        tokens_before = self._count_tokens(messages)
+        result_messages, compact_memory = self._summarize_messages(messages)
+        if compact_memory is not None:
+            self.compact_memory = compact_memory
+        self._log_compaction("同步", start, tokens_before, result_messages)
+        return result_messages
 
-压缩原则：
-1. 如果遇到"[已加载压缩的历史记忆]"，适度压缩为关键要点（保留200-500字）
-2. 保留最新对话的关键事实和重要细节（包括关键过程）
-3. 旧记忆简洁总结，新记忆充分保留（可以包含重要代码片段）
-4. 去除所有重复和冗余
-5. 确保时间顺序：旧记忆→新记忆
+    def _log_compaction(self, mode: str, start: float, tokens_before: int, result_messages: List[Dict]) -> None:
+        """记录压缩耗时和压缩前后的token数"""
+        tokens_after = self._count_tokens(result_messages)
+        print(f"  ⏱️ {mode}压缩耗时: {time.time() - start:.1f}秒, tokens: {tokens_before} → {tokens_after}")
+
+    def _start_background_compaction(self) -> None:
+        """在后台线程中压缩当前消息快照（软阈值触发）
+
+        快照之后新增的消息不参与压缩，在替换时原样接在压缩结果之后。
+        """
+        with self._compact_lock:
+            if self._background_compact is not None:
+                return  # 已有进行中或待替换的后台压缩
+            job = {
+                "generation": self._compact_generation,
+                "snapshot": list(self.messages),
+                "tokens_before": self._count_tokens(self.messages),
+                "start": time.time(),
+                "done": threading.Event(),
+                "result": None,
+            }
+            self._background_compact = job
+
+        print(f"\n🧠 后台Compact压缩已启动（超过{self.compress_config['soft_threshold'] // 1000}k tokens）...")
+
+        def worker():
+            try:
+                job["result"] = self._summarize_messages(job["snapshot"])
+            except Exception as e:
+                print(f"  ⚠️ 后台压缩出错: {e}")
+            finally:
+                job["done"].set()
+
+        threading.Thread(target=worker, name=f"{self.name}-compact", daemon=True).start()
+
+    def _apply_background_compaction(self) -> bool:
+        """在轮次边界原子替换已完成的后台压缩结果
+
+        Returns:
+            是否替换了消息列表
+        """
+        with self._compact_lock:
+            job = self._background_compact
+            if job is None or not job["done"].is_set():
+                return False
+            self._background_compact = None
+
+            snapshot = job["snapshot"]
+            # 后台压缩失败（降级结果不替换，留给硬阈值兜底），
+            # 或快照期间消息被替换过（同步压缩、无状态重置等），结果已过期
+            if (job["result"] is None
+                    or job["result"][1] is None
+                    or job["generation"] != self._compact_generation
+                    or len(self.messages) < len(snapshot)
+                    or (snapshot and self.messages[len(snapshot) - 1] is not snapshot[-1])):
+                return False
+
+            compacted, compact_memory = job["result"]
+            self.messages = compacted + self.messages[len(snapshot):]
+            if compact_memory is not None:
+                self.compact_memory = compact_memory
+            self._compact_generation += 1
+
+        self._log_compaction("后台", job["start"], job["tokens_before"], compacted)
+        return True
+
+    def _summarize_messages(self, messages: List[Dict]) -> Tuple[List[Dict], Optional[str]]:
+        """分层压缩消息列表，不修改Agent状态（可在后台线程中运行）
+
+        分层方案：
+        1. 最近的若干轮对话原文保留
+        2. 更早的对话按固定大小分块摘要（并行，按内容哈希缓存到磁盘）
+        3. 分块摘要合并进滚动的长期记忆（旧的压缩记忆不再嵌套）
+
+        Returns:
+            (压缩后的消息列表, 新的compact记忆；压缩失败降级时为None)
+        """
+        compress_prompt = self._build_compress_prompt()
 
-输出要求：
-- 旧记忆：简洁总结（500-1000字）
-- 新记忆：详细要点（10-20点）
-- 总长度不超过10000字
-- 不要嵌套结构"""
-        
         # 分离系统消息和对话消息
         # 只保留第一个系统消息（原始系统提示词），忽略后续可能添加的系统消息
         original_system_msg = None
@@ -1561,161 +1754,252 @@ class ReactAgentMinimal(Function):
             if m["role"] == "system":
                 original_system_msg = m
                 break
-        
+
         # 对话消息不包含任何系统消息
         dialogue_msgs = [m for m in messages if m["role"] != "system"]
-        
-        # 统计Compact记忆的压缩次数，避免过度嵌套
-        compact_count = 0
-        for m in dialogue_msgs:
-            if m.get("role") == "assistant" and "[已加载压缩的历史记忆]" in m.get("content", ""):
-                compact_count += 1
-        
-        # 如果压缩次数过多，提取核心记忆进行深度压缩
-        if compact_count >= 3:
-            print(f"  🔄 深度压缩模式（已压缩{compact_count}次）")
-        
-        # 🎯 解析应答对结构，明确标注最后一个应答对
-        dialogue_turns = []
-        current_turn = []
 
-        for msg in dialogue_msgs:
-            if msg.get("role") == "user":
-                # 遇到新的用户消息，开始新的应答对
-                if current_turn:
-                    dialogue_turns.append(current_turn)
-                current_turn = [msg]
-            else:
-                # 将assistant/tool消息添加到当前应答对
-                current_turn.append(msg)
-
-        # 添加最后一个应答对
-        if current_turn:
-            dialogue_turns.append(current_turn)
-
-        # 构建明确的应答对描述
-        turns_description = []
-        for i, turn in enumerate(dialogue_turns):
-            turn_num = i + 1
-            is_last = (i == len(dialogue_turns) - 1)
-
-            # 标记最后一个应答对
-            marker = " ← 最后一个应答对（完整保留）" if is_last else ""
+        # 提取已有的长期记忆（此前压缩/加载的结果），其余消息切分为对话轮次
+        long_term_summary, rounds = self._split_compact_rounds(dialogue_msgs)
+
+        # 最近的轮次原文保留；更早的轮次按固定大小分块
+        keep_recent = self.compress_config["keep_recent_rounds"]
+        chunk_size = self.compress_config["chunk_rounds"]
+        old_rounds = rounds[:-keep_recent] if len(rounds) > keep_recent else []
+        full_count = len(old_rounds) // chunk_size * chunk_size
+        if full_count:
+            # 只摘要完整的块，保证块边界稳定，重复压缩时可以命中缓存
+            chunks = [old_rounds[i:i + chunk_size] for i in range(0, full_count, chunk_size)]
+        elif old_rounds:
+            # 轮次太少但单轮很大：整体作为一个块
+            chunks = [old_rounds]
+            full_count = len(old_rounds)
+        else:
+            # 只有最近的轮次：保留最后一轮，其余作为一个块
+            chunks = [rounds[:-1]] if len(rounds) > 1 else []
+            full_count = len(rounds) - 1 if len(rounds) > 1 else 0
+        recent_msgs = [msg for round_msgs in rounds[full_count:] for msg in round_msgs]
 
-            turns_description.append(f"### 应答对 {turn_num}{marker}")
-            turns_description.append(json.dumps(turn, ensure_ascii=False, indent=2))
-            turns_description.append("")  # 空行
+        if not chunks and long_term_summary is None:
+            return list(messages), None
 
-        # 调用压缩模型
         try:
-            compress_messages = [
-                {"role": "system", "content": compress_prompt},
-                {"role": "user", "content": f"""请压缩以下对话历史。
+            print(f"  📦 分块压缩: {len(chunks)}块（每块{chunk_size}轮），原文保留{len(rounds) - full_count}轮")
+
+            # 并行摘要各块（已缓存的块直接复用）
+            chunk_summaries = []
+            if chunks:
+                from concurrent.futures import ThreadPoolExecutor
+                max_workers = min(len(chunks), self.compress_config["max_parallel_chunks"])
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    chunk_summaries = list(executor.map(
+                        lambda chunk: self._summarize_chunk(compress_prompt, chunk), chunks
+                    ))
+            if any(summary is None for summary in chunk_summaries):
+                raise RuntimeError("分块摘要失败")
+
+            # 合并进滚动的长期记忆
+            if long_term_summary is None and len(chunk_summaries) == 1:
+                compressed_content = chunk_summaries[0]
+            else:
+                compressed_content = self._merge_summaries(compress_prompt, long_term_summary, chunk_summaries)
+                if compressed_content is None:
+                    raise RuntimeError("长期记忆合并失败")
 
-**重要**：对话已划分为{len(dialogue_turns)}个应答对，最后一个应答对已明确标注。
+            print(f"  ✅ 压缩完成，保留关键信息")
 
-{chr(10).join(turns_description)}"""}
+            # 使用user/assistant对来保持消息交替格式
+            compressed_messages = [
+                {"role": "user", "content": "[请基于以下压缩的历史记忆继续对话]"},
+                {"role": "assistant", "content": f"[已加载压缩的历史记忆]\n{compressed_content}"}
             ]
-            
-            # 智能代理管理（压缩API）
-            compress_proxies = None
-            compress_base_url_lower = self.compress_config['base_url'].lower()
-            compress_domestic_apis = ["deepseek.com", "moonshot.cn"]
-            compress_is_domestic = any(domain in compress_base_url_lower for domain in compress_domestic_apis)
-
-            if compress_is_domestic:
-                compress_proxies = {"http": None, "https": None}
-
-            compress_response = requests.post(
-                f"{self.compress_config['base_url']}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.compress_config['api_key']}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.compress_config["model"],
-                    "messages": compress_messages,
-                    "temperature": self.compress_config["temperature"]
-                },
-                proxies=compress_proxies  # 智能代理设置
-            )
-            
-            if compress_response.status_code == 200:
-                compressed_content = compress_response.json()["choices"][0]["message"]["content"]
-                
-                print(f"  ✅ 压缩完成，保留关键信息")
-                
-                # 创建压缩后的消息对
-                # 直接使用新的压缩内容（已包含旧记忆的精简版）
-                self.compact_memory = compressed_content
-                
-                # 使用user/assistant对来保持消息交替格式
-                compressed_messages = [
-                    {"role": "user", "content": "[请基于以下压缩的历史记忆继续对话]"},
-                    {"role": "assistant", "content": f"[已加载压缩的历史记忆]\n{self.compact_memory}"}
-                ]
-                
-                # 检查是否有未完成的tool调用
-                # 找到最后一个assistant消息看是否有tool_calls
-                pending_tool_messages = []
-                for i in range(len(messages) - 1, -1, -1):
-                    msg = messages[i]
-                    if msg["role"] == "tool":
-                        # 继续向前查找对应的tool_calls
-                        pending_tool_messages.insert(0, msg)
-                    elif msg["role"] == "assistant" and msg.get("tool_calls"):
-                        # 找到了tool_calls，添加到pending列表
-                        pending_tool_messages.insert(0, msg)
-                        break
-                    elif msg["role"] in ["user", "assistant"] and not msg.get("tool_calls"):
-                        # 遇到普通消息，停止查找
-                        pending_tool_messages = []
-                        break
-                
-                # 返回新的消息列表：系统提示词 + 压缩的消息对 + 未完成的tool调用
-                result_messages = []
-                if original_system_msg:
-                    result_messages.append(original_system_msg)
-                result_messages.extend(compressed_messages)
-
-                result_messages.extend(pending_tool_messages)
-                return result_messages
-            else:
-                print(f"  ⚠️ 压缩失败，保留最近消息")
-                # 压缩失败时的降级策略：保留最近的1/3消息
-                keep_count = max(2, len(dialogue_msgs) // 3)
-                # 确保从user消息开始，保持交替格式
-                kept_msgs = dialogue_msgs[-keep_count:]
-                if kept_msgs and kept_msgs[0]["role"] == "assistant":
-                    # 如果第一条是assistant消息，去掉它
-                    kept_msgs = kept_msgs[1:]
-                # 确保消息数量是偶数（user/assistant成对）
-                if len(kept_msgs) % 2 != 0:
-                    kept_msgs = kept_msgs[1:]
-                
-                # 只返回原始系统提示词 + 保留的对话消息
-                result_messages = []
-                if original_system_msg:
-                    result_messages.append(original_system_msg)
-                result_messages.extend(kept_msgs)
-                return result_messages
-                
+            # 原文保留的轮次可能从assistant消息开始，插入一条user消息避免连续两条assistant消息
+            if recent_msgs and recent_msgs[0]["role"] == "assistant":
+                compressed_messages.append({"role": "user", "content": "[以下是最近的对话原文]"})
+
+            # 返回新的消息列表：系统提示词 + 长期记忆 + 原文保留的最近轮次
+            result_messages = []
+            if original_system_msg:
+                result_messages.append(original_system_msg)
+            result_messages.extend(compressed_messages)
+            result_messages.extend(recent_msgs)
+            return result_messages, compressed_content
+
         except Exception as e:
             print(f"  ⚠️ 压缩出错: {e}，保留最近消息")
-            # 出错时的降级策略（与压缩失败时相同）
+            # 降级策略：保留最近的1/3消息
             keep_count = max(2, len(dialogue_msgs) // 3)
+            # 确保从user消息开始，保持交替格式
             kept_msgs = dialogue_msgs[-keep_count:]
             if kept_msgs and kept_msgs[0]["role"] == "assistant":
+                # 如果第一条是assistant消息，去掉它
                 kept_msgs = kept_msgs[1:]
+            # 确保消息数量是偶数（user/assistant成对）
             if len(kept_msgs) % 2 != 0:
                 kept_msgs = kept_msgs[1:]
-            
+
             # 只返回原始系统提示词 + 保留的对话消息
             result_messages = []
             if original_system_msg:
                 result_messages.append(original_system_msg)
             result_messages.extend(kept_msgs)
-            return result_messages
+            return result_messages, None
+
+    def _build_compress_prompt(self) -> str:
+        """构建压缩提示词 - 从外部文件加载，使用description作为注意力先验"""
+        compress_prompt_file = Path(__file__).parent.parent / "knowledge" / "minimal" / "system" / "compact_prompt.md"
+
+        if compress_prompt_file.exists():
+            # 从外部文件读取压缩提示词
+            compress_prompt_template = read_knowledge_file(compress_prompt_file)
+
+            # 替换description占位符
+            if self.description:
+                return compress_prompt_template.replace('{description}', self.description)
+            # 无description时，移除注意力框架部分
+            return compress_prompt_template.replace(
+                '## Agent注意力框架\n\n{description}\n\n基于上述Agent的专业身份和职责，压缩对话历史时请重点关注与其相关的内容。\n\n',
+                ''
+            )
+
+        # 降级到内置简单压缩（向后兼容）
+        print(f"  ⚠️ 未找到compact_prompt.md，使用内置简单压缩")
+        return """你是一个对话历史压缩专家。请将冗长的对话历史压缩成精炼的摘要。
+
+压缩原则：
+1. 保留关键事实和重要细节（包括关键过程）
+2. 旧记忆简洁总结，新记忆充分保留（可以包含重要代码片段）
+3. 去除所有重复和冗余
+4. 确保时间顺序：旧记忆→新记忆
+
+输出要求：
+- 旧记忆：简洁总结（500-1000字）
+- 新记忆：详细要点（10-20点）
+- 总长度不超过10000字
+- 不要嵌套结构"""
+
+    def _split_compact_rounds(self, dialogue_msgs: List[Dict]) -> Tuple[Optional[str], List[List[Dict]]]:
+        """提取已有的长期记忆，并把其余消息切分为轮次
+
+        轮次 = 一条user消息，或一条assistant消息及其后的tool结果，
+        这样切分不会拆散tool_calls与对应的tool结果。
+
+        Returns:
+            (已有的长期记忆，没有则为None；轮次列表)
+        """
+        memory_markers = ("[已加载压缩的历史记忆]", "[已加载历史压缩记忆]")
+        summaries = []
+        rounds = []
+        after_memory_request = False
+
+        for msg in dialogue_msgs:
+            role = msg.get("role")
+            content = msg.get("content") or ""
+
+            if role == "user" and content == "[请基于以下压缩的历史记忆继续对话]":
+                after_memory_request = True
+                continue
+            if role == "user" and content == "[以下是最近的对话原文]":
+                after_memory_request = False
+                continue
+            if role == "assistant" and (after_memory_request or content.startswith(memory_markers)):
+                for marker in memory_markers:
+                    if content.startswith(marker):
+                        content = content[len(marker):]
+                        break
+                content = content.strip()
+                if content and content not in summaries:
+                    summaries.append(content)
+                after_memory_request = False
+                continue
+            after_memory_request = False
+
+            if role == "tool" and rounds:
+                rounds[-1].append(msg)
+            else:
+                rounds.append([msg])
+
+        long_term_summary = "\n\n".join(summaries) if summaries else None
+        return long_term_summary, rounds
+
+    def _summarize_chunk(self, compress_prompt: str, chunk: List[List[Dict]]) -> Optional[str]:
+        """摘要一个历史分块，结果按内容哈希缓存在~/.agent/<name>/compact_chunks/"""
+        import hashlib
+
+        # 工具结果可能很长，适度截断以限制单块的压缩成本
+        trimmed = [
+            [dict(msg, content=msg["content"][:2000] + "...")
+             if msg.get("role") == "tool" and len(msg.get("content") or "") > 2000 else msg
+             for msg in round_msgs]
+            for round_msgs in chunk
+        ]
+        chunk_json = json.dumps(trimmed, ensure_ascii=False, indent=2)
+        key = hashlib.sha256(
+            f"{self.compress_config['model']}\n{compress_prompt}\n{chunk_json}".encode('utf-8')
+        ).hexdigest()[:32]
+        cache_dir = self.agent_home / "compact_chunks"
+        cache_file = cache_dir / f"{key}.md"
+        if cache_file.exists():
+            return cache_file.read_text(encoding='utf-8')
+
+        summary = self._call_compress_api(compress_prompt, f"""请压缩以下较早的对话片段。
+
+**说明**：这是历史中的一个分块，最近的对话会原文保留，因此无需在L0中保留"最后一个应答对"，只需提取本片段中值得长期记住的内容。
+
+{chunk_json}""")
+        if summary is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix('.tmp')
+            temp_file.write_text(summary, encoding='utf-8')
+            temp_file.replace(cache_file)  # 原子操作
+        return summary
+
+    def _merge_summaries(self, compress_prompt: str, long_term_summary: Optional[str],
+                         chunk_summaries: List[str]) -> Optional[str]:
+        """将分块摘要按时间顺序合并进滚动的长期记忆"""
+        sections = []
+        if long_term_summary:
+            sections.append(f"## 已有的长期记忆（更早）\n\n{long_term_summary}")
+        for i, summary in enumerate(chunk_summaries, 1):
+            sections.append(f"## 新增分块摘要 {i}\n\n{summary}")
+
+        return self._call_compress_api(compress_prompt, f"""请将以下记忆按时间顺序合并为一份新的长期记忆。
+
+**要求**：输出一份扁平的记忆，不要嵌套"已加载的历史记忆"结构；最近的对话会原文保留，无需在L0中保留"最后一个应答对"。
+
+{chr(10).join(sections)}""")
+
+    def _call_compress_api(self, system_prompt: str, user_content: str) -> Optional[str]:
+        """调用压缩模型，失败时返回None"""
+        # 智能代理管理（压缩API）
+        compress_proxies = None
+        compress_base_url_lower = self.compress_config['base_url'].lower()
+        compress_domestic_apis = ["deepseek.com", "moonshot.cn"]
+        compress_is_domestic = any(domain in compress_base_url_lower for domain in compress_domestic_apis)
+
+        if compress_is_domestic:
+            compress_proxies = {"http": None, "https": None}
+
+        compress_response = requests.post(
+            f"{self.compress_config['base_url']}/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.compress_config['api_key']}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.compress_config["model"],
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                "temperature": self.compress_config["temperature"]
+            },
+            proxies=compress_proxies  # 智能代理设置
+        )
+
+        if compress_response.status_code != 200:
+            print(f"  ⚠️ 压缩API错误: {compress_response.status_code}")
+            return None
+        return compress_response.json()["choices"][0]["message"]["content"]
 
     @classmethod
     def load(cls, name: str, **kwargs):
@@ -2021,18 +2305,11 @@ class ReactAgentMinimal(Function):
             # 1. 从children列表中移除
             self.children.remove(child_name)
 
-            # 2. 从function_instances中移除对应的Function
-            removed_from_tools = False
-            for i, func in enumerate(self.function_instances):
-                if hasattr(func, 'name') and func.name == child_name:
-                    self.function_instances.pop(i)
-                    removed_from_tools = True
-                    break
-
-            # 3. 更新functions列表（OpenAI格式）
-            self.functions = [f.to_openai_function() for f in self.function_instances]
+            # 2. 从function_instances和分发表中移除对应的Function
+            # （functions列表在下次API调用时自动更新）
+            removed_from_tools = self.remove_function(child_name)
 
-            # 4. 删除子Agent的物理存储
+            # 3. 删除子Agent的物理存储
             import shutil
             child_home = Path.home() / ".agent" / child_name
             if child_home.exists():
@@ -2041,7 +2318,7 @@ class ReactAgentMinimal(Function):
             else:
                 physical_deleted = False
 
-            # 5. 保存父Agent状态
+            # 4. 保存父Agent状态
             self._auto_save_state()
 
             # 返回结果
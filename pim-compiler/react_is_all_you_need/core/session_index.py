@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Session历史全文索引 - SQLite FTS5
+
+SessionQueryTool不再每次查询都读取全部.sessions/*.md：
+- 索引库放在.sessions/.index.sqlite，按(mtime, 大小)增量同步，
+  只重新读取新增或修改过的session，已删除的session从索引移除
+- 写session的代码可以调用add_session()立即入索引
+- 全文检索按BM25排序并返回摘要片段，支持时间范围过滤
+- 正则查询先从模式中提取必需的字面量，用索引筛选候选，再逐个正则匹配
+
+使用trigram分词器（SQLite 3.34+），中文和英文都可以做子串检索；
+旧版SQLite降级为unicode61分词器。
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+__all__ = [
+    'SessionIndex',
+]
+
+SUMMARY_LINES = 10  # 摘要保留的行数
+
+
+class SessionIndex:
+    """一个.sessions目录的全文索引"""
+
+    def __init__(self, sessions_dir: Path, db_path: Optional[Path] = None):
+        self.sessions_dir = Path(sessions_dir)
+        self.db_path = Path(db_path) if db_path else self.sessions_dir / ".index.sqlite"
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.trigram = True
+
+    # ============= 连接与表结构 =============
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # 允许多个Agent进程同时读
+        conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            session_time REAL NOT NULL,
+            summary TEXT NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_time ON sessions(session_time)")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts "
+                         "USING fts5(path UNINDEXED, body, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            # SQLite < 3.34 没有trigram分词器
+            self.trigram = False
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts "
+                         "USING fts5(path UNINDEXED, body)")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ============= 增量维护 =============
+
+    def add_session(self, path: Path) -> None:
+        """写入session后调用，立即更新索引"""
+        path = Path(path)
+        with self._lock:
+            conn = self._connect()
+            self._upsert(conn, path, path.stat())
+            conn.commit()
+
+    def sync(self) -> Tuple[int, int]:
+        """按mtime和大小增量同步目录
+
+        Returns:
+            (更新的session数, 删除的session数)
+        """
+        if not self.sessions_dir.exists():
+            return 0, 0
+
+        current: Dict[str, os.stat_result] = {}
+        with os.scandir(self.sessions_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".md") and entry.is_file():
+                    current[entry.path] = entry.stat()
+
+        with self._lock:
+            conn = self._connect()
+            indexed = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in conn.execute("SELECT path, mtime_ns, size FROM sessions")
+            }
+
+            updated = 0
+            for path, stat in current.items():
+                if indexed.get(path) != (stat.st_mtime_ns, stat.st_size):
+                    self._upsert(conn, Path(path), stat)
+                    updated += 1
+
+            removed = [path for path in indexed if path not in current]
+            for path in removed:
+                conn.execute("DELETE FROM sessions WHERE path = ?", (path,))
+                conn.execute("DELETE FROM sessions_fts WHERE path = ?", (path,))
+
+            if updated or removed:
+                conn.commit()
+        return updated, len(removed)
+
+    def _upsert(self, conn: sqlite3.Connection, path: Path, stat: os.stat_result) -> None:
+        try:
+            body = path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            return
+        summary = '\n'.join(body.split('\n')[:SUMMARY_LINES])
+        key = str(path)
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (path, mtime_ns, size, session_time, summary) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, stat.st_mtime_ns, stat.st_size, stat.st_mtime, summary)
+        )
+        conn.execute("DELETE FROM sessions_fts WHERE path = ?", (key,))
+        conn.execute("INSERT INTO sessions_fts (path, body) VALUES (?, ?)", (key, body))
+
+    # ============= 查询 =============
+
+    @staticmethod
+    def _time_filter(since: Optional[str], until: Optional[str]) -> Tuple[str, List]:
+        """把ISO格式的时间范围转换为SQL条件"""
+        clauses, params = [], []
+        if since:
+            clauses.append("s.session_time >= ?")
+            params.append(datetime.fromisoformat(since).timestamp())
+        if until:
+            clauses.append("s.session_time <= ?")
+            params.append(datetime.fromisoformat(until).timestamp())
+        return (" AND " + " AND ".join(clauses)) if clauses else "", params
+
+    def _fts_query(self, text: str) -> Optional[str]:
+        """构造FTS5 MATCH表达式；trigram分词下少于3个字符的词无法检索"""
+        terms = [t for t in text.split() if t]
+        if self.trigram:
+            terms = [t for t in terms if len(t) >= 3]
+        if not terms:
+            return None
+        return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    def search(self, query: str, limit: int = 10,
+               since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """全文检索，按BM25相关度排序并返回摘要片段"""
+        time_sql, time_params = self._time_filter(since, until)
+        match = self._fts_query(query)
+        with self._lock:
+            conn = self._connect()
+            if match is not None:
+                rows = conn.execute(
+                    "SELECT s.path, s.session_time, s.summary, "
+                    "snippet(sessions_fts, 1, '**', '**', '…', 16), bm25(sessions_fts) "
+                    "FROM sessions_fts JOIN sessions s ON s.path = sessions_fts.path "
+                    f"WHERE sessions_fts MATCH ?{time_sql} "
+                    "ORDER BY bm25(sessions_fts) LIMIT ?",
+                    [match, *time_params, limit]
+                ).fetchall()
+            else:
+                # 词太短无法走索引：在已存储的正文中做子串匹配（不读文件）
+                rows = conn.execute(
+                    "SELECT s.path, s.session_time, s.summary, '', 0.0 "
+                    "FROM sessions_fts JOIN sessions s ON s.path = sessions_fts.path "
+                    f"WHERE instr(lower(sessions_fts.body), lower(?)) > 0{time_sql} "
+                    "ORDER BY s.session_time DESC LIMIT ?",
+                    [query, *time_params, limit]
+                ).fetchall()
+        return [self._row_to_result(row) for row in rows]
+
+    def regex_search(self, pattern: str, limit: int = 10,
+                     since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """正则检索：用必需字面量通过索引筛选候选，再逐个正则匹配（最新的在前）"""
+        regex = re.compile(pattern, re.IGNORECASE)
+        time_sql, time_params = self._time_filter(since, until)
+        literal = required_literal(pattern)
+        match = self._fts_query(literal) if literal and ' ' not in literal else None
+
+        with self._lock:
+            conn = self._connect()
+            if match is not None:
+                cursor = conn.execute(
+                    "SELECT s.path, s.session_time, s.summary, sessions_fts.body "
+                    "FROM sessions_fts JOIN sessions s ON s.path = sessions_fts.path "
+                    f"WHERE sessions_fts MATCH ?{time_sql} ORDER BY s.path DESC",
+                    [match, *time_params]
+                )
+            else:
+                cursor = conn.execute(
+                    "SELECT s.path, s.session_time, s.summary, sessions_fts.body "
+                    "FROM sessions_fts JOIN sessions s ON s.path = sessions_fts.path "
+                    f"WHERE 1{time_sql} ORDER BY s.path DESC",
+                    time_params
+                )
+
+            results = []
+            for path, session_time, summary, body in cursor:
+                found = regex.search(body)
+                if not found:
+                    continue
+                start = max(0, found.start() - 60)
+                snippet = body[start:found.end() + 60]
+                results.append(self._row_to_result((path, session_time, summary, snippet, 0.0)))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def recent(self, limit: int = 10,
+               since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """按文件名倒序（与旧实现一致）列出session"""
+        time_sql, time_params = self._time_filter(since, until)
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT s.path, s.session_time, s.summary, '', 0.0 FROM sessions s "
+                f"WHERE 1{time_sql} ORDER BY s.path DESC LIMIT ?",
+                [*time_params, limit]
+            ).fetchall()
+        return [self._row_to_result(row) for row in rows]
+
+    @staticmethod
+    def _row_to_result(row) -> Dict:
+        path, session_time, summary, snippet, score = row
+        return {
+            "path": path,
+            "name": Path(path).name,
+            "time": datetime.fromtimestamp(session_time).isoformat(timespec='seconds'),
+            "summary": summary,
+            "snippet": snippet.replace('\n', ' '),
+            "score": -score,  # bm25()越小越相关，取反后越大越相关
+        }
+
+
+def required_literal(pattern: str) -> Optional[str]:
+    """提取正则中必然出现的最长字面量（用于索引预筛选）
+
+    保守处理：顶层有|分支或使用verbose标志时不预筛选；只收集括号外的连续普通字符，
+    量词修饰的字符视为可选。
+    """
+    if re.match(r'\(\?[a-zA-Z]*x', pattern):
+        return None  # (?x)中的空白和#注释不是字面量
+    special = set(".^$*+?{}[]()|\\")
+    runs, current = [], []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\' and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            if depth == 0 and not nxt.isalnum():
+                current.append(nxt)  # 转义的普通字符，如\.
+            else:
+                runs.append(''.join(current))
+                current = []
+            i += 2
+            continue
+        if ch == '|' and depth == 0:
+            return None
+        if ch == '[':
+            # 跳过字符类：开头（^之后）的]是普通字符，\]是转义
+            runs.append(''.join(current))
+            current = []
+            i += 1
+            if i < len(pattern) and pattern[i] == '^':
+                i += 1
+            if i < len(pattern) and pattern[i] == ']':
+                i += 1
+            while i < len(pattern) and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+            i += 1
+            continue
+        if ch in '*?{+':
+            # *?{ 使前一个字符可选；+ 保留前一个字符，但其后不再连续
+            if ch != '+' and current:
+                current.pop()
+            runs.append(''.join(current))
+            current = []
+            if ch == '{':
+                end = pattern.find('}', i)
+                i = end + 1 if end != -1 else len(pattern)
+                continue
+        elif ch in special:
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth = max(0, depth - 1)
+            runs.append(''.join(current))
+            current = []
+        elif depth == 0:
+            current.append(ch)
+        i += 1
+    runs.append(''.join(current))
+    longest = max(runs, key=len, default='')
+    return longest or None
@@ -7,6 +7,15 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 from pathlib import Path
+import re
+
+try:
+    from .file_index import read_char_range, read_line_range, read_tail
+    from .session_index import SessionIndex
+except ImportError:
+    # 支持把core目录加入sys.path后直接import tool_base
+    from file_index import read_char_range, read_line_range, read_tail
+    from session_index import SessionIndex
 
 __all__ = [
     'Function',
@@ -92,12 +101,19 @@ class Function(ABC):
 # ============= 通用工具类 =============
 
 class ReadFileTool(Function):
-    """读取文件工具"""
+    """读取文件工具
+
+    小文件整体读取；大文件通过偏移索引seek到目标位置，只解码需要的片段
+    （见file_index.py），分页读取几百MB的日志时不再每页重读整个文件。
+    """
+
+    # 超过此大小的文件使用索引范围读取
+    INDEX_MIN_SIZE = 4 * 1024 * 1024
     
     def __init__(self, work_dir):
         super().__init__(
             name="read_file",
-            description="读取文件内容，支持分段读取大文件",
+            description="读取文件内容，支持按字符或按行分段读取大文件，以及读取文件末尾（tail）",
             parameters={
                 "file_path": {
                     "type": "string",
@@ -105,11 +121,21 @@ class ReadFileTool(Function):
                 },
                 "offset": {
                     "type": "integer",
-                    "description": "起始字符位置（0表示文件开头，负数表示从文件末尾倒数）。用于分段读取大文件，默认0"
+                    "description": "起始位置（0表示文件开头，负数表示从文件末尾倒数）。unit为chars时是字符位置，为lines时是行号（0起始）。用于分段读取大文件，默认0"
                 },
                 "limit": {
                     "type": "integer",
-                    "description": "最多读取的字符数。默认2000字符，足够显示代码的关键部分。设置为0表示读取整个文件（从offset到文件末尾）"
+                    "description": "最多读取的字符数或行数。默认2000字符/200行，足够显示代码的关键部分。设置为0表示读取到文件末尾"
+                },
+                "unit": {
+                    "type": "string",
+                    "enum": ["chars", "lines"],
+                    "description": "offset和limit的单位：chars按字符（默认），lines按行"
+                },
+                "mode": {
+                    "type": "string",
+                    "enum": ["range", "tail"],
+                    "description": "range按offset/limit读取（默认）；tail读取文件最后limit行（默认50行），适合查看日志"
                 }
             }
         )
@@ -127,16 +153,38 @@ class ReadFileTool(Function):
             file_path = self.work_dir / path_str
 
         if file_path.exists():
+            mode = kwargs.get("mode") or "range"
+            unit = kwargs.get("unit") or "chars"
+
+            # tail模式：从末尾向前读取，不需要扫描整个文件
+            if mode == "tail":
+                return read_tail(file_path, int(kwargs.get("limit") or 50))
+
             # 确保offset和limit是整数
             offset = int(kwargs.get("offset", 0))
-            limit = int(kwargs.get("limit", 2000))
+            limit = int(kwargs.get("limit", 200 if unit == "lines" else 2000))
 
-            # 读取整个文件内容（这样可以按字符而不是字节处理）
+            # 大文件：通过索引只读取需要的范围
+            if file_path.stat().st_size >= self.INDEX_MIN_SIZE:
+                if unit == "lines":
+                    return read_line_range(file_path, offset, limit)
+                return read_char_range(file_path, offset, limit)
+
+            # 小文件：读取整个文件内容（这样可以按字符而不是字节处理）
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-            # 获取文件的字节大小（用于显示）
-            file_size = file_path.stat().st_size
+            if unit == "lines":
+                # 只按'\n'分行，与大文件的索引读取保持一致
+                lines = content.split('\n')
+                lines = [line + '\n' for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+                if offset < 0:
+                    offset = max(0, len(lines) + offset)
+                if offset >= len(lines):
+                    return f"偏移量{offset}超过文件长度{len(lines)}行"
+                end_line = len(lines) if limit == 0 else offset + limit
+                return ''.join(lines[offset:end_line])
+
             content_length = len(content)
 
             # 处理负偏移（从文件末尾开始）
@@ -260,16 +308,28 @@ class AppendFileTool(Function):
 
 
 class SessionQueryTool(Function):
-    """查询历史session工具"""
+    """查询历史session工具（基于SQLite FTS5全文索引）"""
     
     def __init__(self, work_dir):
         super().__init__(
             name="query_sessions",
             description="查询历史任务记录，获取之前的解决方案和经验。可用于：查找相似问题的处理方法、追溯文件修改历史、回顾错误和修复记录",
             parameters={
+                "query": {
+                    "type": "string",
+                    "description": "全文检索关键词（可选，空格分隔多个词），按相关度排序并返回匹配片段"
+                },
                 "pattern": {
                     "type": "string",
-                    "description": "搜索模式（可选）"
+                    "description": "正则搜索模式（可选）"
+                },
+                "since": {
+                    "type": "string",
+                    "description": "起始时间（可选，ISO格式，如2025-01-01或2025-01-01T12:00）"
+                },
+                "until": {
+                    "type": "string",
+                    "description": "截止时间（可选，ISO格式）"
                 },
                 "limit": {
                     "type": "integer",
@@ -280,45 +340,48 @@ class SessionQueryTool(Function):
         )
         self.work_dir = Path(work_dir)
         self.sessions_dir = self.work_dir / ".sessions"
+        self._index: Optional[SessionIndex] = None
+    
+    @property
+    def index(self) -> SessionIndex:
+        """索引在首次查询时创建"""
+        if self._index is None:
+            self._index = SessionIndex(self.sessions_dir)
+        return self._index
     
     def execute(self, **kwargs) -> str:
+        query = kwargs.get("query", None)
         pattern = kwargs.get("pattern", None)
+        since = kwargs.get("since", None)
+        until = kwargs.get("until", None)
         limit = kwargs.get("limit", 10)
         
         if not self.sessions_dir.exists():
             return "没有找到session记录"
         
-        # 获取所有session文件，按时间倒序
-        session_files = sorted(self.sessions_dir.glob("*.md"), reverse=True)
-        
-        if pattern:
-            # 如果提供了搜索模式，过滤文件
-            import re
-            regex = re.compile(pattern, re.IGNORECASE)
-            filtered = []
-            for f in session_files:
-                try:
-                    if regex.search(f.read_text(encoding='utf-8')):
-                        filtered.append(f)
-                except:
-                    continue
-            session_files = filtered
-        
-        # 限制返回数量
-        session_files = session_files[:limit]
+        try:
+            # 只重新索引新增或修改过的session
+            self.index.sync()
+            if query:
+                sessions = self.index.search(query, limit, since, until)
+            elif pattern:
+                sessions = self.index.regex_search(pattern, limit, since, until)
+            else:
+                sessions = self.index.recent(limit, since, until)
+        except re.error as e:
+            return f"正则表达式错误: {e}"
+        except ValueError as e:
+            return f"时间格式错误（应为ISO格式）: {e}"
         
-        if not session_files:
+        if not sessions:
             return "没有找到匹配的session"
         
         # 构建结果
         results = []
-        for session_file in session_files:
-            # 读取文件前几行获取摘要
-            try:
-                lines = session_file.read_text(encoding='utf-8').split('\n')[:10]
-                summary = '\n'.join(lines)
-                results.append(f"## {session_file.name}\n{summary}\n...")
-            except:
-                continue
+        for session in sessions:
+            header = f"## {session['name']} ({session['time']})"
+            if session['snippet']:
+                header += f"\n匹配: {session['snippet']}"
+            results.append(f"{header}\n{session['summary']}\n...")
         
-        return '\n\n'.join(results) if results else "无法读取session文件"
\ No newline at end of file
+        return '\n\n'.join(results)
@@ -153,14 +153,12 @@ class CreateAgentTool(Function):
             inherited_count = 0
             if inherit_tools and self.parent_agent:
                 for tool_name in inherit_tools:
-                    # 从父Agent的function_instances列表中查找
-                    for tool in self.parent_agent.function_instances:
-                        # 直接匹配工具名称
-                        if tool.name == tool_name:
-                            # 将找到的工具添加到新Agent
-                            agent.add_function(tool)
-                            inherited_count += 1
-                            break
+                    # 从父Agent的分发表中按名称查找
+                    tool = self.parent_agent.function_map.get(tool_name)
+                    if tool is not None:
+                        # 将找到的工具添加到新Agent
+                        agent.add_function(tool)
+                        inherited_count += 1
             
             # 如果有父Agent，直接将新Agent添加到父Agent的工具列表
             if self.parent_agent:
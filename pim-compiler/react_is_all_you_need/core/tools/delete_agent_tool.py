@@ -45,13 +45,10 @@ class DeleteAgentTool(Function):
             return "错误：没有父Agent引用，无法删除工具"
 
         try:
-            # 检查Agent是否存在
-            if agent_name not in self.parent_agent.function_instances:
+            # 从工具列表和分发表中移除
+            if not self.parent_agent.remove_function(agent_name):
                 return f"Agent '{agent_name}' 不存在于工具列表中"
 
-            # 从工具列表中移除
-            del self.parent_agent.function_instances[agent_name]
-
             # 清理相关资源（如果有）
             # 注意：这里只是从工具列表移除引用，Python的垃圾回收会处理实际的内存释放
 
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+知识检索工具 - 在knowledge/目录的函数和概念中按相关度搜索
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from core.tool_base import Function
+from core.knowledge_concept_loader import KnowledgeConceptLoader
+
+# 两次检索之间至少间隔这么久才重新扫描知识文件（秒）；
+# 知识目录本身的mtime变化（增删文件）会立即触发刷新
+REFRESH_INTERVAL = 2.0
+
+
+class KnowledgeSearchTool(Function):
+    """知识检索工具 - BM25全文检索 + @名称模糊匹配"""
+
+    def __init__(self, knowledge_dirs: Optional[List[str]] = None):
+        super().__init__(
+            name="search_knowledge",
+            description="在知识库中检索知识函数和概念，按相关度返回前k项及分数。"
+                        "查询以@开头时按名称模糊匹配（如@valdate可找到@validate），否则按中英文关键词全文检索",
+            parameters={
+                "query": {
+                    "type": "string",
+                    "description": "检索关键词，或@名称"
+                },
+                "top_k": {
+                    "type": "integer",
+                    "description": "返回数量",
+                    "default": 5
+                },
+                "semantic": {
+                    "type": "boolean",
+                    "description": "是否按语义向量相似度检索（适合同义改写的查询）",
+                    "default": False
+                },
+                "related": {
+                    "type": "boolean",
+                    "description": "是否同时列出每个结果的相关知识项（同文件或互相引用）",
+                    "default": False
+                }
+            }
+        )
+        if knowledge_dirs is None:
+            knowledge_dirs = [str(Path(__file__).parent.parent.parent / "knowledge")]
+        self.knowledge_dirs = knowledge_dirs
+        self._loader: Optional[KnowledgeConceptLoader] = None
+        self._refreshed_at = 0.0
+        self._dir_mtimes: Tuple[int, ...] = ()
+
+    def _knowledge_dir_mtimes(self) -> Tuple[int, ...]:
+        mtimes = []
+        for dir_path in self.knowledge_dirs:
+            try:
+                mtimes.append(os.stat(dir_path).st_mtime_ns)
+            except OSError:
+                mtimes.append(0)
+        return tuple(mtimes)
+
+    @property
+    def loader(self) -> KnowledgeConceptLoader:
+        """加载器在首次检索时创建（知识文件解析结果有磁盘缓存）
+
+        之后只在知识目录的mtime变化或距上次刷新超过REFRESH_INTERVAL时刷新，
+        连续的检索不会每次都重新扫描目录。
+        """
+        dir_mtimes = self._knowledge_dir_mtimes()
+        now = time.monotonic()
+        if self._loader is None:
+            self._loader = KnowledgeConceptLoader(self.knowledge_dirs)
+        elif dir_mtimes != self._dir_mtimes or now - self._refreshed_at >= REFRESH_INTERVAL:
+            self._loader.refresh()  # 增量：只重新解析变化过的文件
+        else:
+            return self._loader
+        self._refreshed_at = now
+        self._dir_mtimes = dir_mtimes
+        return self._loader
+
+    def execute(self, **kwargs) -> str:
+        query = kwargs.get("query")
+        if not query:
+            return "错误：需要提供检索关键词"
+        top_k = kwargs.get("top_k", 5)
+        show_related = kwargs.get("related", False)
+
+        loader = self.loader
+        if kwargs.get("semantic", False):
+            try:
+                results = loader.semantic_search(query, top_k)
+            except ImportError:
+                return "错误：语义检索需要安装numpy"
+        else:
+            results = loader.search(query, top_k)
+        if not results:
+            return f"知识库中没有找到与'{query}'相关的内容"
+
+        type_names = {
+            'function': '函数',
+            'contract': '契约函数',
+            'concept': '概念',
+            'pattern': '模式',
+            'principle': '原理'
+        }
+        lines = [f"找到{len(results)}项（共{len(loader.knowledge_index)}项知识）："]
+        for rank, (item, score) in enumerate(results, 1):
+            type_str = type_names.get(item.item_type, item.item_type)
+            lines.append(f"{rank}. @{item.name} ({type_str}) 分数={score:.3f}")
+            lines.append(f"   文件: {item.path}")
+            lines.append(f"   {item.docstring}")
+            if show_related:
+                related = loader.get_related_items(item.name)
+                if related:
+                    lines.append("   相关: " + ", ".join(f"@{r.name}" for r in related[:10]))
+        return "\n".join(lines)
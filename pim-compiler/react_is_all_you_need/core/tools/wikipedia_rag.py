@@ -2,14 +2,41 @@
 """
 Wikipedia RAG：基于结构化知识索引的新型RAG实现
 替代传统向量数据库RAG，使用分类索引和知识图谱
+
+检索引擎：
+- 标题+正文的倒排索引（BM25，中文二元组分词），首次关键词检索时建立，
+  页面新增、删除或修改后（按mtime和大小判断）重建
+- 有容量上限的LRU页面缓存（按mtime失效）
+- 知识图谱按关系类型加权的BFS，有节点预算
+- 混合检索：分类命中、关键词命中、图谱命中归一化后加权合并
 """
 
 import json
 import re
+import heapq
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+from core.knowledge_search import BM25Index
+
+INDEX_FILES = {"CATEGORY_INDEX.md", "ALPHABETICAL_INDEX.md"}
+
+# 关系类型权重：沿强关系扩展的页面得分更高，未列出的类型使用默认值
+RELATION_WEIGHTS = {
+    "is_a": 1.0,
+    "part_of": 0.9,
+    "implements": 0.9,
+    "depends_on": 0.8,
+    "uses": 0.7,
+    "related_to": 0.5,
+}
+DEFAULT_RELATION_WEIGHT = 0.6
+
+# 混合检索中各来源的权重
+HYBRID_WEIGHTS = {"keyword": 1.0, "category": 0.5, "graph": 0.7}
+
 @dataclass
 class WikiPage:
     """Wikipedia页面"""
@@ -30,18 +57,26 @@ class KnowledgeEntity:
 class WikipediaRAG:
     """基于Wikipedia风格知识组织的RAG系统"""
 
-    def __init__(self, wiki_dir: str):
+    def __init__(self, wiki_dir: str, max_cached_pages: int = 256):
         """
         初始化Wikipedia RAG
 
         Args:
             wiki_dir: Wikipedia知识库目录
+            max_cached_pages: 页面缓存容量（LRU淘汰）
         """
         self.wiki_dir = Path(wiki_dir)
         self.category_index = {}
         self.alphabetical_index = {}
         self.knowledge_graph = {}
-        self.pages_cache = {}
+        self.pages_cache: "OrderedDict[str, Tuple[int, WikiPage]]" = OrderedDict()
+        self.max_cached_pages = max_cached_pages
+
+        # 倒排索引（首次关键词检索时建立）
+        self._search_index: Optional[BM25Index] = None
+        self._doc_files: List[str] = []  # 文档号 -> 文件名
+        self._titles: Dict[str, str] = {}  # 文件名 -> 标题
+        self._index_signature: Dict[str, Tuple[int, int]] = {}  # 文件名 -> (mtime_ns, 大小)
 
         # 加载索引和图谱
         self._load_indices()
@@ -137,61 +172,199 @@ class WikipediaRAG:
                     pages.append(page)
         return pages
 
-    def retrieve_by_keyword(self, keyword: str) -> List[WikiPage]:
+    def retrieve_by_keyword(self, keyword: str, top_k: int = 10) -> List[WikiPage]:
         """
         按关键词检索知识
 
         Args:
             keyword: 关键词
+            top_k: 最多返回的页面数
 
         Returns:
-            相关Wikipedia页面列表
+            相关Wikipedia页面列表（按相关度排序）
         """
         pages = []
-        keyword_lower = keyword.lower()
-
-        # 搜索所有分类
-        for category, items in self.category_index.items():
-            for page_info in items:
-                if keyword_lower in page_info['title'].lower():
-                    page = self._load_page(page_info['file'])
-                    if page:
-                        pages.append(page)
-
+        for filename, _ in self._keyword_hits(keyword, top_k):
+            page = self._load_page(filename)
+            if page:
+                pages.append(page)
         return pages
 
-    def retrieve_by_relation(self, entity_name: str, max_depth: int = 2) -> List[WikiPage]:
+    def retrieve_by_relation(self, entity_name: str, max_depth: int = 2,
+                             max_nodes: int = 50) -> List[WikiPage]:
         """
         按知识图谱关系检索
 
         Args:
             entity_name: 实体名称
             max_depth: 最大遍历深度
+            max_nodes: 最多访问的实体数
 
         Returns:
-            相关Wikipedia页面列表
+            相关Wikipedia页面列表（按关系强度排序）
         """
         pages = []
-        visited = set()
-
-        def traverse(entity: str, depth: int):
-            if depth > max_depth or entity in visited:
-                return
-            visited.add(entity)
-
-            # 加载实体对应的页面
-            page_file = f"{entity}.md"
-            page = self._load_page(page_file)
+        for entity, _ in self._graph_hits([entity_name], max_depth, max_nodes):
+            page = self._load_page(f"{entity}.md")
             if page:
                 pages.append(page)
+        return pages
 
-            # 遍历相关实体
-            if entity in self.knowledge_graph:
-                for rel_type, target in self.knowledge_graph[entity].relations:
-                    traverse(target, depth + 1)
+    def retrieve(self, query: str, top_k: int = 5) -> List[Tuple[WikiPage, float]]:
+        """
+        混合检索：分类、关键词、知识图谱三路命中归一化后加权合并
 
-        traverse(entity_name, 0)
-        return pages
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+
+        Returns:
+            [(页面, 分数)]，分数从高到低
+        """
+        combined: Dict[str, float] = {}
+
+        def merge(hits: List[Tuple[str, float]], weight: float):
+            if not hits:
+                return
+            top = max(score for _, score in hits) or 1.0
+            for filename, score in hits:
+                combined[filename] = combined.get(filename, 0.0) + weight * score / top
+
+        # 关键词：标题+正文BM25
+        keyword_hits = self._keyword_hits(query, top_k * 4)
+        merge(keyword_hits, HYBRID_WEIGHTS["keyword"])
+
+        # 分类：查询中提到的分类下的所有页面
+        query_lower = query.lower()
+        category_hits = [
+            (page_info['file'], 1.0)
+            for category, items in self.category_index.items()
+            if category.lower() in query_lower
+            for page_info in items
+        ]
+        merge(category_hits, HYBRID_WEIGHTS["category"])
+
+        # 图谱：从查询中提到的实体和关键词最佳命中出发扩展
+        seeds = [entity for entity in self.knowledge_graph if entity.lower() in query_lower]
+        for filename, _ in keyword_hits[:3]:
+            entity = Path(filename).stem
+            if entity in self.knowledge_graph and entity not in seeds:
+                seeds.append(entity)
+        graph_hits = [(f"{entity}.md", score)
+                      for entity, score in self._graph_hits(seeds, max_depth=2, max_nodes=top_k * 4)]
+        merge(graph_hits, HYBRID_WEIGHTS["graph"])
+
+        results = []
+        for filename, score in heapq.nlargest(top_k * 2, combined.items(), key=lambda pair: pair[1]):
+            page = self._load_page(filename)
+            if page:
+                results.append((page, score))
+            if len(results) >= top_k:
+                break
+        return results
+
+    # ============= 检索引擎 =============
+
+    def _page_files(self) -> List[str]:
+        """知识库中的所有页面（相对wiki_dir的路径，不含索引文件）"""
+        return list(self._page_signature())
+
+    def _page_signature(self) -> Dict[str, Tuple[int, int]]:
+        """所有页面的(mtime_ns, 大小)，用来发现页面的新增、删除和修改"""
+        signature = {}
+        if self.wiki_dir.exists():
+            for path in self.wiki_dir.rglob("*.md"):
+                if path.name in INDEX_FILES:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                signature[path.relative_to(self.wiki_dir).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return signature
+
+    def invalidate_search_index(self):
+        """丢弃倒排索引，下次关键词检索时重建（写入页面后可直接调用）"""
+        self._search_index = None
+
+    def _ensure_search_index(self) -> BM25Index:
+        """建立标题+正文的倒排索引（只读取一次每个页面，不占用页面缓存）
+
+        每次检索只stat页面文件；页面新增、删除或修改后整体重建。
+        """
+        signature = self._page_signature()
+        if self._search_index is not None and signature == self._index_signature:
+            return self._search_index
+
+        index = BM25Index({"title": 3.0, "content": 1.0})
+        doc_files = []
+        titles = {}
+        # 分类索引中的标题优先于页面内的标题
+        for items in self.category_index.values():
+            for page_info in items:
+                titles.setdefault(page_info['file'], page_info['title'])
+        for filename in signature:
+            try:
+                content = (self.wiki_dir / filename).read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError):
+                continue
+            title = titles.get(filename) or self._extract_title(content)
+            titles[filename] = title
+            index.add({"title": title, "content": content})
+            doc_files.append(filename)
+
+        self._doc_files = doc_files
+        self._titles = titles
+        self._index_signature = signature
+        self._search_index = index
+        return index
+
+    def _keyword_hits(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """关键词命中：[(文件名, 分数)]
+
+        BM25覆盖中文和完整英文单词；英文标题的部分匹配（如"arch"）按标题子串补充。
+        """
+        index = self._ensure_search_index()
+        hits = [(self._doc_files[doc_id], score) for doc_id, score in index.search(query, top_k)]
+
+        if len(hits) < top_k:
+            query_lower = query.lower().strip()
+            found = {filename for filename, _ in hits}
+            floor = min((score for _, score in hits), default=1.0)
+            for filename, title in self._titles.items():
+                if filename not in found and query_lower and query_lower in title.lower():
+                    hits.append((filename, floor * 0.5))
+                    if len(hits) >= top_k:
+                        break
+        return hits
+
+    def _graph_hits(self, seeds: List[str], max_depth: int = 2,
+                    max_nodes: int = 50) -> List[Tuple[str, float]]:
+        """从种子实体出发按关系加权扩展：[(实体, 分数)]
+
+        优先扩展分数最高的实体（分数 = 路径上关系权重的乘积），
+        超过max_depth或访问满max_nodes个实体即停止。
+        """
+        best: Dict[str, float] = {}
+        frontier = [(-1.0, 0, seed) for seed in seeds]
+        heapq.heapify(frontier)
+        visited = []
+
+        while frontier and len(visited) < max_nodes:
+            neg_score, depth, entity = heapq.heappop(frontier)
+            if entity in best:
+                continue
+            best[entity] = -neg_score
+            visited.append(entity)
+
+            if depth >= max_depth or entity not in self.knowledge_graph:
+                continue
+            for rel_type, target in self.knowledge_graph[entity].relations:
+                if target not in best:
+                    weight = RELATION_WEIGHTS.get(rel_type, DEFAULT_RELATION_WEIGHT)
+                    heapq.heappush(frontier, (neg_score * weight, depth + 1, target))
+
+        return [(entity, best[entity]) for entity in visited]
 
     def _load_page(self, filename: str) -> Optional[WikiPage]:
         """
@@ -203,14 +376,18 @@ class WikipediaRAG:
         Returns:
             WikiPage对象或None
         """
-        # 检查缓存
-        if filename in self.pages_cache:
-            return self.pages_cache[filename]
-
         filepath = self.wiki_dir / filename
-        if not filepath.exists():
+        try:
+            mtime_ns = filepath.stat().st_mtime_ns
+        except OSError:
             return None
 
+        # 检查缓存（文件修改后失效）
+        cached = self.pages_cache.get(filename)
+        if cached and cached[0] == mtime_ns:
+            self.pages_cache.move_to_end(filename)
+            return cached[1]
+
         content = filepath.read_text(encoding='utf-8')
 
         # 解析页面内容
@@ -226,8 +403,11 @@ class WikipediaRAG:
             source_path=str(filepath)
         )
 
-        # 缓存页面
-        self.pages_cache[filename] = page
+        # 缓存页面，超出容量时淘汰最久未使用的
+        self.pages_cache[filename] = (mtime_ns, page)
+        self.pages_cache.move_to_end(filename)
+        while len(self.pages_cache) > self.max_cached_pages:
+            self.pages_cache.popitem(last=False)
         return page
 
     def _extract_title(self, content: str) -> str:
@@ -283,8 +463,8 @@ class WikipediaRAG:
             # 关系查询：使用知识图谱
             pages = self.retrieve_by_relation(intent['entity'])
         else:
-            # 通用查询：综合检索
-            pages = self.retrieve_by_keyword(intent['keyword'])
+            # 通用查询：混合检索整个问题
+            pages = [page for page, _ in self.retrieve(question)]
 
         # 3. 构建上下文
         context = self._build_context(pages)
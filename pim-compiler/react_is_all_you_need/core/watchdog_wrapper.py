@@ -4,16 +4,21 @@ WatchdogWrapper: 事件驱动的Agent包装器
 让Agent只在有消息时被唤醒，实现0成本空闲
 """
 
+import os
 import time
+import queue
 import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileCreatedEvent
 
 from .react_agent_minimal import ReactAgentMinimal
 
+# 消息文件没有From头且最近仍在写入时，等待这么多秒再归为unknown
+SENDER_SETTLE_SECONDS = 0.5
+
 
 class WatchdogWrapper(FileSystemEventHandler):
     """
@@ -22,8 +27,8 @@ class WatchdogWrapper(FileSystemEventHandler):
     特点：
     1. 空闲时0 API调用
     2. 即时响应（<100ms）
-    3. 支持多Agent并发
-    4. 自动消息路由
+    3. 有界工作线程池 + 背压队列（突发消息不会创建成百上千个线程）
+    4. 复用预热的Agent，同一发送者的消息批量处理
     """
     
     def __init__(
@@ -32,7 +37,10 @@ class WatchdogWrapper(FileSystemEventHandler):
         model: str = "x-ai/grok-code-fast-1",
         knowledge_files: list = None,
         inbox_dir: str = ".inbox",
-        auto_start: bool = True
+        auto_start: bool = True,
+        max_workers: int = 4,
+        max_queue_size: int = 100,
+        max_batch_size: int = 10
     ):
         """
         初始化WatchdogWrapper
@@ -43,6 +51,9 @@ class WatchdogWrapper(FileSystemEventHandler):
             knowledge_files: 知识文件列表
             inbox_dir: inbox根目录
             auto_start: 是否自动启动监听
+            max_workers: 工作线程数（也是预热Agent池的大小）
+            max_queue_size: 待处理消息上限，队列满时阻塞监听线程（背压）
+            max_batch_size: 同一发送者一次批量处理的最大消息数
         """
         super().__init__()
         self.agent_name = agent_name
@@ -50,6 +61,9 @@ class WatchdogWrapper(FileSystemEventHandler):
         self.knowledge_files = knowledge_files or []
         self.inbox_path = Path(inbox_dir) / agent_name
         self.inbox_path.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
         
         # 监听器
         self.observer = Observer()
@@ -57,12 +71,31 @@ class WatchdogWrapper(FileSystemEventHandler):
         
         # 消息处理回调（可自定义）
         self.message_handler: Optional[Callable] = None
+
+        # 待处理队列：按到达顺序的[消息路径, 入队时间, 发送者, 下次读取发送者的时间]。
+        # 发送者在入队时读取；on_created触发时写入方可能还没写完消息头，这时发送者为None，
+        # 由工作线程在锁外重新读取。文件I/O都不在_queue_cond内进行
+        self._pending: List[list] = []
+        self._pending_count = 0
+        self._busy_senders = set()  # 正在处理中的发送者（保证同一发送者的消息按序处理）
+        self._queue_cond = threading.Condition()
+        self._stopping = False
+        self._workers: List[threading.Thread] = []
+
+        # 预热的Agent池（按需创建，最多max_workers个）
+        self._agent_pool: "queue.LifoQueue[ReactAgentMinimal]" = queue.LifoQueue()
+        self._agents_created = 0
+        self._pool_lock = threading.Lock()
         
         # 统计信息
+        self._stats_lock = threading.Lock()
         self.stats = {
             "messages_received": 0,
             "messages_processed": 0,
+            "batches_processed": 0,
             "total_api_calls": 0,
+            "max_queue_depth": 0,
+            "total_latency": 0.0,  # 入队到处理完成的累计秒数
             "start_time": None
         }
         
@@ -70,36 +103,130 @@ class WatchdogWrapper(FileSystemEventHandler):
             self.start()
     
     def on_created(self, event):
-        """文件创建事件处理"""
+        """文件创建事件处理 - 入队，由工作线程池处理"""
         if event.is_directory:
             return
             
         if event.src_path.endswith('.md'):
-            self.stats["messages_received"] += 1
+            with self._stats_lock:
+                self.stats["messages_received"] += 1
             print(f"\n📨 [{self.agent_name}] 收到新消息: {Path(event.src_path).name}")
-            
-            # 在新线程中处理，避免阻塞监听
-            thread = threading.Thread(
-                target=self._process_message,
-                args=(event.src_path,)
-            )
-            thread.start()
-    
-    def _process_message(self, msg_path: str):
-        """处理单个消息"""
+            self._enqueue(event.src_path)
+
+    def _enqueue(self, msg_path: str):
+        """入队；队列满时阻塞调用方（背压）"""
+        enqueued = time.time()
+        sender = self._read_sender(msg_path, SENDER_SETTLE_SECONDS)
+        retry_at = time.time() + SENDER_SETTLE_SECONDS
+        with self._queue_cond:
+            while self._pending_count >= self.max_queue_size and not self._stopping:
+                self._queue_cond.wait()
+            self._pending.append([msg_path, enqueued, sender, retry_at])
+            self._pending_count += 1
+            depth = self._pending_count
+            self._queue_cond.notify_all()
+        with self._stats_lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], depth)
+
+    @staticmethod
+    def _read_sender(msg_path: str, settle: float = 0.0) -> Optional[str]:
+        """从消息头的From字段读取发送者
+
+        读不到时归为unknown；但文件在settle秒内还被修改过时返回None（写入方可能还没写完）。
+        """
+        try:
+            with open(msg_path, encoding='utf-8') as f:
+                for _ in range(5):
+                    line = f.readline()
+                    if line.startswith("From:"):
+                        return line[len("From:"):].strip() or "unknown"
+            if settle and time.time() - os.path.getmtime(msg_path) < settle:
+                return None
+        except (OSError, UnicodeDecodeError):
+            pass
+        return "unknown"
+
+    def _next_batch(self) -> Optional[Tuple[str, List[Tuple[str, float]]]]:
+        """取出下一个空闲发送者的一批消息；停止且队列为空时返回None"""
+        while True:
+            with self._queue_cond:
+                while True:
+                    chosen = None
+                    batch = []
+                    unresolved = []
+                    for entry in self._pending:
+                        if entry[2] is None:
+                            unresolved.append(entry)
+                            continue
+                        if chosen is None and entry[2] not in self._busy_senders:
+                            chosen = entry[2]
+                        if entry[2] == chosen:
+                            batch.append(entry)
+                            if len(batch) >= self.max_batch_size:
+                                break
+                    if batch:
+                        taken = {id(entry) for entry in batch}
+                        self._pending = [entry for entry in self._pending if id(entry) not in taken]
+                        self._pending_count -= len(batch)
+                        self._busy_senders.add(chosen)
+                        self._queue_cond.notify_all()  # 唤醒因背压阻塞的入队方
+                        return chosen, [(entry[0], entry[1]) for entry in batch]
+                    if self._stopping and self._pending_count == 0:
+                        return None
+                    # 停止时不再等待写入方，发送者读不到就归为unknown
+                    now = time.time()
+                    due = [entry for entry in unresolved if self._stopping or entry[3] <= now]
+                    if due:
+                        break
+                    # 有消息头还没写完的消息时到期重试，否则等待新消息或发送者空闲
+                    self._queue_cond.wait(min(entry[3] for entry in unresolved) - now
+                                          if unresolved else None)
+                settle = 0.0 if self._stopping else SENDER_SETTLE_SECONDS
+
+            # 在锁外读取消息头，文件I/O不阻塞入队方和其它工作线程；
+            # 多个工作线程可能读取同一条消息，结果相同
+            for entry in due:
+                sender = self._read_sender(entry[0], settle)
+                entry[3] = time.time() + SENDER_SETTLE_SECONDS
+                entry[2] = sender
+
+    def _worker_loop(self):
+        """工作线程：循环处理批次直到停止"""
+        while True:
+            item = self._next_batch()
+            if item is None:
+                return
+            sender, batch = item
+            results = None
+            try:
+                results = self._process_batch(sender, [path for path, _ in batch])
+            finally:
+                with self._queue_cond:
+                    self._busy_senders.discard(sender)
+                    self._queue_cond.notify_all()
+            if results is None:
+                continue  # 失败的批次不计入处理延迟（与messages_processed一致）
+            done = time.time()
+            with self._stats_lock:
+                self.stats["total_latency"] += sum(done - enqueued for _, enqueued in batch)
+
+    def _process_batch(self, sender: str, msg_paths: List[str]):
+        """处理同一发送者的一批消息"""
         try:
-            # 如果有自定义处理器，使用它
+            # 如果有自定义处理器，逐条调用
             if self.message_handler:
-                result = self.message_handler(msg_path)
+                results = [self.message_handler(msg_path) for msg_path in msg_paths]
             else:
-                result = self._default_handler(msg_path)
+                results = [self._default_handler(msg_paths)]
             
-            self.stats["messages_processed"] += 1
+            with self._stats_lock:
+                self.stats["messages_processed"] += len(msg_paths)
+                self.stats["batches_processed"] += 1
             try:
-                print(f"✅ [{self.agent_name}] 消息处理完成")
+                print(f"✅ [{self.agent_name}] 消息处理完成（{sender}: {len(msg_paths)}条）")
             except:
                 pass  # 忽略打印错误
-            return result
+            return results
             
         except Exception as e:
             try:
@@ -107,30 +234,57 @@ class WatchdogWrapper(FileSystemEventHandler):
             except:
                 pass  # 忽略打印错误
             return None
+
+    def _process_message(self, msg_path: str):
+        """处理单个消息（兼容旧接口）"""
+        return self._process_batch(self._read_sender(msg_path), [msg_path])
+
+    def _acquire_agent(self) -> ReactAgentMinimal:
+        """从池中取一个预热的Agent，池空且未达上限时创建"""
+        try:
+            return self._agent_pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._agents_created < self.max_workers:
+                index = self._agents_created
+                self._agents_created += 1
+                return ReactAgentMinimal(
+                    work_dir=".",
+                    name=f"{self.agent_name}_worker_{index}",
+                    model=self.model,
+                    knowledge_files=self.knowledge_files,
+                    stateful=False  # 每条消息重置对话，只保留系统提示
+                )
+        return self._agent_pool.get()
+
+    def _release_agent(self, agent: ReactAgentMinimal):
+        """归还Agent到池中"""
+        self._agent_pool.put(agent)
     
-    def _default_handler(self, msg_path: str):
-        """默认消息处理器"""
+    def _default_handler(self, msg_paths):
+        """默认消息处理器 - 用池中的Agent处理同一发送者的一批消息"""
+        if isinstance(msg_paths, str):
+            msg_paths = [msg_paths]
         print(f"   唤醒 {self.agent_name} Agent...")
         
-        # 创建Agent实例
-        agent = ReactAgentMinimal(
-            work_dir=".",
-            model=self.model,
-            knowledge_files=self.knowledge_files,
-            minimal_mode=True
-        )
-        
-        # 统计API调用
-        self.stats["total_api_calls"] += 1
-        
-        # 构建任务
-        task = f"""
-        处理消息文件：{msg_path}
+        agent = self._acquire_agent()
+        try:
+            # 统计API调用
+            with self._stats_lock:
+                self.stats["total_api_calls"] += 1
+
+            files = "\n".join(f"        - {path}" for path in msg_paths)
+            
+            # 构建任务
+            task = f"""
+        处理消息文件（同一发送者的{len(msg_paths)}条消息，按顺序处理）：
+{files}
         
         步骤：
-        1. 用read_file读取消息内容
+        1. 用read_file读取每条消息内容
         2. 提取发送者（From字段）和内容
-        3. 根据内容生成回复
+        3. 根据内容生成回复（多条消息可以合并为一条回复）
         4. 用write_file将回复写入发送者的inbox
         5. 用execute_command删除已处理的消息
         
@@ -140,9 +294,10 @@ class WatchdogWrapper(FileSystemEventHandler):
         Time: [当前时间]
         Answer: [你的回复]
         """
-        
-        result = agent.execute(task=task)
-        return result
+            
+            return agent.execute(task=task)
+        finally:
+            self._release_agent(agent)
     
     def set_message_handler(self, handler: Callable):
         """设置自定义消息处理器"""
@@ -155,6 +310,15 @@ class WatchdogWrapper(FileSystemEventHandler):
             print(f"⚠️ [{self.agent_name}] 已在运行")
             return
         
+        # 启动工作线程池
+        self._stopping = False
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"{self.agent_name}-worker-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        
         self.observer.schedule(self, str(self.inbox_path), recursive=False)
         self.observer.start()
         self.is_running = True
@@ -163,15 +327,23 @@ class WatchdogWrapper(FileSystemEventHandler):
         print(f"🚀 [{self.agent_name}] 监听服务启动")
         print(f"   📂 监听目录: {self.inbox_path}")
         print(f"   🤖 模型: {self.model}")
+        print(f"   👷 工作线程: {self.max_workers}，队列上限: {self.max_queue_size}")
         print(f"   ✨ 等待消息中...")
     
     def stop(self):
-        """停止监听服务"""
+        """停止监听服务（处理完已入队的消息后退出）"""
         if not self.is_running:
             return
         
         self.observer.stop()
         self.observer.join()
+
+        with self._queue_cond:
+            self._stopping = True
+            self._queue_cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
         self.is_running = False
         
         print(f"🛑 [{self.agent_name}] 监听服务停止")
@@ -209,8 +381,15 @@ Content:
             print(f"\n📊 [{self.agent_name}] 统计信息:")
             print(f"   运行时间: {runtime}")
             print(f"   收到消息: {self.stats['messages_received']}")
-            print(f"   处理消息: {self.stats['messages_processed']}")
+            print(f"   处理消息: {self.stats['messages_processed']}（{self.stats['batches_processed']}批）")
             print(f"   API调用: {self.stats['total_api_calls']}")
+            print(f"   队列深度: {self._pending_count}（峰值 {self.stats['max_queue_depth']}）")
+            if self.stats["messages_processed"]:
+                avg_latency = self.stats["total_latency"] / self.stats["messages_processed"]
+                print(f"   平均处理延迟: {avg_latency:.2f}秒")
+            if runtime.total_seconds() > 0:
+                throughput = self.stats["messages_processed"] / runtime.total_seconds() * 60
+                print(f"   吞吐量: {throughput:.1f}条/分钟")
             
             # 计算节省
             if runtime.total_seconds() > 0:
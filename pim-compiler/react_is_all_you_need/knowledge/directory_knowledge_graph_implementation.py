@@ -2,17 +2,60 @@
 """
 目录知识图谱转换实现
 基于cnSchema将目录结构转换为知识图谱
+
+增量模式（incremental=True）维护变更日志{output_name}_journal.json，
+记录每个条目的(路径, mtime, 大小, 哈希)，只为新增、修改、删除的文件
+更新实体和包含关系，JSON-LD逐个实体流式写出。
 """
 
 import os
 import json
+import hashlib
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+JOURNAL_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+
+JSONLD_CONTEXT = {
+    "cns": "http://cnschema.org/",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "dir": "http://example.org/directory#",
+    "file": "http://example.org/file#"
+}
+
+# 模式定义
+SCHEMA_NODES = [
+    {
+        "@id": "dir:Directory",
+        "@type": "cns:DigitalDocument",
+        "rdfs:label": "目录",
+        "rdfs:comment": "文件系统中的目录"
+    },
+    {
+        "@id": "file:File",
+        "@type": "cns:DigitalDocument",
+        "rdfs:label": "文件",
+        "rdfs:comment": "文件系统中的文件"
+    },
+    {
+        "@id": "dir:contains",
+        "@type": "rdf:Property",
+        "rdfs:label": "包含",
+        "rdfs:comment": "目录包含文件或子目录",
+        "rdfs:domain": "dir:Directory",
+        "rdfs:range": ["file:File", "dir:Directory"]
+    }
+]
+
 
 def directory_to_knowledge_graph(directory_path, output_name="directory_knowledge_graph", 
                                 include_content=False, max_depth=3, 
-                                file_types=["md", "py", "json", "txt", "yaml", "yml"]):
+                                file_types=["md", "py", "json", "txt", "yaml", "yml"],
+                                incremental=False):
     """
     将目录结构转换为知识图谱
     
@@ -22,17 +65,17 @@ def directory_to_knowledge_graph(directory_path, output_name="directory_knowledg
     - include_content: 是否包含文件内容摘要
     - max_depth: 最大目录深度
     - file_types: 要处理的文件类型列表
+    - incremental: 增量模式，只处理上次运行后变化的文件
     
     返回:
     - 包含生成文件路径的字典
     """
+    if incremental:
+        return directory_to_knowledge_graph_incremental(
+            directory_path, output_name, include_content, max_depth, file_types)
     
     # 步骤1: 验证目录存在性
-    if not os.path.exists(directory_path):
-        raise ValueError(f"目录不存在: {directory_path}")
-    
-    if not os.path.isdir(directory_path):
-        raise ValueError(f"路径不是目录: {directory_path}")
+    check_directory(directory_path)
     
     # 获取目录基本信息
     dir_info = {
@@ -84,9 +127,18 @@ def directory_to_knowledge_graph(directory_path, output_name="directory_knowledg
     return output_files
 
 
-def create_directory_entity(dir_path, parent_path):
-    """创建目录实体"""
-    stat = os.stat(dir_path)
+def check_directory(directory_path):
+    """验证目录存在性"""
+    if not os.path.exists(directory_path):
+        raise ValueError(f"目录不存在: {directory_path}")
+    
+    if not os.path.isdir(directory_path):
+        raise ValueError(f"路径不是目录: {directory_path}")
+
+
+def create_directory_entity(dir_path, parent_path, stat=None):
+    """创建目录实体（stat可由调用方提供，避免重复系统调用）"""
+    stat = stat or os.stat(dir_path)
     dir_name = os.path.basename(dir_path)
     
     return {
@@ -105,9 +157,9 @@ def create_directory_entity(dir_path, parent_path):
     }
 
 
-def create_file_entity(file_path, parent_path, include_content):
+def create_file_entity(file_path, parent_path, include_content, stat=None):
     """创建文件实体"""
-    stat = os.stat(file_path)
+    stat = stat or os.stat(file_path)
     file_name = os.path.basename(file_path)
     file_ext = file_path.split('.')[-1].lower() if '.' in file_path else ''
     
@@ -146,78 +198,61 @@ def build_knowledge_graph(dir_info, dir_entities, file_entities):
     
     # 基础模板
     template = {
-        "@context": {
-            "cns": "http://cnschema.org/",
-            "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
-            "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
-            "xsd": "http://www.w3.org/2001/XMLSchema#",
-            "dir": "http://example.org/directory#",
-            "file": "http://example.org/file#"
-        },
-        "@graph": [
-            # 模式定义
-            {
-                "@id": "dir:Directory",
-                "@type": "cns:DigitalDocument",
-                "rdfs:label": "目录",
-                "rdfs:comment": "文件系统中的目录"
-            },
-            {
-                "@id": "file:File",
-                "@type": "cns:DigitalDocument",
-                "rdfs:label": "文件",
-                "rdfs:comment": "文件系统中的文件"
-            },
-            {
-                "@id": "dir:contains",
-                "@type": "rdf:Property",
-                "rdfs:label": "包含",
-                "rdfs:comment": "目录包含文件或子目录",
-                "rdfs:domain": "dir:Directory",
-                "rdfs:range": ["file:File", "dir:Directory"]
-            }
-        ]
+        "@context": dict(JSONLD_CONTEXT),
+        "@graph": [dict(node) for node in SCHEMA_NODES]
     }
     
     # 添加文件类型定义
+    template["@graph"].extend(file_type_nodes(file_entities))
+    
+    # 添加根目录
+    root_dir = create_root_node(dir_info['name'])
+    template["@graph"].append(root_dir)
+    
+    # 添加所有目录和文件
+    for entity in dir_entities + file_entities:
+        template["@graph"].append(entity)
+        
+        # 建立包含关系
+        parent_id = f"dir:{os.path.basename(entity['parent'])}"
+        if parent_id == f"dir:{dir_info['name']}":
+            root_dir["dir:contains"].append({"@id": entity["@id"]})
+    
+    return template
+
+
+def file_type_nodes(file_entities):
+    """文件类型定义节点"""
     file_types = set()
     for entity in file_entities:
         file_type = entity.get("file:hasType")
         if file_type:
             file_types.add(file_type)
     
+    nodes = []
     for file_type in file_types:
         type_name = file_type.replace("file:FileType_", "")
-        template["@graph"].append({
+        nodes.append({
             "@id": file_type,
             "@type": "rdfs:Class",
             "rdfs:label": f"{type_name}文件",
             "rdfs:comment": f"{type_name}格式的文件"
         })
-    
-    # 添加根目录
-    root_dir = {
-        "@id": f"dir:{dir_info['name']}",
+    return nodes
+
+
+def create_root_node(root_name):
+    """根目录节点（dir:contains由调用方填充）"""
+    return {
+        "@id": f"dir:{root_name}",
         "@type": "dir:Directory",
-        "rdfs:label": dir_info['name'],
+        "rdfs:label": root_name,
         "file:hasCreationTime": {
             "@value": datetime.datetime.now().isoformat(),
             "@type": "xsd:dateTime"
         },
         "dir:contains": []
     }
-    template["@graph"].append(root_dir)
-    
-    # 添加所有目录和文件
-    for entity in dir_entities + file_entities:
-        template["@graph"].append(entity)
-        
-        # 建立包含关系
-        parent_id = f"dir:{os.path.basename(entity['parent'])}"
-        if parent_id == f"dir:{dir_info['name']}":
-            root_dir["dir:contains"].append({"@id": entity["@id"]})
-    
-    return template
 
 
 def generate_output_files(knowledge_graph, output_name):
@@ -243,30 +278,38 @@ def generate_output_files(knowledge_graph, output_name):
     }
 
 
+def count_entities(nodes):
+    """统计图谱节点：总数、目录数、文件数、文件类型分布"""
+    counts = {"total": 0, "directories": 0, "files": 0, "file_types": {}}
+    for entity in nodes:
+        counts["total"] += 1
+        if entity.get("@type") == "dir:Directory":
+            counts["directories"] += 1
+        elif entity.get("@type") == "file:File":
+            counts["files"] += 1
+            file_type = entity.get("file:hasType", "unknown")
+            counts["file_types"][file_type] = counts["file_types"].get(file_type, 0) + 1
+    return counts
+
+
 def create_summary_file(knowledge_graph, summary_path):
     """创建可视化摘要"""
-    # 统计信息
-    dir_count = len([e for e in knowledge_graph["@graph"] if e.get("@type") == "dir:Directory"])
-    file_count = len([e for e in knowledge_graph["@graph"] if e.get("@type") == "file:File"])
-    
+    write_summary_file(count_entities(knowledge_graph["@graph"]), summary_path)
+
+
+def write_summary_file(counts, summary_path):
+    """根据统计结果写摘要"""
     summary_content = f"""# 目录知识图谱摘要
 
 ## 统计信息
-- 目录数量: {dir_count}
-- 文件数量: {file_count}
-- 总实体数量: {len(knowledge_graph['@graph'])}
+- 目录数量: {counts['directories']}
+- 文件数量: {counts['files']}
+- 总实体数量: {counts['total']}
 
 ## 文件类型分布
 """
     
-    # 文件类型统计
-    file_types = {}
-    for entity in knowledge_graph["@graph"]:
-        if entity.get("@type") == "file:File":
-            file_type = entity.get("file:hasType", "unknown")
-            file_types[file_type] = file_types.get(file_type, 0) + 1
-    
-    for file_type, count in file_types.items():
+    for file_type, count in counts["file_types"].items():
         type_name = file_type.replace("file:FileType_", "")
         summary_content += f"- {type_name}: {count}个文件\n"
     
@@ -278,19 +321,19 @@ def create_summary_file(knowledge_graph, summary_path):
 
 def create_stats_file(knowledge_graph, stats_path):
     """创建统计信息文件"""
+    write_stats_file(count_entities(knowledge_graph["@graph"]), stats_path)
+
+
+def write_stats_file(counts, stats_path, extra=None):
+    """根据统计结果写统计文件（extra为附加字段）"""
     stats = {
-        "total_entities": len(knowledge_graph["@graph"]),
-        "directories": len([e for e in knowledge_graph["@graph"] if e.get("@type") == "dir:Directory"]),
-        "files": len([e for e in knowledge_graph["@graph"] if e.get("@type") == "file:File"]),
-        "file_types": {},
+        "total_entities": counts["total"],
+        "directories": counts["directories"],
+        "files": counts["files"],
+        "file_types": counts["file_types"],
         "generated_at": datetime.datetime.now().isoformat()
     }
-    
-    # 文件类型统计
-    for entity in knowledge_graph["@graph"]:
-        if entity.get("@type") == "file:File":
-            file_type = entity.get("file:hasType", "unknown")
-            stats["file_types"][file_type] = stats["file_types"].get(file_type, 0) + 1
+    stats.update(extra or {})
     
     with open(stats_path, 'w', encoding='utf-8') as f:
         json.dump(stats, f, ensure_ascii=False, indent=2)
@@ -306,6 +349,195 @@ def validate_results(output_files):
             raise RuntimeError(f"输出文件为空: {file_path}")
 
 
+
+# ============= 增量模式 =============
+
+def directory_to_knowledge_graph_incremental(directory_path, output_name="directory_knowledge_graph",
+                                             include_content=False, max_depth=3,
+                                             file_types=["md", "py", "json", "txt", "yaml", "yml"],
+                                             workers=None):
+    """
+    增量转换目录知识图谱
+    
+    与上次运行的变更日志对比(mtime, 大小)，变化的文件用线程池计算内容哈希；
+    只为新增、修改的文件重新生成实体（哈希未变的只更新元数据、不重读内容），
+    删除的文件从日志移除，未变化的实体直接复用。
+    
+    返回:
+    - 包含生成文件路径的字典（额外包含journal）
+    """
+    check_directory(directory_path)
+    
+    journal_path = f"{output_name}_journal.json"
+    options = {
+        "root": os.path.abspath(directory_path),
+        "max_depth": max_depth,
+        "file_types": sorted(file_types),
+        "include_content": include_content
+    }
+    old_entries = load_journal(journal_path, options)
+    
+    # 步骤1: 扫描目录，按(mtime, 大小)找出候选变化
+    entries = {}
+    changed = []
+    for path, parent_path, is_dir, stat in scan_directory(directory_path, max_depth, file_types):
+        key = os.path.relpath(path, directory_path)
+        old = old_entries.get(key)
+        if old and old["is_dir"] == is_dir and old["mtime_ns"] == stat.st_mtime_ns \
+                and old["size"] == stat.st_size:
+            entries[key] = old
+        else:
+            changed.append((key, path, parent_path, is_dir, stat))
+    
+    # 步骤2: 并行计算变化文件的内容哈希
+    file_paths = [path for _, path, _, is_dir, _ in changed if not is_dir]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = dict(zip(file_paths, pool.map(hash_file, file_paths)))
+    
+    # 步骤3: 只为变化的条目生成实体
+    changes = {"added": 0, "modified": 0, "touched": 0, "removed": 0, "unchanged": len(entries)}
+    for key, path, parent_path, is_dir, stat in changed:
+        old = old_entries.get(key)
+        content_hash = None if is_dir else hashes.get(path)
+        same_content = bool(old) and not is_dir and old.get("hash") == content_hash
+        
+        if is_dir:
+            entity = create_directory_entity(path, parent_path, stat)
+        else:
+            # 内容未变时不重读文件，沿用上次的内容摘要
+            entity = create_file_entity(path, parent_path, include_content and not same_content, stat)
+            if same_content and "file:hasContent" in old["entity"]:
+                entity["file:hasContent"] = old["entity"]["file:hasContent"]
+        
+        changes["added" if not old else "touched" if same_content else "modified"] += 1
+        entries[key] = {
+            "is_dir": is_dir,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": content_hash,
+            "entity": entity
+        }
+    changes["removed"] = len(set(old_entries) - set(entries))
+    
+    output_files = {
+        "jsonld": f"{output_name}.jsonld",
+        "summary": f"{output_name}_summary.md",
+        "stats": f"{output_name}_stats.json",
+        "journal": journal_path
+    }
+    
+    # 步骤4: 有变化（或输出缺失）时流式重写输出
+    nothing_changed = changes["unchanged"] == len(entries) == len(old_entries)
+    if not (nothing_changed and all(os.path.exists(p) for p in output_files.values())):
+        root_name = os.path.basename(directory_path)
+        write_jsonld_stream(output_files["jsonld"], graph_nodes(root_name, entries))
+        
+        counts = count_entities(graph_nodes(root_name, entries))
+        write_summary_file(counts, output_files["summary"])
+        write_stats_file(counts, output_files["stats"], {"changes": changes})
+        
+        save_journal(journal_path, options, entries)
+    
+    validate_results(output_files)
+    
+    print(f"增量更新: 新增{changes['added']} 修改{changes['modified']} "
+          f"仅元数据{changes['touched']} 删除{changes['removed']} 未变{changes['unchanged']}")
+    return output_files
+
+
+def scan_directory(directory_path, max_depth, file_types):
+    """用os.scandir批量遍历目录（深度规则与analyze_directory相同）
+    
+    返回[(路径, 父目录, 是否目录, stat)]
+    """
+    results = []
+    stack = [(directory_path, 0)]
+    while stack:
+        current_path, current_depth = stack.pop()
+        try:
+            with os.scandir(current_path) as iterator:
+                batch = list(iterator)
+        except PermissionError:
+            print(f"警告: 无权限访问目录: {current_path}")
+            continue
+        
+        for entry in batch:
+            try:
+                if entry.is_dir():
+                    results.append((entry.path, current_path, True, entry.stat()))
+                    if current_depth + 1 <= max_depth:
+                        stack.append((entry.path, current_depth + 1))
+                elif entry.is_file():
+                    file_ext = entry.name.split('.')[-1].lower() if '.' in entry.name else ''
+                    if file_ext in file_types:
+                        results.append((entry.path, current_path, False, entry.stat()))
+            except OSError as e:
+                print(f"警告: 无法读取 {entry.path}: {e}")
+    return results
+
+
+def hash_file(file_path):
+    """文件内容的SHA-256，读取失败返回None"""
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def load_journal(journal_path, options):
+    """读取变更日志；版本或参数不一致时返回空（全量重建）"""
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if journal.get("version") != JOURNAL_VERSION or journal.get("options") != options:
+        return {}
+    return journal.get("entries", {})
+
+
+def save_journal(journal_path, options, entries):
+    """原子写入变更日志"""
+    temp_path = f"{journal_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": JOURNAL_VERSION, "options": options, "entries": entries},
+                  f, ensure_ascii=False)
+    os.replace(temp_path, journal_path)
+
+
+def graph_nodes(root_name, entries):
+    """按与build_knowledge_graph相同的顺序逐个产生图谱节点"""
+    dir_entities = [e["entity"] for e in entries.values() if e["is_dir"]]
+    file_entities = [e["entity"] for e in entries.values() if not e["is_dir"]]
+    
+    yield from SCHEMA_NODES
+    yield from file_type_nodes(file_entities)
+    
+    root_dir = create_root_node(root_name)
+    for entity in dir_entities + file_entities:
+        if os.path.basename(entity["parent"]) == root_name:
+            root_dir["dir:contains"].append({"@id": entity["@id"]})
+    yield root_dir
+    
+    yield from dir_entities
+    yield from file_entities
+
+
+def write_jsonld_stream(jsonld_path, nodes):
+    """逐个节点写出JSON-LD，不构建完整的图谱字典"""
+    with open(jsonld_path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "@context": ')
+        f.write(json.dumps(JSONLD_CONTEXT, ensure_ascii=False))
+        f.write(',\n  "@graph": [')
+        for i, node in enumerate(nodes):
+            f.write(',\n    ' if i else '\n    ')
+            f.write(json.dumps(node, ensure_ascii=False))
+        f.write('\n  ]\n}\n')
+
 if __name__ == "__main__":
     # 测试代码
     try:
@@ -6,12 +6,26 @@
 
 import os
 import ast
+import json
+import sqlite3
+import hashlib
 import rdflib
 from rdflib import Namespace, RDF, RDFS, Literal, URIRef
+import sys
 from pathlib import Path
-import hashlib
-import numpy as np
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# 语义向量来自core/embedding_index（本地嵌入后端 + 向量索引）
+try:
+    from ..core.embedding_index import SemanticIndex
+    from .triple_store import save_graph
+except ImportError:
+    # 直接运行脚本：通过项目根目录导入core包（不能把core目录本身加入sys.path，
+    # 否则core/tools会遮蔽顶层的tools包）
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from core.embedding_index import SemanticIndex
+    from triple_store import save_graph
 
 # 定义命名空间
 CORE = Namespace("http://ontology.core#")  # 静态核心本体
@@ -19,15 +33,211 @@ ONTO = Namespace("http://ontology.meta#")  # 元本体
 EXT = Namespace("http://ontology.ext#")    # 动态扩展
 KG = Namespace("http://example.org/knowledge#")  # 代码实体
 
+EXTRACTOR_VERSION = 3  # 三元组格式或URI规则变化时递增，旧缓存自动失效
+PARALLEL_MIN_FILES = 16  # 需要解析的文件少于此数量时不启动进程池
+
+
+def module_id_for(file_path, root):
+    """按包路径生成模块ID（core/tools/search_tool.py -> core.tools.search_tool）
+
+    只用文件名会让不同包下的同名模块（如多个utils.py）URI冲突。
+    """
+    try:
+        relative = Path(file_path).resolve().relative_to(Path(root).resolve())
+    except ValueError:
+        relative = Path(Path(file_path).name)
+    parts = list(relative.with_suffix("").parts)
+    if len(parts) > 1 and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def _truncate(doc):
+    return doc[:200] if len(doc) > 200 else doc
+
+
+class _CodeTripleVisitor(ast.NodeVisitor):
+    """单次遍历AST，提取模块、导入、类、方法、函数的三元组
+
+    三元组格式：(主语URI, 谓语URI, 宾语, 宾语是否为字面量)，便于跨进程传递和缓存。
+    结果只取决于模块ID和文件内容，文件路径（KG.hasPath）由调用方另外加入。
+    """
+
+    def __init__(self, module_id):
+        self.module_id = module_id
+        self.module_uri = str(KG[f"module_{module_id}"])
+        self.triples = [
+            (self.module_uri, str(RDF.type), str(EXT.Module), False),
+            (self.module_uri, str(KG.hasName), module_id, True),
+        ]
+        self._depth = 0  # 函数/类嵌套深度，0表示模块级
+
+    def add(self, s, p, o, is_literal=False):
+        self.triples.append((s, str(p), o, is_literal))
+
+    def add_doc(self, uri, doc_predicate, node):
+        doc = ast.get_docstring(node)
+        if doc:
+            self.add(uri, doc_predicate, doc, True)
+            self.add(uri, ONTO.nlDescription, _truncate(doc), True)
+
+    def visit_Module(self, node):
+        self.add_doc(self.module_uri, KG.hasModuleDocstring, node)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            import_uri = str(KG[f"import_{alias.name}"])
+            self.add(self.module_uri, EXT.Import, import_uri)
+            self.add(import_uri, KG.hasName, alias.name, True)
+
+    def visit_ImportFrom(self, node):
+        if node.module:
+            import_uri = str(KG[f"import_{node.module}"])
+            self.add(self.module_uri, EXT.Import, import_uri)
+            self.add(import_uri, KG.hasName, node.module, True)
+
+    def visit_ClassDef(self, node):
+        class_uri = str(KG[f"class_{self.module_id}.{node.name}"])
+        self.add(class_uri, RDF.type, str(EXT.Class))
+        self.add(class_uri, KG.hasName, node.name, True)
+        self.add(class_uri, CORE.partOf, self.module_uri)
+        self.add_doc(class_uri, KG.hasClassDocstring, node)
+
+        # 处理继承
+        for base in node.bases:
+            if isinstance(base, ast.Name):
+                self.add(class_uri, KG.inheritsFrom, str(KG[f"class_{base.id}"]))
+
+        # 处理方法
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef):
+                method_uri = str(KG[f"method_{self.module_id}.{node.name}.{item.name}"])
+                self.add(method_uri, RDF.type, str(EXT.Method))
+                self.add(method_uri, KG.hasName, item.name, True)
+                self.add(method_uri, CORE.partOf, class_uri)
+                self.add_doc(method_uri, KG.hasMethodDocstring, item)
+
+                # 参数信息
+                params = [arg.arg for arg in item.args.args]
+                if params:
+                    self.add(method_uri, KG.hasParameters, ", ".join(params), True)
+
+        self._depth += 1
+        self.generic_visit(node)  # 嵌套类和导入
+        self._depth -= 1
+
+    def visit_FunctionDef(self, node):
+        if self._depth == 0:
+            # 模块级函数
+            func_uri = str(KG[f"function_{self.module_id}.{node.name}"])
+            self.add(func_uri, RDF.type, str(EXT.Function))
+            self.add(func_uri, KG.hasName, node.name, True)
+            self.add(func_uri, CORE.partOf, self.module_uri)
+            self.add_doc(func_uri, KG.hasFunctionDocstring, node)
+        self._depth += 1
+        self.generic_visit(node)
+        self._depth -= 1
+
+    def visit_AsyncFunctionDef(self, node):
+        # 异步函数不算模块级函数，但其中的导入和类仍需提取
+        self._depth += 1
+        self.generic_visit(node)
+        self._depth -= 1
+
+
+def extract_file_triples(file_path, module_id, content=None):
+    """解析一个Python文件，返回三元组列表（不含KG.hasPath）；语法错误时返回None"""
+    if content is None:
+        content = Path(file_path).read_bytes()
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    visitor = _CodeTripleVisitor(module_id)
+    visitor.visit(tree)
+    return visitor.triples
+
+
+def _extract_job(job):
+    """进程池任务：(缓存键, 路径, 模块ID, 内容) -> 三元组"""
+    _, file_path, module_id, content = job
+    return extract_file_triples(file_path, module_id, content)
+
+
+def path_triple(module_id, file_path):
+    """模块的KG.hasPath三元组（不进入缓存：移动、复制目录或内容相同的文件路径不同）"""
+    return (str(KG[f"module_{module_id}"]), str(KG.hasPath), str(file_path), True)
+
+
+class CodeTripleCache:
+    """按文件内容哈希缓存三元组（~/.agent/.code_rdf_cache.sqlite）"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path) if db_path else Path.home() / ".agent" / ".code_rdf_cache.sqlite"
+
+    @staticmethod
+    def key(module_id, content):
+        digest = hashlib.sha256(content).hexdigest()
+        return f"v{EXTRACTOR_VERSION}:{module_id}:{digest}"
+
+    def _connect(self):
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS file_triples (key TEXT PRIMARY KEY, triples TEXT NOT NULL)")
+            return conn
+        except sqlite3.Error:
+            return None
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        conn = self._connect()
+        if conn is None:
+            return {}
+        found = {}
+        try:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, triples in conn.execute(
+                        f"SELECT key, triples FROM file_triples WHERE key IN ({placeholders})", chunk):
+                    found[key] = json.loads(triples)
+        finally:
+            conn.close()
+        return found
+
+    def put(self, entries):
+        if not entries:
+            return
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO file_triples VALUES (?, ?)",
+                                 [(key, json.dumps(triples, ensure_ascii=False))
+                                  for key, triples in entries.items()])
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+
 class CodeToRDFConverter:
     """将Python代码转换为RDF图谱"""
     
-    def __init__(self):
+    def __init__(self, cache_path=None):
         self.graph = rdflib.Graph()
+        self.cache = CodeTripleCache(cache_path)  # 按文件内容哈希缓存的三元组
         self.init_namespaces()
         self.init_static_core()
         self.extensions = {}
         self.agent_name = "CodeAnalysisAgent"
+        self.semantic_index = SemanticIndex()  # 扩展概念的语义向量索引
         
     def init_namespaces(self):
         """初始化命名空间"""
@@ -57,13 +267,12 @@ class CodeToRDFConverter:
         self.graph.add((CORE.transformsTo, RDFS.subPropertyOf, CORE.Relation))
     
     def generate_embedding(self, text):
-        """生成语义向量（模拟）"""
-        hash_obj = hashlib.sha256(text.encode())
-        hash_hex = hash_obj.hexdigest()
-        np.random.seed(int(hash_hex[:8], 16))
-        embedding = np.random.randn(768)
-        embedding = embedding / np.linalg.norm(embedding)
-        return embedding.tolist()
+        """生成语义向量（本地嵌入后端，按内容哈希缓存）"""
+        return self.semantic_index.embed(text).tolist()
+
+    def search_concepts(self, query, top_k=5):
+        """按语义相似度检索已扩展的概念，返回[(概念名, 相似度)]"""
+        return self.semantic_index.search(query, top_k)
     
     def extend_concept(self, concept_name, parent_class, nl_description, nl_context, nl_example, confidence=0.9):
         """动态扩展概念"""
@@ -86,6 +295,8 @@ class CodeToRDFConverter:
         embedding = self.generate_embedding(full_text)
         embedding_str = ",".join([f"{x:.4f}" for x in embedding[:10]])
         self.graph.add((concept_uri, ONTO.embedding, Literal(f"[{embedding_str}...]")))
+        if concept_name not in self.semantic_index:
+            self.semantic_index.add_texts([concept_name], [full_text])
         
         # 添加元数据
         self.graph.add((concept_uri, ONTO.createdBy, Literal(self.agent_name)))
@@ -146,110 +357,35 @@ class CodeToRDFConverter:
             0.91
         )
     
-    def process_python_file(self, file_path):
-        """处理单个Python文件"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        try:
-            tree = ast.parse(content)
-        except SyntaxError:
+    def process_python_file(self, file_path, root=None):
+        """处理单个Python文件（root用于计算包路径，默认为文件所在目录）"""
+        file_path = Path(file_path)
+        root = Path(root) if root else file_path.parent
+        module_id = module_id_for(file_path, root)
+        cache = self.cache
+
+        content = file_path.read_bytes()
+        key = cache.key(module_id, content)
+        triples = cache.get(key)
+        if triples is None:
+            triples = extract_file_triples(str(file_path), module_id, content)
+            if triples is not None:
+                cache.put({key: triples})
+        if triples is None:
             print(f"  ⚠️ 语法错误，跳过: {file_path}")
             return
-        
-        # 创建模块实体
-        module_name = file_path.stem
-        module_uri = KG[f"module_{module_name}"]
-        
-        self.graph.add((module_uri, RDF.type, EXT.Module))
-        self.graph.add((module_uri, KG.hasName, Literal(module_name)))
-        self.graph.add((module_uri, KG.hasPath, Literal(str(file_path))))
-        
-        # 提取模块docstring
-        module_doc = ast.get_docstring(tree)
-        if module_doc:
-            self.graph.add((module_uri, KG.hasModuleDocstring, Literal(module_doc)))
-            # 添加自然语言描述
-            self.graph.add((module_uri, ONTO.nlDescription, 
-                          Literal(module_doc[:200] if len(module_doc) > 200 else module_doc)))
-        
-        # 处理导入
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    import_name = alias.name
-                    import_uri = KG[f"import_{import_name}"]
-                    self.graph.add((module_uri, EXT.Import, import_uri))
-                    self.graph.add((import_uri, KG.hasName, Literal(import_name)))
-            
-            elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    import_uri = KG[f"import_{node.module}"]
-                    self.graph.add((module_uri, EXT.Import, import_uri))
-                    self.graph.add((import_uri, KG.hasName, Literal(node.module)))
-        
-        # 处理类
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                class_uri = KG[f"class_{module_name}_{node.name}"]
-                
-                self.graph.add((class_uri, RDF.type, EXT.Class))
-                self.graph.add((class_uri, KG.hasName, Literal(node.name)))
-                self.graph.add((class_uri, CORE.partOf, module_uri))
-                
-                # 提取类docstring
-                class_doc = ast.get_docstring(node)
-                if class_doc:
-                    self.graph.add((class_uri, KG.hasClassDocstring, Literal(class_doc)))
-                    self.graph.add((class_uri, ONTO.nlDescription,
-                                  Literal(class_doc[:200] if len(class_doc) > 200 else class_doc)))
-                
-                # 处理继承
-                for base in node.bases:
-                    if isinstance(base, ast.Name):
-                        base_uri = KG[f"class_{base.id}"]
-                        self.graph.add((class_uri, KG.inheritsFrom, base_uri))
-                
-                # 处理方法
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef):
-                        method_uri = KG[f"method_{module_name}_{node.name}_{item.name}"]
-                        
-                        self.graph.add((method_uri, RDF.type, EXT.Method))
-                        self.graph.add((method_uri, KG.hasName, Literal(item.name)))
-                        self.graph.add((method_uri, CORE.partOf, class_uri))
-                        
-                        # 提取方法docstring
-                        method_doc = ast.get_docstring(item)
-                        if method_doc:
-                            self.graph.add((method_uri, KG.hasMethodDocstring, Literal(method_doc)))
-                            self.graph.add((method_uri, ONTO.nlDescription,
-                                          Literal(method_doc[:200] if len(method_doc) > 200 else method_doc)))
-                        
-                        # 参数信息
-                        params = [arg.arg for arg in item.args.args]
-                        if params:
-                            self.graph.add((method_uri, KG.hasParameters, 
-                                          Literal(", ".join(params))))
-        
-        # 处理模块级函数
-        for node in tree.body:
-            if isinstance(node, ast.FunctionDef):
-                func_uri = KG[f"function_{module_name}_{node.name}"]
-                
-                self.graph.add((func_uri, RDF.type, EXT.Function))
-                self.graph.add((func_uri, KG.hasName, Literal(node.name)))
-                self.graph.add((func_uri, CORE.partOf, module_uri))
-                
-                # 提取函数docstring
-                func_doc = ast.get_docstring(node)
-                if func_doc:
-                    self.graph.add((func_uri, KG.hasFunctionDocstring, Literal(func_doc)))
-                    self.graph.add((func_uri, ONTO.nlDescription,
-                                  Literal(func_doc[:200] if len(func_doc) > 200 else func_doc)))
-    
-    def convert_directory(self, directory_path):
-        """转换整个目录的Python代码"""
+        self._add_triples(triples + [path_triple(module_id, file_path)])
+
+    def _add_triples(self, triples):
+        for s, p, o, is_literal in triples:
+            self.graph.add((URIRef(s), URIRef(p), Literal(o) if is_literal else URIRef(o)))
+
+    def convert_directory(self, directory_path, workers=None):
+        """转换整个目录的Python代码
+
+        只重新解析内容变化过的文件（按内容哈希缓存三元组），
+        需要解析的文件较多时使用进程池并行。
+        """
         directory = Path(directory_path)
         
         # 确保代码概念已定义
@@ -259,12 +395,46 @@ class CodeToRDFConverter:
         print("使用静态核心 + 动态扩展模式")
         
         # 收集所有Python文件
-        py_files = list(directory.rglob("*.py"))
-        
+        py_files = [f for f in directory.rglob("*.py") if '__pycache__' not in f.parts]
+
+        cache = self.cache
+        jobs = []  # (缓存键, 路径, 模块ID, 内容)
+        keys = []  # (缓存键, 路径, 模块ID)
         for py_file in py_files:
-            if '__pycache__' not in str(py_file):
-                print(f"  处理: {py_file.relative_to(directory)}")
-                self.process_python_file(py_file)
+            try:
+                content = py_file.read_bytes()
+            except OSError:
+                continue
+            module_id = module_id_for(py_file, directory)
+            key = cache.key(module_id, content)
+            keys.append((key, py_file, module_id))
+            jobs.append((key, str(py_file), module_id, content))
+
+        cached = cache.get_many([key for key, _, _ in keys])
+        missing = [job for job in jobs if job[0] not in cached]
+        print(f"  缓存命中: {len(cached)}，需要解析: {len(missing)}")
+
+        extracted = {}
+        if len(missing) >= PARALLEL_MIN_FILES and (workers is None or workers > 1):
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_extract_job, missing,
+                                   chunksize=max(1, len(missing) // ((workers or os.cpu_count() or 1) * 4)))
+                for (key, path, _, _), triples in zip(missing, results):
+                    extracted[key] = triples
+        else:
+            for job in missing:
+                extracted[job[0]] = _extract_job(job)
+        cache.put({key: triples for key, triples in extracted.items() if triples is not None})
+
+        # 按文件顺序合并到图谱
+        for key, py_file, module_id in keys:
+            triples = cached.get(key)
+            if triples is None:
+                triples = extracted.get(key)
+            if triples is None:
+                print(f"  ⚠️ 语法错误，跳过: {py_file.relative_to(directory)}")
+                continue
+            self._add_triples(triples + [path_triple(module_id, py_file)])
         
         print(f"\n转换完成:")
         print(f"  - 文件数: {len(py_files)}")
@@ -272,8 +442,8 @@ class CodeToRDFConverter:
         print(f"  - 扩展概念: {len(self.extensions)}")
     
     def save(self, output_file):
-        """保存RDF图谱"""
-        self.graph.serialize(destination=output_file, format="turtle")
+        """保存RDF图谱（.ttl同时写二进制快照；.sqlite/.db写入SQLite三元组存储）"""
+        save_graph(self.graph, output_file)
         print(f"\n✅ RDF图谱已保存: {output_file}")
     
     def generate_report(self):
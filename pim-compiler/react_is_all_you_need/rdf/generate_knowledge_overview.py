@@ -10,12 +10,13 @@ from collections import defaultdict, Counter
 import networkx as nx
 from datetime import datetime
 
+from triple_store import open_graph
+
 def generate_knowledge_overview(ttl_file, output_file):
     """生成知识图谱的高层次概览"""
     
-    # 加载RDF图谱
-    g = rdflib.Graph()
-    g.parse(ttl_file, format="turtle")
+    # 加载RDF图谱（有效的二进制快照或.sqlite存储可跳过Turtle解析）
+    g = open_graph(ttl_file)
     
     # 定义命名空间
     kg = Namespace("http://example.org/knowledge#")
@@ -8,11 +8,21 @@ import os
 import re
 import rdflib
 from rdflib import Namespace, RDF, RDFS, Literal, URIRef
+import sys
 from pathlib import Path
-import hashlib
-import numpy as np
 from datetime import datetime
 
+# 语义向量来自core/embedding_index（本地嵌入后端 + 向量索引）
+try:
+    from ..core.embedding_index import SemanticIndex
+    from .triple_store import save_graph
+except ImportError:
+    # 直接运行脚本：通过项目根目录导入core包（不能把core目录本身加入sys.path，
+    # 否则core/tools会遮蔽顶层的tools包）
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from core.embedding_index import SemanticIndex
+    from triple_store import save_graph
+
 # 定义命名空间
 CORE = Namespace("http://ontology.core#")  # 静态核心本体
 ONTO = Namespace("http://ontology.meta#")  # 元本体（描述本体的本体）
@@ -31,6 +41,7 @@ class DynamicOntologyExtender:
         self.extensions = {}
         self.confidence_threshold = 0.8
         self.agent_name = "KnowledgeAnalysisAgent"
+        self.semantic_index = SemanticIndex()  # 扩展概念的语义向量索引
         
         # 初始化静态核心本体
         self.init_static_core()
@@ -74,18 +85,16 @@ class DynamicOntologyExtender:
         self.graph.add((CORE.transformsTo, RDFS.subPropertyOf, CORE.Relation))
     
     def generate_embedding(self, text):
-        """生成语义向量（模拟）"""
-        # 实际应用中使用sentence-transformers
-        # 这里用哈希模拟768维向量
-        hash_obj = hashlib.sha256(text.encode())
-        hash_hex = hash_obj.hexdigest()
-        
-        # 将哈希转换为768维向量
-        np.random.seed(int(hash_hex[:8], 16))
-        embedding = np.random.randn(768)
-        embedding = embedding / np.linalg.norm(embedding)  # 归一化
-        
-        return embedding.tolist()
+        """生成语义向量（本地嵌入后端，按内容哈希缓存）
+
+        设置AGENT_EMBEDDING_BACKEND=sentence-transformers使用本地模型，
+        默认使用哈希词频向量。
+        """
+        return self.semantic_index.embed(text).tolist()
+
+    def search_concepts(self, query, top_k=5):
+        """按语义相似度检索已扩展的概念，返回[(概念名, 相似度)]"""
+        return self.semantic_index.search(query, top_k)
     
     def extend_concept(self, concept_name, parent_class, nl_description, nl_context, nl_example, confidence=0.9):
         """扩展新概念并添加自然语言说明"""
@@ -107,6 +116,8 @@ class DynamicOntologyExtender:
         embedding = self.generate_embedding(full_text)
         embedding_str = ",".join([f"{x:.4f}" for x in embedding[:10]])  # 只存储前10维作为示例
         self.graph.add((concept_uri, ONTO.embedding, Literal(f"[{embedding_str}...]")))
+        if concept_name not in self.semantic_index:
+            self.semantic_index.add_texts([concept_name], [full_text])
         
         # 添加元数据
         self.graph.add((concept_uri, ONTO.createdBy, Literal(self.agent_name)))
@@ -339,7 +350,7 @@ def main():
     
     # 保存RDF图谱
     output_file = "/tmp/knowledge_extended.ttl"
-    g.serialize(destination=output_file, format="turtle")
+    save_graph(g, output_file)  # 同时写二进制快照，验证脚本可直接加载
     print(f"\n✅ 扩展的知识图谱已生成: {output_file}")
     
     # 生成扩展报告
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+本体物化视图 - 验证脚本常用查询的预计算结果
+
+验证脚本原来每次都对整个图做多遍全量扫描（扩展概念、继承关系、命名空间统计、
+孤立概念……），继承树也是每次递归遍历。OntologyViews一次扫描把这些结果物化
+为按键索引的表：
+
+- classes:    rdfs:Class定义的类
+- parents / children: rdfs:subClassOf两个方向的邻接表（类层次）
+- instances:  类 -> rdf:type实例数（孤立概念 = 实例数为0的类）
+- domains:    属性 -> rdfs:domain
+- predicates: 谓词 -> 使用次数
+- namespaces: 命名空间 -> URI出现次数
+
+通过views.add()/views.remove()修改图时各表增量更新，派生结果（继承树、孤立概念、
+SPARQL结果）按版本号缓存。load_views()把物化表保存在Turtle文件旁的
+<文件名>.views（与二进制快照一样按源文件mtime+大小校验），文件未变时直接加载。
+
+所有表的键都是URI字符串（marshal可直接序列化）。
+"""
+
+import marshal
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import rdflib
+from rdflib import RDF, RDFS
+from rdflib.plugins.sparql import prepareQuery
+
+from triple_store import SQLITE_SUFFIXES
+
+__all__ = ['OntologyViews', 'load_views', 'PREPARED_QUERIES']
+
+VIEWS_MAGIC = "ontology-views"
+VIEWS_VERSION = 1
+
+_TYPE = str(RDF.type)
+_CLASS = str(RDFS.Class)
+_SUBCLASS = str(RDFS.subClassOf)
+_DOMAIN = str(RDFS.domain)
+
+# 常用查询只解析、编译一次（首次使用时）
+PREPARED_QUERIES = {
+    "class_hierarchy": """
+        SELECT ?child ?parent WHERE { ?child rdfs:subClassOf ?parent }
+    """,
+    "orphan_classes": """
+        SELECT ?cls WHERE {
+            ?cls rdf:type rdfs:Class .
+            FILTER NOT EXISTS { ?instance rdf:type ?cls }
+        }
+    """,
+    "property_domains": """
+        SELECT ?property ?domain WHERE { ?property rdfs:domain ?domain }
+    """,
+    "instances_of": """
+        SELECT ?instance WHERE { ?instance rdf:type ?cls }
+    """,
+}
+_compiled: Dict[str, object] = {}
+
+
+def _prepared(name: str):
+    query = _compiled.get(name)
+    if query is None:
+        query = _compiled[name] = prepareQuery(PREPARED_QUERIES[name], initNs={"rdf": RDF, "rdfs": RDFS})
+    return query
+
+
+def _namespace(uri: str) -> str:
+    return uri.split('#')[0] + '#'
+
+
+def local_name(uri: str) -> str:
+    return str(uri).split('#')[-1]
+
+
+class OntologyViews:
+    """图的物化视图，通过add()/remove()增量维护"""
+
+    def __init__(self, graph: rdflib.Graph, build: bool = True):
+        self.graph = graph
+        self.classes: Dict[str, None] = {}  # 用dict保持插入顺序
+        self.parents: Dict[str, List[str]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.instances: Counter = Counter()
+        self.domains: Dict[str, List[str]] = {}
+        self.predicates: Counter = Counter()
+        self.namespaces: Counter = Counter()
+        self.version = 0
+        self._derived: Dict[tuple, object] = {}  # (版本, 名称, 参数) -> 结果
+        if build:
+            for triple in graph:
+                self._apply(triple, 1)
+
+    # ----- 增量维护 -----
+
+    def _apply(self, triple, delta: int):
+        s, p, o = str(triple[0]), str(triple[1]), str(triple[2])
+        self._count(self.predicates, p, delta)
+        for term, text in zip(triple, (s, p, o)):
+            if isinstance(term, rdflib.URIRef):
+                self._count(self.namespaces, _namespace(text), delta)
+
+        if p == _TYPE:
+            self._count(self.instances, o, delta)
+            if o == _CLASS:
+                if delta > 0:
+                    self.classes[s] = None
+                else:
+                    self.classes.pop(s, None)
+        elif p == _SUBCLASS:
+            self._update_list(self.parents, s, o, delta)
+            self._update_list(self.children, o, s, delta)
+        elif p == _DOMAIN:
+            self._update_list(self.domains, s, o, delta)
+        self.version += 1
+
+    @staticmethod
+    def _count(table: Counter, key: str, delta: int):
+        table[key] += delta
+        if table[key] <= 0:
+            del table[key]
+
+    @staticmethod
+    def _update_list(table: Dict[str, List[str]], key: str, value: str, delta: int):
+        if delta > 0:
+            table.setdefault(key, []).append(value)
+        else:
+            values = table.get(key, [])
+            if value in values:
+                values.remove(value)
+            if not values:
+                table.pop(key, None)
+
+    def add(self, triple):
+        """向图中添加三元组并更新视图（已存在的三元组不重复计数）"""
+        if triple not in self.graph:
+            self.graph.add(triple)
+            self._apply(triple, 1)
+
+    def add_many(self, triples: Iterable):
+        for triple in triples:
+            self.add(triple)
+
+    def remove(self, pattern):
+        """从图中删除匹配的三元组并更新视图"""
+        for triple in list(self.graph.triples(pattern)):
+            self.graph.remove(triple)
+            self._apply(triple, -1)
+
+    # ----- 派生查询（按版本缓存） -----
+
+    def _cached(self, key: tuple, compute):
+        key = (self.version,) + key
+        if key not in self._derived:
+            if self._derived and next(iter(self._derived))[0] != self.version:
+                self._derived.clear()  # 图已变化，旧结果作废
+            self._derived[key] = compute()
+        return self._derived[key]
+
+    def classes_in(self, namespace) -> List[str]:
+        """某命名空间下定义的类"""
+        namespace = str(namespace)
+        return [c for c in self.classes if c.startswith(namespace)]
+
+    def orphan_classes(self, namespace="") -> List[str]:
+        """没有实例的类"""
+        return self._cached(("orphans", str(namespace)), lambda: [
+            c for c in self.classes_in(namespace) if not self.instances.get(c)
+        ])
+
+    def hierarchy_lines(self, root: str) -> List[str]:
+        """按局部名展开的继承树（格式与原print_tree一致），迭代遍历"""
+        return self._cached(("hierarchy", root), lambda: self._hierarchy_lines(root))
+
+    def _hierarchy_lines(self, root: str) -> List[str]:
+        children_by_name: Dict[str, List[str]] = {}
+        for parent, children in self.children.items():
+            children_by_name.setdefault(local_name(parent), []).extend(local_name(c) for c in children)
+
+        lines, visited = [], set()
+        stack: List[Tuple[str, str]] = [(root, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            lines.append(f"{prefix}{node}")
+            children = children_by_name.get(node, [])
+            for i in range(len(children) - 1, -1, -1):
+                marker = "└── " if i == len(children) - 1 else "├── "
+                stack.append((children[i], prefix + marker))
+        return lines
+
+    def query(self, name: str, **bindings) -> List[tuple]:
+        """执行预编译的常用SPARQL查询，结果按图版本缓存"""
+        initBindings = {k: v if isinstance(v, rdflib.term.Node) else rdflib.URIRef(v)
+                        for k, v in bindings.items()}
+        key = ("sparql", name, tuple(sorted((k, str(v)) for k, v in initBindings.items())))
+        return self._cached(key, lambda: [
+            tuple(row) for row in self.graph.query(_prepared(name), initBindings=initBindings)
+        ])
+
+    # ----- 持久化 -----
+
+    def dump(self) -> dict:
+        return {
+            "classes": list(self.classes),
+            "parents": self.parents,
+            "children": self.children,
+            "instances": dict(self.instances),
+            "domains": self.domains,
+            "predicates": dict(self.predicates),
+            "namespaces": dict(self.namespaces),
+        }
+
+    @classmethod
+    def restore(cls, graph: rdflib.Graph, tables: dict) -> "OntologyViews":
+        views = cls(graph, build=False)
+        views.classes = dict.fromkeys(tables["classes"])
+        views.parents = tables["parents"]
+        views.children = tables["children"]
+        views.instances = Counter(tables["instances"])
+        views.domains = tables["domains"]
+        views.predicates = Counter(tables["predicates"])
+        views.namespaces = Counter(tables["namespaces"])
+        return views
+
+
+def _views_path(ttl_path: Path) -> Path:
+    return ttl_path.with_name(ttl_path.name + ".views")
+
+
+def load_views(graph: rdflib.Graph, path) -> OntologyViews:
+    """加载path对应图的物化视图：Turtle文件未变时读<文件名>.views，否则重建并保存"""
+    path = Path(path)
+    if path.suffix in SQLITE_SUFFIXES or not path.exists():
+        return OntologyViews(graph)
+
+    stat = path.stat()
+    source = (stat.st_mtime_ns, stat.st_size)
+    views_file = _views_path(path)
+    try:
+        with open(views_file, "rb") as f:
+            data = marshal.load(f)
+        if isinstance(data, dict) and data.get("magic") == VIEWS_MAGIC \
+                and data.get("version") == VIEWS_VERSION and data.get("source") == source:
+            return OntologyViews.restore(graph, data["tables"])
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        pass
+
+    views = OntologyViews(graph)
+    try:
+        temp_file = Path(str(views_file) + ".tmp")
+        with open(temp_file, "wb") as f:
+            marshal.dump({"magic": VIEWS_MAGIC, "version": VIEWS_VERSION,
+                          "source": source, "tables": views.dump()}, f)
+        temp_file.replace(views_file)
+    except OSError:
+        pass  # 视图文件写入失败不影响使用
+    return views
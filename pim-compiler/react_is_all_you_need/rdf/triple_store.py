@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+RDF三元组持久化存储
+
+rdf脚本原来每次都把整个Turtle文件解析进内存Graph，保存时再整体序列化。
+这里提供两种可选的加速方式：
+
+1. SQLiteStore：rdflib Store插件，三元组存在SQLite中
+   - 术语表 + 整数三元组表，SPO主键 + POS/OSP索引
+   - bulk_load批量导入，upsert_subjects按主语增量替换
+   - rdflib.Graph(store=SQLiteStore(path))后可直接用SPARQL查询，无需解析Turtle
+2. 二进制快照：Turtle文件旁的<文件名>.snapshot（marshal格式）
+   - open_graph()发现快照与Turtle文件（mtime+大小）一致时直接加载快照
+   - save_graph()保存Turtle的同时写快照
+
+脚本统一使用open_graph(path)/save_graph(graph, path)：
+路径以.sqlite/.db结尾时使用SQLiteStore，否则使用Turtle+快照。
+"""
+
+import os
+import marshal
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import rdflib
+from rdflib import BNode, Literal, URIRef
+from rdflib.store import Store
+
+__all__ = [
+    'SQLiteStore',
+    'open_graph',
+    'load_graph',
+    'save_graph',
+    'bulk_load',
+    'upsert_subjects',
+    'save_snapshot',
+    'load_snapshot',
+]
+
+SNAPSHOT_MAGIC = "rdf-snapshot"
+SNAPSHOT_VERSION = 1
+SQLITE_SUFFIXES = {".sqlite", ".db"}
+
+
+# ============= 术语编码 =============
+
+def _encode(term) -> Tuple[str, str, str, str]:
+    """术语 -> (类型, 值, 数据类型, 语言)；空字符串表示无（SQLite的UNIQUE约束不比较NULL）"""
+    if isinstance(term, Literal):
+        return ("L", str(term), str(term.datatype or ""), term.language or "")
+    if isinstance(term, BNode):
+        return ("B", str(term), "", "")
+    return ("U", str(term), "", "")
+
+
+def _decode(kind: str, value: str, datatype: str, lang: str):
+    if kind == "U":
+        return URIRef(value)
+    if kind == "B":
+        return BNode(value)
+    return Literal(value, lang=lang or None, datatype=URIRef(datatype) if datatype else None)
+
+
+# ============= SQLite存储 =============
+
+class SQLiteStore(Store):
+    """SQLite后端的rdflib Store（单图，不区分上下文）"""
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration: Optional[str] = None, identifier=None):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._ids: Dict[Tuple[str, str, str, str], int] = {}  # 编码 -> 术语ID
+        self._terms: Dict[int, object] = {}  # 术语ID -> 术语
+        self.identifier = identifier
+        super().__init__(configuration)
+
+    def open(self, configuration, create: bool = True):
+        path = Path(configuration)
+        if not create and not path.exists():
+            return rdflib.store.NO_STORE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                datatype TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                UNIQUE (kind, value, datatype, lang)
+            );
+            CREATE TABLE IF NOT EXISTS triples (
+                s INTEGER NOT NULL,
+                p INTEGER NOT NULL,
+                o INTEGER NOT NULL,
+                PRIMARY KEY (s, p, o)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_pos ON triples (p, o, s);
+            CREATE INDEX IF NOT EXISTS idx_osp ON triples (o, s, p);
+            CREATE TABLE IF NOT EXISTS namespaces (
+                prefix TEXT PRIMARY KEY,
+                uri TEXT NOT NULL
+            );
+        """)
+        self._conn = conn
+        return rdflib.store.VALID_STORE
+
+    def close(self, commit_pending_transaction: bool = False):
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+
+    # ----- 术语ID -----
+
+    def _lookup_id(self, term) -> Optional[int]:
+        """已存在术语的ID，不存在返回None（查询时使用，不插入）"""
+        key = _encode(term)
+        term_id = self._ids.get(key)
+        if term_id is None:
+            row = self._conn.execute(
+                "SELECT id FROM terms WHERE kind = ? AND value = ? AND datatype = ? AND lang = ?", key
+            ).fetchone()
+            if row:
+                term_id = row[0]
+                self._ids[key] = term_id
+                self._terms[term_id] = term
+        return term_id
+
+    def _term_id(self, term) -> int:
+        term_id = self._lookup_id(term)
+        if term_id is None:
+            key = _encode(term)
+            term_id = self._conn.execute(
+                "INSERT INTO terms (kind, value, datatype, lang) VALUES (?, ?, ?, ?)", key
+            ).lastrowid
+            self._ids[key] = term_id
+            self._terms[term_id] = term
+        return term_id
+
+    def _term(self, term_id: int):
+        term = self._terms.get(term_id)
+        if term is None:
+            row = self._conn.execute(
+                "SELECT kind, value, datatype, lang FROM terms WHERE id = ?", (term_id,)
+            ).fetchone()
+            term = _decode(*row)
+            self._terms[term_id] = term
+        return term
+
+    # ----- Store接口 -----
+
+    def add(self, triple, context=None, quoted: bool = False):
+        s, p, o = triple
+        self._conn.execute("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)",
+                           (self._term_id(s), self._term_id(p), self._term_id(o)))
+        Store.add(self, triple, context, quoted)
+
+    def addN(self, quads: Iterable):
+        rows = [(self._term_id(s), self._term_id(p), self._term_id(o)) for s, p, o, _ in quads]
+        self._conn.executemany("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)", rows)
+
+    def _where(self, pattern) -> Optional[Tuple[str, list]]:
+        """三元组模式 -> WHERE子句；模式中有库里不存在的术语时返回None（无匹配）"""
+        clauses, params = [], []
+        for column, term in zip("spo", pattern):
+            if term is None:
+                continue
+            term_id = self._lookup_id(term)
+            if term_id is None:
+                return None
+            clauses.append(f"{column} = ?")
+            params.append(term_id)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def remove(self, triple_pattern, context=None):
+        where = self._where(triple_pattern)
+        if where is not None:
+            self._conn.execute(f"DELETE FROM triples{where[0]}", where[1])
+        Store.remove(self, triple_pattern, context)
+
+    def triples(self, triple_pattern, context=None) -> Iterator:
+        where = self._where(triple_pattern)
+        if where is None:
+            return
+        # 先取完结果再解码，调用者在迭代中修改存储也安全
+        rows = self._conn.execute(f"SELECT s, p, o FROM triples{where[0]}", where[1]).fetchall()
+        for s, p, o in rows:
+            yield (self._term(s), self._term(p), self._term(o)), iter(())
+
+    def __len__(self, context=None) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix: str, namespace, override: bool = True):
+        if not override:
+            row = self._conn.execute("SELECT 1 FROM namespaces WHERE prefix = ?", (prefix,)).fetchone()
+            if row:
+                return
+        self._conn.execute("INSERT OR REPLACE INTO namespaces VALUES (?, ?)", (prefix, str(namespace)))
+
+    def namespace(self, prefix: str) -> Optional[URIRef]:
+        row = self._conn.execute("SELECT uri FROM namespaces WHERE prefix = ?", (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace) -> Optional[str]:
+        row = self._conn.execute("SELECT prefix FROM namespaces WHERE uri = ?", (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self._conn.execute("SELECT prefix, uri FROM namespaces").fetchall():
+            yield prefix, URIRef(uri)
+
+
+def _sqlite_graph(path: Path) -> rdflib.Graph:
+    store = SQLiteStore()
+    store.open(str(path), create=True)
+    return rdflib.Graph(store=store)
+
+
+def bulk_load(store_graph: rdflib.Graph, source: rdflib.Graph, replace: bool = False):
+    """把source的所有三元组和命名空间批量写入SQLite图"""
+    store = store_graph.store
+    if replace:
+        store._conn.execute("DELETE FROM triples")
+    for prefix, namespace in source.namespaces():
+        store.bind(prefix, namespace)
+    store.addN((s, p, o, store_graph) for s, p, o in source)
+    store.commit()
+
+
+def upsert_subjects(store_graph: rdflib.Graph, triples: Iterable[Tuple]):
+    """增量更新：删除这些三元组涉及的主语的所有旧三元组，再写入新三元组
+
+    适合按实体（如一个模块、一个知识文件）重新生成的场景。
+    """
+    triples = list(triples)
+    store = store_graph.store
+    for subject in {s for s, _, _ in triples}:
+        store.remove((subject, None, None))
+    store.addN((s, p, o, store_graph) for s, p, o in triples)
+    store.commit()
+
+
+# ============= 二进制快照 =============
+
+def _snapshot_path(ttl_path: Path) -> Path:
+    return ttl_path.with_name(ttl_path.name + ".snapshot")
+
+
+def save_snapshot(graph: rdflib.Graph, path: Path, source_stat: Optional[os.stat_result] = None):
+    """写二进制快照：术语表 + 整数三元组 + 命名空间"""
+    ids: Dict[object, int] = {}
+    terms = []
+    flat = []
+    for triple in graph:
+        for term in triple:
+            term_id = ids.get(term)
+            if term_id is None:
+                term_id = ids[term] = len(terms)
+                terms.append(_encode(term))
+            flat.append(term_id)
+    data = {
+        "magic": SNAPSHOT_MAGIC,
+        "version": SNAPSHOT_VERSION,
+        "source": (source_stat.st_mtime_ns, source_stat.st_size) if source_stat else None,
+        "terms": terms,
+        "triples": flat,
+        "namespaces": [(prefix, str(uri)) for prefix, uri in graph.namespaces()],
+    }
+    temp_path = Path(str(path) + ".tmp")
+    with open(temp_path, "wb") as f:
+        marshal.dump(data, f)
+    temp_path.replace(path)  # 原子替换
+
+
+def load_snapshot(path: Path, source_stat: Optional[os.stat_result] = None) -> Optional[rdflib.Graph]:
+    """加载快照；格式不符或与源文件不一致时返回None"""
+    try:
+        with open(path, "rb") as f:
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("magic") != SNAPSHOT_MAGIC \
+            or data.get("version") != SNAPSHOT_VERSION:
+        return None
+    if source_stat is not None and data.get("source") != (source_stat.st_mtime_ns, source_stat.st_size):
+        return None
+
+    terms = [_decode(*encoded) for encoded in data["terms"]]
+    flat = data["triples"]
+    graph = rdflib.Graph()
+    for prefix, uri in data["namespaces"]:
+        graph.bind(prefix, uri, override=True)
+    add = graph.store.add
+    for i in range(0, len(flat), 3):
+        add((terms[flat[i]], terms[flat[i + 1]], terms[flat[i + 2]]), graph)
+    return graph
+
+
+# ============= 脚本入口 =============
+
+def load_graph(path, use_snapshot: bool = True) -> Tuple[rdflib.Graph, str]:
+    """打开图谱并返回数据来源："sqlite"、"snapshot"或"turtle"
+
+    只有来源为"turtle"时本次才真正解析了Turtle语法；use_snapshot=False强制解析。
+    """
+    path = Path(path)
+    if path.suffix in SQLITE_SUFFIXES:
+        return _sqlite_graph(path), "sqlite"
+
+    stat = path.stat()
+    snapshot = _snapshot_path(path)
+    if use_snapshot and snapshot.exists():
+        graph = load_snapshot(snapshot, stat)
+        if graph is not None:
+            return graph, "snapshot"
+
+    graph = rdflib.Graph()
+    graph.parse(str(path), format="turtle")
+    try:
+        save_snapshot(graph, snapshot, stat)
+    except OSError:
+        pass  # 快照写入失败不影响使用
+    return graph, "turtle"
+
+
+def open_graph(path) -> rdflib.Graph:
+    """打开图谱：.sqlite/.db用SQLiteStore；Turtle文件优先加载有效的快照"""
+    return load_graph(path)[0]
+
+
+def save_graph(graph: rdflib.Graph, path):
+    """保存图谱：.sqlite/.db整体替换写入SQLite；否则写Turtle并生成快照"""
+    path = Path(path)
+    if path.suffix in SQLITE_SUFFIXES:
+        if isinstance(graph.store, SQLiteStore):
+            graph.store.commit()
+            return
+        bulk_load(_sqlite_graph(path), graph, replace=True)
+        return
+
+    graph.serialize(destination=str(path), format="turtle")
+    try:
+        save_snapshot(graph, _snapshot_path(path), path.stat())
+    except OSError:
+        pass
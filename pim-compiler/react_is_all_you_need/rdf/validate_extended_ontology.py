@@ -8,12 +8,16 @@ import rdflib
 from rdflib import Namespace, RDF, RDFS
 from collections import defaultdict
 
+from triple_store import open_graph
+from ontology_views import load_views
+
 def validate_extended_ontology(ttl_file):
     """验证扩展本体"""
     
-    # 加载RDF图
-    g = rdflib.Graph()
-    g.parse(ttl_file, format="turtle")
+    # 加载RDF图（有效的二进制快照或.sqlite存储可跳过Turtle解析）
+    g = open_graph(ttl_file)
+    # 常用查询结果的物化视图（文件未变时直接加载）
+    views = load_views(g, ttl_file)
     
     # 定义命名空间
     CORE = Namespace("http://ontology.core#")
@@ -51,48 +55,46 @@ def validate_extended_ontology(ttl_file):
     print("-" * 40)
     
     extensions = []
-    for s, p, o in g:
-        if str(s).startswith(str(EXT)):
-            if p == RDF.type and o == RDFS.Class:
-                concept_name = str(s).split('#')[-1]
-                extensions.append(concept_name)
-                
-                # 检查必需的自然语言说明
-                has_nl_desc = (s, ONTO.nlDescription, None) in g
-                has_nl_context = (s, ONTO.nlContext, None) in g
-                has_nl_example = (s, ONTO.nlExample, None) in g
-                has_embedding = (s, ONTO.embedding, None) in g
-                has_confidence = (s, ONTO.confidence, None) in g
-                
-                print(f"\n扩展概念: ext:{concept_name}")
-                
-                # 获取父类
-                parent = g.value(s, RDFS.subClassOf)
-                if parent:
-                    parent_name = str(parent).split('#')[-1]
-                    print(f"  父类: core:{parent_name}")
-                
-                # 获取描述
-                nl_desc = g.value(s, ONTO.nlDescription)
-                if nl_desc:
-                    print(f"  描述: {nl_desc[:60]}...")
-                
-                # 获取置信度
-                confidence = g.value(s, ONTO.confidence)
-                if confidence:
-                    conf_val = float(confidence)
-                    status = "✅ 自动接受" if conf_val >= 0.8 else "⚠️ 需要审核"
-                    print(f"  置信度: {conf_val} ({status})")
-                
-                # 验证完整性
-                completeness = []
-                if has_nl_desc: completeness.append("描述")
-                if has_nl_context: completeness.append("语境")
-                if has_nl_example: completeness.append("示例")
-                if has_embedding: completeness.append("向量")
-                if has_confidence: completeness.append("置信度")
-                
-                print(f"  完整性: [{', '.join(completeness)}]")
+    for s in map(rdflib.URIRef, views.classes_in(EXT)):
+        concept_name = str(s).split('#')[-1]
+        extensions.append(concept_name)
+        
+        # 检查必需的自然语言说明
+        has_nl_desc = (s, ONTO.nlDescription, None) in g
+        has_nl_context = (s, ONTO.nlContext, None) in g
+        has_nl_example = (s, ONTO.nlExample, None) in g
+        has_embedding = (s, ONTO.embedding, None) in g
+        has_confidence = (s, ONTO.confidence, None) in g
+        
+        print(f"\n扩展概念: ext:{concept_name}")
+        
+        # 获取父类
+        parent = g.value(s, RDFS.subClassOf)
+        if parent:
+            parent_name = str(parent).split('#')[-1]
+            print(f"  父类: core:{parent_name}")
+        
+        # 获取描述
+        nl_desc = g.value(s, ONTO.nlDescription)
+        if nl_desc:
+            print(f"  描述: {nl_desc[:60]}...")
+        
+        # 获取置信度
+        confidence = g.value(s, ONTO.confidence)
+        if confidence:
+            conf_val = float(confidence)
+            status = "✅ 自动接受" if conf_val >= 0.8 else "⚠️ 需要审核"
+            print(f"  置信度: {conf_val} ({status})")
+        
+        # 验证完整性
+        completeness = []
+        if has_nl_desc: completeness.append("描述")
+        if has_nl_context: completeness.append("语境")
+        if has_nl_example: completeness.append("示例")
+        if has_embedding: completeness.append("向量")
+        if has_confidence: completeness.append("置信度")
+        
+        print(f"  完整性: [{', '.join(completeness)}]")
     
     print(f"\n动态扩展总数: {len(extensions)}")
     
@@ -100,31 +102,10 @@ def validate_extended_ontology(ttl_file):
     print("\n3. 继承关系验证")
     print("-" * 40)
     
-    inheritance = defaultdict(list)
-    for s, p, o in g:
-        if p == RDFS.subClassOf:
-            child = str(s).split('#')[-1]
-            parent = str(o).split('#')[-1]
-            inheritance[parent].append(child)
-    
-    # 显示继承树
-    def print_tree(node, prefix="", visited=None):
-        if visited is None:
-            visited = set()
-        if node in visited:
-            return
-        visited.add(node)
-        
-        print(f"{prefix}{node}")
-        children = inheritance.get(node, [])
-        for i, child in enumerate(children):
-            is_last = i == len(children) - 1
-            child_prefix = prefix + ("└── " if is_last else "├── ")
-            next_prefix = prefix + ("    " if is_last else "│   ")
-            print_tree(child, child_prefix, visited)
-    
+    # 显示继承树（物化的subClassOf邻接表，迭代展开）
     print("\n继承树:")
-    print_tree("Thing", "")
+    for line in views.hierarchy_lines("Thing"):
+        print(line)
     
     # 4. 统计分析
     print("\n4. 统计分析")
@@ -132,13 +113,10 @@ def validate_extended_ontology(ttl_file):
     
     # 统计各命名空间的使用
     ns_stats = defaultdict(int)
-    for s, p, o in g:
-        for term in [s, p, o]:
-            if isinstance(term, rdflib.URIRef):
-                ns = str(term).split('#')[0] + '#'
-                if 'ontology' in ns:
-                    ns_name = ns.split('/')[-1].replace('#', '')
-                    ns_stats[ns_name] += 1
+    for ns, count in views.namespaces.items():
+        if 'ontology' in ns:
+            ns_name = ns.split('/')[-1].replace('#', '')
+            ns_stats[ns_name] += count
     
     print("\n命名空间使用:")
     for ns, count in sorted(ns_stats.items(), key=lambda x: x[1], reverse=True):
@@ -158,15 +136,9 @@ def validate_extended_ontology(ttl_file):
             issues.append(f"扩展 {ext} 没有父类")
     
     # 检查是否有孤立概念
-    for s in g.subjects(RDF.type, RDFS.Class):
-        if str(s).startswith(str(EXT)):
-            has_instances = False
-            for _, _, o in g.triples((None, RDF.type, s)):
-                has_instances = True
-                break
-            if not has_instances:
-                name = str(s).split('#')[-1]
-                warnings.append(f"扩展概念 {name} 没有实例")
+    for s in views.orphan_classes(EXT):
+        name = str(s).split('#')[-1]
+        warnings.append(f"扩展概念 {name} 没有实例")
     
     if issues:
         print("\n❌ 发现问题:")
@@ -12,15 +12,19 @@ from rdflib import Namespace, RDF, RDFS
 from collections import defaultdict
 import sys
 
+from triple_store import open_graph
+from ontology_views import load_views
+
 def validate_knowledge_rdf(ttl_file):
     """验证知识图谱的RDF结构"""
     
-    # 创建图并加载文件
-    g = rdflib.Graph()
+    # 加载图（有效的二进制快照或.sqlite存储可跳过Turtle解析）
     try:
-        g.parse(ttl_file, format="turtle")
+        g = open_graph(ttl_file)
         print(f"✅ 成功加载RDF文件：{ttl_file}")
         print(f"   包含 {len(g)} 个三元组\n")
+        # 常用查询结果的物化视图（文件未变时直接加载）
+        views = load_views(g, ttl_file)
     except Exception as e:
         print(f"❌ 加载RDF文件失败：{e}")
         return False
@@ -197,9 +201,9 @@ def validate_knowledge_rdf(ttl_file):
     
     # 统计各种关系
     relations = defaultdict(int)
-    for s, p, o in g:
-        if not str(p).startswith("http://www.w3.org"):
-            relations[str(p).split('#')[-1]] += 1
+    for p, count in views.predicates.items():
+        if not p.startswith("http://www.w3.org"):
+            relations[p.split('#')[-1]] += count
     
     print("\n关系使用统计：")
     for rel, count in sorted(relations.items(), key=lambda x: x[1], reverse=True):
@@ -211,7 +215,7 @@ def validate_knowledge_rdf(ttl_file):
     print("=" * 60)
     
     # 检查类定义
-    classes = list(g.subjects(RDF.type, RDFS.Class))
+    classes = list(views.classes)
     print(f"\n✅ 定义的类: {len(classes)} 个")
     
     class_by_ns = defaultdict(list)
@@ -225,9 +229,9 @@ def validate_knowledge_rdf(ttl_file):
         print(f"\n   {prefix}: ({len(names)} 个)")
         for name in sorted(names):
             # 检查子类关系
-            full_uri = rdflib.URIRef(ns + name)
-            parent = g.value(full_uri, RDFS.subClassOf)
-            if parent:
+            parents = views.parents.get(ns + name)
+            if parents:
+                parent = parents[0]
                 parent_name = str(parent).split('#')[-1]
                 print(f"     - {name} → {parent_name}")
             else:
@@ -0,0 +1,132 @@
+"""测试目录知识图谱增量模式：按变更日志更新的输出与全量重建一致"""
+
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "knowledge"))
+
+from directory_knowledge_graph_implementation import directory_to_knowledge_graph
+
+
+def write(path, text):
+    """写入文件并推进mtime，保证同一秒内的修改也能被发现"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    touch(path)
+
+
+def touch(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def normalized_nodes(jsonld_path):
+    """与顺序无关的节点集合；根目录的创建时间是生成时间，不参与比较"""
+    with open(jsonld_path, encoding="utf-8") as f:
+        graph = json.load(f)
+    nodes = []
+    for node in graph["@graph"]:
+        node = dict(node)
+        if "dir:contains" in node:
+            node.pop("file:hasCreationTime", None)
+            node["dir:contains"] = sorted(item["@id"] for item in node["dir:contains"])
+        nodes.append(json.dumps(node, ensure_ascii=False, sort_keys=True))
+    return sorted(nodes)
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "project"
+    write(root / "README.md", "# 项目\n")
+    write(root / "main.py", "print('hello')\n")
+    write(root / "notes.bin", "不处理的类型")
+    write(root / "src" / "app.py", "def app():\n    pass\n")
+    write(root / "src" / "config.yaml", "debug: true\n")
+    write(root / "docs" / "guide.md", "# 指南\n")
+    write(root / "docs" / "api" / "index.md", "# API\n")
+    write(root / "a" / "b" / "c" / "d" / "deep.txt", "超过最大深度\n")
+    return root
+
+
+class TestIncrementalBuild:
+    """测试directory_to_knowledge_graph(incremental=True)"""
+
+    @pytest.fixture(params=[False, True], ids=["metadata", "content"])
+    def build(self, request, tmp_path):
+        """返回(增量构建, 全量构建)，输出放在不同目录"""
+        (tmp_path / "incremental").mkdir()
+        (tmp_path / "full").mkdir()
+
+        def run(root, incremental):
+            output_name = str(tmp_path / ("incremental" if incremental else "full") / "kg")
+            return directory_to_knowledge_graph(str(root), output_name, include_content=request.param,
+                                                max_depth=2, incremental=incremental)
+        return run
+
+    def assert_matches_rebuild(self, build, root):
+        incremental = build(root, incremental=True)
+        full = build(root, incremental=False)
+        assert normalized_nodes(incremental["jsonld"]) == normalized_nodes(full["jsonld"])
+
+        with open(incremental["stats"], encoding="utf-8") as f:
+            incremental_stats = json.load(f)
+        with open(full["stats"], encoding="utf-8") as f:
+            full_stats = json.load(f)
+        for key in ("total_entities", "directories", "files", "file_types"):
+            assert incremental_stats[key] == full_stats[key], key
+        return incremental_stats.get("changes")
+
+    def test_first_run_matches_full_build(self, build, project):
+        changes = self.assert_matches_rebuild(build, project)
+        assert changes["added"] > 0 and changes["unchanged"] == 0
+
+    def test_edits_match_full_build(self, build, project):
+        """新增、修改、仅改mtime、删除文件和目录之后，输出与全量重建相同"""
+        self.assert_matches_rebuild(build, project)
+
+        write(project / "src" / "util.py", "def util():\n    return 1\n")
+        write(project / "main.py", "print('hello, world')\n")
+        write(project / "docs" / "guide.md", "# 手册\n")  # 大小不变，内容变化
+        touch(project / "README.md")
+        (project / "src" / "config.yaml").unlink()
+        shutil.rmtree(project / "docs" / "api")
+        touch(project / "docs")
+
+        changes = self.assert_matches_rebuild(build, project)
+        assert changes["added"] == 1
+        assert changes["removed"] == 3
+        assert changes["touched"] == 1
+
+    def test_unchanged_run_keeps_outputs(self, build, project):
+        """没有变化时不重写输出"""
+        first = build(project, incremental=True)
+        mtime = os.stat(first["jsonld"]).st_mtime_ns
+
+        with open(first["journal"], encoding="utf-8") as f:
+            journal = json.load(f)
+        assert "a/b/c" in {key.replace(os.sep, "/") for key in journal["entries"]}
+        assert not any("deep.txt" in key for key in journal["entries"])
+
+        second = build(project, incremental=True)
+        assert os.stat(second["jsonld"]).st_mtime_ns == mtime
+
+    def test_missing_output_is_rewritten(self, build, project):
+        first = build(project, incremental=True)
+        os.remove(first["jsonld"])
+        self.assert_matches_rebuild(build, project)
+
+    def test_changed_options_rebuild(self, tmp_path, project):
+        """参数不同的变更日志无效，全量重新生成"""
+        output_name = str(tmp_path / "kg")
+        directory_to_knowledge_graph(str(project), output_name, max_depth=2, incremental=True)
+        result = directory_to_knowledge_graph(str(project), output_name, max_depth=1,
+                                              file_types=["md"], incremental=True)
+        with open(result["stats"], encoding="utf-8") as f:
+            stats = json.load(f)
+        assert stats["changes"]["unchanged"] == 0
+        assert stats["file_types"] == {"file:FileType_MD": 2}
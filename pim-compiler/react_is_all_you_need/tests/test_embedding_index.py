@@ -0,0 +1,60 @@
+"""测试嵌入缓存：进程内LRU有界，淘汰的向量从SQLite读取"""
+
+import numpy as np
+import pytest
+
+from core.embedding_index import EmbeddingCache, HashingEmbeddingBackend
+
+
+class CountingBackend(HashingEmbeddingBackend):
+    """记录实际计算过的文本"""
+
+    def __init__(self):
+        super().__init__(dim=32)
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.extend(texts)
+        return super().embed(texts)
+
+
+@pytest.fixture
+def backend():
+    return CountingBackend()
+
+
+@pytest.fixture
+def cache(backend, tmp_path):
+    return EmbeddingCache(backend, tmp_path / "embeddings.sqlite", max_memory_entries=3)
+
+
+class TestEmbeddingCache:
+    """测试EmbeddingCache"""
+
+    def test_memory_is_bounded(self, cache):
+        cache.embed([f"文本 {i}" for i in range(10)])
+        assert len(cache._memory) == 3
+        assert list(cache._memory) == [cache._key(f"文本 {i}") for i in (7, 8, 9)]
+
+    def test_hit_refreshes_recency(self, cache):
+        cache.embed(["a", "b", "c"])
+        cache.embed(["a"])
+        cache.embed(["d"])
+        assert cache._key("a") in cache._memory
+        assert cache._key("b") not in cache._memory
+
+    def test_evicted_vectors_come_from_sqlite(self, cache, backend):
+        texts = [f"text {i}" for i in range(6)]
+        first = cache.embed(texts)
+        backend.calls.clear()
+
+        again = cache.embed(texts)
+        assert backend.calls == []
+        np.testing.assert_allclose(again, first, atol=1e-3)  # SQLite中以float16存储
+
+    def test_cached_rows_do_not_pin_result(self, cache):
+        result = cache.embed(["x", "y"])
+        for vector in cache._memory.values():
+            assert vector.base is None
+        result[:] = 0
+        assert np.any(cache.embed(["x"]) != 0)
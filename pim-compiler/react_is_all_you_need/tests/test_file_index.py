@@ -0,0 +1,142 @@
+"""测试大文件范围读取：字符/行偏移索引与整文件读取的结果一致"""
+
+import os
+import random
+
+import pytest
+
+from core import file_index
+from core.file_index import FileRangeIndex, get_index, read_char_range, read_line_range, read_tail
+
+
+@pytest.fixture(autouse=True)
+def small_steps(monkeypatch, tmp_path):
+    """用很小的检查点间隔和块大小，让小文件也跨越多个检查点和块边界"""
+    monkeypatch.setattr(file_index, "CHAR_STEP", 100)
+    monkeypatch.setattr(file_index, "LINE_STEP", 8)
+    monkeypatch.setattr(file_index, "BLOCK_SIZE", 256)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))  # 持久化的索引放在临时目录
+    monkeypatch.setattr(file_index, "_INDEX_CACHE", {})
+
+
+def mixed_bytes(count: int, seed: int = 1) -> bytes:
+    """ASCII、多字节字符、非法UTF-8字节和截断的多字节序列混合的内容"""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(count):
+        r = rng.random()
+        if r < 0.03:
+            parts.append(b"\xff")
+        elif r < 0.05:
+            parts.append(b"\xe2\x82")  # 截断的三字节字符
+        elif r < 0.3:
+            parts.append("é中😀".encode("utf-8"))
+        elif r < 0.9:
+            parts.append(b"a")
+        else:
+            parts.append(b"\n")
+    return b"".join(parts)
+
+
+def reference(data: bytes) -> str:
+    return file_index._printable(data.decode("utf-8", errors="surrogateescape"))
+
+
+@pytest.fixture
+def mixed_file(tmp_path):
+    path = tmp_path / "mixed.log"
+    path.write_bytes(mixed_bytes(3000))
+    return path
+
+
+class TestCharRange:
+    """测试read_char_range"""
+
+    def test_matches_full_decode(self, mixed_file):
+        """任意偏移的读取结果与整文件解码相同（非法字节算一个字符）"""
+        expected = reference(mixed_file.read_bytes())
+        assert get_index(mixed_file).total_chars == len(expected)
+        for offset in list(range(0, len(expected), 37)) + [99, 100, 101, len(expected) - 1]:
+            assert read_char_range(mixed_file, offset, 50) == expected[offset:offset + 50], offset
+
+    def test_negative_offset_and_unlimited(self, mixed_file):
+        expected = reference(mixed_file.read_bytes())
+        assert read_char_range(mixed_file, -30, 10) == expected[-30:-20]
+        assert read_char_range(mixed_file, 250, 0) == expected[250:]
+        assert read_char_range(mixed_file, -10 * len(expected), 5) == expected[:5]
+
+    def test_offset_past_end(self, mixed_file):
+        total = get_index(mixed_file).total_chars
+        assert "超过文件长度" in read_char_range(mixed_file, total, 10)
+
+    def test_mmap_reader(self, mixed_file, monkeypatch):
+        """超大文件用mmap读取，结果相同"""
+        monkeypatch.setattr(file_index, "MMAP_MIN_SIZE", 0)
+        expected = reference(mixed_file.read_bytes())
+        assert read_char_range(mixed_file, 345, 80) == expected[345:425]
+
+
+class TestLineRange:
+    """测试read_line_range和read_tail"""
+
+    @pytest.fixture
+    def log_file(self, tmp_path):
+        path = tmp_path / "app.log"
+        path.write_text("".join(f"第{i}行 line {i}\n" for i in range(100)) + "最后一行没有换行", encoding="utf-8")
+        return path
+
+    def test_matches_splitlines(self, log_file):
+        lines = log_file.read_text(encoding="utf-8").splitlines(keepends=True)
+        assert get_index(log_file).total_lines == len(lines) == 101
+        for offset in range(0, 101, 7):
+            assert read_line_range(log_file, offset, 5) == "".join(lines[offset:offset + 5]), offset
+        assert read_line_range(log_file, -3, 0) == "".join(lines[-3:])
+        assert "超过文件长度" in read_line_range(log_file, 101, 1)
+
+    def test_tail(self, log_file, monkeypatch):
+        """从末尾按块读取，块边界不影响结果"""
+        monkeypatch.setattr(file_index, "BLOCK_SIZE", 16)
+        lines = log_file.read_text(encoding="utf-8").splitlines(keepends=True)
+        assert read_tail(log_file, 3) == "".join(lines[-3:])
+        assert read_tail(log_file, 1000) == "".join(lines)
+
+        log_file.write_text("a\nb\nc\n", encoding="utf-8")
+        assert read_tail(log_file, 2) == "b\nc\n"
+
+
+class TestIndexCache:
+    """测试索引的缓存、持久化和失效"""
+
+    def test_rebuilt_after_change(self, mixed_file):
+        """文件修改后（mtime或大小变化）索引重建"""
+        first = get_index(mixed_file)
+        data = mixed_bytes(500, seed=2)
+        mixed_file.write_bytes(data)
+        stat = mixed_file.stat()
+        os.utime(mixed_file, ns=(stat.st_atime_ns, first.mtime_ns + 1_000_000_000))
+
+        assert get_index(mixed_file) is not first
+        assert read_char_range(mixed_file, 0, 0) == reference(data)
+
+    def test_sidecar_reused_across_processes(self, mixed_file, monkeypatch):
+        """新进程（内存缓存为空）直接使用持久化的索引，不重新扫描"""
+        get_index(mixed_file)
+        monkeypatch.setattr(file_index, "_INDEX_CACHE", {})
+
+        def no_build(path):
+            raise AssertionError("index should come from the sidecar")
+
+        monkeypatch.setattr(FileRangeIndex, "build", classmethod(lambda cls, path: no_build(path)))
+        expected = reference(mixed_file.read_bytes())
+        assert read_char_range(mixed_file, 120, 30) == expected[120:150]
+
+    def test_sidecar_with_other_steps_is_ignored(self, mixed_file, monkeypatch):
+        """检查点间隔不同的持久化索引无效"""
+        get_index(mixed_file)
+        monkeypatch.setattr(file_index, "_INDEX_CACHE", {})
+        monkeypatch.setattr(file_index, "CHAR_STEP", 64)
+
+        index = get_index(mixed_file)
+        assert len(index.char_offsets) == (index.total_chars - 1) // 64 + 1
+        expected = reference(mixed_file.read_bytes())
+        assert read_char_range(mixed_file, 130, 20) == expected[130:150]
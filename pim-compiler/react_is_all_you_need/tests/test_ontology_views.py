@@ -0,0 +1,160 @@
+"""测试本体物化视图：add()/remove()增量更新与重建一致，派生结果随图变化失效"""
+
+import os
+import sys
+import random
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "rdf"))
+
+from rdflib import RDF, RDFS, Graph, Literal, Namespace
+
+from ontology_views import OntologyViews, load_views
+
+EX = Namespace("http://example.org/onto#")
+OTHER = Namespace("http://example.org/other#")
+
+
+def normalized(views: OntologyViews) -> dict:
+    """与顺序无关的表内容"""
+    tables = views.dump()
+    tables["classes"] = sorted(tables["classes"])
+    for name in ("parents", "children", "domains"):
+        tables[name] = {key: sorted(values) for key, values in tables[name].items()}
+    return tables
+
+
+TRIPLES = [(EX[cls], RDF.type, RDFS.Class) for cls in ("Thing", "Agent", "Tool", "Document", "Unused")] + [
+    (EX.Agent, RDFS.subClassOf, EX.Thing),
+    (EX.Tool, RDFS.subClassOf, EX.Thing),
+    (EX.Document, RDFS.subClassOf, EX.Thing),
+    (EX.name, RDFS.domain, EX.Thing),
+    (EX.alice, RDF.type, EX.Agent),
+    (EX.alice, EX.name, Literal("Alice")),
+    (EX.hammer, RDF.type, EX.Tool),
+    (OTHER.x, RDF.type, EX.Document),
+]
+
+
+def make_graph() -> Graph:
+    graph = Graph()
+    for triple in TRIPLES:
+        graph.add(triple)
+    return graph
+
+
+@pytest.fixture
+def views():
+    """从空图开始逐个add()，表中的顺序与添加顺序一致"""
+    views = OntologyViews(Graph())
+    views.add_many(TRIPLES)
+    return views
+
+
+class TestIncrementalUpdates:
+    """测试add()/remove()"""
+
+    def test_add_updates_tables(self, views):
+        views.add((EX.Robot, RDF.type, RDFS.Class))
+        views.add((EX.Robot, RDFS.subClassOf, EX.Agent))
+        views.add((EX.r2, RDF.type, EX.Robot))
+
+        assert "http://example.org/onto#Robot" in views.classes
+        assert views.parents[str(EX.Robot)] == [str(EX.Agent)]
+        assert str(EX.Robot) in views.children[str(EX.Agent)]
+        assert views.instances[str(EX.Robot)] == 1
+
+    def test_duplicate_add_is_not_counted(self, views):
+        before = normalized(views)
+        views.add((EX.alice, RDF.type, EX.Agent))
+        assert normalized(views) == before
+
+    def test_remove_pattern(self, views):
+        """按模式删除，删空的键从表中移除"""
+        views.remove((EX.alice, None, None))
+        assert str(EX.Agent) not in views.instances
+        views.remove((None, RDFS.subClassOf, EX.Thing))
+        assert views.children == {} and views.parents == {}
+        views.remove((EX.Unused, RDF.type, RDFS.Class))
+        assert str(EX.Unused) not in views.classes
+
+    def test_matches_full_build(self, views):
+        assert normalized(views) == normalized(OntologyViews(make_graph()))
+
+    def test_random_edits_match_rebuild(self, views):
+        """任意顺序的增删之后，各表与从图重建的结果相同"""
+        rng = random.Random(7)
+        nodes = [EX[f"n{i}"] for i in range(8)] + [EX.Thing, OTHER.y]
+        predicates = [RDF.type, RDFS.subClassOf, RDFS.domain, EX.name]
+        for _ in range(300):
+            triple = (rng.choice(nodes), rng.choice(predicates),
+                      rng.choice(nodes + [RDFS.Class, Literal("v")]))
+            if rng.random() < 0.6:
+                views.add(triple)
+            else:
+                views.remove((triple[0], triple[1], None))
+        assert normalized(views) == normalized(OntologyViews(views.graph))
+
+
+class TestDerivedResults:
+    """测试派生结果的缓存失效"""
+
+    def test_orphans_follow_edits(self, views):
+        assert views.orphan_classes(EX) == [str(EX.Thing), str(EX.Unused)]
+        assert views.orphan_classes(EX) is views.orphan_classes(EX)  # 图未变时使用缓存
+
+        views.add((EX.thing1, RDF.type, EX.Unused))
+        assert views.orphan_classes(EX) == [str(EX.Thing)]
+        views.remove((EX.alice, RDF.type, EX.Agent))
+        assert views.orphan_classes(EX) == [str(EX.Thing), str(EX.Agent)]
+
+    def test_hierarchy_follows_edits(self, views):
+        assert views.hierarchy_lines("Thing") == ["Thing", "├── Agent", "├── Tool", "└── Document"]
+
+        views.add((EX.Robot, RDFS.subClassOf, EX.Agent))
+        views.remove((EX.Tool, RDFS.subClassOf, None))
+        assert views.hierarchy_lines("Thing") == ["Thing", "├── Agent", "├── └── Robot", "└── Document"]
+
+    def test_sparql_results_follow_edits(self, views):
+        instances = views.query("instances_of", cls=EX.Agent)
+        assert [str(row[0]) for row in instances] == [str(EX.alice)]
+
+        views.add((EX.bob, RDF.type, EX.Agent))
+        instances = views.query("instances_of", cls=EX.Agent)
+        assert sorted(str(row[0]) for row in instances) == [str(EX.alice), str(EX.bob)]
+
+        views.remove((None, RDF.type, EX.Agent))
+        assert views.query("instances_of", cls=EX.Agent) == []
+
+
+class TestLoadViews:
+    """测试物化表的持久化"""
+
+    @pytest.fixture
+    def ttl_path(self, tmp_path):
+        path = tmp_path / "onto.ttl"
+        make_graph().serialize(destination=str(path), format="turtle")
+        return path
+
+    def test_restored_views_match(self, ttl_path):
+        graph = Graph().parse(str(ttl_path), format="turtle")
+        built = load_views(graph, ttl_path)
+        assert (ttl_path.parent / "onto.ttl.views").exists()
+
+        restored = load_views(graph, ttl_path)
+        assert restored is not built
+        assert normalized(restored) == normalized(built) == normalized(OntologyViews(graph))
+
+    def test_rebuilt_when_source_changes(self, ttl_path):
+        graph = Graph().parse(str(ttl_path), format="turtle")
+        load_views(graph, ttl_path)
+
+        graph.add((EX.Robot, RDF.type, RDFS.Class))
+        graph.serialize(destination=str(ttl_path), format="turtle")
+        stat = ttl_path.stat()
+        os.utime(ttl_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        views = load_views(Graph().parse(str(ttl_path), format="turtle"), ttl_path)
+        assert str(EX.Robot) in views.classes
@@ -0,0 +1,136 @@
+"""测试Session全文索引：增量同步和正则查询的字面量预筛选"""
+
+import os
+import re
+import time
+
+import pytest
+
+from core.session_index import SessionIndex, required_literal
+
+# (模式, 会被检索的文本)
+PATTERNS = [
+    (r"foo|barbaz", ["foo", "xx BARBAZ", "bar"]),
+    (r"prefix(abc|xyz)suffix", ["PREFIXxyzSUFFIX", "prefixsuffix"]),
+    (r"module(_name)?error", ["moduleerror", "Module_NameError"]),
+    (r"colou?r", ["color", "COLOUR", "colr"]),
+    (r"timeouts*error", ["timeouterror", "timeoutsssError"]),
+    (r"x{2,3}yz", ["xxyz", "xyz"]),
+    (r"err\.or\(\)", ["ERR.OR()", "errxor()"]),
+    (r"version [0-9]+\.[0-9]+", ["Version 3.11", "version x"]),
+    (r"[\]x]abc", ["]abc", "xabc", "x]abc"]),
+    (r"[^]x]yz", ["ayz", "]yz"]),
+    (r"[]a]bcd", ["]bcd", "abcd"]),
+    (r"[^]abcd]x", ["zx"]),
+    (r"[\]abcd]x", ["ax", "]x"]),
+    (r"(?x) time out", ["timeout"]),
+    (r"(?i)KeyError: '\w+'", ["keyerror: 'name'"]),
+    (r"^Traceback.*line \d+$", ["Traceback in line 3"]),
+    (r"数据库(连接)?失败", ["数据库失败", "数据库连接失败"]),
+]
+
+
+def write(path, text):
+    """写入文件并推进mtime，保证同一秒内的修改也能被发现"""
+    path.write_text(text, encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestRequiredLiteral:
+    """测试required_literal：预筛选只能跳过不可能匹配的session"""
+
+    @pytest.mark.parametrize("pattern, texts", PATTERNS)
+    def test_never_drops_a_match(self, pattern, texts):
+        literal = required_literal(pattern)
+        for text in texts:
+            if re.search(pattern, text, re.IGNORECASE):
+                assert literal is None or literal.lower() in text.lower(), (pattern, text, literal)
+
+    def test_extracted_literals(self):
+        assert required_literal(r"foo|bar") is None
+        assert required_literal(r"module(_name)?error") == "module"
+        assert required_literal(r"colou?r") == "colo"
+        assert required_literal(r"err\.or\(\)") == "err.or()"
+        assert required_literal(r"[abc]+timeout") == "timeout"
+        assert required_literal(r"(?x) time out") is None
+
+
+class TestSessionIndex:
+    """测试增量同步和检索"""
+
+    @pytest.fixture
+    def sessions(self, tmp_path):
+        sessions_dir = tmp_path / ".sessions"
+        sessions_dir.mkdir()
+        write(sessions_dir / "2024-01-01_a.md", "# 任务A\n修复数据库连接失败\nKeyError: 'user_id'\n")
+        write(sessions_dir / "2024-01-02_b.md", "# 任务B\n实现缓存层 timeout error\n")
+        write(sessions_dir / "2024-01-03_c.md", "# 任务C\n编写文档\n")
+        index = SessionIndex(sessions_dir)
+        yield sessions_dir, index
+        index.close()
+
+    @staticmethod
+    def names(results):
+        return sorted(result["name"] for result in results)
+
+    def test_sync_is_incremental(self, sessions):
+        """只重新索引新增或修改的session，删除的session从索引移除"""
+        sessions_dir, index = sessions
+        assert index.sync() == (3, 0)
+        assert index.sync() == (0, 0)
+
+        write(sessions_dir / "2024-01-03_c.md", "# 任务C\n编写部署文档\n")
+        write(sessions_dir / "2024-01-04_d.md", "# 任务D\n部署上线\n")
+        (sessions_dir / "2024-01-01_a.md").unlink()
+        assert index.sync() == (2, 1)
+
+        assert self.names(index.search("部署")) == ["2024-01-03_c.md", "2024-01-04_d.md"]
+        assert index.search("数据库连接") == []
+
+    def test_index_persists(self, sessions):
+        """重新打开索引时未变化的session不再读取"""
+        sessions_dir, index = sessions
+        index.sync()
+        index.close()
+
+        reopened = SessionIndex(sessions_dir)
+        assert reopened.sync() == (0, 0)
+        assert self.names(reopened.search("缓存层")) == ["2024-01-02_b.md"]
+        reopened.close()
+
+    def test_add_session(self, sessions):
+        """add_session立即入索引，之后的sync不会重复读取"""
+        sessions_dir, index = sessions
+        index.sync()
+        write(sessions_dir / "2024-01-05_e.md", "# 任务E\n重构消息队列\n")
+        index.add_session(sessions_dir / "2024-01-05_e.md")
+
+        assert self.names(index.search("消息队列")) == ["2024-01-05_e.md"]
+        assert index.sync() == (0, 0)
+
+    def test_short_query_uses_substring_match(self, sessions):
+        """少于三个字的查询无法使用trigram索引，在已存储的正文中做子串匹配"""
+        _, index = sessions
+        index.sync()
+        assert self.names(index.search("文档")) == ["2024-01-03_c.md"]
+
+    @pytest.mark.parametrize("pattern", [
+        r"KeyError: '\w+'", r"数据库(连接)?失败", r"timeouts* error", r"任务[AB]", r"缓存|文档",
+    ])
+    def test_regex_search_matches_full_scan(self, sessions, pattern):
+        """用字面量预筛选的正则检索与逐个文件匹配的结果相同"""
+        sessions_dir, index = sessions
+        index.sync()
+        expected = sorted(path.name for path in sessions_dir.glob("*.md")
+                          if re.search(pattern, path.read_text(encoding="utf-8"), re.IGNORECASE))
+        assert expected
+        assert self.names(index.regex_search(pattern, limit=10)) == expected
+
+    def test_time_filter(self, sessions):
+        sessions_dir, index = sessions
+        index.sync()
+        newest = max(path.stat().st_mtime for path in sessions_dir.glob("*.md"))
+        since = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(newest + 3600))
+        assert index.recent(since=since) == []
+        assert len(index.recent()) == 3
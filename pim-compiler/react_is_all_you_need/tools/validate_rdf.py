@@ -8,21 +8,33 @@ import sys
 from rdflib import Graph, Namespace, URIRef, Literal, RDF, RDFS
 from rdflib.plugins.sparql import prepareQuery
 import json
+from pathlib import Path
 
-def validate_rdf_graph(turtle_file: str):
-    """验证RDF图谱"""
+sys.path.insert(0, str(Path(__file__).parent.parent / "rdf"))
+from triple_store import load_graph
+
+def validate_rdf_graph(turtle_file: str, check_syntax: bool = False):
+    """验证RDF图谱
+
+    check_syntax=False时允许从有效的二进制快照或.sqlite存储加载，此时本次没有解析Turtle，
+    语法报告为"not checked"；check_syntax=True时总是重新解析Turtle。
+    """
     print(f"🔍 验证RDF图谱: {turtle_file}")
     print("=" * 60)
     
-    # 创建图谱并加载Turtle文件
-    g = Graph()
-    
+    # 加载图谱（有效的二进制快照或.sqlite存储可跳过Turtle解析）
     try:
-        g.parse(turtle_file, format='turtle')
-        print(f"✅ Turtle文件语法正确")
+        g, source = load_graph(turtle_file, use_snapshot=not check_syntax)
     except Exception as e:
         print(f"❌ Turtle文件解析失败: {e}")
         return False
+    if source == "turtle":
+        syntax = "valid"
+        print(f"✅ Turtle文件语法正确")
+    else:
+        syntax = "not checked"
+        print(f"⏭️ 未检查Turtle语法（从{'二进制快照' if source == 'snapshot' else 'SQLite存储'}加载，"
+              f"使用 --check-syntax 强制解析）")
     
     # 定义命名空间
     CODE = Namespace("http://example.org/code#")
@@ -230,6 +242,7 @@ def validate_rdf_graph(turtle_file: str):
     report = {
         "file": turtle_file,
         "valid": True,
+        "syntax": syntax,
         "statistics": {
             "total_triples": len(g),
             "modules": get_count(g, "Module"),
@@ -278,11 +291,15 @@ def get_relation_count(graph, relation):
     return 0
 
 def main():
-    if len(sys.argv) != 2:
-        print("用法: python validate_rdf.py <turtle文件.ttl>")
+    args = sys.argv[1:]
+    check_syntax = "--check-syntax" in args
+    if check_syntax:
+        args.remove("--check-syntax")
+    if len(args) != 1:
+        print("用法: python validate_rdf.py [--check-syntax] <turtle文件.ttl>")
         sys.exit(1)
     
-    turtle_file = sys.argv[1]
+    turtle_file = args[0]
     
     # 检查rdflib是否安装
     try:
@@ -292,7 +309,7 @@ def main():
         print("请运行: pip install rdflib")
         sys.exit(1)
     
-    validate_rdf_graph(turtle_file)
+    validate_rdf_graph(turtle_file, check_syntax=check_syntax)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -10,6 +10,7 @@ import json
 
 from compiler.core.compiler_config import CompilerConfig
 from compiler.transformers.deepseek_compiler import DeepSeekCompiler
+from compiler.core.batch_runner import run_batch, BatchEvent
 
 
 def setup_logging(verbose: bool = False, debug: bool = False):
@@ -67,6 +68,7 @@ def create_parser() -> argparse.ArgumentParser:
     compile_parser.add_argument('--no-lint', action='store_true', help='跳过lint检查')
     compile_parser.add_argument('--no-tests', action='store_true', help='不生成单元测试')
     compile_parser.add_argument('--no-run-tests', action='store_true', help='不运行生成的测试')
+    compile_parser.add_argument('-j', '--jobs', type=int, help='并发编译的文件数（默认: 4，1 表示串行）')
     
     # generate 命令
     generate_parser = subparsers.add_parser('generate', help='从PIM生成代码')
@@ -92,29 +94,38 @@ def create_parser() -> argparse.ArgumentParser:
 
 
 def compile_files(files: List[Path], config: CompilerConfig) -> int:
-    """编译文件"""
+    """编译文件（多个文件时并发编译）"""
     compiler = DeepSeekCompiler(config)
     
+    failed_files = [str(f) for f in files if not f.exists()]
+    for file_path in failed_files:
+        logging.error(f"文件不存在: {file_path}")
+    existing = [f for f in files if f.exists()]
+    
     success_count = 0
-    failed_files = []
     
-    for file_path in files:
-        if not file_path.exists():
-            logging.error(f"文件不存在: {file_path}")
-            failed_files.append(str(file_path))
-            continue
-        
-        print(f"编译: {file_path}")
-        result = compiler.compile(file_path)
-        
-        if result.success:
-            print(f"  ✓ 成功 -> {result.psm_file}")
-            success_count += 1
-        else:
-            print(f"  ✗ 失败")
-            for error in result.errors:
-                print(f"    - {error}")
-            failed_files.append(str(file_path))
+    def report(event: BatchEvent):
+        nonlocal success_count
+        if event.status == "started":
+            print(f"编译: {event.pim_file} ({event.index}/{event.total})")
+        elif event.status == "finished":
+            result = event.result
+            if result.success:
+                print(f"  ✓ {event.pim_file} -> {result.psm_file} ({event.elapsed:.1f}s)")
+                success_count += 1
+            else:
+                print(f"  ✗ {event.pim_file} 失败")
+                for error in result.errors:
+                    print(f"    - {error}")
+                failed_files.append(str(event.pim_file))
+    
+    run_batch(
+        existing,
+        compiler.compile,
+        is_success=lambda result: result.success,
+        workers=config.max_concurrent_compilations,
+        on_event=report
+    )
     
     # 打印摘要
     print(f"\n编译完成: {success_count}/{len(files)} 成功")
@@ -245,9 +256,14 @@ def clean_cache(all_cache: bool = False):
         print("已清理所有缓存")
     else:
         # 只清理编译缓存
-        compiler_cache = cache_dir / "compiler_cache.json"
-        if compiler_cache.exists():
-            compiler_cache.unlink()
+        cache_files = [cache_dir / name for name in (
+            "compile_cache.sqlite", "compile_cache.sqlite-wal", "compile_cache.sqlite-shm",
+            "compiler_cache.json"  # 旧版按路径的缓存
+        )]
+        existing = [f for f in cache_files if f.exists()]
+        for cache_file in existing:
+            cache_file.unlink()
+        if existing:
             print("已清理编译缓存")
         else:
             print("没有找到编译缓存")
@@ -273,6 +289,8 @@ def load_config(args) -> CompilerConfig:
     if hasattr(args, 'output'):
         if args.output:
             config.output_dir = args.output
+    if getattr(args, 'jobs', None):
+        config.max_concurrent_compilations = args.jobs
     if hasattr(args, 'no_cache') and args.no_cache:
         config.enable_cache = False
     if hasattr(args, 'no_validation') and args.no_validation:
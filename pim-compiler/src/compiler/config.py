@@ -27,6 +27,8 @@ class CompilerConfig:
     
     # 编译选项
     enable_cache: bool = True  # 是否启用缓存
+    cache_dir: Path = field(default_factory=lambda: Path(".pim_cache"))  # 内容寻址编译缓存目录
+    cache_max_size_mb: int = 256  # 编译缓存大小上限（超出按 LRU 淘汰）
     verbose: bool = True  # 是否输出详细日志
     
     # 测试和修复选项
@@ -45,6 +47,8 @@ class CompilerConfig:
     
     # 高级选项
     max_retries: int = 3  # 最大重试次数
+    batch_workers: int = 4  # 批量编译的并发数
+    fix_workers: int = 3  # 测试修复时并发修复的文件数（互不导入的文件）
     timeout: int = 600  # 超时时间（秒）
     
     def __post_init__(self):
@@ -52,6 +56,7 @@ class CompilerConfig:
         # 确保输出目录存在
         self.output_dir = Path(self.output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = Path(self.cache_dir)
         
         # 检查 Gemini API key（虽然 Gemini CLI 可能使用其他认证方式）
         if not self.gemini_api_key and not os.getenv("GOOGLE_API_KEY"):
@@ -65,6 +70,8 @@ class CompilerConfig:
             "generator_type": self.generator_type,
             "gemini_model": self.gemini_model,
             "enable_cache": self.enable_cache,
+            "cache_dir": str(self.cache_dir),
+            "cache_max_size_mb": self.cache_max_size_mb,
             "verbose": self.verbose,
             "auto_test": self.auto_test,
             "enable_lint": self.enable_lint,
@@ -1,9 +1,7 @@
 """Base compiler abstract class for LLM-based PIM compilation"""
 
 import os
-import json
 import yaml
-import hashlib
 import subprocess
 from abc import ABC, abstractmethod
 from typing import Optional, Dict, Any, List, Tuple
@@ -12,6 +10,8 @@ from datetime import datetime
 import logging
 
 from .compiler_config import CompilerConfig
+from .compilation_cache import CompilationCache
+from .batch_runner import get_rate_limiter
 
 
 class CompilationResult:
@@ -52,10 +52,10 @@ class BaseCompiler(ABC):
         else:
             self.logger.setLevel(logging.WARNING)
         
-        # 初始化缓存
-        self._cache = {}
+        # 初始化内容寻址缓存（PIM/PSM内容 + 编译器 + 模型 + 提示词 + 平台）
+        self.cache: Optional[CompilationCache] = None
         if config.enable_cache:
-            self._load_cache()
+            self.cache = CompilationCache(config.cache_dir, config.cache_max_size_mb * 1024 * 1024)
     
     def compile(self, pim_file: Path) -> CompilationResult:
         """编译PIM文件到PSM
@@ -65,12 +65,7 @@ class BaseCompiler(ABC):
         self.logger.info(f"开始编译: {pim_file}")
         
         try:
-            # 检查缓存
-            if self.config.enable_cache:
-                cached_result = self._check_cache(pim_file)
-                if cached_result:
-                    self.logger.info("使用缓存的编译结果")
-                    return cached_result
+            cache_start = self.cache.counters() if self.cache else (0, 0)
             
             # 1. 读取 PIM Markdown 文件
             pim_content = self._read_file(pim_file)
@@ -78,7 +73,7 @@ class BaseCompiler(ABC):
                 return CompilationResult(False, errors=["无法读取PIM文件"])
             
             # 2. 使用 LLM 转换 PIM 到 PSM
-            psm_content = self._transform_pim_to_psm(pim_content, pim_file)
+            psm_content = self._transform_pim_to_psm_cached(pim_content, pim_file)
             if not psm_content:
                 return CompilationResult(False, errors=["PIM到PSM转换失败"])
             
@@ -88,7 +83,7 @@ class BaseCompiler(ABC):
             # 4. 生成代码（如果需要）
             code_files = []
             if self.config.generate_code:
-                code_files = self._generate_code_from_psm(psm_content, psm_file)
+                code_files = self._generate_code_from_psm_cached(psm_content, psm_file)
                 
                 # 5. 对生成的代码进行 lint 检查和修复
                 if code_files and self.config.enable_lint:
@@ -108,14 +103,11 @@ class BaseCompiler(ABC):
                     "pim_file": str(pim_file),
                     "platform": self.config.target_platform,
                     "code_files": code_files,
-                    "compile_time": (datetime.now() - datetime.now()).total_seconds()
+                    "compile_time": (datetime.now() - datetime.now()).total_seconds(),
+                    "cache": self.cache.get_stats(cache_start) if self.cache else None
                 }
             )
             
-            # 缓存结果
-            if self.config.enable_cache:
-                self._update_cache(pim_file, result)
-            
             self.logger.info(f"编译成功: {psm_file}")
             return result
             
@@ -165,60 +157,63 @@ class BaseCompiler(ABC):
         return output_file
     
     # 缓存相关方法
-    def _get_cache_key(self, pim_file: Path) -> str:
-        """生成缓存键"""
-        # 使用文件路径、修改时间和目标平台生成缓存键
-        mtime = pim_file.stat().st_mtime
-        key_str = f"{pim_file}:{mtime}:{self.config.target_platform}"
-        return hashlib.md5(key_str.encode()).hexdigest()
+    def _get_cache_key(self, stage: str, content: str) -> str:
+        """生成内容寻址的缓存键（与文件路径、修改时间无关）"""
+        return CompilationCache.make_key(
+            stage,
+            content,
+            self.__class__.__name__,
+            self.config.llm_model,
+            self._get_prompt_template(stage),
+            self.config.target_platform
+        )
+    
+    def _get_prompt_template(self, stage: str) -> str:
+        """阶段的提示词模板（参与缓存键），默认读取子类的 pim_to_psm_prompt / psm_to_code_prompt"""
+        return getattr(self, f"{stage}_prompt", "")
     
-    def _check_cache(self, pim_file: Path) -> Optional[CompilationResult]:
-        """检查缓存"""
-        cache_key = self._get_cache_key(pim_file)
+    def _transform_pim_to_psm_cached(self, pim_content: str, source_file: Path) -> Optional[str]:
+        """带缓存的 PIM 到 PSM 转换"""
+        if not self.cache:
+            get_rate_limiter(self.config.llm_provider).acquire()
+            return self._transform_pim_to_psm(pim_content, source_file)
         
-        if cache_key in self._cache:
-            cached = self._cache[cache_key]
-            # 检查PSM文件是否仍然存在
-            if cached["psm_file"] and Path(cached["psm_file"]).exists():
-                return CompilationResult(
-                    success=True,
-                    psm_file=Path(cached["psm_file"]),
-                    metadata=cached.get("metadata", {})
-                )
+        cache_key = self._get_cache_key("pim_to_psm", pim_content)
+        psm_content = self.cache.get_psm(cache_key)
+        if psm_content is not None:
+            self.logger.info("使用缓存的PSM")
+            return psm_content
         
-        return None
-    
-    def _update_cache(self, pim_file: Path, result: CompilationResult):
-        """更新缓存"""
-        if result.success and result.psm_file:
-            cache_key = self._get_cache_key(pim_file)
-            self._cache[cache_key] = {
-                "psm_file": str(result.psm_file),
-                "metadata": result.metadata,
-                "timestamp": result.timestamp.isoformat()
-            }
-            self._save_cache()
-    
-    def _load_cache(self):
-        """加载缓存"""
-        cache_file = self.config.cache_dir / "compiler_cache.json"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    self._cache = json.load(f)
-            except Exception as e:
-                self.logger.warning(f"加载缓存失败: {e}")
-                self._cache = {}
+        get_rate_limiter(self.config.llm_provider).acquire()
+        psm_content = self._transform_pim_to_psm(pim_content, source_file)
+        if psm_content:
+            self.cache.put_psm(cache_key, psm_content)
+        return psm_content
     
-    def _save_cache(self):
-        """保存缓存"""
-        cache_file = self.config.cache_dir / "compiler_cache.json"
-        try:
-            cache_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(cache_file, 'w') as f:
-                json.dump(self._cache, f, indent=2)
-        except Exception as e:
-            self.logger.warning(f"保存缓存失败: {e}")
+    def _generate_code_from_psm_cached(self, psm_content: str, psm_file: Path) -> List[str]:
+        """带缓存的代码生成，缓存的文件集合相对于 PSM 文件所在目录"""
+        if not self.cache:
+            get_rate_limiter(self.config.llm_provider).acquire()
+            return self._generate_code_from_psm(psm_content, psm_file)
+        
+        base_dir = psm_file.parent
+        cache_key = self._get_cache_key("psm_to_code", psm_content)
+        restored = self.cache.restore_files(cache_key, base_dir)
+        if restored is not None:
+            self.logger.info(f"使用缓存的代码（{len(restored)} 个文件）")
+            return restored
+        
+        get_rate_limiter(self.config.llm_provider).acquire()
+        code_files = self._generate_code_from_psm(psm_content, psm_file)
+        if code_files:
+            files = {}
+            for file_path in code_files:
+                rel_path = os.path.relpath(file_path, base_dir)
+                if rel_path.startswith(".."):
+                    return code_files  # 生成到了 PSM 目录之外，不缓存
+                files[Path(rel_path).as_posix()] = Path(file_path).read_bytes()
+            self.cache.put_files(cache_key, "code", files)
+        return code_files
     
     def _lint_and_fix_code(self, code_files: List[str]):
         """对生成的代码进行 lint 检查并自动修复"""
@@ -0,0 +1,177 @@
+"""
+并发批量编译
+
+编译一个 PIM 文件的时间几乎都花在等待 LLM 响应和子进程上，因此批量编译用线程池
+并发执行：
+- run_batch: 按工作线程数并发编译，逐文件发出进度事件；stop_on_failure 时第一个
+  失败后取消尚未开始的任务
+- RateLimiter / get_rate_limiter: 按 LLM 提供商共享的请求速率限制（所有线程、
+  所有编译器实例共用）
+- shared_http_client: 进程内共享的 httpx 连接池，供 ChatOpenAI 等客户端复用连接
+"""
+
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# 各提供商默认每分钟请求数，可用环境变量 PIM_RATE_LIMIT_<PROVIDER> 覆盖（0 表示不限制）
+PROVIDER_RATE_LIMITS = {
+    "deepseek": 60,
+    "openai": 60,
+    "gemini": 60,
+    "gemini-cli": 30,
+}
+DEFAULT_RATE_LIMIT = 60
+
+
+class RateLimiter:
+    """线程安全的速率限制器：保证相邻两次请求至少间隔 60/rate_per_minute 秒"""
+
+    def __init__(self, rate_per_minute: int):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """等待直到允许发出下一个请求"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """获取提供商共享的速率限制器"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            env_name = "PIM_RATE_LIMIT_" + provider.upper().replace("-", "_")
+            rate = int(os.getenv(env_name, PROVIDER_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMIT)))
+            limiter = _rate_limiters[provider] = RateLimiter(rate)
+        return limiter
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def shared_http_client():
+    """进程内共享的 httpx.Client（未安装 httpx 时返回 None，由客户端自行创建）"""
+    global _http_client
+    if httpx is None:
+        return None
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=httpx.Timeout(600.0, connect=10.0),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+            )
+        return _http_client
+
+
+@dataclass
+class BatchEvent:
+    """批量编译进度事件"""
+    status: str  # started, finished, cancelled
+    pim_file: Path
+    index: int  # 从 1 开始
+    total: int
+    success: Optional[bool] = None
+    elapsed: float = 0.0
+    completed: int = 0  # 已完成的文件数
+    result: Any = None  # finished 事件携带编译结果
+
+
+def log_event(event: BatchEvent):
+    """默认的进度输出"""
+    if event.status == "started":
+        logger.info(f"Compiling {event.pim_file} ({event.index}/{event.total})")
+    elif event.status == "finished":
+        state = "succeeded" if event.success else "failed"
+        logger.info(f"[{event.completed}/{event.total}] {event.pim_file} {state} in {event.elapsed:.1f}s")
+    else:
+        logger.info(f"Cancelled {event.pim_file}")
+
+
+def run_batch(
+    pim_files: Sequence[Path],
+    compile_fn: Callable[[Path], Any],
+    is_success: Callable[[Any], bool],
+    workers: int = 4,
+    stop_on_failure: bool = False,
+    on_event: Optional[Callable[[BatchEvent], None]] = log_event
+) -> List[Any]:
+    """并发编译多个文件
+
+    Args:
+        pim_files: PIM 文件列表
+        compile_fn: 编译单个文件的函数
+        is_success: 判断编译结果是否成功
+        workers: 并发数（1 表示串行）
+        stop_on_failure: 第一个失败后取消尚未开始的文件
+        on_event: 进度事件回调
+
+    Returns:
+        List[Any]: 已完成文件的结果（按输入顺序），被取消的文件不在其中
+    """
+    total = len(pim_files)
+    results: Dict[int, Any] = {}
+    emit = on_event or (lambda event: None)
+
+    def run_one(index: int, pim_file: Path):
+        emit(BatchEvent("started", pim_file, index + 1, total))
+        start = time.time()
+        result = compile_fn(pim_file)
+        return result, time.time() - start
+
+    workers = max(1, workers)
+    queue = iter(enumerate(pim_files))
+    futures = {}
+    stopped = False
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pim-batch") as executor:
+        # 同时最多提交 workers 个任务，失败后不再提交新的任务
+        while True:
+            while not stopped and len(futures) < workers:
+                item = next(queue, None)
+                if item is None:
+                    break
+                futures[executor.submit(run_one, *item)] = item
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, pim_file = futures.pop(future)
+                result, elapsed = future.result()
+                results[index] = result
+                success = is_success(result)
+                emit(BatchEvent("finished", pim_file, index + 1, total, success, elapsed, len(results), result))
+
+                if not success and stop_on_failure and not stopped:
+                    logger.error(f"Compilation failed for {pim_file}, stopping batch")
+                    stopped = True
+
+    for index, pim_file in queue:
+        emit(BatchEvent("cancelled", pim_file, index + 1, total))
+
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,222 @@
+"""
+异步 CLI 子进程运行器
+
+Gemini CLI 每次调用要运行几十秒到几分钟，所有调用都在一个共享的 asyncio 事件循环
+（后台线程）中执行，调用线程只等待结果：
+- 输出按块读取并流式写入日志文件 / on_output 回调，stdout 和 stderr 合并，不会因为
+  管道写满而阻塞子进程
+- 超时后先 terminate，5 秒内没有退出再 kill；stop_when 返回 True 时同样提前结束
+- 失败且输出匹配 retry_on 中的模式（如 API 500）时按指数退避重试，退避期间不占用
+  并发名额，也不阻塞线程
+- 按 concurrency_key 共享的并发限制：同时运行的同类子进程数不超过
+  PIM_CLI_CONCURRENCY_<KEY>（默认 DEFAULT_CONCURRENCY）
+
+协程中用 `await run_cli(...)`，同步代码（编译器、批量编译的工作线程）用 run_cli_sync，
+两者共用同一个事件循环和并发限制。
+"""
+
+import os
+import time
+import codecs
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+READ_CHUNK_SIZE = 64 * 1024
+TERMINATE_GRACE = 5.0
+
+
+@dataclass
+class CLIResult:
+    """一次 CLI 调用（含重试）的结果"""
+    returncode: Optional[int]
+    output: str  # stdout 和 stderr 合并后的输出（最后一次尝试）
+    duration: float = 0.0
+    attempts: int = 1
+    timed_out: bool = False
+    stopped: bool = False  # 被 stop_when 提前结束
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.stopped
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_semaphores: Dict[str, asyncio.Semaphore] = {}  # 只在事件循环线程中访问
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """共享的事件循环（第一次调用时在守护线程中启动）"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="cli-runner", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _semaphore(key: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(key)
+    if semaphore is None:
+        env_name = "PIM_CLI_CONCURRENCY_" + key.upper().replace("-", "_")
+        limit = max(1, int(os.getenv(env_name, DEFAULT_CONCURRENCY)))
+        semaphore = _semaphores[key] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+async def run_cli(cmd: Sequence[str], **kwargs) -> CLIResult:
+    """在共享事件循环中运行 CLI 命令（参数见 _run）"""
+    loop = _get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await _run(list(cmd), **kwargs)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_run(list(cmd), **kwargs), loop))
+
+
+def run_cli_sync(cmd: Sequence[str], **kwargs) -> CLIResult:
+    """同步调用：阻塞当前线程直到命令结束（不能在共享事件循环的线程中调用）"""
+    loop = _get_loop()
+    if threading.current_thread().name == "cli-runner":
+        raise RuntimeError("run_cli_sync cannot be called from the CLI runner event loop")
+    return asyncio.run_coroutine_threadsafe(_run(list(cmd), **kwargs), loop).result()
+
+
+async def _run(cmd: list, cwd: Optional[Union[str, Path]] = None, env: Optional[dict] = None,
+               timeout: Optional[float] = None, log_path: Optional[Union[str, Path]] = None,
+               log_header: str = "", on_output: Optional[Callable[[str], None]] = None,
+               stop_when: Optional[Callable[[], bool]] = None, check_interval: float = 10.0,
+               max_retries: int = 1, retry_delay: float = 5.0, retry_on: Sequence[str] = (),
+               concurrency_key: str = "default") -> CLIResult:
+    """运行命令，失败且输出匹配 retry_on 时最多尝试 max_retries 次
+
+    Args:
+        cwd / env: 子进程的工作目录和环境变量
+        timeout: 单次尝试的超时（秒），超时不重试
+        log_path: 输出日志文件，每次尝试覆盖写入，先写 log_header
+        on_output: 每读到一块输出时调用（在事件循环线程中，不应阻塞）
+        stop_when: 每 check_interval 秒在线程池中调用一次，返回 True 时结束子进程
+        retry_delay: 第一次重试前的等待秒数，之后每次翻倍
+        concurrency_key: 共享并发限制的键
+    """
+    start = time.monotonic()
+    delay = retry_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        async with _semaphore(concurrency_key):
+            result = await _run_once(cmd, cwd, env, timeout, log_path, log_header,
+                                     on_output, stop_when, check_interval)
+        result.attempts = attempt
+        result.duration = time.monotonic() - start
+        if (result.success or result.timed_out or result.stopped or attempt >= max_retries
+                or not any(pattern in result.output for pattern in retry_on)):
+            return result
+        logger.warning(f"{Path(cmd[0]).name} failed with a retryable error "
+                       f"(attempt {attempt}/{max_retries}), retrying in {delay:g}s")
+        await asyncio.sleep(delay)
+        delay *= 2
+
+
+async def _run_once(cmd, cwd, env, timeout, log_path, log_header,
+                    on_output, stop_when, check_interval) -> CLIResult:
+    log_file = open(log_path, "w", encoding="utf-8") if log_path else None
+    try:
+        if log_file and log_header:
+            log_file.write(log_header)
+            log_file.flush()
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=str(cwd) if cwd else None,
+            env=env
+        )
+        chunks = []
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        def emit(text: str):
+            if not text:
+                return
+            chunks.append(text)
+            if log_file:
+                log_file.write(text)
+                log_file.flush()
+            if on_output:
+                on_output(text)
+
+        async def pump():
+            while True:
+                data = await process.stdout.read(READ_CHUNK_SIZE)
+                if not data:
+                    break
+                emit(decoder.decode(data))
+            emit(decoder.decode(b"", final=True))
+            await process.wait()
+
+        async def watch():
+            loop = asyncio.get_running_loop()
+            while True:
+                await asyncio.sleep(check_interval)
+                try:
+                    if await loop.run_in_executor(None, stop_when):
+                        return
+                except Exception as e:
+                    logger.warning(f"Error checking progress: {e}")
+
+        pump_task = asyncio.ensure_future(pump())
+        watch_task = asyncio.ensure_future(watch()) if stop_when else None
+        tasks = {pump_task} | ({watch_task} if watch_task else set())
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # 调用方取消时不留下孤儿进程
+            for task in tasks:
+                task.cancel()
+            await _terminate(process)
+            raise
+
+        timed_out = not done
+        stopped = watch_task is not None and watch_task in done and pump_task not in done
+        if watch_task:
+            watch_task.cancel()
+        if pump_task not in done:
+            if timed_out:
+                logger.warning(f"{Path(cmd[0]).name} timed out after {timeout} seconds, terminating...")
+            await _terminate(process)
+            # 子进程的子进程可能仍持有管道，最多再读 TERMINATE_GRACE 秒
+            try:
+                await asyncio.wait_for(pump_task, TERMINATE_GRACE)
+            except asyncio.TimeoutError:
+                pass
+            if timed_out:
+                emit(f"\n\n=== TIMEOUT: Process terminated after {timeout} seconds ===\n")
+        else:
+            pump_task.result()
+
+        return CLIResult(returncode=process.returncode, output="".join(chunks),
+                         timed_out=timed_out, stopped=stopped)
+    finally:
+        if log_file:
+            log_file.close()
+
+
+async def _terminate(process):
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), TERMINATE_GRACE)
+    except asyncio.TimeoutError:
+        logger.warning("Force killing process...")
+        process.kill()
+        await process.wait()
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,222 @@
+"""
+内容寻址的编译缓存
+
+缓存键由输入内容计算，而不是文件路径和修改时间：
+- PSM 阶段：PIM 内容 + 生成器类型 + 模型 + 提示词模板 + 目标平台
+- 代码阶段：PSM 内容 + 生成器类型 + 模型 + 提示词模板 + 目标平台
+
+因此 git checkout、复制文件不会使缓存失效，而修改提示词或切换模型会。
+PSM 相同时代码阶段也能命中。
+
+存储是一个 SQLite 数据库（cache_dir/compile_cache.sqlite）：
+- blobs:   按内容 SHA-256 去重的 zlib 压缩数据块
+- entries: 缓存条目（PSM 或生成的文件集合），记录最近使用时间
+- entry_files: 条目包含的文件（相对路径 -> 数据块）
+总大小超过上限时按 LRU 淘汰条目，并回收不再被引用的数据块。
+
+ConfigurableCompiler、PureGeminiCompiler 和 DeepSeekCompiler（BaseCompiler）共用。
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB（压缩后）
+PSM_FILE = "psm.md"  # PSM 条目中的文件名
+
+# 快照生成文件时跳过的目录
+EXCLUDED_DIRS = {"venv", ".venv", "env", "__pycache__", ".pytest_cache", ".git", "node_modules", ".mypy_cache"}
+
+
+class CompilationCache:
+    """内容寻址的 PSM / 代码缓存，带 LRU 大小限制"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.db_path = self.cache_dir / "compile_cache.sqlite"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # compile_batch 可能并发使用同一实例
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._db() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entry_files (
+                    key TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    blob TEXT NOT NULL,
+                    PRIMARY KEY (key, path)
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (last_used);
+                CREATE INDEX IF NOT EXISTS idx_entry_files_blob ON entry_files (blob);
+            """)
+
+    @contextmanager
+    def _db(self):
+        """打开连接，正常退出时提交，最后关闭"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(stage: str, content: str, generator: str, model: Optional[str],
+                 prompt_template: str, platform: str) -> str:
+        """计算缓存键（各字段以\\0分隔后取 SHA-256）"""
+        parts = [str(CACHE_VERSION), stage, generator, model or "", platform,
+                 hashlib.sha256(prompt_template.encode('utf-8')).hexdigest(),
+                 hashlib.sha256(content.encode('utf-8')).hexdigest()]
+        return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+    # ----- 读取 -----
+
+    def get_files(self, key: str) -> Optional[Dict[str, bytes]]:
+        """取出条目的文件集合（相对路径 -> 内容），未命中返回 None"""
+        with self._lock:
+            try:
+                with self._db() as conn:
+                    rows = conn.execute(
+                        "SELECT f.path, b.data FROM entry_files f JOIN blobs b ON b.hash = f.blob "
+                        "WHERE f.key = ?", (key,)
+                    ).fetchall()
+                    exists = rows or conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+                    if exists:
+                        conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            except sqlite3.Error as e:
+                logger.warning(f"读取编译缓存失败: {e}")
+                rows, exists = [], None
+
+            if not exists:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {path: zlib.decompress(data) for path, data in rows}
+
+    def get_psm(self, key: str) -> Optional[str]:
+        files = self.get_files(key)
+        if files is None or PSM_FILE not in files:
+            return None
+        return files[PSM_FILE].decode('utf-8')
+
+    def restore_files(self, key: str, target_dir: Path) -> Optional[List[str]]:
+        """命中时把文件集合写入 target_dir，返回写入的文件路径列表"""
+        files = self.get_files(key)
+        if files is None:
+            return None
+        written = []
+        for rel_path, content in files.items():
+            file_path = Path(target_dir) / rel_path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(content)
+            written.append(str(file_path))
+        return written
+
+    # ----- 写入 -----
+
+    def put_files(self, key: str, stage: str, files: Dict[str, bytes]):
+        """保存文件集合（相同内容的数据块只存一份）"""
+        blobs = {}
+        entry_files = []
+        for rel_path, content in files.items():
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            blob_hash = hashlib.sha256(content).hexdigest()
+            blobs[blob_hash] = content
+            entry_files.append((key, rel_path, blob_hash))
+
+        with self._lock:
+            try:
+                with self._db() as conn:
+                    existing = {row[0] for row in conn.execute(
+                        f"SELECT hash FROM blobs WHERE hash IN ({','.join('?' * len(blobs))})", list(blobs)
+                    )} if blobs else set()
+                    new_blobs = []
+                    for blob_hash, content in blobs.items():
+                        if blob_hash not in existing:
+                            data = zlib.compress(content, 6)
+                            new_blobs.append((blob_hash, data, len(data)))
+                    conn.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)", new_blobs)
+                    conn.execute("DELETE FROM entry_files WHERE key = ?", (key,))
+                    conn.executemany("INSERT INTO entry_files VALUES (?, ?, ?)", entry_files)
+                    conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, stage, time.time()))
+                    self._evict(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"写入编译缓存失败: {e}")
+
+    def put_psm(self, key: str, psm_content: str):
+        self.put_files(key, "psm", {PSM_FILE: psm_content})
+
+    def put_directory(self, key: str, source_dir: Path, exclude: Iterable[str] = ()):
+        """快照目录中的生成文件（跳过虚拟环境、缓存目录和 exclude 中的相对路径）"""
+        self.put_files(key, "code", snapshot_directory(source_dir, exclude))
+
+    def _evict(self, conn: sqlite3.Connection):
+        """总大小超限时按最近使用时间淘汰条目"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for (key,) in conn.execute("SELECT key FROM entries ORDER BY last_used").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.execute("DELETE FROM entry_files WHERE key = ?", (key,))
+            conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT blob FROM entry_files)")
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                break
+
+    # ----- 统计 -----
+
+    def counters(self) -> tuple:
+        """当前(命中, 未命中)计数，配合 get_stats(since=...) 统计单次编译"""
+        return self.hits, self.misses
+
+    def get_stats(self, since: tuple = (0, 0)) -> Dict[str, float]:
+        hits = self.hits - since[0]
+        misses = self.misses - since[1]
+        lookups = hits + misses
+        return {
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "cache_hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def snapshot_directory(source_dir: Path, exclude: Iterable[str] = ()) -> Dict[str, bytes]:
+    """读取目录下所有文件（相对路径 -> 内容）"""
+    source_dir = Path(source_dir)
+    exclude = set(exclude)
+    files = {}
+    for root, dirs, names in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+        for name in names:
+            file_path = Path(root) / name
+            rel_path = file_path.relative_to(source_dir).as_posix()
+            if rel_path in exclude:
+                continue
+            try:
+                files[rel_path] = file_path.read_bytes()
+            except OSError:
+                continue
+    return files
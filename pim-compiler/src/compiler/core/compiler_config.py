@@ -31,6 +31,7 @@ class CompilerConfig:
     target_platform: str = "fastapi"  # fastapi, spring, django
     enable_cache: bool = True
     cache_dir: Path = field(default_factory=lambda: Path(".pim_cache"))
+    cache_max_size_mb: int = 256  # 内容寻址编译缓存大小上限（超出按 LRU 淘汰）
     enable_validation: bool = True
     enable_optimization: bool = True
     generate_code: bool = False  # 是否生成代码（除了PSM）
@@ -153,6 +154,7 @@ class CompilerConfig:
             "target_platform": self.target_platform,
             "enable_cache": self.enable_cache,
             "cache_dir": str(self.cache_dir),
+            "cache_max_size_mb": self.cache_max_size_mb,
             "enable_validation": self.enable_validation,
             "enable_optimization": self.enable_optimization,
             "generate_code": self.generate_code,
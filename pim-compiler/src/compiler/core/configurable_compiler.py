@@ -6,16 +6,22 @@
 import os
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from datetime import datetime
 import shutil
 
 from ..config import CompilerConfig
 from ..generators import GeneratorFactory, GeneratorConfig, BaseGenerator
+from ..generators.base_generator import GenerationResult
+from .compilation_cache import CompilationCache
+from .batch_runner import run_batch, log_event, get_rate_limiter, BatchEvent
+from .pim_diff import parse_pim_sections, diff_pim, content_hash, load_state, save_state
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+PIM_STATE_FILE = "pim_sections.json"  # 上次成功编译的 PIM 分节摘要，用于编译报告
+
 
 class ConfigurableCompiler:
     """可配置的编译器
@@ -29,6 +35,9 @@ class ConfigurableCompiler:
     def __init__(self, config: CompilerConfig):
         self.config = config
         self.generator = self._create_generator()
+        self.cache: Optional[CompilationCache] = None
+        if config.enable_cache:
+            self.cache = CompilationCache(config.cache_dir, config.cache_max_size_mb * 1024 * 1024)
         logger.info(f"Initialized ConfigurableCompiler with generator: {config.generator_type}")
     
     def _create_generator(self) -> BaseGenerator:
@@ -51,6 +60,77 @@ class ConfigurableCompiler:
             generator_config
         )
     
+    def _cache_key(self, stage: str, content: str) -> str:
+        """内容寻址缓存键：输入内容 + 生成器类型 + 模型 + 提示词 + 平台"""
+        return CompilationCache.make_key(
+            stage,
+            content,
+            self.config.generator_type,
+            self.generator.config.model or self.config.gemini_model,
+            self.generator.cache_fingerprint(),
+            self.config.target_platform
+        )
+    
+    def _acquire_rate_limit(self):
+        """按生成器实际使用的 LLM 提供商限速（同一提供商的所有生成器共享一个限制）"""
+        provider = self.generator.rate_limit_provider()
+        if provider:
+            get_rate_limiter(provider).acquire()
+    
+    def _generate_psm_cached(self, pim_content: str, output_dir: Path) -> GenerationResult:
+        """生成 PSM，命中缓存时不调用 LLM"""
+        if self.cache:
+            cache_key = self._cache_key("pim_to_psm", pim_content)
+            cached_psm = self.cache.get_psm(cache_key)
+            if cached_psm is not None:
+                logger.info("Using cached PSM")
+                return GenerationResult(success=True, output_path=output_dir,
+                                        psm_content=cached_psm, logs="PSM loaded from cache",
+                                        regeneration={"mode": "cached", "regenerated": {}})
+        
+        self._acquire_rate_limit()
+        psm_result = self.generator.generate_psm(
+            pim_content,
+            self.config.target_platform,
+            output_dir
+        )
+        if self.cache and psm_result.success and psm_result.psm_content:
+            self.cache.put_psm(cache_key, psm_result.psm_content)
+        return psm_result
+    
+    def _generate_code_cached(self, psm_content: str, code_dir: Path) -> GenerationResult:
+        """生成代码，命中缓存时直接恢复文件集合"""
+        if self.cache:
+            cache_key = self._cache_key("psm_to_code", psm_content)
+            cached_files = self.cache.get_files(cache_key)
+            if cached_files is not None:
+                logger.info(f"Using cached code ({len(cached_files)} files)")
+                code_files = {path: content.decode('utf-8', errors='replace')
+                              for path, content in cached_files.items()}
+                for path, content in cached_files.items():
+                    file_path = code_dir / path
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    file_path.write_bytes(content)
+                return GenerationResult(success=True, output_path=code_dir,
+                                        code_files=code_files, logs="Code loaded from cache",
+                                        regeneration={"mode": "cached", "regenerated": {}})
+        
+        self._acquire_rate_limit()
+        code_result = self.generator.generate_code(
+            psm_content,
+            code_dir,
+            self.config.target_platform
+        )
+        if self.cache and code_result.success and code_result.code_files:
+            self.cache.put_files(cache_key, "code", code_result.code_files)
+        return code_result
+    
+    def _regeneration_report(self, result: GenerationResult) -> Dict[str, Any]:
+        """生成结果中重新生成了哪些部分及原因；不支持增量生成的生成器总是全量生成"""
+        if result.regeneration is not None:
+            return result.regeneration
+        return {"mode": "full", "regenerated": {"*": [f"{self.config.generator_type} 生成器不支持增量生成"]}}
+    
     def compile(self, pim_file: Path) -> Dict[str, Any]:
         """编译 PIM 文件
         
@@ -61,6 +141,7 @@ class ConfigurableCompiler:
             Dict[str, Any]: 编译结果
         """
         start_time = datetime.now()
+        cache_start = self.cache.counters() if self.cache else (0, 0)
         logger.info(f"Starting compilation of {pim_file}")
         logger.info(f"Using generator: {self.config.generator_type}")
         logger.info(f"Target platform: {self.config.target_platform}")
@@ -87,15 +168,20 @@ class ConfigurableCompiler:
         output_dir = self.config.output_dir / f"{pim_file.stem}_{self.config.generator_type}"
         output_dir.mkdir(parents=True, exist_ok=True)
         
+        # 与上次编译的 PIM 比较，报告中说明重新生成的原因
+        pim_sections = parse_pim_sections(pim_content)
+        pim_state_file = output_dir / PIM_STATE_FILE
+        pim_state_base = content_hash(self.config.generator_type, self.config.target_platform)
+        previous_state = load_state(pim_state_file, pim_state_base)
+        pim_diff = diff_pim(previous_state["sections"], pim_sections) if previous_state else None
+        if pim_diff is not None:
+            logger.info(f"PIM changes since last compilation: {pim_diff.reasons() or 'none'}")
+        
         # 步骤 1: 生成 PSM
         logger.info("Step 1: Generating PSM...")
         psm_start = time.time()
         
-        psm_result = self.generator.generate_psm(
-            pim_content,
-            self.config.target_platform,
-            output_dir
-        )
+        psm_result = self._generate_psm_cached(pim_content, output_dir)
         
         if not psm_result.success:
             return {
@@ -118,11 +204,7 @@ class ConfigurableCompiler:
         logger.info("Step 2: Generating code...")
         code_start = time.time()
         
-        code_result = self.generator.generate_code(
-            psm_result.psm_content,
-            output_dir / "generated",
-            self.config.target_platform
-        )
+        code_result = self._generate_code_cached(psm_result.psm_content, output_dir / "generated")
         
         if not code_result.success:
             return {
@@ -152,6 +234,7 @@ class ConfigurableCompiler:
         
         # 计算总时间
         total_time = (datetime.now() - start_time).total_seconds()
+        save_state(pim_state_file, pim_state_base, sections=pim_sections)
         
         return {
             "success": True,
@@ -167,34 +250,46 @@ class ConfigurableCompiler:
                 "total_files": generated_files,
                 "python_files": py_files,
                 "psm_size": len(psm_result.psm_content) if psm_result.psm_content else 0,
-                "total_code_size": sum(len(content) for content in code_result.code_files.values()) if code_result.code_files else 0
+                "total_code_size": sum(len(content) for content in code_result.code_files.values()) if code_result.code_files else 0,
+                **(self.cache.get_stats(cache_start) if self.cache else {})
             },
             "test_results": test_results,
+            "regeneration": {
+                "pim_changes": pim_diff.reasons() if pim_diff is not None else None,
+                "psm": self._regeneration_report(psm_result),
+                "code": self._regeneration_report(code_result)
+            },
             "psm_logs": psm_result.logs,
             "code_logs": code_result.logs
         }
     
-    def compile_batch(self, pim_files: list[Path]) -> Dict[str, Any]:
-        """批量编译多个 PIM 文件
+    def compile_batch(
+        self,
+        pim_files: list[Path],
+        workers: Optional[int] = None,
+        on_event: Optional[Callable[[BatchEvent], None]] = log_event
+    ) -> Dict[str, Any]:
+        """批量编译多个 PIM 文件（并发执行）
         
         Args:
             pim_files: PIM 文件列表
+            workers: 并发数，默认使用 config.batch_workers（1 表示串行）
+            on_event: 逐文件的进度事件回调（started / finished / cancelled）
             
         Returns:
             Dict[str, Any]: 批量编译结果
         """
-        results = []
         total_start = datetime.now()
         
-        for pim_file in pim_files:
-            logger.info(f"Compiling {pim_file} ({pim_files.index(pim_file) + 1}/{len(pim_files)})")
-            result = self.compile(pim_file)
-            results.append(result)
-            
-            # 如果某个文件失败且配置要求停止，则停止批处理
-            if not result["success"] and self.config.fail_on_test_failure:
-                logger.error(f"Compilation failed for {pim_file}, stopping batch")
-                break
+        # 如果某个文件失败且配置要求停止，则取消尚未开始的文件
+        results = run_batch(
+            pim_files,
+            self.compile,
+            is_success=lambda result: result["success"],
+            workers=workers or self.config.batch_workers,
+            stop_on_failure=self.config.fail_on_test_failure,
+            on_event=on_event
+        )
         
         total_time = (datetime.now() - total_start).total_seconds()
         success_count = sum(1 for r in results if r["success"])
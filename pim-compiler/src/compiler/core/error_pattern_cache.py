@@ -1,12 +1,50 @@
-"""错误模式缓存机制"""
+"""错误模式缓存机制
+
+匹配在修复循环中对每个错误都要执行，因此：
+- 模式只编译一次，并提取每个模式必须出现的最长字面量作为预过滤条件，错误文本中
+  不含该字面量的模式不执行正则匹配
+- 修复方案按错误哈希建立索引，查找是 O(1)
+- 使用统计和新的修复方案只在内存中更新，延迟 save_delay 秒后批量写入（进程退出时
+  也会写入；所有缓存共用一个只持有弱引用的退出钩子，不会让缓存对象常驻内存）
+"""
+import os
 import json
 import re
+import atexit
+import threading
+import weakref
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import hashlib
 
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+PATTERN_FLAGS = re.IGNORECASE | re.MULTILINE
+MIN_LITERAL_LENGTH = 3
+
+# 忽略大小写时与 ASCII 字母匹配、但 lower() 后不是该字母的字符（ſ 匹配 s，ı 匹配 i）
+_FOLD_TABLE = str.maketrans({"\u017f": "s", "\u0131": "i"})
+
+# 进程退出时写入仍未保存的修改（弱引用，不阻止缓存被回收）
+_live_caches: "weakref.WeakSet[ErrorPatternCache]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for cache in list(_live_caches):
+        cache.flush()
+
+
+def fold_text(text: str) -> str:
+    """预过滤时比较用的文本：忽略大小写匹配 required_literal 的文本一定包含该字面量"""
+    lowered = text.lower()
+    return lowered if lowered.isascii() else lowered.translate(_FOLD_TABLE)
+
 
 @dataclass
 class ErrorPattern:
@@ -30,19 +68,66 @@ class CachedFix:
     timestamp: str  # 时间戳
 
 
+def required_literal(pattern: str) -> Optional[str]:
+    """模式匹配时必定出现的最长字面量（小写），无法提取时返回 None
+
+    只取顶层顺序结构和必选分组中连续的字面量；大小写不敏感时只使用 ASCII 或没有大小写
+    区分的字符，保证 literal in fold_text(text) 是匹配的必要条件。
+    """
+    try:
+        parsed = sre_parse.parse(pattern, PATTERN_FLAGS)
+    except (re.error, OverflowError, RecursionError):
+        return None
+
+    runs = []
+
+    def collect(items):
+        current = []
+        for op, av in items:
+            char = chr(av) if op is sre_parse.LITERAL else None
+            if char is not None and (char.isascii() or char.lower() == char.upper()):
+                current.append(char.lower())
+                continue
+            runs.append("".join(current))
+            current = []
+            if op is sre_parse.SUBPATTERN:
+                collect(av[-1])
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+                collect(av[2])
+        runs.append("".join(current))
+
+    collect(parsed)
+    literal = max(runs, key=len, default="")
+    return literal if len(literal) >= MIN_LITERAL_LENGTH else None
+
+
 class ErrorPatternCache:
     """错误模式缓存管理器"""
     
-    def __init__(self, cache_dir: Path = None):
+    def __init__(self, cache_dir: Path = None, save_delay: float = 2.0):
         self.cache_dir = cache_dir or Path.home() / ".cache" / "pim-compiler"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         self.patterns_file = self.cache_dir / "error_patterns.json"
         self.fixes_file = self.cache_dir / "cached_fixes.json"
         
+        # 延迟批量写入
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._dirty = set()
+        self._save_timer: Optional[threading.Timer] = None
+        _live_caches.add(self)
+        
         self.patterns = self._load_patterns()
         self.fixes = self._load_fixes()
         
+        # 模式索引（编译后的正则和预过滤字面量）、哈希 -> 最新的成功修复
+        self._index: List[Tuple[ErrorPattern, "re.Pattern", Optional[str]]] = []
+        self._indexed_keys: Tuple[Tuple[str, int], ...] = ()
+        self._compiled: Dict[str, Tuple["re.Pattern", Optional[str]]] = {}
+        self._fix_index: Dict[str, CachedFix] = {}
+        self._rebuild_fix_index()
+        
         # 初始化内置模式
         self._init_builtin_patterns()
     
@@ -118,9 +203,7 @@ def validate_field(cls, v):
         # 添加内置模式到缓存
         for pattern in builtin_patterns:
             if pattern.pattern not in self.patterns:
-                self.patterns[pattern.pattern] = pattern
-        
-        self._save_patterns()
+                self.add_pattern(pattern)
     
     def _load_patterns(self) -> Dict[str, ErrorPattern]:
         """加载错误模式"""
@@ -149,25 +232,80 @@ def validate_field(cls, v):
     
     def _save_patterns(self):
         """保存错误模式"""
-        with open(self.patterns_file, 'w', encoding='utf-8') as f:
-            json.dump(
-                [asdict(p) for p in self.patterns.values()],
-                f,
-                indent=2,
-                ensure_ascii=False
-            )
+        self._write_json(self.patterns_file, [asdict(p) for p in self.patterns.values()])
     
     def _save_fixes(self):
         """保存修复方案"""
         # 只保留最近1000个修复方案
-        self.fixes = self.fixes[-1000:]
-        with open(self.fixes_file, 'w', encoding='utf-8') as f:
-            json.dump(
-                [asdict(fix) for fix in self.fixes],
-                f,
-                indent=2,
-                ensure_ascii=False
-            )
+        if len(self.fixes) > 1000:
+            self.fixes = self.fixes[-1000:]
+            self._rebuild_fix_index()
+        self._write_json(self.fixes_file, [asdict(fix) for fix in self.fixes])
+    
+    @staticmethod
+    def _write_json(path: Path, data):
+        """先写临时文件再替换，进程中断时不会留下写了一半的缓存文件"""
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def _schedule_save(self, *kinds: str):
+        """标记需要保存的文件，save_delay 秒后批量写入"""
+        with self._lock:
+            self._dirty.update(kinds)
+            if self.save_delay <= 0:
+                self.flush()
+            elif self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush(self):
+        """立即写入所有未保存的修改"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            dirty, self._dirty = self._dirty, set()
+            try:
+                if "patterns" in dirty:
+                    self._save_patterns()
+                if "fixes" in dirty:
+                    self._save_fixes()
+            except Exception:
+                self._dirty |= dirty  # 写入失败的修改留待下次保存
+                raise
+    
+    def close(self):
+        """写入未保存的修改，之后不再需要退出时写入"""
+        self.flush()
+        _live_caches.discard(self)
+    
+    def add_pattern(self, pattern: ErrorPattern):
+        """添加（或替换）错误模式"""
+        with self._lock:
+            self.patterns[pattern.pattern] = pattern
+        self._schedule_save("patterns")
+    
+    def _pattern_index(self) -> List[Tuple[ErrorPattern, "re.Pattern", Optional[str]]]:
+        """按 self.patterns 的顺序返回 (模式, 编译后的正则, 预过滤字面量)，模式变化时重建"""
+        keys = tuple((key, id(pattern)) for key, pattern in self.patterns.items())
+        if keys != self._indexed_keys:
+            index = []
+            for key, pattern in self.patterns.items():
+                if key not in self._compiled:
+                    try:
+                        self._compiled[key] = (re.compile(key, PATTERN_FLAGS), required_literal(key))
+                    except re.error:
+                        continue  # 无效的正则永远不会匹配
+                compiled, literal = self._compiled[key]
+                index.append((pattern, compiled, literal))
+            self._index, self._indexed_keys = index, keys
+        return self._index
+    
+    def _rebuild_fix_index(self):
+        self._fix_index = {fix.error_hash: fix for fix in self.fixes if fix.success}
     
     def _compute_error_hash(self, error_text: str, file_path: str) -> str:
         """计算错误内容的哈希值"""
@@ -179,24 +317,25 @@ def validate_field(cls, v):
         return hashlib.md5(content.encode()).hexdigest()
     
     def find_pattern_match(self, error_text: str) -> Optional[ErrorPattern]:
-        """查找匹配的错误模式"""
-        for pattern in self.patterns.values():
-            if re.search(pattern.pattern, error_text, re.IGNORECASE | re.MULTILINE):
+        """查找匹配的错误模式（按模式的添加顺序，第一个匹配的模式）"""
+        lowered = None
+        for pattern, compiled, literal in self._pattern_index():
+            if literal is not None:
+                if lowered is None:
+                    lowered = fold_text(error_text)
+                if literal not in lowered:
+                    continue
+            if compiled.search(error_text):
                 # 更新使用统计
                 pattern.use_count += 1
                 pattern.last_used = datetime.now().isoformat()
-                self._save_patterns()
+                self._schedule_save("patterns")
                 return pattern
         return None
     
     def find_cached_fix(self, error_text: str, file_path: str) -> Optional[CachedFix]:
-        """查找缓存的修复方案"""
-        error_hash = self._compute_error_hash(error_text, file_path)
-        
-        for fix in reversed(self.fixes):  # 从最新的开始查找
-            if fix.error_hash == error_hash and fix.success:
-                return fix
-        return None
+        """查找缓存的修复方案（同一错误最新的成功修复）"""
+        return self._fix_index.get(self._compute_error_hash(error_text, file_path))
     
     def add_fix_result(self, error_text: str, file_path: str, 
                       fix_content: str, success: bool):
@@ -211,15 +350,18 @@ def validate_field(cls, v):
             timestamp=datetime.now().isoformat()
         )
         
-        self.fixes.append(cached_fix)
-        self._save_fixes()
+        with self._lock:
+            self.fixes.append(cached_fix)
+            if success:
+                self._fix_index[error_hash] = cached_fix
+        self._schedule_save("fixes")
     
     def update_pattern_success_rate(self, pattern: ErrorPattern, success: bool):
         """更新模式成功率"""
         # 使用指数移动平均
         alpha = 0.1  # 平滑因子
         pattern.success_rate = (1 - alpha) * pattern.success_rate + alpha * (1.0 if success else 0.0)
-        self._save_patterns()
+        self._schedule_save("patterns")
     
     def get_stats(self) -> Dict:
         """获取缓存统计信息"""
@@ -1,10 +1,20 @@
 """增量修复策略实现"""
+import os
 import re
+import math
+import time
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
-import subprocess
+from typing import List, Dict, Tuple, Optional, Set, Callable
+from dataclasses import dataclass, field
 from ...utils.logger import get_logger
+from .compilation_cache import EXCLUDED_DIRS, snapshot_directory
+from .pytest_runner import (
+    get_test_runner, is_test_file, ImportGraph, TestFailure, TestRunResult, WarmTestRunner, IGNORED_SUFFIXES
+)
 
 logger = get_logger(__name__)
 
@@ -18,6 +28,7 @@ class TestError:
     error_message: str
     full_traceback: str
     line_number: Optional[int] = None
+    test_id: Optional[str] = None  # 失败测试的 pytest node id（结构化结果中才有）
 
 
 @dataclass
@@ -29,12 +40,43 @@ class FileToFix:
     dependencies: List[str] = None  # 依赖的其他文件
 
 
+@dataclass
+class FileFixOutcome:
+    """并发修复中一个文件的结果"""
+    file: FileToFix
+    status: str  # applied / rolled_back / conflict / no_change / failed
+    changed_files: List[str] = field(default_factory=list)
+    duration: float = 0.0  # 这个文件的修复（LLM）耗时
+    new_failures: List[str] = field(default_factory=list)  # 回滚原因：修复后新出现的失败测试
+
+
+@dataclass
+class ParallelFixReport:
+    """一批文件并发修复的结果和耗时"""
+    outcomes: List[FileFixOutcome]
+    fix_wall_time: float    # 并发修复阶段的实际耗时
+    sequential_time: float  # 各文件修复耗时之和（逐个修复所需的时间）
+    test_time: float = 0.0  # 应用修改后运行受影响测试的耗时
+    test_result: Optional[TestRunResult] = None
+
+    @property
+    def time_saved(self) -> float:
+        return max(0.0, self.sequential_time - self.fix_wall_time)
+
+
 class IncrementalFixer:
     """增量修复器"""
     
-    def __init__(self, project_dir: Path):
+    def __init__(self, project_dir: Path, test_runner: Optional[WarmTestRunner] = None):
+        """
+        Args:
+            project_dir: 项目目录（测试运行的目录，错误中的路径相对于它）
+            test_runner: 测试循环已经在使用的运行器，默认取 project_dir 的共享运行器
+        """
         self.project_dir = project_dir
         self.app_dir = project_dir / "app"
+        self._import_graph: Optional[ImportGraph] = None
+        self._test_runner = test_runner
         
         # 文件优先级映射
         self.priority_map = {
@@ -49,6 +91,12 @@ class IncrementalFixer:
             "tests": 9    # 目录
         }
     
+    @property
+    def test_runner(self) -> WarmTestRunner:
+        if self._test_runner is None:
+            self._test_runner = get_test_runner(self.project_dir)
+        return self._test_runner
+    
     def parse_pytest_output(self, error_output: str) -> List[TestError]:
         """解析pytest输出，提取错误信息"""
         errors = []
@@ -141,6 +189,103 @@ class IncrementalFixer:
         logger.info(f"Parsed {len(errors)} errors from pytest output")
         return errors
     
+    def errors_from_result(self, result: TestRunResult, use_coverage: bool = True) -> List[TestError]:
+        """从常驻 pytest 工作进程的结构化结果构造错误，不需要解析文本输出
+
+        出错的源文件取调用栈中最深的项目源文件帧。调用栈中没有源文件时（例如接口返回 500
+        后在测试中断言失败），重新运行这些测试文件并记录覆盖，用覆盖信息定位最可疑的源文件。
+        """
+        errors = []
+        unmapped = []
+        for failure in result.failures:
+            source, line_number = self._source_frame(failure)
+            error = TestError(
+                file_path=source or failure.test_file,
+                test_name=failure.nodeid.split("::", 1)[-1],
+                error_type=failure.exc_type,
+                error_message=failure.message,
+                full_traceback=failure.longrepr,
+                line_number=line_number if source else failure.lineno,
+                test_id=failure.nodeid
+            )
+            errors.append(error)
+            if source is None:
+                unmapped.append(error)
+
+        if unmapped and use_coverage:
+            self._map_with_coverage(unmapped)
+
+        logger.info(f"Collected {len(errors)} errors from structured test results "
+                    f"({len(unmapped)} located via coverage)")
+        return errors
+
+    def _project_path(self, path: Optional[str]) -> Optional[str]:
+        """调用栈中的路径 -> 项目内的相对路径（项目外或虚拟环境中的文件返回 None）"""
+        if not path:
+            return None
+        full_path = Path(path)
+        if not full_path.is_absolute():
+            full_path = self.project_dir / full_path
+        try:
+            relative = full_path.resolve().relative_to(Path(self.project_dir).resolve())
+        except ValueError:
+            return None
+        if relative.parts and (relative.parts[0] in EXCLUDED_DIRS or relative.parts[0].startswith(".")):
+            return None
+        return relative.as_posix()
+
+    @staticmethod
+    def _is_source_file(path: Optional[str]) -> bool:
+        return bool(path) and path.endswith(".py") and not path.startswith("tests/") \
+            and not is_test_file(path) and Path(path).name != "conftest.py"
+
+    def _source_frame(self, failure: TestFailure) -> Tuple[Optional[str], Optional[int]]:
+        """调用栈中最深的项目源文件帧（测试文件之外）"""
+        for frame in reversed(failure.traceback):
+            path = self._project_path(frame.get("path"))
+            if self._is_source_file(path):
+                return path, frame.get("lineno")
+        path = self._project_path(failure.path)
+        if self._is_source_file(path):
+            return path, failure.lineno
+        return None, None
+
+    def _map_with_coverage(self, errors: List[TestError]):
+        """用失败测试所在文件的覆盖信息（同一文件中通过的测试作为对照）定位源文件"""
+        test_files = sorted({error.test_id.split("::", 1)[0] for error in errors})
+        result = self.test_runner.run(test_files, trace=True)
+        if not result.coverage:
+            logger.debug(f"No coverage collected for {test_files}")
+            return
+
+        failed = {failure.nodeid for failure in result.failures}
+        coverage = {
+            nodeid: [path for path in files if self._is_source_file(path)]
+            for nodeid, files in result.coverage.items()
+        }
+        scores, passed_counts = self.suspiciousness(coverage, failed)
+        for error in errors:
+            covered = coverage.get(error.test_id)
+            if not covered:
+                continue
+            # 可疑度相同时选择被通过的测试执行得最少的文件
+            error.file_path = min(covered, key=lambda path: (-scores[path], passed_counts[path], path))
+            error.line_number = None
+            logger.debug(f"Located {error.test_id} -> {error.file_path} (score {scores[error.file_path]:.2f})")
+
+    @staticmethod
+    def suspiciousness(coverage: Dict[str, List[str]], failed: Set[str]) -> Tuple[Dict[str, float], Counter]:
+        """Ochiai 可疑度：失败测试执行到越多、通过的测试执行到越少的文件越可疑"""
+        failed_counts, passed_counts = Counter(), Counter()
+        for nodeid, files in coverage.items():
+            (failed_counts if nodeid in failed else passed_counts).update(files)
+        total_failed = max(1, sum(1 for nodeid in coverage if nodeid in failed))
+        scores = {
+            path: failed_counts[path] / math.sqrt(total_failed * (failed_counts[path] + passed_counts[path]))
+            for path in set(failed_counts) | set(passed_counts)
+        }
+        return scores, passed_counts
+
     def _save_current_error(self, errors: List[TestError], test_error: TestError, 
                            error_file: str, traceback: List[str]):
         """保存当前错误信息"""
@@ -301,6 +446,7 @@ class IncrementalFixer:
     def prioritize_files(self, file_errors: Dict[str, List[TestError]]) -> List[FileToFix]:
         """对需要修复的文件进行优先级排序"""
         files_to_fix = []
+        self._import_graph = None  # 文件可能已被修改，重新分析 import
         
         for file_path, errors in file_errors.items():
             priority = self._calculate_priority(file_path)
@@ -335,57 +481,53 @@ class IncrementalFixer:
         return 99
     
     def _find_dependencies(self, file_path: str) -> List[str]:
-        """查找文件的依赖"""
-        dependencies = []
-        file_full_path = self.project_dir / file_path
-        
-        if not file_full_path.exists():
-            return dependencies
-        
-        try:
-            with open(file_full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 查找导入语句
-            import_pattern = r"from\s+(\S+)\s+import|import\s+(\S+)"
-            matches = re.findall(import_pattern, content)
-            
-            for match in matches:
-                module = match[0] or match[1]
-                # 只关注项目内的导入
-                if module.startswith("app."):
-                    dep_path = module.replace(".", "/") + ".py"
-                    dependencies.append(dep_path)
-        
-        except Exception as e:
-            logger.warning(f"Failed to analyze dependencies for {file_path}: {e}")
-        
-        return dependencies
+        """查找文件导入的项目内文件（包括相对导入和各级包的 __init__.py）"""
+        if self._import_graph is None:
+            try:
+                self._import_graph = ImportGraph(self.project_dir)
+            except Exception as e:
+                logger.warning(f"Failed to analyze imports of {self.project_dir}: {e}")
+                return []
+        return sorted(self._import_graph.imports.get(Path(file_path).as_posix(), ()))
     
     def create_fix_batch(self, files_to_fix: List[FileToFix], 
                         batch_size: int = 3) -> List[List[FileToFix]]:
-        """创建修复批次，考虑依赖关系"""
+        """创建修复批次，考虑依赖关系
+
+        同一批次中的文件之间没有 import 关系，可以并发修复；一个文件所依赖的待修复文件
+        在更早的批次中修复。
+        """
         batches = []
         processed = set()
+        pending = {file.path.as_posix() for file in files_to_fix}
+        
+        def dependencies(file: FileToFix) -> Set[str]:
+            # 只有同样需要修复的文件才构成约束
+            return {dep for dep in (file.dependencies or []) if dep in pending and dep != file.path.as_posix()}
         
         while len(processed) < len(files_to_fix):
             batch = []
+            batch_paths = set()
             
             for file in files_to_fix:
-                if file.path.as_posix() in processed:
+                path = file.path.as_posix()
+                if path in processed or path in batch_paths or len(batch) >= batch_size:
                     continue
                 
-                # 检查依赖是否已处理
-                deps_processed = all(
-                    dep in processed for dep in (file.dependencies or [])
+                # 检查依赖是否已在之前的批次中处理，且与本批次的文件互不导入
+                deps = dependencies(file)
+                deps_processed = deps <= processed
+                independent = not (deps & batch_paths) and not any(
+                    path in dependencies(other) for other in batch
                 )
                 
-                if deps_processed and len(batch) < batch_size:
+                if deps_processed and independent:
                     batch.append(file)
-                    processed.add(file.path.as_posix())
+                    batch_paths.add(path)
             
             if batch:
                 batches.append(batch)
+                processed |= batch_paths
             else:
                 # 处理循环依赖的情况
                 for file in files_to_fix:
@@ -397,24 +539,168 @@ class IncrementalFixer:
         
         return batches
     
-    def run_single_file_test(self, test_file: str) -> Tuple[bool, str]:
-        """运行单个测试文件"""
+    def fix_files_concurrently(self, files: List[FileToFix],
+                               fix_file: Callable[[FileToFix, Path], bool],
+                               previous: Optional[TestRunResult] = None,
+                               max_workers: int = 3) -> ParallelFixReport:
+        """并发修复一批互相独立的文件
+
+        每个修复在项目的独立副本中进行（fix_file(file, workspace) 调用 LLM 修改副本），
+        完成后收集各副本中修改的文件。修改了相同文件的修复只应用优先级高的一个，其余
+        留到下一轮；其余修改一次性原子地写回项目，然后运行一次受影响的测试。修复后新
+        出现的失败测试（previous 中没有失败）归因到调用栈或 import 关系涉及的修复，
+        这些修复被回滚。
+        """
+        baseline = {path: content for path, content in snapshot_directory(self.project_dir).items()
+                    if self._is_tracked(path)}
+        
+        def run(file: FileToFix) -> Tuple[bool, Dict[str, Optional[bytes]], float]:
+            workspace = Path(tempfile.mkdtemp(prefix="pim_fix_"))
+            try:
+                shutil.copytree(self.project_dir, workspace, dirs_exist_ok=True,
+                                ignore=shutil.ignore_patterns(*EXCLUDED_DIRS))
+                start = time.time()
+                try:
+                    fixed = fix_file(file, workspace)
+                except Exception as e:
+                    logger.error(f"Fix of {file.path} raised: {e}")
+                    fixed = False
+                duration = time.time() - start
+                edits = self._collect_edits(baseline, workspace) if fixed else {}
+                return fixed, edits, duration
+            finally:
+                shutil.rmtree(workspace, ignore_errors=True)
+        
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+            results = list(executor.map(run, files))
+        fix_wall_time = time.time() - start
+        
+        # 按优先级顺序接受修改，修改了已被接受的文件的修复视为冲突
+        outcomes = []
+        claimed = set()
+        accepted: Dict[str, Optional[bytes]] = {}
+        for file, (fixed, edits, duration) in zip(files, results):
+            outcome = FileFixOutcome(file=file, status="failed", changed_files=sorted(edits), duration=duration)
+            if fixed and not edits:
+                outcome.status = "no_change"
+            elif fixed and claimed & set(edits):
+                outcome.status = "conflict"
+                logger.info(f"Fix of {file.path} conflicts with another fix on {sorted(claimed & set(edits))}, deferred")
+            elif fixed:
+                outcome.status = "applied"
+                claimed |= set(edits)
+                accepted.update(edits)
+            outcomes.append(outcome)
+        
+        report = ParallelFixReport(
+            outcomes=outcomes,
+            fix_wall_time=fix_wall_time,
+            sequential_time=sum(outcome.duration for outcome in outcomes)
+        )
+        applied = [outcome for outcome in outcomes if outcome.status == "applied"]
+        if not applied:
+            return report
+        
+        self._write_files(accepted)
+        logger.info(f"Applied fixes of {len(applied)} files ({len(accepted)} changed files)")
+        
+        start = time.time()
+        report.test_result = self.test_runner.run_affected()
+        report.test_time = time.time() - start
+        if report.test_result.error:
+            logger.warning(f"Could not verify fixes: {report.test_result.error[:200]}")
+            return report
+        
+        # 找出让测试变差的修复并回滚
+        previously_failing = {failure.nodeid for failure in previous.failures} if previous else set()
+        new_failures = [f for f in report.test_result.failures if f.nodeid not in previously_failing]
+        unexplained = []
+        for failure in new_failures:
+            touched = {self._project_path(frame.get("path")) for frame in failure.traceback}
+            culprits = [outcome for outcome in applied if touched & set(outcome.changed_files)]
+            if culprits:
+                for outcome in culprits:
+                    outcome.new_failures.append(failure.nodeid)
+            else:
+                unexplained.append(failure)
+        if unexplained:
+            self._blame_by_coverage(unexplained, applied)
+        
+        rollback = {}
+        for outcome in applied:
+            if outcome.new_failures:
+                outcome.status = "rolled_back"
+                rollback.update({path: baseline.get(path) for path in outcome.changed_files})
+                logger.warning(f"Rolling back fix of {outcome.file.path}: "
+                               f"{len(outcome.new_failures)} new failing tests ({outcome.new_failures[:3]})")
+        if rollback:
+            self._write_files(rollback)
+        return report
+    
+    def _blame_by_coverage(self, failures: List[TestFailure], applied: List[FileFixOutcome]):
+        """调用栈无法说明原因的新失败：按失败测试执行到的文件归因，没有覆盖信息时按 import 关系"""
+        coverage = self.test_runner.run(
+            sorted({failure.test_file for failure in failures}), trace=True
+        ).coverage
+        graph = None
+        for failure in failures:
+            covered = set(coverage.get(failure.nodeid, ()))
+            if covered:
+                culprits = [outcome for outcome in applied if covered & set(outcome.changed_files)]
+            else:
+                graph = graph or ImportGraph(self.project_dir)
+                culprits = [outcome for outcome in applied
+                            if failure.test_file in graph.dependents(outcome.changed_files)]
+            for outcome in culprits:
+                outcome.new_failures.append(failure.nodeid)
+    
+    @staticmethod
+    def _is_tracked(path: str) -> bool:
+        """修复产生的修改中需要应用的文件（忽略日志、数据库、字节码等）"""
+        return Path(path).suffix not in IGNORED_SUFFIXES and "__pycache__" not in Path(path).parts
+    
+    def _collect_edits(self, baseline: Dict[str, bytes], workspace: Path) -> Dict[str, Optional[bytes]]:
+        """副本中相对原项目的修改：相对路径 -> 新内容（None 表示删除）"""
+        current = {path: content for path, content in snapshot_directory(workspace).items()
+                   if self._is_tracked(path)}
+        edits = {path: content for path, content in current.items() if baseline.get(path) != content}
+        edits.update({path: None for path in baseline if path not in current})
+        return edits
+    
+    def _write_files(self, contents: Dict[str, Optional[bytes]]):
+        """原子地写入一组文件：先全部写入临时文件，成功后再逐个替换（None 表示删除）"""
+        staged = []
         try:
-            cmd = ["python", "-m", "pytest", test_file, "-xvs"]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=self.project_dir,
-                timeout=60  # 单文件测试超时时间短
-            )
-            
-            return result.returncode == 0, result.stdout + result.stderr
-            
-        except subprocess.TimeoutExpired:
-            return False, "Test timeout"
-        except Exception as e:
-            return False, str(e)
+            for path, content in contents.items():
+                if content is None:
+                    continue
+                target = self.project_dir / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(content)
+                staged.append((tmp_path, target))
+        except OSError:
+            for tmp_path, _ in staged:
+                tmp_path.unlink(missing_ok=True)
+            raise
+        for tmp_path, target in staged:
+            os.replace(tmp_path, target)
+        for path, content in contents.items():
+            if content is None:
+                (self.project_dir / path).unlink(missing_ok=True)
+    
+    def run_single_file_test(self, test_file: str) -> Tuple[bool, str]:
+        """运行单个测试文件（使用项目的常驻 pytest 工作进程）"""
+        result = self.test_runner.run([test_file], timeout=60)  # 单文件测试超时时间短
+        return result.passed, result.output
+
+    def run_affected_tests(self) -> Tuple[bool, str]:
+        """只运行受刚才修改的文件影响的测试（以及之前失败的测试）"""
+        result = self.test_runner.run_affected(timeout=60)
+        if result.selected is not None:
+            logger.info(f"Ran {len(result.selected)} affected test files for changes {result.changed}")
+        return result.passed, result.output
     
     def generate_file_specific_prompt(self, file: FileToFix) -> str:
         """生成针对特定文件的修复提示"""
@@ -0,0 +1,187 @@
+"""
+PIM 分节与差异比较
+
+把 PIM Markdown 按二级标题拆成几类（概述、业务实体、业务服务、业务流程、业务规则），
+每类再按三级标题拆成条目并计算内容摘要。与上次编译的摘要比较后，生成器只需重新
+生成受影响的 PSM 章节和代码，其余部分沿用上次的结果。
+"""
+
+import re
+import json
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Iterable, Optional, Any
+
+# 分类 -> 二级标题关键字（按顺序匹配）
+PIM_CATEGORIES = {
+    "entities": ["实体", "entit", "数据模型", "domain model"],
+    "services": ["服务", "service", "操作"],
+    "flows": ["流程", "flow", "process"],
+    "rules": ["规则", "rule", "约束", "constraint"],
+}
+OVERVIEW = "overview"  # 标题之外的描述、其它二级标题
+
+CATEGORY_NAMES = {
+    OVERVIEW: "概述",
+    "entities": "业务实体",
+    "services": "业务服务",
+    "flows": "业务流程",
+    "rules": "业务规则",
+}
+
+
+def heading_category(title: str) -> str:
+    title = title.lower()
+    for category, keywords in PIM_CATEGORIES.items():
+        if any(keyword in title for keyword in keywords):
+            return category
+    return OVERVIEW
+
+
+def _digest(lines: List[str]) -> str:
+    # 忽略行尾空白和空行的变化
+    text = "\n".join(line.rstrip() for line in lines if line.strip())
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_pim_sections(pim_content: str) -> Dict[str, Dict[str, str]]:
+    """把 PIM 拆成 分类 -> {条目标题: 内容摘要}
+
+    条目是三级标题（### 文章 (Article)）及其下的内容；二级标题下、第一个三级标题
+    之前的文字作为该分类中标题为 "" 的条目。
+    """
+    sections: Dict[str, Dict[str, List[str]]] = {}
+    category, item = OVERVIEW, ""
+    for line in pim_content.splitlines():
+        heading = re.match(r'^(#{1,3})\s+(.*)$', line)
+        if heading:
+            level, title = len(heading.group(1)), heading.group(2).strip()
+            if level == 1:
+                category, item = OVERVIEW, ""
+            elif level == 2:
+                category, item = heading_category(title), ""
+                if category == OVERVIEW:
+                    item = title  # 其它二级标题各自作为概述中的条目
+            else:
+                item = title
+            sections.setdefault(category, {}).setdefault(item, [])
+            if level < 3:
+                continue
+        sections.setdefault(category, {}).setdefault(item, []).append(line)
+
+    return {
+        category: {title: _digest(lines) for title, lines in items.items()}
+        for category, items in sections.items()
+    }
+
+
+@dataclass
+class PIMDiff:
+    """两个版本 PIM 之间的差异（按分类列出条目）"""
+    added: Dict[str, List[str]] = field(default_factory=dict)
+    removed: Dict[str, List[str]] = field(default_factory=dict)
+    modified: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def changed_categories(self) -> List[str]:
+        categories = set(self.added) | set(self.removed) | set(self.modified)
+        return [c for c in CATEGORY_NAMES if c in categories]
+
+    def is_empty(self) -> bool:
+        return not self.changed_categories
+
+    def reasons(self, categories: Optional[Iterable[str]] = None) -> List[str]:
+        """可读的变更说明，如 "业务实体 修改: 文章 (Article)" """
+        categories = self.changed_categories if categories is None else categories
+        reasons = []
+        for category in categories:
+            name = CATEGORY_NAMES.get(category, category)
+            for label, changes in (("新增", self.added), ("删除", self.removed), ("修改", self.modified)):
+                items = [item or "(说明)" for item in changes.get(category, [])]
+                if items:
+                    reasons.append(f"{name} {label}: {', '.join(items)}")
+        return reasons
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"added": self.added, "removed": self.removed, "modified": self.modified}
+
+
+def diff_pim(old: Dict[str, Dict[str, str]], new: Dict[str, Dict[str, str]]) -> PIMDiff:
+    """比较两次 parse_pim_sections 的结果"""
+    diff = PIMDiff()
+    for category in set(old) | set(new):
+        old_items, new_items = old.get(category, {}), new.get(category, {})
+        added = [item for item in new_items if item not in old_items]
+        removed = [item for item in old_items if item not in new_items]
+        modified = [item for item in new_items if item in old_items and new_items[item] != old_items[item]]
+        if added:
+            diff.added[category] = added
+        if removed:
+            diff.removed[category] = removed
+        if modified:
+            diff.modified[category] = modified
+    return diff
+
+
+def affected_targets(diff: PIMDiff, dependencies: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """根据 目标 -> 依赖的 PIM 分类，返回需要重新生成的目标及原因"""
+    changed = set(diff.changed_categories)
+    return {
+        target: diff.reasons([c for c in diff.changed_categories if c in categories])
+        for target, categories in dependencies.items()
+        if changed & set(categories)
+    }
+
+
+def dependent_targets(targets: Iterable[str], dependencies: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """targets 的所有直接和间接下游目标（不含 targets 本身）及原因
+
+    dependencies 为 目标 -> 依赖的目标列表（DAG）。下游目标基于上游的生成结果，
+    上游重新生成后下游也必须重新生成。
+    """
+    dependents: Dict[str, List[str]] = {}
+    for target, deps in dependencies.items():
+        for dep in deps:
+            dependents.setdefault(dep, []).append(target)
+
+    targets = list(targets)
+    result: Dict[str, List[str]] = {}
+    stack = list(targets)
+    while stack:
+        upstream = stack.pop()
+        for target in dependents.get(upstream, []):
+            if target in targets:
+                continue
+            reason = f"依赖的 {upstream} 将重新生成"
+            if target not in result:
+                result[target] = [reason]
+                stack.append(target)
+            elif reason not in result[target]:
+                result[target].append(reason)
+    return result
+
+
+def content_hash(*parts: Any) -> str:
+    """任意可 JSON 序列化内容的摘要（用于状态文件的适用条件）"""
+    source = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def load_state(path: Path, base: str) -> Optional[Dict[str, Any]]:
+    """读取增量状态文件，base（平台、模型、结构等）不同时返回 None"""
+    try:
+        state = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("base") != base:
+        return None
+    return state
+
+
+def save_state(path: Path, base: str, **data):
+    """原子地写入增量状态文件"""
+    path = Path(path)
+    temp_file = path.with_name(path.name + ".tmp")
+    temp_file.write_text(json.dumps({"base": base, **data}, ensure_ascii=False), encoding='utf-8')
+    temp_file.replace(path)
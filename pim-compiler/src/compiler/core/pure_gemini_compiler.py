@@ -10,7 +10,6 @@ from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 from datetime import datetime
 from dotenv import load_dotenv
-from collections import namedtuple
 
 # 加载环境变量
 load_dotenv()
@@ -18,7 +17,10 @@ load_dotenv()
 from ..config import CompilerConfig
 from src.utils.logger import get_logger
 from .error_pattern_cache import ErrorPatternCache
+from .compilation_cache import CompilationCache
 from .incremental_fixer import IncrementalFixer
+from .pytest_runner import get_test_runner, stop_test_runners, TestRunResult
+from .cli_runner import run_cli_sync, CLIResult
 from .prompts import (
     PSM_GENERATION_PROMPT,
     CODE_GENERATION_PROMPT,
@@ -42,8 +44,8 @@ from .prompts import (
 
 logger = get_logger(__name__)
 
-# 定义命令结果类型
-CommandResult = namedtuple('CommandResult', ['returncode', 'stdout', 'stderr'])
+# Gemini CLI 生成代码时检查进度的间隔（秒）
+PROGRESS_CHECK_INTERVAL = 10
 
 
 @dataclass
@@ -81,6 +83,10 @@ class PureGeminiCompiler:
         self.gemini_cli_path = self._find_gemini_cli()
         self.error_cache = ErrorPatternCache()
         self.use_incremental_fix = True  # 启用增量修复
+        self.last_test_result: Optional[TestRunResult] = None
+        self.cache: Optional[CompilationCache] = None
+        if config.enable_cache:
+            self.cache = CompilationCache(config.cache_dir, config.cache_max_size_mb * 1024 * 1024)
         
     def _find_gemini_cli(self) -> str:
         """查找 Gemini CLI 路径"""
@@ -101,9 +107,17 @@ class PureGeminiCompiler:
         logger.info("Using Gemini CLI from system PATH")
         return "gemini"
     
+    def _cache_key(self, stage: str, content: str, prompt: str, knowledge: str) -> str:
+        """内容寻址缓存键（提示词模板和知识库内容都参与计算）"""
+        return CompilationCache.make_key(
+            stage, content, "gemini-cli", self.config.gemini_model,
+            prompt + "\0" + knowledge, self.config.target_platform
+        )
+    
     def compile(self, pim_file: Path) -> CompilationResult:
         """编译 PIM 文件"""
         start_time = datetime.now()
+        cache_start = self.cache.counters() if self.cache else (0, 0)
         
         try:
             # 验证输入文件
@@ -122,6 +136,7 @@ class PureGeminiCompiler:
             # 项目根目录就是 generated/{project_name}
             code_dir = work_dir / "generated" / pim_file.stem
             if code_dir.exists():
+                stop_test_runners(code_dir)
                 shutil.rmtree(code_dir)
             code_dir.mkdir(parents=True, exist_ok=True)
             
@@ -136,8 +151,10 @@ class PureGeminiCompiler:
                 # 如果不存在，尝试从当前工作目录查找
                 knowledge_file = Path.cwd() / "GEMINI_KNOWLEDGE.md"
             
+            knowledge = ""
             if knowledge_file.exists():
                 shutil.copy2(knowledge_file, code_dir / "GEMINI_KNOWLEDGE.md")
+                knowledge = knowledge_file.read_text(encoding='utf-8')
                 logger.info(f"Copied knowledge file to {code_dir / 'GEMINI_KNOWLEDGE.md'}")
             else:
                 logger.warning(f"Knowledge file not found at {knowledge_file}")
@@ -147,13 +164,22 @@ class PureGeminiCompiler:
             psm_file = code_dir / f"{pim_file.stem}_psm.md"
             psm_start = time.time()
             
-            success = self._generate_psm(pim_copy, psm_file, code_dir)
-            if not success:
-                return CompilationResult(
-                    success=False,
-                    pim_file=pim_file,
-                    error="Failed to generate PSM"
-                )
+            pim_content = pim_copy.read_text(encoding='utf-8')
+            psm_key = self._cache_key("pim_to_psm", pim_content, PSM_GENERATION_PROMPT, knowledge)
+            cached_psm = self.cache.get_psm(psm_key) if self.cache else None
+            if cached_psm is not None:
+                logger.info("Using cached PSM")
+                psm_file.write_text(cached_psm, encoding='utf-8')
+            else:
+                success = self._generate_psm(pim_copy, psm_file, code_dir)
+                if not success:
+                    return CompilationResult(
+                        success=False,
+                        pim_file=pim_file,
+                        error="Failed to generate PSM"
+                    )
+                if self.cache:
+                    self.cache.put_psm(psm_key, psm_file.read_text(encoding='utf-8'))
             
             psm_time = time.time() - psm_start
             logger.info(f"PSM generated in {psm_time:.2f} seconds")
@@ -164,14 +190,25 @@ class PureGeminiCompiler:
             logger.info("Step 2: Generating code with Gemini CLI...")
             code_start = time.time()
             
-            success = self._generate_code(psm_file, code_dir, code_dir)
-            if not success:
-                return CompilationResult(
-                    success=False,
-                    pim_file=pim_file,
-                    psm_file=psm_file,
-                    error="Failed to generate code"
-                )
+            psm_content = psm_file.read_text(encoding='utf-8')
+            code_key = self._cache_key("psm_to_code", psm_content, CODE_GENERATION_PROMPT, knowledge)
+            restored = self.cache.restore_files(code_key, code_dir) if self.cache else None
+            if restored is not None:
+                logger.info(f"Restored {len(restored)} generated files from cache")
+            else:
+                success = self._generate_code(psm_file, code_dir, code_dir)
+                if not success:
+                    return CompilationResult(
+                        success=False,
+                        pim_file=pim_file,
+                        psm_file=psm_file,
+                        error="Failed to generate code"
+                    )
+                if self.cache:
+                    # 只缓存生成的文件，输入文件和日志不进入缓存
+                    self.cache.put_directory(code_key, code_dir, exclude={
+                        pim_file.name, psm_file.name, "GEMINI_KNOWLEDGE.md", "gemini.log"
+                    })
             
             code_time = time.time() - code_start
             logger.info(f"Code generated in {code_time:.2f} seconds")
@@ -185,7 +222,8 @@ class PureGeminiCompiler:
                 "total_files": file_count,
                 "python_files": len(py_files),
                 "psm_generation_time": int(psm_time),
-                "code_generation_time": int(code_time)
+                "code_generation_time": int(code_time),
+                **(self.cache.get_stats(cache_start) if self.cache else {})
             }
             
             # 步骤 3: 运行测试和修复（如果启用）
@@ -395,122 +433,56 @@ class PureGeminiCompiler:
        
     def _execute_gemini_cli(self, prompt: str, work_dir: Path, timeout: int = 300, 
                             monitor_progress: bool = False, target_dir: Optional[Path] = None) -> bool:
-        """执行 Gemini CLI 命令，支持 API 500 错误重试"""
-        # API 500 错误重试配置
-        max_retries = 3
-        retry_delay = 5  # 初始延迟秒数
-        
-        for attempt in range(max_retries):
-            try:
-                # 准备环境变量
-                env = os.environ.copy()
-                # 处理 API key 冲突
-                if "GOOGLE_API_KEY" in env and "GEMINI_API_KEY" in env:
-                    del env["GOOGLE_API_KEY"]
-                
-                # 获取 Gemini 模型配置
-                model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-                
-                if attempt > 0:
-                    logger.info(f"Retry attempt {attempt + 1}/{max_retries} for Gemini CLI")
-                else:
-                    logger.info(f"Executing Gemini CLI with model {model}")
-                    logger.info(f"Gemini CLI working directory (absolute): {work_dir.resolve()}")
-                
-                if monitor_progress and target_dir:
-                    # 使用进程监控
-                    success, is_api_error = self._execute_with_monitoring(prompt, work_dir, env, model, timeout, target_dir)
-                else:
-                    # 简单执行，同时保存输出到日志
-                    gemini_log_path = work_dir / "gemini.log"
-                    logger.info(f"Gemini CLI output will be saved to: {gemini_log_path}")
-                    
-                    with open(gemini_log_path, "w", encoding="utf-8") as log_file:
-                        # 先写入提示词
-                        log_file.write(f"=== GEMINI CLI PROMPT ===\n{prompt}\n\n=== GEMINI CLI OUTPUT ===\n")
-                        log_file.flush()
-                        
-                        # 直接使用提示词，不再判断长度
-                        process = subprocess.Popen(
-                            [self.gemini_cli_path, "-m", model, "-p", prompt, "-y"],
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.STDOUT,
-                            text=True,
-                            env=env,
-                            cwd=work_dir
-                        )
-                        
-                        output_lines = []
-                        if process.stdout:
-                            while True:
-                                line = process.stdout.readline()
-                                if not line and process.poll() is not None:
-                                    break
-                                if line:
-                                    log_file.write(line)
-                                    log_file.flush()
-                                    output_lines.append(line.rstrip())
-                        
-                        # 等待进程结束，但要处理超时
-                        try:
-                            return_code = process.wait(timeout=timeout)
-                        except subprocess.TimeoutExpired:
-                            logger.warning(f"Gemini CLI timeout after {timeout} seconds, terminating...")
-                            process.terminate()
-                            try:
-                                return_code = process.wait(timeout=5)
-                            except subprocess.TimeoutExpired:
-                                logger.warning("Force killing Gemini CLI process...")
-                                process.kill()
-                                return_code = process.wait()
-                            log_file.write(f"\n\n=== TIMEOUT: Process terminated after {timeout} seconds ===\n")
-                        
-                    # 构造结果对象以保持兼容性
-                    result = CommandResult(
-                        returncode=return_code,
-                        stdout='\n'.join(output_lines),
-                        stderr='' if return_code == 0 else '\n'.join(output_lines)
-                    )
-                    
-                    if result.returncode != 0:
-                        # 检查是否是 API 500 错误
-                        is_api_error = self._is_api_500_error(result.stderr)
-                        
-                        if is_api_error and attempt < max_retries - 1:
-                            logger.warning(f"Gemini API 500 error detected, will retry after {retry_delay} seconds")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2  # 指数退避
-                            continue
-                        
-                        logger.error(f"Gemini CLI failed with return code {result.returncode}")
-                        if result.stderr:
-                            logger.error(f"Error: {result.stderr}")
-                        return False
-                    
-                    success = True
-                    is_api_error = False
-                
-                # 如果是 API 错误且还有重试机会
-                if not success and is_api_error and attempt < max_retries - 1:
-                    logger.warning(f"Gemini API error detected, will retry after {retry_delay} seconds")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # 指数退避
-                    continue
-                
-                return success
-                    
-            except subprocess.TimeoutExpired:
-                logger.error(f"Gemini CLI timed out after {timeout} seconds")
-                # 超时不重试
-                return False
-            except Exception as e:
-                logger.error(f"Failed to execute Gemini CLI: {e}")
-                # 其他异常不重试
-                return False
+        """执行 Gemini CLI 命令，支持 API 500 错误重试
+
+        子进程由共享的异步运行器（cli_runner）执行：输出流式写入 work_dir/gemini.log，
+        API 500 错误时指数退避重试，同时运行的 Gemini CLI 进程数受
+        PIM_CLI_CONCURRENCY_GEMINI_CLI 限制。
+        """
+        # 准备环境变量
+        env = os.environ.copy()
+        # 处理 API key 冲突
+        if "GOOGLE_API_KEY" in env and "GEMINI_API_KEY" in env:
+            del env["GOOGLE_API_KEY"]
+        
+        # 获取 Gemini 模型配置
+        model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+        logger.info(f"Executing Gemini CLI with model {model}")
+        logger.info(f"Gemini CLI working directory (absolute): {work_dir.resolve()}")
+        
+        gemini_log_path = work_dir / "gemini.log"
+        logger.info(f"Gemini CLI output will be saved to: {gemini_log_path}")
+        monitor = monitor_progress and target_dir is not None
+        
+        try:
+            result = run_cli_sync(
+                [self.gemini_cli_path, "-m", model, "-p", prompt, "-y"],
+                cwd=work_dir,
+                env=env,
+                timeout=timeout,
+                log_path=gemini_log_path,
+                log_header=f"=== GEMINI CLI PROMPT ===\n{prompt}\n\n=== GEMINI CLI OUTPUT ===\n",
+                stop_when=self._progress_monitor(target_dir) if monitor else None,
+                check_interval=PROGRESS_CHECK_INTERVAL,
+                max_retries=3,
+                retry_delay=5,  # 初始延迟秒数，之后每次翻倍
+                retry_on=API_ERROR_PATTERNS,
+                concurrency_key="gemini-cli"
+            )
+        except Exception as e:
+            logger.error(f"Failed to execute Gemini CLI: {e}")
+            return False
+        
+        if result.returncode != 0 and not result.stopped:
+            logger.error(f"Gemini CLI failed with return code {result.returncode}")
+            if result.output:
+                logger.error(f"Error: {result.output}")
+            if self._is_api_500_error(result.output):
+                logger.error(f"All {result.attempts} attempts failed for Gemini CLI")
         
-        # 所有重试都失败
-        logger.error(f"All {max_retries} attempts failed for Gemini CLI")
-        return False
+        if monitor:
+            return self._collect_generated_files(work_dir, target_dir, result)
+        return result.success
     
     
     def _is_api_500_error(self, error_text: str) -> bool:
@@ -520,96 +492,38 @@ class PureGeminiCompiler:
         
         return any(pattern in error_text for pattern in API_ERROR_PATTERNS)
     
-    def _execute_with_monitoring(self, prompt: str, work_dir: Path, env: dict, 
-                                model: str, timeout: int, target_dir: Path) -> tuple[bool, bool]:
-        """执行 Gemini CLI 并监控进度"""
-        # 创建日志文件
-        gemini_log_path = work_dir / "gemini.log"
-        logger.info(f"Gemini CLI output will be saved to: {gemini_log_path}")
-        
-        with open(gemini_log_path, "w", encoding="utf-8") as log_file:
-            # 先写入提示词
-            log_file.write(f"=== GEMINI CLI PROMPT ===\n{prompt}\n\n=== GEMINI CLI OUTPUT ===\n")
-            log_file.flush()
-            
-            # 直接使用提示词，不再判断长度
-            process = subprocess.Popen(
-                [self.gemini_cli_path, "-m", model, "-p", prompt, "-y"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                cwd=work_dir
-            )
+    def _progress_monitor(self, target_dir: Path, max_no_progress: int = 6):
+        """生成代码时的进度检查，由运行器每 PROGRESS_CHECK_INTERVAL 秒调用一次
+
+        关键文件已经生成、且连续 max_no_progress 次检查没有新文件时返回 True，提前结束 Gemini CLI。
+        """
+        state = {"last_file_count": 0, "no_progress_count": 0}
         
-        start_time = time.time()
-        check_interval = 10
-        last_file_count = 0
-        no_progress_count = 0
-        max_no_progress = 6  # 60秒没有新文件
-        
-        while True:
-            # 检查进程是否结束
-            poll_result = process.poll()
-            if poll_result is not None:
-                stdout, stderr = process.communicate()
-                if poll_result != 0:
-                    logger.error(f"Gemini CLI failed with return code {poll_result}")
-                    if stderr:
-                        logger.error(f"Error: {stderr}")
-                    if stdout:
-                        logger.error(f"Output: {stdout[:500]}")  # Log first 500 chars
-                break
-            
-            # 检查超时
-            if time.time() - start_time > timeout:
-                logger.warning("Gemini CLI timeout, terminating process...")
-                process.terminate()
-                time.sleep(2)
-                if process.poll() is None:
-                    process.kill()
-                stdout, stderr = process.communicate()
-                if stderr:
-                    logger.error(f"Timeout stderr: {stderr}")
-                break
-            
-            # 监控文件生成进度
-            if target_dir.exists():
-                try:
-                    current_files = list(target_dir.rglob("*"))
-                    # 排除虚拟环境目录中的文件
-                    file_count = len([f for f in current_files if f.is_file() and "venv" not in str(f) and "__pycache__" not in str(f)])
-                    
-                    if file_count > last_file_count:
-                        logger.info(f"Progress: {file_count} files generated")
-                        last_file_count = file_count
-                        no_progress_count = 0
-                    else:
-                        no_progress_count += 1
-                    
-                    # 检查关键文件
-                    if self._check_key_files(current_files) and no_progress_count >= max_no_progress:
-                        logger.info(f"Key files generated and no new files for {no_progress_count * check_interval}s")
-                        process.terminate()
-                        time.sleep(2)
-                        if process.poll() is None:
-                            process.kill()
-                        stdout, stderr = process.communicate()
-                        break
-                        
-                except Exception as e:
-                    logger.warning(f"Error checking files: {e}")
+        def check() -> bool:
+            if not target_dir.exists():
+                return False
+            current_files = list(target_dir.rglob("*"))
+            # 排除虚拟环境目录中的文件
+            file_count = len([f for f in current_files if f.is_file() and "venv" not in str(f) and "__pycache__" not in str(f)])
+            
+            if file_count > state["last_file_count"]:
+                logger.info(f"Progress: {file_count} files generated")
+                state["last_file_count"] = file_count
+                state["no_progress_count"] = 0
+            else:
+                state["no_progress_count"] += 1
             
-            time.sleep(check_interval)
-        
-        # 检查最终结果
-        success = False
-        is_api_error = False
-        
-        # 首先检查是否是 API 500 错误
-        if poll_result != 0 and stderr:
-            is_api_error = self._is_api_500_error(stderr)
+            # 检查关键文件
+            if self._check_key_files(current_files) and state["no_progress_count"] >= max_no_progress:
+                logger.info(f"Key files generated and no new files for "
+                            f"{state['no_progress_count'] * PROGRESS_CHECK_INTERVAL}s")
+                return True
+            return False
         
+        return check
+    
+    def _collect_generated_files(self, work_dir: Path, target_dir: Path, result: CLIResult) -> bool:
+        """检查 Gemini CLI 生成的文件，把生成在工作目录中的文件移动到 target_dir"""
         # 检查目标目录和工作目录
         all_generated_files = []
         
@@ -660,9 +574,9 @@ class PureGeminiCompiler:
                             logger.warning(f"Failed to move {f.name}: {e}")
         
         # Success if we have files AND the process didn't fail
-        success = file_count > 0 and (poll_result == 0 if poll_result is not None else True)
-        
-        return success, is_api_error
+        # （超时或被进度检查提前结束时只要求生成了文件）
+        finished = not (result.timed_out or result.stopped)
+        return file_count > 0 and (result.returncode == 0 if finished else True)
     
     def _check_key_files(self, files: list) -> bool:
         """检查是否生成了关键文件"""
@@ -802,9 +716,9 @@ class PureGeminiCompiler:
             logger.info(f"Test feedback loop - Attempt {attempt}/{max_attempts}")
             result["attempts"] = attempt
             
-            # 运行测试
+            # 运行测试（第一次运行全部测试，之后只运行受修复影响的测试和之前失败的测试）
             logger.info("Running unit tests...")
-            test_passed, test_errors = self._run_tests(code_dir)
+            test_passed, test_errors = self._run_tests(code_dir, affected_only=attempt > 1)
             
             if test_passed:
                 logger.info(f"Tests passed on attempt {attempt}")
@@ -894,19 +808,22 @@ class PureGeminiCompiler:
             "errors": [],
             "fix_history": [],
             "cache_stats": {},
-            "incremental_fixes": []
+            "incremental_fixes": [],
+            "parallel_fix_timing": []
         }
         
-        fixer = IncrementalFixer(code_dir)
+        # 测试在实际的项目目录中运行，错误中的路径相对于它；修复器与测试循环共用一个工作进程
+        project_dir = self._find_project_directory(code_dir) or code_dir
+        fixer = IncrementalFixer(project_dir, test_runner=get_test_runner(project_dir))
         total_fixes = 0
         
         for attempt in range(1, max_attempts + 1):
             logger.info(f"Incremental test loop - Attempt {attempt}/{max_attempts}")
             result["attempts"] = attempt
             
-            # 运行完整测试
-            logger.info("Running full test suite...")
-            test_passed, test_errors = self._run_tests(code_dir)
+            # 第一次运行完整测试，之后只运行受修复影响的测试和之前失败的测试
+            logger.info("Running full test suite..." if attempt == 1 else "Running affected tests...")
+            test_passed, test_errors = self._run_tests(code_dir, affected_only=attempt > 1)
             
             if test_passed:
                 logger.info(f"All tests passed on attempt {attempt}")
@@ -915,9 +832,12 @@ class PureGeminiCompiler:
                     result["fixed"] = True
                 break
             
-            # 解析错误
-            errors = fixer.parse_pytest_output(test_errors or "")
-            logger.info(f"Parsed {len(errors)} test errors from pytest output")
+            # 解析错误：优先使用工作进程的结构化结果，没有时退回解析文本输出
+            if self.last_test_result is not None:
+                errors = fixer.errors_from_result(self.last_test_result)
+            else:
+                errors = fixer.parse_pytest_output(test_errors or "")
+                logger.info(f"Parsed {len(errors)} test errors from pytest output")
             
             # 记录部分pytest输出以便调试
             if test_errors and len(test_errors) > 0:
@@ -935,12 +855,16 @@ class PureGeminiCompiler:
                 for i, error in enumerate(errors[:3]):  # 只记录前3个
                     logger.info(f"Error {i+1}: {error.file_path}::{error.test_name} - {error.error_type}")
             
-            # 创建修复批次
-            batches = fixer.create_fix_batch(files_to_fix, batch_size=2)
+            # 创建修复批次：同一批次的文件互不导入，并发修复
+            fix_workers = max(1, getattr(self.config, "fix_workers", 1))
+            batches = fixer.create_fix_batch(files_to_fix, batch_size=fix_workers)
+            previous = self.last_test_result
             
             for batch_idx, batch in enumerate(batches):
-                logger.info(f"Processing batch {batch_idx + 1}/{len(batches)}")
+                logger.info(f"Processing batch {batch_idx + 1}/{len(batches)} ({len(batch)} files)")
                 
+                methods = {}
+                prompts = {}
                 for file in batch:
                     # 先检查缓存
                     cached_fix = None
@@ -962,8 +886,7 @@ class PureGeminiCompiler:
                             logger.info(f"Found cached fix for {file.path}")
                             break
                     
-                    # 应用修复
-                    fix_applied = False
+                    methods[file.path] = "pattern" if pattern_match else ("cached" if cached_fix else "generated")
                     
                     if pattern_match and pattern_match.success_rate > 0.5:
                         # 使用模式模板快速修复
@@ -973,53 +896,93 @@ class PureGeminiCompiler:
                             file_path=file.path,
                             error_message=file.errors[0].error_message
                         )
-                        fix_applied = self._fix_with_gemini(code_dir, prompt, "pytest", timeout=60)
-                        self.error_cache.update_pattern_success_rate(pattern_match, fix_applied)
+                        prompts[file.path] = (prompt, 60, pattern_match)
                     
                     elif cached_fix:
                         # 应用缓存的修复
                         logger.info(f"Reusing cached fix for {file.path}")
                         # 这里简化处理，实际可以直接应用修复内容
-                        fix_applied = True
+                        total_fixes += 1
+                        result["incremental_fixes"].append({
+                            "file": str(file.path),
+                            "errors": len(file.errors),
+                            "fixed": True,
+                            "method": "cached"
+                        })
                     
                     else:
                         # 生成新的修复
                         logger.info(f"Generating new fix for {file.path}")
-                        prompt = fixer.generate_file_specific_prompt(file)
-                        fix_applied = self._fix_with_gemini(code_dir, prompt, "pytest", timeout=120)
-                        
+                        prompts[file.path] = (fixer.generate_file_specific_prompt(file), 120, None)
+                
+                if not prompts:
+                    continue
+                
+                # 每个文件一个 Gemini 请求，在项目副本中并发修复，修改一次性应用后运行受影响的测试
+                def fix_file(file, workspace, prompts=prompts):
+                    prompt, timeout, _ = prompts[file.path]
+                    return self._fix_with_gemini(workspace, prompt, "pytest", timeout=timeout)
+                
+                report = fixer.fix_files_concurrently(
+                    [file for file in batch if file.path in prompts],
+                    fix_file,
+                    previous=previous,
+                    max_workers=fix_workers
+                )
+                
+                for outcome in report.outcomes:
+                    file = outcome.file
+                    fix_applied = outcome.status == "applied"
+                    pattern_match = prompts[file.path][2]
+                    if pattern_match:
+                        self.error_cache.update_pattern_success_rate(pattern_match, fix_applied)
+                    elif fix_applied:
                         # 缓存结果
-                        if fix_applied:
-                            self.error_cache.add_fix_result(
-                                file.errors[0].full_traceback,
-                                str(file.path),
-                                "fix_applied",  # 简化，实际应记录具体修复内容
-                                True
-                            )
-                    
+                        self.error_cache.add_fix_result(
+                            file.errors[0].full_traceback,
+                            str(file.path),
+                            "fix_applied",  # 简化，实际应记录具体修复内容
+                            True
+                        )
                     if fix_applied:
                         total_fixes += 1
-                        
-                        # 运行受影响的测试验证修复
-                        test_file = f"tests/{file.path.stem.replace('_', '')}_test.py"
-                        if (code_dir / test_file).exists():
-                            quick_pass, _ = fixer.run_single_file_test(test_file)
-                            logger.info(f"Quick test for {test_file}: {'PASSED' if quick_pass else 'FAILED'}")
                     
                     result["incremental_fixes"].append({
                         "file": str(file.path),
                         "errors": len(file.errors),
                         "fixed": fix_applied,
-                        "method": "pattern" if pattern_match else ("cached" if cached_fix else "generated")
+                        "status": outcome.status,
+                        "method": methods[file.path]
                     })
+                
+                if report.test_result is not None:
+                    logger.info(f"Affected tests after batch {batch_idx + 1}: "
+                                f"{'PASSED' if report.test_result.passed else 'FAILED'} {report.test_result.counts}")
+                    if not any(outcome.status == "rolled_back" for outcome in report.outcomes):
+                        previous = report.test_result
+                logger.info(f"Batch {batch_idx + 1}: fixes took {report.fix_wall_time:.1f}s wall time "
+                            f"vs {report.sequential_time:.1f}s sequentially, saved {report.time_saved:.1f}s")
+                result["parallel_fix_timing"].append({
+                    "attempt": attempt,
+                    "files": len(report.outcomes),
+                    "fix_wall_time": round(report.fix_wall_time, 2),
+                    "sequential_time": round(report.sequential_time, 2),
+                    "test_time": round(report.test_time, 2),
+                    "time_saved": round(report.time_saved, 2)
+                })
+            
+            saved = sum(t["time_saved"] for t in result["parallel_fix_timing"] if t["attempt"] == attempt)
+            if saved:
+                logger.info(f"Attempt {attempt}: concurrent fixing saved {saved:.1f}s wall time")
             
             # 如果没有修复任何文件，避免死循环
             if total_fixes == 0 and attempt > 1:
                 logger.warning("No fixes applied in this attempt, stopping")
                 break
         
-        # 添加缓存统计
+        # 添加缓存统计和并发修复节省的时间
         result["cache_stats"] = self.error_cache.get_stats()
+        result["fix_time_saved"] = round(sum(t["time_saved"] for t in result["parallel_fix_timing"]), 2)
         
         return result
     
@@ -1051,8 +1014,13 @@ class PureGeminiCompiler:
             logger.warning("flake8 not found, skipping lint check")
             return True, None
     
-    def _run_tests(self, code_dir: Path) -> tuple[bool, Optional[str]]:
-        """运行单元测试"""
+    def _run_tests(self, code_dir: Path, affected_only: bool = False) -> tuple[bool, Optional[str]]:
+        """运行单元测试
+
+        测试在项目的常驻 pytest 工作进程中运行，结构化结果保存在 self.last_test_result。
+        affected_only 时只运行受上次运行以来修改的文件影响的测试，以及之前失败的测试。
+        """
+        self.last_test_result = None
         # 查找实际的项目目录
         project_dir = self._find_project_directory(code_dir)
         if project_dir and project_dir != code_dir:
@@ -1070,48 +1038,36 @@ class PureGeminiCompiler:
                 return True, None
             
             logger.info(f"Found tests directory: {test_dir}")
-            logger.info("Running pytest...")
-            
-            result = subprocess.run(
-                ["python", "-m", "pytest", "tests/", "-v", "--tb=short", "--no-header", "-s", "-p", "no:cacheprovider", "-p", "no:warnings", "--no-cov"],
-                capture_output=True,
-                text=True,
-                cwd=code_dir
-            )
+            logger.info("Running pytest (affected tests)..." if affected_only else "Running pytest...")
             
-            error_output = result.stdout + "\n" + result.stderr if result.returncode != 0 else None
+            runner = get_test_runner(code_dir)
+            result = runner.run_affected() if affected_only else runner.run()
             
             # 检查是否是 pytest 启动失败
-            if result.returncode != 0 and error_output:
-                if "ImportError: cannot import name 'FixtureDef' from 'pytest'" in error_output:
+            if not result.passed:
+                if "ImportError: cannot import name 'FixtureDef' from 'pytest'" in result.output:
                     logger.warning("pytest version compatibility issue detected")
                     # 尝试修复 pytest 版本问题
                     if self._fix_pytest_version(code_dir):
                         logger.info("Fixed pytest version, retrying tests...")
-                        # 重新运行测试
-                        result = subprocess.run(
-                            ["python", "-m", "pytest", "tests/", "-v", "--tb=short", "--no-header", "-s", "-p", "no:cacheprovider", "-p", "no:warnings", "--no-cov"],
-                            capture_output=True,
-                            text=True,
-                            cwd=code_dir
-                        )
-                        error_output = result.stdout + "\n" + result.stderr if result.returncode != 0 else None
-                elif "ModuleNotFoundError" in error_output and "pytest" in error_output:
+                        # 重启工作进程以加载新版本的 pytest 后重新运行全部测试
+                        runner.restart()
+                        result = runner.run()
+                elif result.error and "ModuleNotFoundError" in result.error and "pytest" in result.error:
                     logger.warning("pytest not installed or broken")
                     # 标记为环境问题，让上层处理
                     return False, "ENVIRONMENT_ERROR: pytest installation issue"
             
-            if result.returncode == 0:
-                logger.info("Tests passed successfully")
-                logger.info(f"Test output: {result.stdout[:200]}..." if result.stdout else "No stdout")
+            self.last_test_result = result
+            scope = "all tests" if result.selected is None else f"{len(result.selected)} affected test files"
+            if result.passed:
+                logger.info(f"Tests passed successfully ({scope}, {result.duration:.2f}s): {result.counts}")
             else:
-                logger.warning(f"Tests failed with return code: {result.returncode}")
-                logger.info(f"Test stdout length: {len(result.stdout) if result.stdout else 0}")
-                logger.info(f"Test stderr length: {len(result.stderr) if result.stderr else 0}")
-                if error_output:
-                    logger.info(f"Combined error output length: {len(error_output)}")
+                logger.warning(f"Tests failed with exit code {result.exit_code} ({scope}): {result.counts}")
+                for failure in result.failures[:5]:
+                    logger.info(f"  {failure.nodeid}: {failure.exc_type} at {failure.path}:{failure.lineno}")
             
-            return result.returncode == 0, error_output
+            return result.passed, None if result.passed else result.output
                 
         except FileNotFoundError:
             logger.warning("pytest not found, skipping tests")
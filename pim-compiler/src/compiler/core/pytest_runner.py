@@ -0,0 +1,441 @@
+"""
+常驻 pytest 运行器
+
+编译-测试-修复循环中每次修复后都要重新运行测试。每次启动新的 pytest 进程都要重新
+导入 pytest、FastAPI、SQLAlchemy 等库，而修复通常只改动一两个文件。这里为每个生成
+项目保留一个常驻的 pytest 工作进程（pytest_worker.py）：
+- 每次运行前只让变化的模块及依赖它们的项目模块重新导入，第三方库保持已导入状态
+- ImportGraph 用 ast 分析项目内的 import，run_affected 只运行受变化文件影响的测试
+  和上次失败的测试
+- 结果是结构化的（测试 id、异常类型、调用栈中的文件和行号），同时保留 pytest 的终端
+  输出供现有的文本解析使用
+"""
+
+import os
+import ast
+import json
+import queue
+import atexit
+import logging
+import tempfile
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Iterable, Tuple
+
+from .compilation_cache import EXCLUDED_DIRS
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = Path(__file__).with_name("pytest_worker.py")
+
+# 与原来的 subprocess 调用一致的输出格式，-rfE 输出失败摘要供文本解析
+DEFAULT_PYTEST_ARGS = ["-v", "--tb=short", "--no-header", "-rfE",
+                       "-p", "no:cacheprovider", "-p", "no:warnings"]
+
+# 这些收集错误来自代码本身，不是部分重新导入造成的，不需要用新进程重试
+CODE_ERRORS = {"SyntaxError", "IndentationError", "ModuleNotFoundError"}
+
+# 非 Python 文件变化（配置、数据文件等）无法通过 import 关系判断影响范围，运行全部测试
+IGNORED_SUFFIXES = {".pyc", ".pyo", ".log", ".db", ".sqlite", ".sqlite3"}
+
+
+def is_test_file(path: str) -> bool:
+    name = Path(path).name
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+@dataclass
+class TestFailure:
+    """一个失败或出错的测试"""
+    nodeid: str
+    outcome: str                    # failed / error
+    when: str                       # collect / setup / call / teardown
+    exc_type: str
+    message: str
+    path: Optional[str] = None      # 异常发生的位置
+    lineno: Optional[int] = None
+    traceback: List[Dict] = field(default_factory=list)  # [{"path", "lineno", "message"}]
+    longrepr: str = ""
+
+    @property
+    def test_file(self) -> str:
+        return self.nodeid.split("::", 1)[0]
+
+
+@dataclass
+class TestRunResult:
+    """一次测试运行的结果"""
+    passed: bool
+    exit_code: int
+    failures: List[TestFailure] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=dict)
+    duration: float = 0.0
+    output: str = ""
+    selected: Optional[List[str]] = None   # None 表示运行了全部测试
+    changed: List[str] = field(default_factory=list)
+    reloaded: List[str] = field(default_factory=list)
+    error: Optional[str] = None            # 工作进程无法运行测试时的原因
+    coverage: Dict[str, List[str]] = field(default_factory=dict)  # 测试 id -> 执行到的项目文件（trace 时）
+
+    @property
+    def failed_files(self) -> Set[str]:
+        return {failure.test_file for failure in self.failures}
+
+
+class ImportGraph:
+    """项目内模块之间的 import 关系"""
+
+    def __init__(self, project_dir: Path):
+        self.project_dir = Path(project_dir)
+        self.modules: Dict[str, str] = {}          # 模块名 -> 相对路径
+        self.imports: Dict[str, Set[str]] = {}     # 相对路径 -> 它导入的项目文件
+        self._build()
+
+    def _build(self):
+        files = []
+        for root, dirs, names in os.walk(self.project_dir):
+            dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS and not d.startswith(".")]
+            for name in names:
+                if name.endswith(".py"):
+                    files.append((Path(root) / name).relative_to(self.project_dir).as_posix())
+
+        for path in files:
+            parts = path[:-3].split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if parts:
+                self.modules[".".join(parts)] = path
+                # pytest 的 prepend 模式把没有 __init__.py 的测试目录加入 sys.path
+                self.modules.setdefault(parts[-1], path)
+
+        for path in files:
+            self.imports[path] = self._resolve_imports(path)
+
+    def _resolve_imports(self, path: str) -> Set[str]:
+        try:
+            tree = ast.parse((self.project_dir / path).read_text(encoding="utf-8"))
+        except (SyntaxError, UnicodeDecodeError, OSError):
+            return set()
+
+        package = path[:-3].split("/")[:-1]
+        names = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = package[:len(package) - node.level + 1]
+                    module = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    module = node.module or ""
+                names.append(module)
+                names.extend(f"{module}.{alias.name}" if module else alias.name for alias in node.names)
+
+        resolved = set()
+        for name in names:
+            # 导入子模块时会先执行各级包的 __init__.py
+            parts = name.split(".")
+            for i in range(1, len(parts) + 1):
+                target = self.modules.get(".".join(parts[:i]))
+                if target and target != path:
+                    resolved.add(target)
+        return resolved
+
+    def dependents(self, paths: Iterable[str]) -> Set[str]:
+        """这些文件以及直接或间接导入它们的项目文件"""
+        importers: Dict[str, Set[str]] = {}
+        for source, targets in self.imports.items():
+            for target in targets:
+                importers.setdefault(target, set()).add(source)
+
+        result = set()
+        pending = [p for p in paths if p in self.imports]
+        while pending:
+            path = pending.pop()
+            if path in result:
+                continue
+            result.add(path)
+            pending.extend(importers.get(path, ()))
+        return result
+
+    def affected_tests(self, changed: Iterable[str]) -> Optional[List[str]]:
+        """受变化文件影响的测试文件；无法判断影响范围时返回 None（运行全部测试）"""
+        changed = list(changed)
+        for path in changed:
+            if not path.endswith(".py") or path not in self.imports or Path(path).name == "conftest.py":
+                return None
+        affected = self.dependents(changed)
+        if any(Path(path).name == "conftest.py" for path in affected):
+            return None
+        return sorted(path for path in affected if is_test_file(path))
+
+
+class WarmTestRunner:
+    """一个生成项目的常驻 pytest 工作进程"""
+
+    def __init__(self, project_dir: Path, python: Optional[str] = None,
+                 pytest_args: Optional[List[str]] = None, timeout: int = 300):
+        self.project_dir = Path(project_dir).resolve()
+        self.python = python or os.getenv("PIM_TEST_PYTHON", "python")
+        self.pytest_args = list(pytest_args or DEFAULT_PYTEST_ARGS)
+        self.timeout = timeout
+        self.failing: Set[str] = set()   # 最近一次运行中失败的测试文件
+        self._has_baseline = False        # 是否运行过全部测试
+        self._snapshot: Optional[Dict[str, Tuple[int, int]]] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._log_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    # ---- 工作进程 ----
+
+    def start(self):
+        if self._process and self._process.poll() is None:
+            return
+        log = tempfile.NamedTemporaryFile(prefix="pytest_worker_", suffix=".log", delete=False)
+        self._log_path = log.name
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", PYTHONUNBUFFERED="1")
+        self._process = subprocess.Popen(
+            [self.python, str(WORKER_SCRIPT)],
+            cwd=str(self.project_dir),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=log,
+            text=True,
+            encoding="utf-8",
+            env=env
+        )
+        log.close()
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read_responses, args=(self._process, self._responses), daemon=True).start()
+
+        ready = self._receive(timeout=60)
+        if not ready:
+            raise RuntimeError(self._worker_error())
+        logger.info(f"pytest worker started for {self.project_dir} (pytest {ready.get('pytest')})")
+
+    def stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                process.stdin.write(json.dumps({"cmd": "exit"}) + "\n")
+                process.stdin.flush()
+                process.wait(timeout=5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                process.kill()
+                process.wait()
+        if self._log_path:
+            try:
+                os.remove(self._log_path)
+            except OSError:
+                pass
+            self._log_path = None
+
+    def restart(self):
+        """重启工作进程（例如修复了 pytest 环境之后），下次运行时全部模块重新导入"""
+        self.stop()
+        self._snapshot = None
+        self._has_baseline = False
+
+    @staticmethod
+    def _read_responses(process: subprocess.Popen, responses: "queue.Queue[Optional[str]]"):
+        for line in process.stdout:
+            responses.put(line)
+        responses.put(None)
+
+    def _receive(self, timeout: float) -> Optional[Dict]:
+        try:
+            line = self._responses.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return json.loads(line) if line else None
+
+    def _worker_error(self) -> str:
+        tail = ""
+        if self._log_path and os.path.exists(self._log_path):
+            tail = Path(self._log_path).read_text(encoding="utf-8", errors="replace")[-3000:]
+        self.stop()
+        return f"pytest worker exited unexpectedly\n{tail}".strip()
+
+    # ---- 变化检测 ----
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for root, dirs, names in os.walk(self.project_dir):
+            dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS and not d.startswith(".")]
+            for name in names:
+                if Path(name).suffix in IGNORED_SUFFIXES:
+                    continue
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path.relative_to(self.project_dir).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _take_changes(self) -> List[str]:
+        """上次运行以来新增、修改或删除的文件"""
+        current = self._scan()
+        previous, self._snapshot = self._snapshot, current
+        if previous is None:
+            return []
+        return sorted(path for path in set(current) | set(previous) if current.get(path) != previous.get(path))
+
+    def changed_files(self) -> List[str]:
+        """上次运行以来变化的文件（不更新快照）"""
+        if self._snapshot is None:
+            return []
+        current = self._scan()
+        return sorted(path for path in set(current) | set(self._snapshot)
+                      if current.get(path) != self._snapshot.get(path))
+
+    # ---- 运行测试 ----
+
+    def run(self, tests: Optional[List[str]] = None, timeout: Optional[int] = None,
+            trace: bool = False) -> TestRunResult:
+        """运行指定的测试文件或 node id，tests 为 None 时运行全部测试
+
+        trace 时记录每个测试执行到的项目文件（TestRunResult.coverage）。
+        """
+        with self._lock:
+            return self._run(tests, self._take_changes(), timeout, trace)
+
+    def run_affected(self, changed: Optional[Iterable[str]] = None,
+                     timeout: Optional[int] = None) -> TestRunResult:
+        """只运行受变化文件影响的测试，以及最近一次失败的测试
+
+        changed 为 None 时使用上次运行以来实际变化的文件。还没有运行过全部测试、
+        或者变化无法通过 import 关系判断影响范围时运行全部测试。
+        """
+        with self._lock:
+            detected = self._take_changes()
+            changes = sorted(set(detected) | set(changed or ()))
+            selection = None
+            if self._has_baseline:
+                affected = ImportGraph(self.project_dir).affected_tests(changes)
+                if affected is not None:
+                    selection = sorted(set(affected) | self.failing)
+                    if not selection:
+                        return TestRunResult(passed=True, exit_code=0, selected=[], changed=changes,
+                                             output="No tests affected by the changes")
+            return self._run(selection, changes, timeout)
+
+    def _run(self, tests: Optional[List[str]], changes: List[str], timeout: Optional[int],
+             trace: bool = False) -> TestRunResult:
+        timeout = timeout or self.timeout
+        if tests is None:
+            targets = ["tests"] if (self.project_dir / "tests").is_dir() else []
+        else:
+            targets = list(tests)
+
+        warm = self._process is not None and self._process.poll() is None
+        purge = []
+        if warm and changes:
+            graph = ImportGraph(self.project_dir)
+            py_changes = [p for p in changes if p.endswith(".py")]
+            purge = sorted(graph.dependents(py_changes) | set(py_changes))
+
+        result = self._request(targets, purge, timeout, trace)
+        if warm and purge and any(f.when == "collect" and f.exc_type not in CODE_ERRORS
+                                  for f in result.failures):
+            # 只重新导入部分模块时，旧模块的状态（如 SQLAlchemy 的 MetaData）可能导致导入失败，
+            # 用新进程重试一次确认
+            logger.info("Collection errors after partial reload, retrying with a fresh worker")
+            self.stop()
+            result = self._request(targets, [], timeout, trace)
+
+        result.selected = None if tests is None else targets
+        result.changed = changes
+        self._record(result, tests is None)
+        return result
+
+    def _request(self, targets: List[str], purge: List[str], timeout: int, trace: bool = False) -> TestRunResult:
+        try:
+            self.start()
+        except RuntimeError as e:
+            return TestRunResult(passed=False, exit_code=-1, error=str(e), output=str(e))
+
+        request = {"args": self.pytest_args + targets,
+                   "purge": [str(self.project_dir / path) for path in purge],
+                   "trace": trace}
+        try:
+            self._process.stdin.write(json.dumps(request) + "\n")
+            self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            error = self._worker_error() or str(e)
+            return TestRunResult(passed=False, exit_code=-1, error=error, output=error)
+
+        response = self._receive(timeout)
+        if response is None:
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+                self.stop()
+                error = f"Test timeout ({timeout}s)"
+            else:
+                error = self._worker_error()
+            return TestRunResult(passed=False, exit_code=-1, error=error, output=error)
+
+        failures = [TestFailure(**test) for test in response.get("tests", [])]
+        exit_code = response["exit_code"]
+        # 5: 没有收集到测试
+        passed = exit_code in (0, 5) and not failures
+        return TestRunResult(
+            passed=passed,
+            exit_code=exit_code,
+            failures=failures,
+            counts=response.get("counts", {}),
+            duration=response.get("duration", 0.0),
+            output=response.get("output", ""),
+            reloaded=response.get("reloaded", []),
+            coverage=response.get("coverage", {}),
+            error=response["output"] if exit_code == -1 else None
+        )
+
+    def _record(self, result: TestRunResult, full_run: bool):
+        """更新已知失败的测试文件"""
+        if result.error:
+            return
+        if full_run:
+            self.failing = set(result.failed_files)
+            self._has_baseline = True
+        else:
+            self.failing -= set(result.selected or ())
+            self.failing |= result.failed_files
+
+
+_runners: Dict[Path, WarmTestRunner] = {}
+_runners_lock = threading.Lock()
+
+
+def get_test_runner(project_dir: Path) -> WarmTestRunner:
+    """获取项目的常驻测试运行器（同一项目目录共用一个工作进程）"""
+    key = Path(project_dir).resolve()
+    with _runners_lock:
+        runner = _runners.get(key)
+        if runner is None:
+            runner = _runners[key] = WarmTestRunner(key)
+        return runner
+
+
+def stop_test_runners(root: Path):
+    """停止 root 目录（及其子目录）中项目的测试运行器，在项目目录被删除或重新生成前调用"""
+    root = Path(root).resolve()
+    with _runners_lock:
+        keys = [key for key in _runners if key == root or root in key.parents]
+        runners = [_runners.pop(key) for key in keys]
+    for runner in runners:
+        runner.stop()
+
+
+@atexit.register
+def _stop_all_runners():
+    with _runners_lock:
+        runners = list(_runners.values())
+        _runners.clear()
+    for runner in runners:
+        runner.stop()
@@ -0,0 +1,231 @@
+"""
+常驻 pytest 工作进程
+
+由 pytest_runner.WarmTestRunner 在生成项目目录中启动（使用项目的解释器），不依赖编译器的其它模块。
+pytest、插件和第三方库只在第一次运行时导入，之后每次运行只重新导入发生变化的项目模块。
+
+协议：stdin / stdout 上每行一个 JSON。
+- 请求：{"purge": [需要重新导入的文件路径], "args": [pytest 参数], "trace": 是否记录覆盖}，
+  或 {"cmd": "exit"}
+- 响应：{"exit_code", "duration", "counts", "tests": [失败和出错的测试], "output": 终端输出,
+  "coverage": {测试 id: [执行到的项目文件]}（只在 trace 时）}
+测试代码的 print 会写到 stderr，不会干扰协议。
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import threading
+import importlib
+import importlib.util
+import traceback
+
+import pytest
+
+# 项目配置了 --cov 时关闭覆盖率统计（与原来的 subprocess 调用一致）
+NO_COV = ["--no-cov"] if importlib.util.find_spec("pytest_cov") else []
+
+# 收集错误的报告只有文本，从中提取调用栈：`path.py:12: in func` 和 `File "path.py", line 12`
+FRAME_LINE = re.compile(r'^(\S+\.py):(\d+): in (.+)$|File "(.+?\.py)", line (\d+)', re.M)
+
+
+class ResultCollector:
+    """pytest 插件：收集每个测试的结果和失败时的调用栈"""
+
+    def __init__(self):
+        self.counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+        self.tests = []
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        if call.excinfo is not None:
+            # 断言失败等异常的消息中不含异常类型，从 excinfo 中取
+            outcome.get_result().exc_type = call.excinfo.typename
+
+    def pytest_runtest_logreport(self, report):
+        # setup / teardown 只在失败或跳过时记录，避免一个测试被计数多次
+        if report.when != "call" and report.outcome == "passed":
+            return
+        outcome = report.outcome
+        if outcome == "failed" and report.when != "call":
+            outcome = "error"
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        if outcome in ("failed", "error"):
+            self.tests.append(self._describe(report, outcome))
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.counts["error"] += 1
+            self.tests.append(self._describe(report, "error", when="collect"))
+
+    def _describe(self, report, outcome, when=None):
+        longrepr = report.longrepr
+        crash = getattr(longrepr, "reprcrash", None)
+        if crash is not None:
+            message = crash.message
+        else:
+            lines = str(longrepr).strip().splitlines()
+            message = lines[-1].lstrip("E ").strip() if lines else ""
+        exc_type = getattr(report, "exc_type", None)
+        if not exc_type:
+            exc_type = message.split(":", 1)[0].strip() if ":" in message else ""
+        return {
+            "nodeid": report.nodeid,
+            "outcome": outcome,
+            "when": when or report.when,
+            "exc_type": exc_type,
+            "message": message,
+            "path": crash.path if crash is not None else None,
+            "lineno": crash.lineno if crash is not None else None,
+            "traceback": self._frames(longrepr) or self._text_frames(report.longreprtext),
+            "longrepr": report.longreprtext,
+        }
+
+    @staticmethod
+    def _frames(longrepr):
+        """调用栈中每一帧的文件、行号（包含异常链中的所有调用栈）"""
+        chain = getattr(longrepr, "chain", None)
+        if chain:
+            tracebacks = [reprtraceback for reprtraceback, _, _ in chain]
+        elif hasattr(longrepr, "reprtraceback"):
+            tracebacks = [longrepr.reprtraceback]
+        else:
+            return []
+        frames = []
+        for reprtraceback in tracebacks:
+            for entry in getattr(reprtraceback, "reprentries", []):
+                location = getattr(entry, "reprfileloc", None)
+                if location is not None:
+                    frames.append({"path": location.path, "lineno": location.lineno, "message": location.message})
+        return frames
+
+    @staticmethod
+    def _text_frames(text):
+        frames = []
+        for match in FRAME_LINE.finditer(text):
+            if match.group(1):
+                frames.append({"path": match.group(1), "lineno": int(match.group(2)), "message": match.group(3)})
+            else:
+                frames.append({"path": match.group(4), "lineno": int(match.group(5)), "message": ""})
+        return frames
+
+
+class CoverageCollector:
+    """pytest 插件：记录每个测试（setup + call + teardown）执行到的项目文件
+
+    只记录函数调用（不做行级跟踪），开销比 coverage.py 小得多。Python 3.12 以上
+    同时跟踪已经在运行的线程（如 TestClient 的事件循环线程），更早的版本只跟踪
+    当前线程和测试中新启动的线程。
+    """
+
+    def __init__(self, root):
+        self.root = os.path.join(os.path.realpath(root), "")
+        self.coverage = {}
+        self._files = set()
+        self._set_trace = getattr(threading, "settrace_all_threads", None)
+
+    def _trace(self, frame, event, arg):
+        if event == "call":
+            self._files.add(frame.f_code.co_filename)
+        return None
+
+    def _install(self, tracer):
+        if self._set_trace is not None:
+            self._set_trace(tracer)
+        else:
+            sys.settrace(tracer)
+            threading.settrace(tracer)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self._files = set()
+        self._install(self._trace)
+        try:
+            yield
+        finally:
+            self._install(None)
+            files = set()
+            for filename in self._files:
+                path = os.path.realpath(filename)
+                if path.startswith(self.root):
+                    files.add(os.path.relpath(path, self.root).replace(os.sep, "/"))
+            self.coverage[item.nodeid] = sorted(files)
+
+
+def purge(paths):
+    """从 sys.modules 中移除这些文件对应的模块（及其字节码缓存），下次导入时重新执行"""
+    targets = {os.path.realpath(path) for path in paths}
+    if not targets:
+        return []
+    removed = []
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.realpath(module_file) in targets:
+            del sys.modules[name]
+            removed.append(name)
+            # `from package import module` 先查找包的属性，需要同时移除包上的旧模块
+            package, _, attribute = name.rpartition(".")
+            if package in sys.modules and getattr(sys.modules[package], attribute, None) is module:
+                delattr(sys.modules[package], attribute)
+    for path in targets:
+        try:
+            os.remove(importlib.util.cache_from_source(path))
+        except (OSError, ValueError, NotImplementedError):
+            pass
+    importlib.invalidate_caches()
+    return removed
+
+
+def run(args, trace=False):
+    collector = ResultCollector()
+    plugins = [collector]
+    if trace:
+        plugins.append(CoverageCollector(os.getcwd()))
+    output = io.StringIO()
+    saved_stdout = sys.stdout
+    sys.stdout = output  # pytest 的终端输出写入 sys.stdout
+    start = time.time()
+    try:
+        exit_code = int(pytest.main(list(args) + NO_COV, plugins=plugins))
+    except BaseException:
+        exit_code = -1
+        output.write(traceback.format_exc())
+    finally:
+        sys.stdout = saved_stdout
+    return {
+        "exit_code": exit_code,
+        "duration": time.time() - start,
+        "counts": collector.counts,
+        "tests": collector.tests,
+        "output": output.getvalue(),
+        "coverage": plugins[1].coverage if trace else {},
+    }
+
+
+def main():
+    # 协议使用原来的 stdout，进程的 fd 1 改为 stderr，测试中的输出不会混入协议
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    sys.path.insert(0, os.getcwd())
+
+    protocol.write(json.dumps({"ready": True, "pytest": pytest.__version__}) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if request.get("cmd") == "exit":
+            break
+        reloaded = purge(request.get("purge", []))
+        result = run(request.get("args", []), trace=request.get("trace", False))
+        result["reloaded"] = reloaded
+        protocol.write(json.dumps(result, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,12 @@
 """Code generation components"""
 
 from .models import CodeFile, CodePackage
-# from .psm_generator import PSMGenerator
+from .psm_generator import PSMGenerator
 from .code_generator import CodeGenerator
 from .platform_adapters import FastAPIAdapter
 from .base_generator import BaseGenerator, GeneratorConfig, GenerationResult
 from .generator_factory import GeneratorFactory, create_generator
-from .impl import GeminiCLIGenerator, ReactAgentGenerator, AutogenGenerator
+from .impl import GeminiCLIGenerator, ReactAgentGenerator, AutogenGenerator, HybridTemplateGenerator
 
 __all__ = [
     "CodeFile",
@@ -21,5 +21,6 @@ __all__ = [
     "create_generator",
     "GeminiCLIGenerator",
     "ReactAgentGenerator",
-    "AutogenGenerator"
+    "AutogenGenerator",
+    "HybridTemplateGenerator"
 ]
\ No newline at end of file
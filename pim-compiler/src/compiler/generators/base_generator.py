@@ -3,6 +3,8 @@
 定义了所有代码生成器必须实现的接口
 """
 
+import sys
+import inspect
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple
@@ -37,6 +39,7 @@ class GenerationResult:
     error_message: Optional[str] = None
     generation_time: float = 0.0
     logs: str = ""
+    regeneration: Optional[Dict[str, Any]] = None  # 增量生成时：重新生成了哪些部分及原因
     
     def __post_init__(self):
         if self.code_files is None:
@@ -137,6 +140,31 @@ class BaseGenerator(ABC):
         code_result = self.generate_code(psm_result.psm_content, output_dir, platform)
         return psm_result, code_result
     
+    def cache_fingerprint(self) -> str:
+        """参与编译缓存键的提示词指纹
+        
+        包括生成器模块中的提示词常量（如导入的 PSM_GENERATION_PROMPT）和生成器类源码，
+        修改提示词或生成逻辑都会使缓存失效
+        """
+        parts = []
+        module = sys.modules.get(self.__class__.__module__)
+        if module:
+            parts.extend(value for name, value in sorted(vars(module).items())
+                         if "PROMPT" in name.upper() and isinstance(value, str))
+        try:
+            parts.append(inspect.getsource(self.__class__))
+        except (OSError, TypeError):
+            pass
+        return "\n".join(parts)
+    
+    def rate_limit_provider(self) -> Optional[str]:
+        """generate_psm / generate_code 共用的速率限制按哪个 LLM 提供商计算
+        
+        默认取 extra_params["llm_provider"]，未设置时为 deepseek（各 API 生成器默认连接 DeepSeek）；
+        返回 None 表示生成器内部按实际请求自行限速
+        """
+        return self.config.extra_params.get("llm_provider", "deepseek")
+    
     def validate_config(self) -> bool:
         """验证配置是否有效"""
         if not self.config.name:
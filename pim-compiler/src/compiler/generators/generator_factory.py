@@ -9,7 +9,7 @@ from pathlib import Path
 import logging
 
 from .base_generator import BaseGenerator, GeneratorConfig
-from .impl import GeminiCLIGenerator, ReactAgentGenerator, AutogenGenerator, AUTOGEN_AVAILABLE, FunctionCallAgentGenerator, SimpleFunctionCallGenerator
+from .impl import GeminiCLIGenerator, ReactAgentGenerator, AutogenGenerator, AUTOGEN_AVAILABLE, FunctionCallAgentGenerator, SimpleFunctionCallGenerator, HybridTemplateGenerator
 
 
 logger = logging.getLogger(__name__)
@@ -28,6 +28,8 @@ class GeneratorFactory:
         "function_call": FunctionCallAgentGenerator,
         "simple-function-call": SimpleFunctionCallGenerator,
         "simple_function_call": SimpleFunctionCallGenerator,
+        "hybrid-template": HybridTemplateGenerator,
+        "hybrid_template": HybridTemplateGenerator,
     }
     
     # 只有在 Autogen 可用时才注册
@@ -112,7 +114,8 @@ class GeneratorFactory:
             "react-agent": "LangChain React Agent based generator",
             "autogen": "Microsoft Autogen multi-agent based generator",
             "function-call": "Function Call API based generator (OpenAI compatible)",
-            "simple-function-call": "Simple Function Call API based generator (JSON response)"
+            "simple-function-call": "Simple Function Call API based generator (JSON response)",
+            "hybrid-template": "Deterministic templates for CRUD code, LLM only for complex service methods"
         }
         
         result = {}
@@ -164,6 +167,11 @@ class GeneratorFactory:
             base_config.api_key = os.getenv("DEEPSEEK_API_KEY")
             base_config.api_base = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
             
+        elif generator_type in ["hybrid-template", "hybrid_template"]:
+            base_config.model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+            base_config.api_key = os.getenv("DEEPSEEK_API_KEY")
+            base_config.api_base = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+            
         return base_config
     
     @classmethod
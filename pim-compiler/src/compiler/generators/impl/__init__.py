@@ -4,6 +4,7 @@ from .gemini_cli_generator import GeminiCLIGenerator
 from .react_agent_generator import ReactAgentGenerator
 from .function_call_agent_generator import FunctionCallAgentGenerator
 from .simple_function_call_generator import SimpleFunctionCallGenerator
+from .hybrid_template_generator import HybridTemplateGenerator
 
 # Autogen 是可选依赖
 try:
@@ -18,6 +19,7 @@ __all__ = [
     'ReactAgentGenerator',
     'FunctionCallAgentGenerator',
     'SimpleFunctionCallGenerator',
+    'HybridTemplateGenerator',
     'AutogenGenerator',
     'AUTOGEN_AVAILABLE'
 ]
\ No newline at end of file
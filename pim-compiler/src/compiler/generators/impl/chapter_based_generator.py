@@ -1,13 +1,23 @@
 """
 基于章节的 PSM 生成器
 使用预定义的章节结构分块生成长文档
+
+章节之间通过 depends_on 声明依赖，构成一个 DAG：依赖都已完成的章节并发生成，
+每个章节只参考它所依赖章节的摘要。代码生成阶段的各模块使用同一个 DAG 执行器。
+
+增量生成：每个章节用 pim_sections 声明它依赖的 PIM 分类（见 core/pim_diff.py）。
+PIM 修改后只重新生成受影响的章节，代码模块只在对应章节内容变化时重新生成，
+GenerationResult.regeneration 记录重新生成了什么以及原因。
 """
 
 import os
 import json
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Callable
 import logging
 from datetime import datetime
 
@@ -15,6 +25,57 @@ from openai import OpenAI
 from pydantic import BaseModel, Field
 
 from ..base_generator import BaseGenerator, GeneratorConfig, GenerationResult
+from ...core.pim_diff import (
+    parse_pim_sections, diff_pim, affected_targets, dependent_targets, content_hash, load_state, save_state
+)
+
+PSM_STATE_FILE = "psm_state.json"  # 上次生成的 PIM 分节摘要和各章节内容
+CODE_STATE_FILE = ".chapter_code_state.json"  # 上次生成代码时各章节的摘要和文件
+
+
+def run_dag(
+    dependencies: Dict[str, List[str]],
+    run: Callable[[str, Dict[str, Any]], Any],
+    max_workers: int = 3,
+    completed: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """按依赖关系执行任务，依赖都已完成的任务并发执行
+    
+    Args:
+        dependencies: 任务 -> 依赖的任务列表
+        run: 执行单个任务，参数为任务名和已完成任务的结果
+        max_workers: 最大并发数
+        completed: 已完成任务的结果（断点续传时跳过这些任务）
+        
+    Returns:
+        Dict[str, Any]: 所有任务的结果
+    """
+    results = dict(completed or {})
+    for task, deps in dependencies.items():
+        unknown = [dep for dep in deps if dep not in dependencies]
+        if unknown:
+            raise ValueError(f"Task {task} depends on unknown tasks: {unknown}")
+    
+    pending = [task for task in dependencies if task not in results]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            for task in [t for t in pending if all(dep in results for dep in dependencies[t])]:
+                pending.remove(task)
+                running[executor.submit(run, task, dict(results))] = task
+            if not running:
+                raise ValueError(f"Circular dependencies between tasks: {pending}")
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    results[task] = future.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    raise
+    return results
 
 
 class ChapterBasedGenerator(BaseGenerator):
@@ -28,6 +89,8 @@ class ChapterBasedGenerator(BaseGenerator):
         {
             "name": "Domain Models",
             "key": "domain",
+            "depends_on": [],
+            "pim_sections": ["overview", "entities", "rules"],
             "sections": [
                 "Entity Definitions",
                 "Database Models (ORM)", 
@@ -39,7 +102,9 @@ class ChapterBasedGenerator(BaseGenerator):
         },
         {
             "name": "Service Layer",
-            "key": "service", 
+            "key": "service",
+            "depends_on": ["domain"],
+            "pim_sections": ["overview", "entities", "services", "flows", "rules"],
             "sections": [
                 "Business Logic Services",
                 "Repository Interfaces",
@@ -52,6 +117,8 @@ class ChapterBasedGenerator(BaseGenerator):
         {
             "name": "REST API Design",
             "key": "api",
+            "depends_on": ["domain", "service"],
+            "pim_sections": ["overview", "entities", "services", "flows"],
             "sections": [
                 "RESTful Endpoints",
                 "Request/Response Formats",
@@ -64,6 +131,8 @@ class ChapterBasedGenerator(BaseGenerator):
         {
             "name": "Application Configuration", 
             "key": "app",
+            "depends_on": ["domain"],
+            "pim_sections": ["overview"],
             "sections": [
                 "Main Application Setup",
                 "Dependency Injection",
@@ -77,6 +146,8 @@ class ChapterBasedGenerator(BaseGenerator):
         {
             "name": "Testing Specifications",
             "key": "test",
+            "depends_on": ["domain"],
+            "pim_sections": ["overview", "entities", "services", "flows", "rules"],
             "sections": [
                 "Unit Test Design",
                 "Integration Test Design",
@@ -88,6 +159,15 @@ class ChapterBasedGenerator(BaseGenerator):
         }
     ]
     
+    # 代码生成模块：基于哪个章节、生成方法、依赖的模块（按章节 key）
+    CODE_MODULES = [
+        {"chapter": "domain", "method": "_generate_models", "depends_on": []},
+        {"chapter": "service", "method": "_generate_services", "depends_on": ["domain"]},
+        {"chapter": "api", "method": "_generate_api_routes", "depends_on": ["domain", "service"]},
+        {"chapter": "app", "method": "_generate_app_config", "depends_on": ["domain"]},
+        {"chapter": "test", "method": "_generate_tests", "depends_on": ["domain"]}
+    ]
+    
     def setup(self):
         """初始化设置"""
         # 设置 LLM 配置
@@ -106,6 +186,8 @@ class ChapterBasedGenerator(BaseGenerator):
         self.model = model
         self.temperature = self.config.temperature or 0.7
         self.max_tokens_per_chapter = 4000  # 每个章节的最大 token 数
+        self.max_parallel_chapters = self.config.extra_params.get("max_parallel_chapters", 3)
+        self._progress_lock = threading.Lock()
         
         self.logger.info(f"Initialized Chapter Based Generator with model: {model}")
     
@@ -128,34 +210,62 @@ class ChapterBasedGenerator(BaseGenerator):
             # 初始化 PSM 文档
             psm_document = self._initialize_psm_document(platform)
             
-            # 保存章节摘要，供后续章节参考
-            chapter_summaries = []
+            # 读取上次中断时已完成的章节
+            progress_key = self._progress_key(pim_content, platform)
+            completed = self._load_progress(output_dir, progress_key)
+            if completed:
+                self.logger.info(f"Resuming PSM generation, {len(completed)} chapters already done")
+            
+            chapters = {ch['key']: (i, ch) for i, ch in enumerate(self.PSM_CHAPTERS)}
+            
+            # 与上次生成时的 PIM 比较，未受影响的章节沿用上次的内容
+            sections = parse_pim_sections(pim_content)
+            state_file = output_dir / PSM_STATE_FILE
+            state_base = content_hash(platform, self.model, self.PSM_CHAPTERS)
+            state = load_state(state_file, state_base)
+            regeneration = self._plan_regeneration(state, sections, completed)
+            for key in regeneration["reused"]:
+                completed[key] = state["chapters"][key]
+                self._save_progress(output_dir, progress_key, chapters[key][0], key, completed[key])
+            if regeneration["mode"] == "incremental":
+                self.logger.info(f"Incremental PSM generation: regenerating {list(regeneration['regenerated'])}, "
+                                 f"reusing {regeneration['reused']}")
             
-            # 逐章生成
-            for i, chapter in enumerate(self.PSM_CHAPTERS):
+            def generate(key: str, done: Dict[str, str]) -> str:
+                i, chapter = chapters[key]
                 self.logger.info(f"Generating chapter {i+1}/{len(self.PSM_CHAPTERS)}: {chapter['name']}")
                 
-                # 生成章节内容
+                # 只参考所依赖章节（含间接依赖）的摘要，按章节顺序排列
+                ancestors = self._chapter_ancestors(key)
+                summaries = [
+                    self._create_chapter_summary(ch['name'], done[ch['key']])
+                    for ch in self.PSM_CHAPTERS if ch['key'] in ancestors
+                ]
                 chapter_content = self._generate_chapter(
                     chapter=chapter,
                     pim_content=pim_content,
                     platform=platform,
-                    previous_summaries=chapter_summaries
+                    previous_summaries=summaries
                 )
                 
-                # 添加到文档
-                psm_document += f"\n\n# {chapter['name']}\n\n"
-                psm_document += chapter_content
-                
-                # 生成章节摘要
-                summary = self._create_chapter_summary(chapter['name'], chapter_content)
-                chapter_summaries.append(summary)
-                
                 # 保存进度（支持断点续传）
-                progress_file = output_dir / f"psm_progress_{i+1}.md"
-                progress_file.write_text(psm_document, encoding='utf-8')
-                
+                self._save_progress(output_dir, progress_key, i, key, chapter_content)
                 self.logger.info(f"Chapter {chapter['name']} completed, {len(chapter_content)} chars")
+                return chapter_content
+            
+            contents = run_dag(
+                {ch['key']: ch['depends_on'] for ch in self.PSM_CHAPTERS},
+                generate,
+                max_workers=self.max_parallel_chapters,
+                completed=completed
+            )
+            
+            save_state(state_file, state_base, sections=sections, chapters=contents)
+            
+            # 按章节顺序组装文档
+            for chapter in self.PSM_CHAPTERS:
+                psm_document += f"\n\n# {chapter['name']}\n\n"
+                psm_document += contents[chapter['key']]
             
             # 添加文档结尾
             psm_document += self._create_document_footer()
@@ -179,7 +289,9 @@ class ChapterBasedGenerator(BaseGenerator):
                 output_path=output_dir,
                 psm_content=psm_document,
                 generation_time=time.time() - start_time,
-                logs=f"PSM generated successfully with {len(self.PSM_CHAPTERS)} chapters"
+                logs=f"PSM generated successfully with {len(self.PSM_CHAPTERS)} chapters "
+                     f"({len(regeneration['regenerated'])} regenerated)",
+                regeneration=regeneration
             )
             
         except Exception as e:
@@ -191,6 +303,91 @@ class ChapterBasedGenerator(BaseGenerator):
                 generation_time=time.time() - start_time
             )
     
+    def _plan_regeneration(
+        self,
+        state: Optional[Dict[str, Any]],
+        sections: Dict[str, Dict[str, str]],
+        completed: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """确定哪些章节需要重新生成（章节 -> 原因），哪些沿用上次的内容"""
+        plan = {"mode": "full", "pim_changes": [], "regenerated": {}, "reused": [], "resumed": list(completed)}
+        diff = diff_pim(state["sections"], sections) if state else None
+        if diff is not None:
+            plan["mode"] = "incremental"
+            plan["pim_changes"] = diff.reasons()
+            affected = affected_targets(diff, {ch['key']: ch['pim_sections'] for ch in self.PSM_CHAPTERS})
+        
+        for chapter in self.PSM_CHAPTERS:
+            key = chapter['key']
+            if key in completed:
+                continue
+            if diff is None:
+                plan["regenerated"][key] = ["没有上次生成的结果"]
+            elif key in affected:
+                plan["regenerated"][key] = affected[key]
+            elif key in state.get("chapters", {}):
+                plan["reused"].append(key)
+            else:
+                plan["regenerated"][key] = ["没有上次生成的结果"]
+        
+        # 后续章节基于依赖章节的内容生成，依赖重新生成时不能沿用
+        downstream = dependent_targets(plan["regenerated"], {ch['key']: ch['depends_on'] for ch in self.PSM_CHAPTERS})
+        for key in list(plan["reused"]):
+            if key in downstream:
+                plan["reused"].remove(key)
+                plan["regenerated"][key] = downstream[key]
+        return plan
+    
+    def _chapter_ancestors(self, key: str) -> set:
+        """章节的所有直接和间接依赖"""
+        depends_on = {ch['key']: ch['depends_on'] for ch in self.PSM_CHAPTERS}
+        ancestors, stack = set(), list(depends_on[key])
+        while stack:
+            dep = stack.pop()
+            if dep not in ancestors:
+                ancestors.add(dep)
+                stack.extend(depends_on[dep])
+        return ancestors
+    
+    def _progress_key(self, pim_content: str, platform: str) -> str:
+        """进度文件对应的输入：PIM 内容、平台、模型和章节结构都相同时才能续传"""
+        source = json.dumps([pim_content, platform, self.model, self.PSM_CHAPTERS], ensure_ascii=False)
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+    
+    def _load_progress(self, output_dir: Path, progress_key: str) -> Dict[str, str]:
+        """读取已完成章节的内容（psm_progress_<序号>.md 保存对应章节的内容）"""
+        manifest_file = output_dir / "psm_progress.json"
+        try:
+            manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("key") != progress_key:
+            return {}
+        
+        completed = {}
+        for i, chapter in enumerate(self.PSM_CHAPTERS):
+            progress_file = output_dir / f"psm_progress_{i+1}.md"
+            if chapter['key'] in manifest.get("chapters", []) and progress_file.exists():
+                completed[chapter['key']] = progress_file.read_text(encoding='utf-8')
+        return completed
+    
+    def _save_progress(self, output_dir: Path, progress_key: str, index: int, key: str, content: str):
+        """保存章节内容并更新进度清单（并发章节共用清单，需加锁）"""
+        progress_file = output_dir / f"psm_progress_{index+1}.md"
+        progress_file.write_text(content, encoding='utf-8')
+        
+        with self._progress_lock:
+            manifest_file = output_dir / "psm_progress.json"
+            try:
+                manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                manifest = {}
+            if manifest.get("key") != progress_key:
+                manifest = {"key": progress_key, "chapters": []}
+            if key not in manifest["chapters"]:
+                manifest["chapters"].append(key)
+            manifest_file.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    
     def _initialize_psm_document(self, platform: str) -> str:
         """初始化 PSM 文档头部"""
         return f"""# Platform Specific Model (PSM)
@@ -329,38 +526,52 @@ Please review and adjust as needed for your specific requirements.*
             # 解析 PSM 章节
             chapters = self._parse_psm_chapters(psm_content)
             
-            # 基于章节生成对应的代码模块
-            code_files = {}
-            
-            # 1. 基于 Domain 章节生成模型代码
-            if 'domain' in chapters:
-                self.logger.info("Generating models from Domain chapter...")
-                model_files = self._generate_models(chapters['domain'], platform)
-                code_files.update(model_files)
+            # 基于章节生成对应的代码模块，按模块依赖并发执行
+            modules = {m['chapter']: m for m in self.CODE_MODULES if m['chapter'] in chapters}
             
-            # 2. 基于 Service 章节生成服务代码
-            if 'service' in chapters:
-                self.logger.info("Generating services from Service chapter...")
-                service_files = self._generate_services(chapters['service'], platform)
-                code_files.update(service_files)
+            # 章节内容未变的模块沿用上次生成的文件
+            state_file = output_dir / CODE_STATE_FILE
+            state_base = content_hash(platform, self.CODE_MODULES)
+            previous = (load_state(state_file, state_base) or {}).get("modules", {})
+            chapter_hashes = {key: content_hash(chapters[key]) for key in modules}
+            dependencies = {key: [dep for dep in m['depends_on'] if dep in modules] for key, m in modules.items()}
+            reused = {
+                key: previous[key]["files"] for key in modules
+                if key in previous and previous[key]["hash"] == chapter_hashes[key]
+            }
+            regenerated = {
+                key: ["PSM 章节已变化" if key in previous else "没有上次生成的结果"]
+                for key in modules if key not in reused
+            }
+            # 依赖的模块重新生成时，下游模块也重新生成（引用的类名、方法可能已变化）
+            for key, reasons in dependent_targets(regenerated, dependencies).items():
+                if key in reused:
+                    del reused[key]
+                    regenerated[key] = reasons
+            regeneration = {
+                "mode": "incremental" if previous else "full",
+                "regenerated": regenerated,
+                "reused": list(reused)
+            }
             
-            # 3. 基于 API 章节生成路由代码
-            if 'api' in chapters:
-                self.logger.info("Generating API routes from API chapter...")
-                api_files = self._generate_api_routes(chapters['api'], platform)
-                code_files.update(api_files)
+            def generate(key: str, done: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+                module = modules[key]
+                self.logger.info(f"Generating code from {key} chapter ({module['method']})...")
+                return getattr(self, module['method'])(chapters[key], platform)
             
-            # 4. 基于 App 章节生成配置代码
-            if 'app' in chapters:
-                self.logger.info("Generating app configuration from App chapter...")
-                config_files = self._generate_app_config(chapters['app'], platform)
-                code_files.update(config_files)
+            module_files = run_dag(
+                dependencies,
+                generate,
+                max_workers=self.max_parallel_chapters,
+                completed=reused
+            )
+            save_state(state_file, state_base, modules={
+                key: {"hash": chapter_hashes[key], "files": files} for key, files in module_files.items()
+            })
             
-            # 5. 基于 Test 章节生成测试代码
-            if 'test' in chapters:
-                self.logger.info("Generating tests from Test chapter...")
-                test_files = self._generate_tests(chapters['test'], platform)
-                code_files.update(test_files)
+            code_files = {}
+            for module in self.CODE_MODULES:
+                code_files.update(module_files.get(module['chapter'], {}))
             
             # 写入所有文件
             for file_path, content in code_files.items():
@@ -373,7 +584,9 @@ Please review and adjust as needed for your specific requirements.*
                 output_path=output_dir,
                 code_files=code_files,
                 generation_time=time.time() - start_time,
-                logs=f"Generated {len(code_files)} files from PSM chapters"
+                logs=f"Generated {len(code_files)} files from PSM chapters "
+                     f"({len(regeneration['regenerated'])} modules regenerated)",
+                regeneration=regeneration
             )
             
         except Exception as e:
@@ -33,6 +33,10 @@ class GeminiCLIGenerator(BaseGenerator):
         super().__init__(config)
         self.gemini_cli_path = self._find_gemini_cli()
         self.model = config.model or os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+    
+    def rate_limit_provider(self) -> Optional[str]:
+        """Gemini CLI 子进程按 gemini-cli 限速"""
+        return "gemini-cli"
         
     def _find_gemini_cli(self) -> str:
         """查找 Gemini CLI 路径"""
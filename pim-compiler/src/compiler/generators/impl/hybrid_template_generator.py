@@ -0,0 +1,265 @@
+"""
+模板 + LLM 混合生成器
+
+PSM 由 structured_psm 从 PIM 确定性地生成，不调用 LLM。生成代码时，实体、Schema、
+CRUD 服务、路由、配置和测试脚手架都由 FastAPIAdapter 的模板生成；只有 PSM 中标记为
+complex 的服务方法交给 LLM —— 每个服务一个请求，一次返回该服务所有复杂方法的实现，
+不同服务的请求并发执行。
+
+LLM 返回的方法通过语法检查后替换模板中的桩；未配置 API key、请求失败或返回的代码
+无效时保留 NotImplementedError 桩，并在日志中说明。
+"""
+
+import os
+import re
+import ast
+import json
+import time
+import asyncio
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Tuple
+
+try:
+    from openai import OpenAI
+except ImportError:
+    OpenAI = None
+
+from ..base_generator import BaseGenerator, GenerationResult
+from ..models import CodeFile
+from ..platform_adapters import FastAPIAdapter
+from ..psm_generator import PSMModel, PSMService
+from ..structured_psm import parse_pim, render_psm, load_psm
+from ...core.batch_runner import get_rate_limiter, shared_http_client
+
+COMPLEX_METHODS_PROMPT = """你是一个 FastAPI 专家。下面是模板生成的服务类 {service_name}，其中标准 CRUD 方法已经实现，
+请实现列出的业务方法。
+
+## 数据模型
+{entities}
+
+## 服务类（模板生成）
+```python
+{skeleton}
+```
+
+## 需要实现的方法
+{methods}
+
+## 业务规则
+{rules}
+{flows}
+要求：
+1. 保持给出的方法签名不变，方法是服务类中的 async 方法，通过 self.db（SQLAlchemy Session）访问数据库
+2. 只使用服务类已导入的模块，需要其它模块时在方法内部导入
+3. 校验失败时抛出 HTTPException，不要留下 TODO 或 NotImplementedError
+
+只返回一个 JSON 对象，键是方法名，值是该方法的完整 Python 定义（从 async def 开始），不要有其它内容。"""
+
+
+class HybridTemplateGenerator(BaseGenerator):
+    """确定性模板生成标准代码，LLM 只实现复杂的业务方法"""
+
+    def setup(self):
+        """初始化设置"""
+        api_key = self.config.api_key or os.getenv("DEEPSEEK_API_KEY")
+        api_base = self.config.api_base or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+        self.model = self.config.model or "deepseek-chat"
+        self.temperature = self.config.temperature or 0.1
+        self.provider = self.config.extra_params.get("llm_provider", "deepseek")
+        self.max_parallel_services = self.config.extra_params.get("max_parallel_services", 4)
+        self.adapter = FastAPIAdapter()
+
+        self.client = None
+        if api_key and OpenAI is not None:
+            self.client = OpenAI(api_key=api_key, base_url=api_base, http_client=shared_http_client())
+        else:
+            self.logger.warning("No LLM configured (DEEPSEEK_API_KEY / openai), "
+                                "complex service methods will be generated as stubs")
+
+        self.logger.info(f"Initialized Hybrid Template Generator with model: {self.model}")
+
+    def rate_limit_provider(self) -> Optional[str]:
+        """模板生成本身不请求 LLM，复杂方法的请求在 _request_service_methods 中按 self.provider 限速"""
+        return None
+
+    def generate_psm(
+        self,
+        pim_content: str,
+        platform: str = "fastapi",
+        output_dir: Optional[Path] = None
+    ) -> GenerationResult:
+        """从 PIM 确定性地生成 PSM（不调用 LLM）"""
+        start_time = time.time()
+        output_dir = Path(output_dir) if output_dir else Path.cwd()
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            psm_model = parse_pim(pim_content, platform)
+            psm_content = render_psm(psm_model)
+            (output_dir / "psm.md").write_text(psm_content, encoding='utf-8')
+
+            complex_methods = sum(m["complex"] for s in psm_model.services for m in s.methods)
+            return GenerationResult(
+                success=True,
+                output_path=output_dir,
+                psm_content=psm_content,
+                generation_time=time.time() - start_time,
+                logs=f"PSM generated from templates: {len(psm_model.entities)} entities, "
+                     f"{len(psm_model.services)} services, {complex_methods} complex methods"
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to generate PSM: {e}")
+            return GenerationResult(
+                success=False,
+                output_path=output_dir,
+                error_message=str(e),
+                generation_time=time.time() - start_time
+            )
+
+    def generate_code(
+        self,
+        psm_content: str,
+        output_dir: Path,
+        platform: str = "fastapi"
+    ) -> GenerationResult:
+        """从结构化 PSM 生成代码：模板 + 每个服务一次 LLM 请求"""
+        start_time = time.time()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            psm_model = load_psm(psm_content)
+            if psm_model is None:
+                raise ValueError("PSM 中没有结构化模型，请使用 hybrid-template 生成器生成 PSM")
+            if psm_model.platform != "fastapi":
+                raise ValueError(f"Unsupported platform for templates: {psm_model.platform}")
+
+            method_bodies, llm_logs = self._implement_complex_methods(psm_model)
+            files = asyncio.run(self._render_files(psm_model, method_bodies))
+
+            code_files = {f.path: f.content for f in files}
+            for package in sorted({str(Path(path).parent) for path in code_files if path.endswith(".py")}):
+                code_files.setdefault(f"{package}/__init__.py", "")
+            self._save_files(code_files, output_dir)
+
+            return GenerationResult(
+                success=True,
+                output_path=output_dir,
+                code_files=code_files,
+                generation_time=time.time() - start_time,
+                logs=f"Generated {len(code_files)} files from templates. " + "; ".join(llm_logs)
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to generate code: {e}")
+            return GenerationResult(
+                success=False,
+                output_path=output_dir,
+                error_message=str(e),
+                generation_time=time.time() - start_time
+            )
+
+    async def _render_files(self, psm_model: PSMModel, method_bodies: Dict[str, Dict[str, str]]) -> List[CodeFile]:
+        """用 FastAPIAdapter 的模板生成所有文件"""
+        parts = [
+            self.adapter.generate_models(psm_model.entities),
+            self.adapter.generate_services(psm_model.services, method_bodies),
+            self.adapter.generate_routes(psm_model.services),
+            self.adapter.generate_configs(psm_model, {}),
+        ]
+        if self.config.extra_params.get("generate_tests", True):
+            parts.append(self.adapter.generate_tests(psm_model))
+        if self.config.extra_params.get("generate_docs", False):
+            parts.append(self.adapter.generate_docs(psm_model))
+
+        files = [await self.adapter.generate_main_app(psm_model)]
+        for part in await asyncio.gather(*parts):
+            files.extend(part)
+        return files
+
+    def _implement_complex_methods(self, psm_model: PSMModel) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+        """每个含有复杂方法的服务发一个 LLM 请求，返回 服务名 -> {方法名: 实现} 和日志"""
+        services = [s for s in psm_model.services if any(m["complex"] for m in s.methods)]
+        total = sum(m["complex"] for s in services for m in s.methods)
+        if not services:
+            return {}, ["no complex methods, 0 LLM requests"]
+        if self.client is None:
+            return {}, [f"{total} complex methods left as stubs (no LLM configured)"]
+
+        def implement(service: PSMService) -> Dict[str, str]:
+            try:
+                return self._request_service_methods(service, psm_model)
+            except Exception as e:
+                self.logger.error(f"LLM request for {service.name} failed, keeping stubs: {e}")
+                return {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_parallel_services)) as executor:
+            results = list(executor.map(implement, services))
+        method_bodies = {service.name: bodies for service, bodies in zip(services, results) if bodies}
+        implemented = sum(len(bodies) for bodies in method_bodies.values())
+        return method_bodies, [f"{len(services)} LLM requests, {implemented}/{total} complex methods implemented"]
+
+    def _request_service_methods(self, service: PSMService, psm_model: PSMModel) -> Dict[str, str]:
+        """一次请求实现服务中的所有复杂方法"""
+        complex_methods = [m for m in service.methods if m["complex"]]
+        methods = []
+        flows = {}
+        for method in complex_methods:
+            params = "".join(f", {name}: {type_}" for name, type_ in method["parameters"].items())
+            methods.append(f"- `async def {method['name']}(self{params}) -> {method['return_type']}`："
+                           f"{method['description']}")
+            methods.extend(f"  - {rule}" for rule in method.get("rules", []))
+            for title in method.get("flows", []):
+                flows[title] = psm_model.base_model.flows.get(title, "")
+
+        entities = "\n".join(
+            f"- {e.name}（表 {e.table_name}）: " + ", ".join(f"{a.name}: {a.platform_type}" for a in e.attributes)
+            for e in psm_model.entities
+        )
+        flow_text = "".join(f"\n## 流程：{title}\n{content}\n" for title, content in flows.items())
+        prompt = COMPLEX_METHODS_PROMPT.format(
+            service_name=service.name,
+            entities=entities,
+            skeleton=self.adapter._generate_service_class(service),
+            methods="\n".join(methods),
+            rules=psm_model.base_model.rules or "无",
+            flows=flow_text
+        )
+
+        get_rate_limiter(self.provider).acquire()
+        self.logger.info(f"Requesting {len(complex_methods)} complex methods of {service.name}")
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=self.config.max_tokens
+        )
+        return self._parse_methods(response.choices[0].message.content, complex_methods)
+
+    def _parse_methods(self, content: str, methods: List[Dict[str, Any]]) -> Dict[str, str]:
+        """解析 LLM 返回的 JSON，只保留语法正确、名称匹配的方法定义"""
+        match = re.search(r'```(?:json)?\s*\n(.*?)\n```', content, re.S)
+        try:
+            implementations = json.loads(match.group(1) if match else content)
+        except ValueError:
+            self.logger.warning("LLM response is not valid JSON, keeping stubs")
+            return {}
+
+        bodies = {}
+        for method in methods:
+            code = implementations.get(method["name"]) if isinstance(implementations, dict) else None
+            if not isinstance(code, str):
+                continue
+            code = textwrap.dedent(code).strip()
+            try:
+                tree = ast.parse(code)
+            except SyntaxError as e:
+                self.logger.warning(f"Invalid code for {method['name']}, keeping stub: {e}")
+                continue
+            if len(tree.body) == 1 and isinstance(tree.body[0], (ast.AsyncFunctionDef, ast.FunctionDef)) \
+                    and tree.body[0].name == method["name"]:
+                bodies[method["name"]] = code
+            else:
+                self.logger.warning(f"LLM response for {method['name']} is not a single method definition")
+        return bodies
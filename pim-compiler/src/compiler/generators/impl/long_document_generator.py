@@ -1,6 +1,9 @@
 """
 长文档生成器 - 支持生成超长文档
 使用分段生成和续写策略
+
+增量生成：PIM 修改后沿用上次的大纲，只重新生成标题/描述与变化的 PIM 分类相关的
+章节（见 SECTION_KEYWORDS）；代码模块在模块定义和相关 PSM 内容都未变时沿用上次的文件。
 """
 
 import os
@@ -15,6 +18,20 @@ from openai import OpenAI
 from pydantic import BaseModel, Field
 
 from ..base_generator import BaseGenerator, GeneratorConfig, GenerationResult
+from ...core.pim_diff import parse_pim_sections, diff_pim, affected_targets, content_hash, load_state, save_state
+
+PSM_STATE_FILE = "psm_state.json"  # 上次生成的 PIM 分节摘要、大纲和各章节内容
+CODE_STATE_FILE = ".long_document_code_state.json"  # 上次生成的各模块文件
+
+# 大纲章节与 PIM 分类的对应关系（按章节标题、描述和子节匹配），
+# 匹配不到任何分类的章节在 PIM 有任何变化时都重新生成
+SECTION_KEYWORDS = {
+    "entities": ["model", "模型", "entity", "实体", "schema", "数据", "repository", "dao", "关系", "约束",
+                 "api", "endpoint", "端点", "接口"],
+    "services": ["service", "服务", "业务", "api", "endpoint", "端点", "接口", "路由"],
+    "flows": ["flow", "流程", "service", "服务", "workflow"],
+    "rules": ["rule", "规则", "验证", "validation", "约束", "错误", "error"],
+}
 
 
 class LongDocumentGenerator(BaseGenerator):
@@ -60,14 +77,36 @@ class LongDocumentGenerator(BaseGenerator):
         output_dir.mkdir(parents=True, exist_ok=True)
         
         try:
-            # 第一步：生成文档大纲
-            self.logger.info("Step 1: Generating document outline...")
-            outline = self._generate_outline(pim_content, platform)
+            sections = parse_pim_sections(pim_content)
+            state_file = output_dir / PSM_STATE_FILE
+            state_base = content_hash(platform, self.model)
+            state = load_state(state_file, state_base)
+            diff = diff_pim(state["sections"], sections) if state else None
+            
+            # 第一步：生成文档大纲（概述未变时沿用上次的大纲）
+            if diff is not None and "overview" not in diff.changed_categories:
+                self.logger.info("Step 1: Reusing previous document outline")
+                outline = state["outline"]
+                previous_contents = state["contents"]
+            else:
+                self.logger.info("Step 1: Generating document outline...")
+                outline = self._generate_outline(pim_content, platform)
+                previous_contents = []
             
             # 保存大纲
             outline_file = output_dir / "psm_outline.json"
             outline_file.write_text(json.dumps(outline, ensure_ascii=False, indent=2), encoding='utf-8')
             
+            affected = affected_targets(diff, {
+                i: self._section_categories(section) for i, section in enumerate(outline['sections'])
+            }) if previous_contents else {}
+            regeneration = {
+                "mode": "incremental" if previous_contents else "full",
+                "pim_changes": diff.reasons() if diff else [],
+                "regenerated": {},
+                "reused": []
+            }
+            
             # 第二步：分章节生成
             self.logger.info("Step 2: Generating sections...")
             full_content = f"# Platform Specific Model (PSM)\n\n"
@@ -75,27 +114,37 @@ class LongDocumentGenerator(BaseGenerator):
             full_content += f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
             
             section_summaries = []
+            section_contents = []
             
             for i, section in enumerate(outline['sections']):
-                self.logger.info(f"Generating section {i+1}/{len(outline['sections'])}: {section['title']}")
-                
-                # 生成章节内容
-                section_content = self._generate_section(
-                    section=section,
-                    pim_content=pim_content,
-                    platform=platform,
-                    previous_summaries=section_summaries
-                )
-                
-                # 检查是否需要续写
-                if self._seems_truncated(section_content):
-                    self.logger.info(f"Section seems truncated, requesting continuation...")
-                    continuation = self._continue_generation(
-                        section_content=section_content,
+                if i < len(previous_contents) and i not in affected:
+                    # 与变更无关的章节沿用上次的内容
+                    self.logger.info(f"Reusing section {i+1}/{len(outline['sections'])}: {section['title']}")
+                    section_content = previous_contents[i]
+                    regeneration["reused"].append(section['title'])
+                else:
+                    self.logger.info(f"Generating section {i+1}/{len(outline['sections'])}: {section['title']}")
+                    regeneration["regenerated"][section['title']] = affected.get(i, ["没有上次生成的结果"])
+                    
+                    # 生成章节内容
+                    section_content = self._generate_section(
                         section=section,
-                        platform=platform
+                        pim_content=pim_content,
+                        platform=platform,
+                        previous_summaries=section_summaries
                     )
-                    section_content += continuation
+                    
+                    # 检查是否需要续写
+                    if self._seems_truncated(section_content):
+                        self.logger.info(f"Section seems truncated, requesting continuation...")
+                        continuation = self._continue_generation(
+                            section_content=section_content,
+                            section=section,
+                            platform=platform
+                        )
+                        section_content += continuation
+                
+                section_contents.append(section_content)
                 
                 # 添加到完整文档
                 full_content += f"\n## {section['title']}\n\n"
@@ -109,6 +158,8 @@ class LongDocumentGenerator(BaseGenerator):
                 temp_file = output_dir / f"psm_temp_{i+1}.md"
                 temp_file.write_text(full_content, encoding='utf-8')
             
+            save_state(state_file, state_base, sections=sections, outline=outline, contents=section_contents)
+            
             # 保存最终 PSM
             psm_file = output_dir / "psm.md"
             psm_file.write_text(full_content, encoding='utf-8')
@@ -118,7 +169,9 @@ class LongDocumentGenerator(BaseGenerator):
                 output_path=output_dir,
                 psm_content=full_content,
                 generation_time=time.time() - start_time,
-                logs=f"PSM generated successfully with {len(outline['sections'])} sections"
+                logs=f"PSM generated successfully with {len(outline['sections'])} sections "
+                     f"({len(regeneration['regenerated'])} regenerated)",
+                regeneration=regeneration
             )
             
         except Exception as e:
@@ -130,6 +183,13 @@ class LongDocumentGenerator(BaseGenerator):
                 generation_time=time.time() - start_time
             )
     
+    def _section_categories(self, section: Dict) -> List[str]:
+        """大纲章节依赖的 PIM 分类（概述的变化影响所有章节）"""
+        text = " ".join([section.get('title', ''), section.get('description', '')]
+                        + list(section.get('subsections', []))).lower()
+        categories = [c for c, keywords in SECTION_KEYWORDS.items() if any(k in text for k in keywords)]
+        return ["overview"] + (categories or list(SECTION_KEYWORDS))
+    
     def _generate_outline(self, pim_content: str, platform: str) -> Dict:
         """生成文档大纲"""
         prompt = f"""分析以下 PIM（Platform Independent Model），为 {platform} 平台生成详细的 PSM 文档大纲。
@@ -312,17 +372,35 @@ PIM 内容：
             self.logger.info("Analyzing PSM to determine modules...")
             modules = self._analyze_psm_modules(psm_content, platform)
             
+            # 模块定义和相关 PSM 内容都未变的模块沿用上次的文件
+            state_file = output_dir / CODE_STATE_FILE
+            state_base = content_hash(platform, self.model)
+            previous = (load_state(state_file, state_base) or {}).get("modules", {})
+            module_states = {}
+            regeneration = {"mode": "incremental" if previous else "full", "regenerated": {}, "reused": []}
+            
             # 逐模块生成代码
             code_files = {}
             for i, module in enumerate(modules):
-                self.logger.info(f"Generating module {i+1}/{len(modules)}: {module['name']}")
-                
-                module_files = self._generate_module(
-                    module=module,
-                    psm_content=psm_content,
-                    platform=platform,
-                    existing_modules=[m['name'] for m in modules[:i]]
-                )
+                module_key = content_hash(module)
+                psm_hash = content_hash(self._extract_relevant_psm(psm_content, module))
+                cached = previous.get(module_key)
+                if cached and cached["hash"] == psm_hash:
+                    self.logger.info(f"Reusing module {i+1}/{len(modules)}: {module['name']}")
+                    module_files = cached["files"]
+                    regeneration["reused"].append(module['name'])
+                else:
+                    self.logger.info(f"Generating module {i+1}/{len(modules)}: {module['name']}")
+                    regeneration["regenerated"][module['name']] = [
+                        "相关 PSM 内容已变化" if cached else "没有上次生成的结果"
+                    ]
+                    module_files = self._generate_module(
+                        module=module,
+                        psm_content=psm_content,
+                        platform=platform,
+                        existing_modules=[m['name'] for m in modules[:i]]
+                    )
+                module_states[module_key] = {"hash": psm_hash, "files": module_files}
                 
                 # 写入文件
                 for file_path, content in module_files.items():
@@ -339,12 +417,16 @@ PIM 内容：
                 full_path.write_text(content, encoding='utf-8')
                 code_files[file_path] = content
             
+            save_state(state_file, state_base, modules=module_states)
+            
             return GenerationResult(
                 success=True,
                 output_path=output_dir,
                 code_files=code_files,
                 generation_time=time.time() - start_time,
-                logs=f"Generated {len(code_files)} files in {len(modules)} modules"
+                logs=f"Generated {len(code_files)} files in {len(modules)} modules "
+                     f"({len(regeneration['regenerated'])} regenerated)",
+                regeneration=regeneration
             )
             
         except Exception as e:
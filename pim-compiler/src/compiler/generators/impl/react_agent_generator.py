@@ -23,6 +23,7 @@ from langchain_core.globals import set_llm_cache
 from pydantic import BaseModel, Field
 
 from ..base_generator import BaseGenerator, GeneratorConfig, GenerationResult
+from ...core.batch_runner import shared_http_client
 
 
 # 软件工程知识注入
@@ -145,7 +146,8 @@ class ReactAgentGenerator(BaseGenerator):
             model=model,
             api_key=api_key,
             base_url=api_base,
-            temperature=self.config.temperature
+            temperature=self.config.temperature,
+            http_client=shared_http_client()  # 批量编译时各线程复用连接池
         )
         
         self.logger.info(f"Initialized React Agent with model: {model}")
@@ -1,8 +1,10 @@
 """LLM-based code generator"""
 
 from typing import List, Dict, Any, Optional
+import ast
 import asyncio
 import logging
+import textwrap
 
 from .code_generator import CodeGenerator, CodePackage
 from .models import CodeFile
@@ -28,7 +30,8 @@ class LLMCodeGenerator(CodeGenerator):
         Args:
             llm_provider: LLM provider instance, auto-detected if None
             use_llm_for_all: If True, use LLM for all code generation.
-                           If False, use templates for simple CRUD and LLM for complex logic
+                           If False, use templates for simple CRUD and LLM only for complex
+                           methods (one request per service)
         """
         super().__init__()
         self.llm = llm_provider or get_llm_provider("auto")
@@ -54,7 +57,7 @@ class LLMCodeGenerator(CodeGenerator):
         files.extend(model_files)
         
         # Generate services with LLM enhancement
-        if self.use_llm_for_all or self._has_complex_logic(psm_model):
+        if self.use_llm_for_all:
             service_files = await self._generate_services_with_llm(
                 psm_model.services,
                 psm_model
@@ -162,55 +165,69 @@ class LLMCodeGenerator(CodeGenerator):
         psm_model: PSMModel,
         adapter
     ) -> List[CodeFile]:
-        """Generate services using hybrid approach"""
-        files = []
+        """Generate services using hybrid approach
+        
+        服务类和 CRUD 方法总是来自模板；每个服务的复杂方法合并为一个 LLM 请求，
+        返回的方法替换模板中的桩，各服务的请求并发执行
+        """
         model_context = self.converter.convert_model_context(psm_model.base_model)
         
-        for service in services:
-            # Check each method for complexity
-            simple_methods = []
-            complex_methods = []
-            
-            for method in service.methods:
-                if self._is_complex_method(method, psm_model.base_model):
-                    complex_methods.append(method)
-                else:
-                    simple_methods.append(method)
-            
-            if complex_methods:
-                logger.info(f"Service {service.name} has {len(complex_methods)} complex methods")
-                
-                # Generate the entire service with LLM if it has complex methods
-                service_code = await self._generate_service_with_llm(
-                    service,
-                    psm_model,
-                    model_context
-                )
-            else:
-                # Use template for simple CRUD services
+        async def implement(service: PSMService) -> Dict[str, str]:
+            complex_methods = [m for m in service.methods if self._is_complex_method(m, psm_model.base_model)]
+            if not complex_methods:
                 logger.info(f"Service {service.name} is simple CRUD, using templates")
-                service_files = await adapter.generate_services([service])
-                files.extend(service_files)
-                continue
-                
-            file = CodeFile(
-                path=f"app/services/{service.name.lower()}.py",
-                content=service_code,
-                description=f"Hybrid-generated service for {service.name}"
-            )
-            files.append(file)
-            
-        # Generate __init__.py if not already added
-        if not any(f.path == "app/services/__init__.py" for f in files):
-            init_content = self._generate_services_init(services)
-            init_file = CodeFile(
-                path="app/services/__init__.py",
-                content=init_content,
-                description="Services module init"
-            )
-            files.append(init_file)
-            
-        return files
+                return {}
+            logger.info(f"Service {service.name} has {len(complex_methods)} complex methods")
+            return await self._generate_methods_with_llm(service, complex_methods, model_context, adapter)
+        
+        results = await asyncio.gather(*(implement(service) for service in services))
+        method_bodies = {service.name: bodies for service, bodies in zip(services, results) if bodies}
+        return await adapter.generate_services(services, method_bodies)
+    
+    async def _generate_methods_with_llm(
+        self,
+        service: PSMService,
+        methods: List[Dict[str, Any]],
+        model_context: str,
+        adapter
+    ) -> Dict[str, str]:
+        """一次请求生成服务中的多个方法，返回 方法名 -> 方法定义（无效的方法保留模板桩）"""
+        prompt = f"""
+Implement the following methods of the FastAPI service class {service.name}.
+The class skeleton below is generated from templates; keep the method signatures.
+
+```python
+{adapter._generate_service_class(service)}
+```
+
+Methods to implement:
+"""
+        for method in methods:
+            prompt += f"\n- {method['name']}: {method.get('description', 'Implement this method')}\n"
+        
+        code = await self.llm.generate_code(
+            context=model_context,
+            prompt=prompt,
+            constraints=[
+                "Return only the method definitions, indented as class methods",
+                "Use self.db for SQLAlchemy database operations",
+                "Include proper error handling with HTTPException",
+                "Implement actual business logic, not TODO placeholders"
+            ]
+        )
+        
+        wanted = {method["name"] for method in methods}
+        try:
+            tree = ast.parse(textwrap.dedent(code))
+        except SyntaxError as e:
+            logger.warning(f"LLM returned invalid code for {service.name}, keeping stubs: {e}")
+            return {}
+        source = textwrap.dedent(code)
+        return {
+            node.name: ast.get_source_segment(source, node, padded=True)
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.AsyncFunctionDef, ast.FunctionDef)) and node.name in wanted
+        }
     
     async def _generate_service_with_llm(
         self,
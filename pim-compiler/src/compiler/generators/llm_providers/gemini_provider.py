@@ -1,12 +1,13 @@
 """Gemini CLI provider with proxy support"""
 
-import subprocess
 import os
 import logging
 from typing import List, Dict, Any, Optional
 
 from . import LLMProvider
 from config.llm_config import LLM_TIMEOUT_SECONDS, PROXY_HOST, PROXY_PORT
+from ...core.cli_runner import run_cli
+from ...core.prompts import API_ERROR_PATTERNS
 
 logger = logging.getLogger(__name__)
 
@@ -51,13 +52,13 @@ class GeminiCLIProvider(LLMProvider):
             
         # 检查 CLI 是否安装
         try:
-            result = subprocess.run(
+            result = await run_cli(
                 [self.cli_path, "--version"],
-                capture_output=True,
-                text=True,
-                env=os.environ.copy()  # 包含代理设置
+                env=os.environ.copy(),  # 包含代理设置
+                timeout=30,
+                concurrency_key="gemini-cli"
             )
-            return result.returncode == 0
+            return result.success
         except:
             return False
     
@@ -103,18 +104,22 @@ class GeminiCLIProvider(LLMProvider):
             else:
                 print(f"[DEBUG]   {key}=NOT SET")
         
-        result = subprocess.run(
+        # 在共享的异步运行器中执行，不阻塞事件循环；API 500 错误时指数退避重试
+        result = await run_cli(
             cmd,
-            capture_output=True,
-            text=True,
+            env=env,
             timeout=LLM_TIMEOUT_SECONDS,  # 从配置读取超时时间
-            env=env
+            max_retries=3,
+            retry_on=API_ERROR_PATTERNS,
+            concurrency_key="gemini-cli"
         )
         
-        if result.returncode == 0:
-            return self._extract_code(result.stdout)
+        if result.success:
+            return self._extract_code(result.output)
+        elif result.timed_out:
+            raise Exception(f"Gemini CLI timed out after {LLM_TIMEOUT_SECONDS} seconds")
         else:
-            raise Exception(f"Gemini CLI error: {result.stderr}")
+            raise Exception(f"Gemini CLI error: {result.output}")
     
     def _build_prompt(
         self,
@@ -1,10 +1,11 @@
 """Base platform adapter interface"""
 
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 
-# from ..psm_generator import PSMModel, PSMEntity, PSMService
-from typing import Any
+from ..psm_generator import PSMModel, PSMEntity, PSMService
 from ..models import CodeFile
 
 
@@ -1,6 +1,12 @@
-"""FastAPI platform adapter"""
+"""FastAPI platform adapter
 
-from typing import List, Dict, Any
+方法带有 "operation"（create/get/list/update/delete/custom）和 "entity" 时按其选择模板
+（见 structured_psm.py）；否则按方法名推断。custom 方法的实现可以通过 method_bodies
+传入（如 LLM 生成的代码），没有实现时生成 NotImplementedError 桩。
+"""
+
+from typing import List, Dict, Any, Optional
+import re
 import textwrap
 
 from .base import PlatformAdapter
@@ -35,10 +41,9 @@ class FastAPIAdapter(PlatformAdapter):
         """Generate SQLAlchemy models"""
         imports = [
             "from datetime import datetime",
-            "from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Float",
-            "from sqlalchemy.ext.declarative import declarative_base",
+            "from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, Text, Float, JSON, ForeignKey",
             "",
-            "Base = declarative_base()"
+            "from ..core.database import Base"
         ]
         
         models = []
@@ -64,6 +69,8 @@ class FastAPIAdapter(PlatformAdapter):
         col_type = attr.db_type
         constraints = []
         
+        if attr.constraints.get("foreign_key"):
+            constraints.append(f'ForeignKey("{attr.constraints["foreign_key"]}")')
         if attr.constraints.get("primary_key"):
             constraints.append("primary_key=True")
         if attr.constraints.get("unique"):
@@ -78,6 +85,8 @@ class FastAPIAdapter(PlatformAdapter):
                 constraints.append(f"default={default}")
             else:
                 constraints.append(f"default={repr(default)}")
+        if attr.constraints.get("onupdate"):
+            constraints.append(f"onupdate={attr.constraints['onupdate']}")
                 
         constraint_str = ", " + ", ".join(constraints) if constraints else ""
         return f"Column({col_type}{constraint_str})"
@@ -85,8 +94,8 @@ class FastAPIAdapter(PlatformAdapter):
     def _generate_schemas(self, entities: List[PSMEntity]) -> str:
         """Generate Pydantic schemas"""
         imports = [
-            "from datetime import datetime",
-            "from typing import Optional, List",
+            "from datetime import date, datetime",
+            "from typing import Any, Dict, Optional, List",
             "from pydantic import BaseModel, EmailStr, HttpUrl, UUID4",
             ""
         ]
@@ -144,7 +153,8 @@ class FastAPIAdapter(PlatformAdapter):
             "date": "date",
             "EmailStr": "EmailStr",
             "HttpUrl": "HttpUrl",
-            "UUID": "UUID4"
+            "UUID": "UUID4",
+            "Dict[str, Any]": "Dict[str, Any]"
         }
         
         field_type = type_map.get(attr.platform_type, "str")
@@ -154,12 +164,22 @@ class FastAPIAdapter(PlatformAdapter):
         else:
             return f"Optional[{field_type}]"
             
-    async def generate_services(self, services: List[PSMService]) -> List[CodeFile]:
-        """Generate service layer files"""
+    async def generate_services(
+        self,
+        services: List[PSMService],
+        method_bodies: Optional[Dict[str, Dict[str, str]]] = None
+    ) -> List[CodeFile]:
+        """Generate service layer files
+        
+        Args:
+            services: 服务列表
+            method_bodies: 服务名 -> {方法名: 方法的完整定义}，替换对应方法的模板
+        """
         files = []
+        method_bodies = method_bodies or {}
         
         for service in services:
-            service_content = self._generate_service_class(service)
+            service_content = self._generate_service_class(service, method_bodies.get(service.name))
             file = CodeFile(
                 path=f"app/services/{service.name.lower()}.py",
                 content=service_content,
@@ -178,10 +198,11 @@ class FastAPIAdapter(PlatformAdapter):
         
         return files
         
-    def _generate_service_class(self, service: PSMService) -> str:
+    def _generate_service_class(self, service: PSMService, method_bodies: Optional[Dict[str, str]] = None) -> str:
         """Generate service class implementation"""
+        method_bodies = method_bodies or {}
         imports = [
-            "from typing import List, Optional",
+            "from typing import Any, Dict, List, Optional",
             "from sqlalchemy.orm import Session",
             "from fastapi import HTTPException",
             "",
@@ -196,7 +217,10 @@ class FastAPIAdapter(PlatformAdapter):
         
         # Generate methods
         for method in service.methods:
-            method_impl = self._generate_service_method(method)
+            if method["name"] in method_bodies:
+                method_impl = "\n" + textwrap.indent(textwrap.dedent(method_bodies[method["name"]]).strip(), "    ") + "\n"
+            else:
+                method_impl = self._generate_service_method(method)
             class_def += method_impl
             
         return "\n".join(imports) + class_def
@@ -204,7 +228,17 @@ class FastAPIAdapter(PlatformAdapter):
     def _generate_service_method(self, method: Dict[str, Any]) -> str:
         """Generate service method implementation"""
         method_name = method["name"]
-        params = method.get("parameters", [])
+        operation = method.get("operation")
+        
+        if operation:
+            generators = {
+                "create": self._generate_create_method,
+                "get": self._generate_get_method,
+                "list": self._generate_get_method,
+                "update": self._generate_update_method,
+                "delete": self._generate_delete_method,
+            }
+            return generators.get(operation, self._generate_generic_method)(method)
         
         # Simple CRUD implementations
         if "create" in method_name.lower():
@@ -220,7 +254,7 @@ class FastAPIAdapter(PlatformAdapter):
             
     def _generate_create_method(self, method: Dict[str, Any]) -> str:
         """Generate create method"""
-        entity_name = self._infer_entity_name(method["name"])
+        entity_name = self._method_entity(method)
         
         return f"""
     async def {method["name"]}(self, data: {entity_name}Create) -> {entity_name}:
@@ -234,9 +268,9 @@ class FastAPIAdapter(PlatformAdapter):
         
     def _generate_get_method(self, method: Dict[str, Any]) -> str:
         """Generate get/find method"""
-        entity_name = self._infer_entity_name(method["name"])
+        entity_name = self._method_entity(method)
         
-        if "all" in method["name"].lower() or "list" in method["name"].lower():
+        if self._is_list_method(method):
             return f"""
     async def {method["name"]}(self, skip: int = 0, limit: int = 100) -> List[{entity_name}]:
         \"\"\"{method.get('description', 'Get all ' + entity_name + 's')}\"\"\"
@@ -254,12 +288,14 @@ class FastAPIAdapter(PlatformAdapter):
             
     def _generate_update_method(self, method: Dict[str, Any]) -> str:
         """Generate update method"""
-        entity_name = self._infer_entity_name(method["name"])
+        entity_name = self._method_entity(method)
         
         return f"""
     async def {method["name"]}(self, id: int, data: {entity_name}Update) -> {entity_name}:
         \"\"\"{method.get('description', 'Update ' + entity_name)}\"\"\"
-        obj = await self.get_{entity_name.lower()}_by_id(id)
+        obj = self.db.query({entity_name}).filter({entity_name}.id == id).first()
+        if not obj:
+            raise HTTPException(status_code=404, detail="{entity_name} not found")
         update_data = data.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(obj, field, value)
@@ -270,12 +306,14 @@ class FastAPIAdapter(PlatformAdapter):
         
     def _generate_delete_method(self, method: Dict[str, Any]) -> str:
         """Generate delete method"""
-        entity_name = self._infer_entity_name(method["name"]) 
+        entity_name = self._method_entity(method)
         
         return f"""
     async def {method["name"]}(self, id: int) -> bool:
         \"\"\"{method.get('description', 'Delete ' + entity_name)}\"\"\"
-        obj = await self.get_{entity_name.lower()}_by_id(id)
+        obj = self.db.query({entity_name}).filter({entity_name}.id == id).first()
+        if not obj:
+            raise HTTPException(status_code=404, detail="{entity_name} not found")
         self.db.delete(obj)
         self.db.commit()
         return True
@@ -296,6 +334,15 @@ class FastAPIAdapter(PlatformAdapter):
         raise NotImplementedError("{method['name']} not implemented")
 """
         
+    def _method_entity(self, method: Dict[str, Any]) -> str:
+        """方法操作的实体：优先使用 PSM 中声明的 entity"""
+        return method.get("entity") or self._infer_entity_name(method["name"])
+        
+    def _is_list_method(self, method: Dict[str, Any]) -> bool:
+        if method.get("operation"):
+            return method["operation"] == "list"
+        return "all" in method["name"].lower() or "list" in method["name"].lower()
+        
     def _infer_entity_name(self, method_name: str) -> str:
         """Infer entity name from method name"""
         # Simple heuristic - improve as needed
@@ -345,8 +392,8 @@ class FastAPIAdapter(PlatformAdapter):
     def _generate_route_file(self, service: PSMService) -> str:
         """Generate route file for a service"""
         imports = [
-            "from typing import List",
-            "from fastapi import APIRouter, Depends, HTTPException",
+            "from typing import Any, Dict, List",
+            "from fastapi import APIRouter, Body, Depends, HTTPException",
             "from sqlalchemy.orm import Session",
             "",
             "from ...core.database import get_db",
@@ -373,21 +420,31 @@ class FastAPIAdapter(PlatformAdapter):
         method_name = method["name"]
         
         # Infer response model
-        entity_name = self._infer_entity_name(method_name)
-        
-        if "list" in method_name.lower() or "all" in method_name.lower():
+        entity_name = self._method_entity(method)
+        operation = method.get("operation")
+        
+        if operation == "custom":
+            response_model = None  # 复杂方法的返回值由实现决定
+        elif operation == "delete":
+            response_model = "bool"
+        elif self._is_list_method(method):
             response_model = f"List[{entity_name}Response]"
         else:
             response_model = f"{entity_name}Response"
             
-        route = f'\n\n@router.{http_method}("{path}", response_model={response_model})\n'
+        if response_model:
+            route = f'\n\n@router.{http_method}("{path}", response_model={response_model})\n'
+        else:
+            route = f'\n\n@router.{http_method}("{path}")\n'
         route += f'async def {method_name}(\n'
         
         # Add parameters
         if "{id}" in path:
             route += "    id: int,\n"
             
-        if http_method in ["post", "put"]:
+        if operation == "custom":
+            route += "    data: Dict[str, Any] = Body(default_factory=dict),\n"
+        elif http_method in ["post", "put"]:
             route += f"    data: {entity_name}{'Create' if http_method == 'post' else 'Update'},\n"
             
         route += "    db: Session = Depends(get_db)\n"
@@ -396,7 +453,9 @@ class FastAPIAdapter(PlatformAdapter):
         route += f"    service = {service_name}(db)\n"
         
         # Call service method
-        if http_method in ["post", "put"]:
+        if operation == "custom":
+            route += f"    return await service.{method_name}(data)\n"
+        elif http_method in ["post", "put"]:
             route += f"    return await service.{method_name}("
             if "{id}" in path:
                 route += "id, data"
@@ -529,7 +588,11 @@ async def health_check():
         return '''"""Application settings"""
 
 from typing import List
-from pydantic import BaseSettings
+
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:  # pydantic 1.x
+    from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
@@ -595,6 +658,8 @@ uvicorn[standard]>=0.23.0
 sqlalchemy>=2.0.0
 psycopg2-binary>=2.9.0
 pydantic>=2.0.0
+pydantic-settings>=2.0.0
+email-validator>=2.0.0
 python-dotenv>=1.0.0
 alembic>=1.12.0
 pytest>=7.4.0
@@ -633,8 +698,12 @@ ALLOWED_ORIGINS=["*"]
         ))
         
         # API tests
+        entities = {entity.name: entity for entity in psm_model.entities}
         for service in psm_model.services:
-            test_content = self._generate_service_tests(service)
+            if any(method.get("operation") for method in service.methods):
+                test_content = self._generate_operation_tests(service, entities)
+            else:
+                test_content = self._generate_service_tests(service)
             files.append(CodeFile(
                 path=f"tests/test_{service.name.lower()}.py",
                 content=test_content,
@@ -682,6 +751,61 @@ def client():
     Base.metadata.drop_all(bind=engine)
 '''
         
+    def _sample_value(self, attr: PSMAttribute, suffix: str) -> Any:
+        """测试数据中字段的示例值"""
+        samples = {
+            "int": 1, "float": 1.5, "bool": True, "datetime": "2024-01-01T00:00:00",
+            "date": "2024-01-01", "EmailStr": f"test{suffix}@example.com", "HttpUrl": "https://example.com",
+            "Dict[str, Any]": {},
+        }
+        if attr.platform_type in samples:
+            return samples[attr.platform_type]
+        return f"test_{attr.name}{suffix}"
+        
+    def _generate_operation_tests(self, service: PSMService, entities: Dict[str, PSMEntity]) -> str:
+        """按 PSM 中声明的 CRUD 操作生成测试，请求数据由实体字段生成"""
+        operations = {method["operation"]: method for method in service.methods if method.get("operation")}
+        entity = entities.get(next((m["entity"] for m in operations.values() if m.get("entity")), ""))
+        lines = [f'"""Tests for {service.name}"""', "", "from fastapi.testclient import TestClient", ""]
+        if entity is None:
+            return "\n".join(lines)
+        
+        fields = [attr for attr in entity.attributes
+                  if attr.name not in ("id", "created_at", "updated_at") and not attr.constraints.get("foreign_key")]
+        payload = {attr.name: self._sample_value(attr, "_create") for attr in fields}
+        snake = "_".join(part.lower() for part in re.findall(r'[A-Z][a-z0-9]*', entity.name)) or entity.table_name
+        
+        if "create" in operations:
+            lines += ["", f"def test_create_{snake}(client: TestClient):",
+                      f'    """Test creating a {entity.name}"""',
+                      f'    response = client.post("{service.base_path}", json={payload!r})',
+                      "    assert response.status_code == 200",
+                      '    assert "id" in response.json()', ""]
+        if "list" in operations:
+            lines += ["", f"def test_list_{snake}(client: TestClient):",
+                      f'    """Test listing {entity.name}"""',
+                      f'    response = client.get("{service.base_path}")',
+                      "    assert response.status_code == 200",
+                      "    assert isinstance(response.json(), list)", ""]
+        if "create" in operations:
+            for operation in ("get", "update", "delete"):
+                if operation not in operations:
+                    continue
+                # 唯一字段的值按测试区分，避免与其它测试创建的数据冲突
+                other_payload = {attr.name: self._sample_value(attr, f"_{operation}") for attr in fields}
+                lines += ["", f"def test_{operation}_{snake}(client: TestClient):",
+                          f'    """Test {operation} {entity.name}"""',
+                          f'    created = client.post("{service.base_path}", json={other_payload!r}).json()',
+                          f'    path = f"{service.base_path}/{{created[\'id\']}}"']
+                if operation == "get":
+                    lines += ["    response = client.get(path)"]
+                elif operation == "update":
+                    lines += [f"    response = client.put(path, json={{}})"]
+                else:
+                    lines += ["    response = client.delete(path)"]
+                lines += ["    assert response.status_code == 200", ""]
+        return "\n".join(lines)
+        
     def _generate_service_tests(self, service: PSMService) -> str:
         """Generate tests for a service"""
         entity_name = self._infer_entity_name(service.methods[0]["name"] if service.methods else "Entity")
@@ -1,5 +1,7 @@
 """PIM to PSM transformation"""
 
+from __future__ import annotations
+
 from typing import Dict, Any, List
 from dataclasses import dataclass
 from datetime import datetime
@@ -36,15 +38,15 @@ class PSMService:
     platform_config: Dict[str, Any]
 
 
-# @dataclass
-# class PSMModel:
-#     """Platform-specific model"""
-#     platform: str
-#     base_model: PIMModel
-#     entities: List[PSMEntity]
-#     services: List[PSMService]
-#     platform_config: Dict[str, Any]
-#     generated_at: datetime
+@dataclass
+class PSMModel:
+    """Platform-specific model"""
+    platform: str
+    base_model: Any  # PIMModel，或解析出的 PIM 描述
+    entities: List[PSMEntity]
+    services: List[PSMService]
+    platform_config: Dict[str, Any]
+    generated_at: datetime
 
 
 class PSMGenerator:
@@ -0,0 +1,516 @@
+"""
+结构化 PSM：不经过 LLM，直接从 PIM 解析出 PSMModel
+
+模板生成器（HybridTemplateGenerator）的 PSM 由这里确定性地生成：
+- parse_pim: 解析 PIM 中的实体、属性和服务操作，推断字段类型和约束，
+  把服务操作分为标准 CRUD（由模板生成）和复杂操作（交给 LLM 实现）
+- render_psm: 输出 Markdown PSM，末尾嵌入 JSON 格式的结构化模型
+- load_psm: 从 PSM 中读回 PSMModel，代码生成阶段不需要再理解自然语言
+
+中文名称通过 NAME_GLOSSARY 转换为标识符；PIM 中写明英文名（如 "### 文章 (Article)"）
+时优先使用英文名。无法转换的名称使用 field_1、method_1 这样的编号并记录警告。
+"""
+
+import re
+import json
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from .psm_generator import PSMGenerator, PSMModel, PSMEntity, PSMService, PSMAttribute
+from ..core.pim_diff import heading_category
+
+logger = logging.getLogger(__name__)
+
+SPEC_MARKER = "<!-- psm-spec -->"
+
+# 中文术语 -> 标识符中的单词（按最长匹配切分名称）
+NAME_GLOSSARY = {
+    # 通用
+    "创建时间": "created_at", "更新时间": "updated_at", "注册时间": "registered_at",
+    "发布时间": "published_at", "分配时间": "assigned_at", "最后登录时间": "last_login_at",
+    "用户名": "username", "姓名": "full_name", "名称": "name", "名": "name", "标题": "title",
+    "邮箱": "email", "邮件": "email", "密码": "password", "手机号": "phone", "手机": "phone",
+    "电话": "phone", "联系电话": "contact_phone", "地址": "address", "性别": "gender",
+    "年龄": "age", "状态": "status", "类型": "type", "代码": "code", "编号": "number",
+    "编码": "code", "描述": "description", "说明": "description", "备注": "remark",
+    "内容": "content", "摘要": "summary", "简介": "summary", "列表": "list", "信息": "info",
+    "详情": "detail", "数量": "count", "次数": "count", "数": "count", "总": "total",
+    "时间": "time", "日期": "date", "年份": "year", "价格": "price", "金额": "amount",
+    "图片": "image", "链接": "url", "排序": "sort_order", "是否": "is", "最后": "last",
+    "关系": "relation", "记录": "record", "资源": "resource", "操作": "operation",
+    "系统": "system", "管理": "management", "服务": "service", "令牌": "token",
+    # 用户与权限
+    "用户": "user", "角色": "role", "权限": "permission", "作者": "author", "读者": "reader",
+    # 动作
+    "创建": "create", "新增": "create", "新建": "create", "添加": "add", "注册": "register",
+    "登录": "login", "登出": "logout", "查询": "query", "获取": "get", "查看": "view",
+    "搜索": "search", "更新": "update", "修改": "change", "编辑": "edit", "删除": "delete",
+    "移除": "remove", "分配": "assign", "检查": "check", "验证": "verify", "禁用": "disable",
+    "启用": "enable", "发布": "publish", "发表": "post", "审核": "review", "增加": "increase",
+    "减少": "decrease", "取消": "cancel", "确认": "confirm", "支付": "pay", "下架": "remove",
+    "借阅": "borrow", "归还": "return", "续借": "renew", "预约": "reserve", "通知": "notify",
+    "重置": "reset", "导出": "export", "导入": "import", "统计": "stats", "按": "by",
+    # 常见业务对象
+    "文章": "article", "分类": "category", "评论": "comment", "标签": "tag", "浏览量": "view_count",
+    "图书": "book", "书名": "title", "出版社": "publisher", "出版": "publish", "位置": "location",
+    "库存": "stock", "可借": "available", "应还": "due", "实际": "actual", "罚金": "fine",
+    "信用分": "credit_score", "有效期": "valid", "至": "until", "过期": "expire",
+    "身份证号": "id_card_number", "订单": "order", "商品": "product", "产品": "product",
+    "客户": "customer", "部门": "department", "员工": "employee", "项目": "project",
+    "任务": "task", "消息": "message", "文件": "file", "账户": "account", "账号": "account",
+    "患者": "patient", "医生": "doctor", "护士": "nurse", "科室": "department",
+}
+IGNORED_CHARS = set("的之与和及或/、，,（）()·-_ \t")
+
+# 服务操作的动词 -> CRUD 操作
+CRUD_VERBS = {
+    "创建": "create", "新增": "create", "新建": "create", "添加": "create",
+    "查询": "list", "获取": "list", "查看": "list", "列出": "list",
+    "更新": "update", "修改": "update", "编辑": "update",
+    "删除": "delete", "移除": "delete",
+}
+OBJECT_SUFFIXES = ("信息", "列表", "详情")
+
+# 显式类型（"- 书名 (文本，必填)"）和按名称推断的类型
+EXPLICIT_TYPES = {
+    "日期时间": "datetime", "时间": "datetime", "日期": "date", "文本": "string", "字符串": "string",
+    "整数": "integer", "小数": "float", "数字": "float", "布尔": "boolean", "枚举": "string",
+    "邮箱": "email", "长文本": "text", "列表": "json",
+}
+NAME_TYPES = [
+    (("日期时间",), "datetime"), (("时间",), "datetime"), (("日期",), "date"),
+    (("邮箱", "邮件"), "email"), (("价格", "金额", "罚金", "费用", "余额"), "float"),
+    (("描述", "内容", "简介", "备注", "正文", "摘要", "说明"), "text"),
+    (("列表", "集合"), "json"), (("数量", "次数", "年龄", "库存", "年份", "排序"), "integer"),
+]
+COUNT_SUFFIXES = ("数", "量", "分")
+AUTO_ATTRIBUTES = ("id", "created_at", "updated_at")
+
+
+@dataclass
+class PIMSummary:
+    """PSMModel.base_model：模板中使用的系统信息和交给 LLM 的业务规则、流程"""
+    domain: str
+    description: str = ""
+    version: str = "1.0.0"
+    rules: str = ""
+    flows: Dict[str, str] = field(default_factory=dict)
+
+
+def _split_camel(text: str) -> List[str]:
+    return [w.lower() for w in re.findall(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+', text)]
+
+
+def _translate(text: str) -> Optional[List[str]]:
+    """把名称切分为标识符单词，含有无法翻译的汉字时返回 None"""
+    words, i = [], 0
+    while i < len(text):
+        ascii_word = re.match(r'[A-Za-z0-9]+', text[i:])
+        if ascii_word:
+            words.extend(_split_camel(ascii_word.group(0)))
+            i += len(ascii_word.group(0))
+            continue
+        for length in range(min(8, len(text) - i), 0, -1):
+            term = text[i:i + length]
+            if term in NAME_GLOSSARY:
+                words.append(NAME_GLOSSARY[term])
+                i += length
+                break
+        else:
+            if text[i] not in IGNORED_CHARS:
+                return None
+            i += 1
+    return words or None
+
+
+def _explicit_name(text: str) -> Tuple[str, Optional[str]]:
+    """拆出 "文章 (Article)" 中的英文名"""
+    match = re.match(r'^(.*?)\s*[（(]\s*([A-Za-z][A-Za-z0-9_]*)\s*[)）]\s*$', text)
+    if match:
+        return match.group(1).strip(), match.group(2)
+    return text.strip(), None
+
+
+class _Namer:
+    """名称 -> 标识符，无法翻译时按类别编号"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.unresolved: List[str] = []
+
+    def words(self, name: str, english: Optional[str], kind: str) -> List[str]:
+        if english:
+            return _split_camel(english) or [english.lower()]
+        words = _translate(name)
+        if words:
+            return words
+        self.counters[kind] = self.counters.get(kind, 0) + 1
+        self.unresolved.append(name)
+        return [kind, str(self.counters[kind])]
+
+    def snake(self, name: str, english: Optional[str], kind: str) -> str:
+        return "_".join(self.words(name, english, kind))
+
+    def pascal(self, name: str, english: Optional[str], kind: str) -> str:
+        if english and english[0].isupper():
+            return english
+        return "".join(w[:1].upper() + w[1:] for w in "_".join(self.words(name, english, kind)).split("_"))
+
+
+def _pluralize(word: str) -> str:
+    if word.endswith("y") and word[-2:-1] not in "aeiou":
+        return word[:-1] + "ies"
+    if word.endswith(("s", "x", "ch", "sh")):
+        return word + "es"
+    return word + "s"
+
+
+def _snake_from_pascal(name: str) -> str:
+    return "_".join(_split_camel(name))
+
+
+# ----- PIM 解析 -----
+
+def _pim_blocks(pim_content: str) -> Dict[str, Any]:
+    """按标题拆出 标题、概述、实体、服务、规则、流程 各部分的原始内容（二级标题分类与增量生成相同）"""
+    blocks = {"title": "", "overview": [], "entities": [], "services": [], "rules": [], "flows": []}
+    category = "overview"
+    for line in pim_content.splitlines():
+        heading = re.match(r'^(#{1,2})\s+(.*)$', line)
+        if heading:
+            if len(heading.group(1)) == 1:
+                blocks["title"] = blocks["title"] or heading.group(2).strip()
+                category = "overview"
+            else:
+                category = heading_category(heading.group(2))
+                category = category if category in blocks else "overview"
+            continue
+        blocks[category].append(line)
+    return blocks
+
+
+def _items(lines: List[str]) -> List[Tuple[int, str, List[str]]]:
+    """三级及以下标题 -> (级别, 标题, 直属内容行)"""
+    items, current = [], None
+    for line in lines:
+        heading = re.match(r'^(#{3,6})\s+(.*)$', line)
+        if heading:
+            current = (len(heading.group(1)), heading.group(2).strip(), [])
+            items.append(current)
+        elif current is not None:
+            current[2].append(line)
+    return items
+
+
+def _bullets(lines: List[str]) -> List[str]:
+    return [re.sub(r'^\s*[-*]\s+', '', line).strip() for line in lines if re.match(r'^[-*]\s+', line)]
+
+
+def _operations(lines: List[str]) -> List[Tuple[str, List[str]]]:
+    """操作列表中的 (操作, 业务规则)：列表项，或 "1. **创建用户**" 及其下 "规则：" 子项"""
+    operations = []
+    for line in lines:
+        numbered = re.match(r'^\d+\.\s+\*\*(.+?)\*\*\s*[：:]?\s*(.*)$', line)
+        if numbered:
+            operations.append((numbered.group(1).strip() + (" - " + numbered.group(2) if numbered.group(2) else ""), []))
+        elif re.match(r'^[-*]\s+', line):
+            operations.append((re.sub(r'^[-*]\s+', '', line).strip(), []))
+        elif operations and re.match(r'^\s+[-*]\s+(规则|rule)', line, re.I):
+            operations[-1][1].append(re.sub(r'^\s+[-*]\s+(规则|rule)\s*[：:]?\s*', '', line, flags=re.I))
+    return operations
+
+
+def _infer_type(name: str, flags: List[str]) -> str:
+    for flag in flags:
+        if flag in EXPLICIT_TYPES:
+            return EXPLICIT_TYPES[flag]
+    if name.startswith("是否"):
+        return "boolean"
+    for keywords, pim_type in NAME_TYPES:
+        if any(keyword in name for keyword in keywords):
+            return pim_type
+    if name.endswith(COUNT_SUFFIXES):
+        return "integer"
+    return "string"
+
+
+def _parse_attribute(text: str, namer: _Namer, entities: Dict[str, str],
+                     type_mapping: Dict[str, Tuple[str, str]]) -> Optional[PSMAttribute]:
+    """解析属性行：用户名（必填，唯一）- 说明 / 书名 (文本，必填): 说明 / 标题：说明"""
+    match = re.match(r'^([^（(：:\-]+?)\s*(?:[（(]([^）)]*)[）)])?\s*(?:[：:]|-\s*|$)(.*)$', text)
+    if not match:
+        return None
+    name, detail = match.group(1).strip(), (match.group(2) or "")
+    flags = [flag.strip() for flag in re.split(r'[，,、]', detail) if flag.strip()]
+    english = name if re.fullmatch(r'[A-Za-z][A-Za-z0-9_]*', name) else None
+
+    # 用户（关联到用户）-> user_id 外键
+    reference = next((flag[3:].strip() for flag in flags if flag.startswith("关联到")), None)
+    if reference in entities:
+        target = entities[reference]
+        return PSMAttribute(
+            name=f"{_snake_from_pascal(target)}_id",
+            pim_type="integer",
+            platform_type="int",
+            db_type="Integer",
+            constraints={"nullable": False, "foreign_key": f"{_pluralize(_snake_from_pascal(target))}.id",
+                         "description": name}
+        )
+
+    attr_name = namer.snake(name, english, "field")
+    if english and english.isupper():
+        attr_name = english.lower()
+    if attr_name in AUTO_ATTRIBUTES or "自动生成" in flags:
+        return None
+
+    pim_type = _infer_type(name, flags)
+    platform_type, db_type = type_mapping.get(pim_type, ("str", "String"))
+    constraints: Dict[str, Any] = {"description": name}
+    if "必填" in flags:
+        constraints["nullable"] = False
+    if "唯一" in flags or "唯一" in (match.group(3) or "")[:6]:
+        constraints["unique"] = True
+        constraints["index"] = True
+    default = next((flag[2:].strip() for flag in flags if flag.startswith("默认")), None)
+    if default:
+        constraints["default"] = int(default) if default.isdigit() else default
+    return PSMAttribute(name=attr_name, pim_type=pim_type, platform_type=platform_type,
+                        db_type=db_type, constraints=constraints)
+
+
+def _auto_attributes(type_mapping: Dict[str, Tuple[str, str]]) -> Tuple[List[PSMAttribute], List[PSMAttribute]]:
+    """与 PSMGenerator 相同的主键和时间戳字段"""
+    datetime_type = type_mapping["datetime"]
+    id_attr = PSMAttribute("id", "integer", "int", "Integer", {"primary_key": True, "index": True})
+    timestamps = [
+        PSMAttribute("created_at", "datetime", *datetime_type, {"default": "datetime.utcnow"}),
+        PSMAttribute("updated_at", "datetime", *datetime_type,
+                     {"default": "datetime.utcnow", "onupdate": "datetime.utcnow"}),
+    ]
+    return [id_attr], timestamps
+
+
+def _parse_entities(lines: List[str], namer: _Namer, platform: str) -> Tuple[List[PSMEntity], Dict[str, str]]:
+    type_mapping = PSMGenerator.TYPE_MAPPINGS[platform]
+    candidates = [(title, _bullets(body)) for _, title, body in _items(lines)]
+    candidates = [(title, bullets) for title, bullets in candidates if bullets]  # 没有属性的标题是分组
+
+    # 先确定所有实体名，属性中的 "关联到X" 才能解析
+    names: Dict[str, str] = {}
+    for title, _ in candidates:
+        name, english = _explicit_name(title)
+        names[name] = namer.pascal(name, english, "entity")
+
+    entities = []
+    for title, bullets in candidates:
+        name, _ = _explicit_name(title)
+        class_name = names[name]
+        head, tail = _auto_attributes(type_mapping)
+        attributes = [attr for attr in (_parse_attribute(b, namer, names, type_mapping) for b in bullets) if attr]
+        seen, unique_attributes = set(AUTO_ATTRIBUTES), []
+        for attr in attributes:
+            if attr.name not in seen:
+                seen.add(attr.name)
+                unique_attributes.append(attr)
+        entities.append(PSMEntity(
+            name=class_name,
+            table_name=_pluralize(_snake_from_pascal(class_name)),
+            attributes=head + unique_attributes + tail,
+            platform_annotations={"orm_mode": True, "description": name}
+        ))
+    return entities, names
+
+
+def _classify_operation(name: str, entity_names: Dict[str, str], default_entity: Optional[str]) -> Tuple[str, Optional[str]]:
+    """标准 CRUD 返回 (操作, 实体类名)，其它返回 ("custom", 服务的实体)"""
+    for verb, operation in CRUD_VERBS.items():
+        if name.startswith(verb):
+            target = name[len(verb):].strip()
+            for suffix in OBJECT_SUFFIXES:
+                if target.endswith(suffix):
+                    target = target[:-len(suffix)]
+            if not target and default_entity:
+                return operation, default_entity
+            if target in entity_names:
+                return operation, entity_names[target]
+            break
+    return "custom", default_entity
+
+
+def _parse_services(lines: List[str], namer: _Namer, entity_names: Dict[str, str],
+                    flows: Dict[str, str]) -> List[PSMService]:
+    services: List[Tuple[str, Optional[str], List[Tuple[str, List[str]]]]] = []
+    for level, title, body in _items(lines):
+        name, english = _explicit_name(title)
+        if "服务" in name or "service" in name.lower() or level == 3:
+            # 服务标题，直属的列表项是操作
+            services.append((name, english, _operations(body)))
+        elif services and not re.search(r'操作|方法|列表|operation|method', name, re.I):
+            # "#### 添加图书 (addBook)"：操作标题，列表项是该操作的业务规则
+            services[-1][2].append((title, _bullets(body)))
+        elif services:
+            services[-1][2].extend(_operations(body))
+
+    result = []
+    for name, english, operations in services:
+        subject = re.sub(r'(管理)?服务$', '', name).strip()
+        default_entity = entity_names.get(subject)
+        class_name = english or namer.pascal(name, None, "service")
+        if not class_name.endswith("Service"):
+            class_name += "Service"
+        base_entity = default_entity or class_name[:-len("Service")] or "Item"
+        base_path = "/" + _pluralize(_snake_from_pascal(base_entity)).replace("_", "-")
+
+        methods, used = [], set()
+        for text, op_rules in operations:
+            parts = re.split(r'\s+-\s+|[：:]', text, maxsplit=1)
+            op_text, description = (parts[0].strip(), parts[1].strip()) if len(parts) == 2 else (text, "")
+            op_name, op_english = _explicit_name(op_text)
+            detail = re.search(r'[（(]([^）)]*)[）)]\s*$', op_name)
+            if detail and not op_english:
+                op_name, description = op_name[:detail.start()].strip(), description or detail.group(1)
+            operation, entity = _classify_operation(op_name, entity_names, default_entity)
+            if op_rules:
+                operation = "custom"  # 带有专门业务规则的操作交给 LLM
+
+            if operation == "custom":
+                method_name = _snake_from_pascal(op_english) if op_english else namer.snake(op_name, None, "method")
+            else:
+                entity_snake = _snake_from_pascal(entity)
+                method_name = f"list_{_pluralize(entity_snake)}" if operation == "list" else f"{operation}_{entity_snake}"
+            while method_name in used:
+                method_name += "_2"
+            used.add(method_name)
+
+            # 操作名中的动词（去掉实体名后的任意两个字）出现在流程标题中时，把流程交给 LLM 参考
+            terms = {op_name[i:i + 2] for i in range(len(op_name) - 1)} - set(entity_names)
+            related_flows = [title for title in flows if any(term in title for term in terms)]
+            methods.append(_method_spec(method_name, operation, entity, op_name, description,
+                                        op_rules, related_flows))
+        result.append(PSMService(
+            name=class_name,
+            base_path=base_path,
+            methods=methods,
+            platform_config={"tags": [name], "dependencies": ["Depends(get_db)"], "entity": default_entity}
+        ))
+    return result
+
+
+def _method_spec(name: str, operation: str, entity: Optional[str], title: str, description: str,
+                 rules: List[str], flows: List[str]) -> Dict[str, Any]:
+    http_methods = {"create": "POST", "list": "GET", "get": "GET", "update": "PUT", "delete": "DELETE"}
+    if operation == "custom":
+        path, parameters, return_type = "/" + name.replace("_", "-"), {"data": "Dict[str, Any]"}, "Any"
+    elif operation in ("create", "list"):
+        path, parameters, return_type = "", {}, entity
+    else:
+        path, parameters, return_type = "/{id}", {"id": "int"}, entity
+    return {
+        "name": name,
+        "operation": operation,
+        "entity": entity,
+        "http_method": http_methods.get(operation, "POST"),
+        "path": path,
+        "parameters": parameters,
+        "return_type": return_type,
+        "description": f"{title} - {description}" if description else title,
+        "complex": operation == "custom",
+        "rules": rules,
+        "flows": flows,
+    }
+
+
+def parse_pim(pim_content: str, platform: str = "fastapi") -> PSMModel:
+    """确定性地把 PIM 转换为 PSMModel（不调用 LLM）"""
+    if platform not in PSMGenerator.TYPE_MAPPINGS:
+        raise ValueError(f"Unsupported platform: {platform}")
+    blocks = _pim_blocks(pim_content)
+    namer = _Namer()
+
+    flows = {}
+    for _, title, body in _items(blocks["flows"]):
+        flows[title] = "\n".join(body).strip()
+    overview = [line.strip() for line in blocks["overview"] if line.strip() and not line.startswith("#")]
+    domain = re.sub(r'^.*?[：:]\s*', '', blocks["title"]) or "Generated System"
+    summary = PIMSummary(
+        domain=domain,
+        description=overview[0] if overview else domain,
+        rules="\n".join(blocks["rules"]).strip(),
+        flows=flows
+    )
+
+    entities, entity_names = _parse_entities(blocks["entities"], namer, platform)
+    services = _parse_services(blocks["services"], namer, entity_names, flows)
+    if namer.unresolved:
+        logger.warning(f"No identifier for {len(namer.unresolved)} names, numbered instead: "
+                       f"{namer.unresolved[:10]}. Add English names in the PIM, e.g. '### 文章 (Article)'")
+
+    return PSMModel(
+        platform=platform,
+        base_model=summary,
+        entities=entities,
+        services=services,
+        platform_config=PSMGenerator(platform)._get_platform_config(),
+        generated_at=datetime.now()
+    )
+
+
+# ----- Markdown 输出与读回 -----
+
+def render_psm(psm_model: PSMModel) -> str:
+    """输出可读的 Markdown PSM，末尾嵌入结构化模型（代码生成只读取这一部分）"""
+    summary = psm_model.base_model
+    lines = [f"# {summary.domain} - Platform Specific Model ({psm_model.platform})", "",
+             summary.description, "", "## 数据模型", ""]
+    for entity in psm_model.entities:
+        lines.append(f"### {entity.name} 表 (`{entity.table_name}`)")
+        lines.append(f"{entity.platform_annotations.get('description', entity.name)}")
+        for attr in entity.attributes:
+            flags = [key if value is True else f"{key}={value}"
+                     for key, value in attr.constraints.items() if key != "description"]
+            note = attr.constraints.get("description", "")
+            lines.append(f"- {attr.name}: {attr.platform_type} / {attr.db_type}"
+                         f"{' (' + ', '.join(flags) + ')' if flags else ''}{' - ' + note if note else ''}")
+        lines.append("")
+
+    lines += ["## 服务与 API", ""]
+    for service in psm_model.services:
+        lines.append(f"### {service.name} (`{service.base_path}`)")
+        for method in service.methods:
+            kind = "LLM" if method["complex"] else "模板"
+            lines.append(f"- {method['http_method']} {service.base_path}{method['path']} → "
+                         f"`{method['name']}` [{kind}] - {method['description']}")
+        lines.append("")
+
+    spec = {
+        "platform": psm_model.platform,
+        "base_model": asdict(summary),
+        "entities": [asdict(entity) for entity in psm_model.entities],
+        "services": [asdict(service) for service in psm_model.services],
+        "platform_config": psm_model.platform_config,
+    }
+    lines += ["## 结构化模型", "", SPEC_MARKER, "```json",
+              json.dumps(spec, ensure_ascii=False, indent=2), "```", ""]
+    return "\n".join(lines)
+
+
+def load_psm(psm_content: str) -> Optional[PSMModel]:
+    """读回 render_psm 嵌入的结构化模型，PSM 中没有时返回 None"""
+    marker = psm_content.find(SPEC_MARKER)
+    if marker < 0:
+        return None
+    match = re.search(r'```json\s*\n(.*?)\n```', psm_content[marker:], re.S)
+    if not match:
+        return None
+    spec = json.loads(match.group(1))
+    return PSMModel(
+        platform=spec["platform"],
+        base_model=PIMSummary(**spec["base_model"]),
+        entities=[PSMEntity(**{**entity, "attributes": [PSMAttribute(**a) for a in entity["attributes"]]})
+                  for entity in spec["entities"]],
+        services=[PSMService(**service) for service in spec["services"]],
+        platform_config=spec.get("platform_config", {}),
+        generated_at=datetime.now()
+    )
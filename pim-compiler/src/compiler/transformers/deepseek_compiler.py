@@ -13,6 +13,7 @@ from pydantic import SecretStr
 
 from ..core.base_compiler import BaseCompiler, CompilationResult
 from ..core.compiler_config import CompilerConfig
+from ..core.batch_runner import shared_http_client
 
 
 class DeepSeekCompiler(BaseCompiler):
@@ -32,7 +33,8 @@ class DeepSeekCompiler(BaseCompiler):
             temperature=config.llm_temperature,
             model=config.llm_model,
             base_url=config.deepseek_base_url,
-            api_key=SecretStr(os.getenv("DEEPSEEK_API_KEY", ""))
+            api_key=SecretStr(os.getenv("DEEPSEEK_API_KEY", "")),
+            http_client=shared_http_client()  # 批量编译时各线程复用连接池
         )
         
         # 加载提示词模板
@@ -0,0 +1,111 @@
+"""测试并发批量编译和速率限制"""
+
+import time
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.compiler.core.batch_runner import RateLimiter, get_rate_limiter, run_batch
+
+
+def pim_files(count: int):
+    return [Path(f"pim_{i}.md") for i in range(count)]
+
+
+class TestRunBatch:
+    """测试 run_batch"""
+
+    def test_results_keep_input_order(self):
+        """结果按输入顺序返回，与完成顺序无关"""
+        files = pim_files(4)
+        delays = {files[0]: 0.2, files[1]: 0.0, files[2]: 0.1, files[3]: 0.0}
+
+        def compile_fn(pim_file):
+            time.sleep(delays[pim_file])
+            return {"file": pim_file, "success": True}
+
+        results = run_batch(files, compile_fn, lambda r: r["success"], workers=4, on_event=None)
+        assert [r["file"] for r in results] == files
+
+    def test_concurrency_limited_to_workers(self):
+        """同时运行的编译数不超过 workers"""
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def compile_fn(pim_file):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return True
+
+        results = run_batch(pim_files(8), compile_fn, bool, workers=3, on_event=None)
+        assert len(results) == 8
+        assert 1 < peak <= 3
+
+    def test_stop_on_failure_cancels_pending_files(self):
+        """第一个失败后不再开始新的文件，并为它们发出 cancelled 事件"""
+        files = pim_files(5)
+        events = []
+        started = []
+
+        def compile_fn(pim_file):
+            started.append(pim_file)
+            return pim_file != files[0]
+
+        results = run_batch(files, compile_fn, bool, workers=1, stop_on_failure=True,
+                            on_event=events.append)
+        assert results == [False]
+        assert started == [files[0]]
+        assert [e.pim_file for e in events if e.status == "cancelled"] == files[1:]
+
+    def test_events(self):
+        """每个文件依次发出 started 和 finished 事件，completed 递增"""
+        events = []
+        run_batch(pim_files(3), lambda f: True, bool, workers=1, on_event=events.append)
+
+        assert [e.status for e in events] == ["started", "finished"] * 3
+        finished = [e for e in events if e.status == "finished"]
+        assert [e.completed for e in finished] == [1, 2, 3]
+        assert all(e.success and e.total == 3 for e in finished)
+
+    def test_exception_propagates(self):
+        """编译函数抛出的异常传递给调用方"""
+        def compile_fn(pim_file):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            run_batch(pim_files(2), compile_fn, bool, workers=2, on_event=None)
+
+
+class TestRateLimiter:
+    """测试 RateLimiter"""
+
+    def test_spaces_requests(self):
+        """相邻两次请求至少间隔 60/rate 秒"""
+        limiter = RateLimiter(rate_per_minute=600)  # 间隔 0.1 秒
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        assert time.monotonic() - start >= 0.3 - 0.01
+
+    def test_zero_rate_is_unlimited(self):
+        """速率为 0 时不限制"""
+        limiter = RateLimiter(rate_per_minute=0)
+        start = time.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        assert time.monotonic() - start < 0.1
+
+    def test_shared_per_provider(self, monkeypatch):
+        """同一提供商共用一个限制器，速率可用环境变量覆盖"""
+        monkeypatch.setenv("PIM_RATE_LIMIT_TEST_PROVIDER_A", "0")
+        limiter = get_rate_limiter("test-provider-a")
+        assert get_rate_limiter("test-provider-a") is limiter
+        assert get_rate_limiter("test-provider-b") is not limiter
+        assert limiter.interval == 0.0
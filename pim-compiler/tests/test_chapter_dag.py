@@ -0,0 +1,167 @@
+"""测试按章节依赖并发执行的 run_dag 和 PSM 生成的断点续传"""
+
+import time
+import threading
+
+import pytest
+
+from src.compiler.generators.base_generator import GeneratorConfig
+from src.compiler.generators.impl.chapter_based_generator import ChapterBasedGenerator, run_dag
+
+# 与 PSM 章节相同的依赖结构
+CHAPTER_DEPENDENCIES = {
+    "domain": [],
+    "service": ["domain"],
+    "api": ["domain", "service"],
+    "app": ["domain"],
+    "test": ["domain"],
+}
+
+
+class TestRunDag:
+    """测试 run_dag"""
+
+    def test_dependencies_run_first(self):
+        """任务开始时它的依赖都已完成，且能看到依赖的结果"""
+        order = []
+        lock = threading.Lock()
+
+        def run(task, done):
+            assert set(CHAPTER_DEPENDENCIES[task]) <= set(done)
+            time.sleep(0.02)
+            with lock:
+                order.append(task)
+            return f"{task}:" + ",".join(sorted(done))
+
+        results = run_dag(CHAPTER_DEPENDENCIES, run, max_workers=3)
+
+        assert set(results) == set(CHAPTER_DEPENDENCIES)
+        for task, deps in CHAPTER_DEPENDENCIES.items():
+            assert all(order.index(dep) < order.index(task) for dep in deps)
+        assert results["api"].startswith("api:") and "service" in results["api"]
+
+    def test_independent_tasks_run_concurrently(self):
+        """依赖都已完成的任务并发执行，且不超过 max_workers"""
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def run(task, done):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return task
+
+        run_dag(CHAPTER_DEPENDENCIES, run, max_workers=2)
+        assert peak == 2
+
+    def test_unknown_dependency(self):
+        """依赖不存在的任务时直接报错，不执行任何任务"""
+        calls = []
+        with pytest.raises(ValueError, match="unknown"):
+            run_dag({"a": [], "b": ["missing"]}, lambda task, done: calls.append(task))
+        assert calls == []
+
+    def test_cycle(self):
+        """循环依赖在无任务可执行时报错"""
+        calls = []
+        with pytest.raises(ValueError, match="Circular"):
+            run_dag({"a": [], "b": ["c"], "c": ["b"]}, lambda task, done: calls.append(task))
+        assert calls == ["a"]
+
+    def test_failure_skips_dependents(self):
+        """上游任务失败时异常传递给调用方，依赖它的任务不再执行"""
+        calls = []
+
+        def run(task, done):
+            calls.append(task)
+            if task == "domain":
+                raise RuntimeError("LLM error")
+            return task
+
+        with pytest.raises(RuntimeError, match="LLM error"):
+            run_dag(CHAPTER_DEPENDENCIES, run, max_workers=3)
+        assert calls == ["domain"]
+
+    def test_failure_stops_scheduling(self):
+        """失败时已经在运行的无关任务可以结束，但不会开始新的任务"""
+        dependencies = {"a": [], "slow": [], "after_a": ["a"], "after_slow": ["slow"]}
+        calls = []
+
+        def run(task, done):
+            calls.append(task)
+            if task == "a":
+                raise RuntimeError("boom")
+            time.sleep(0.1)
+            return task
+
+        with pytest.raises(RuntimeError):
+            run_dag(dependencies, run, max_workers=2)
+        assert "after_a" not in calls
+        assert "after_slow" not in calls
+
+    def test_completed_tasks_are_skipped(self):
+        """已完成的任务不再执行，其结果传给下游并出现在返回值中"""
+        calls = []
+
+        def run(task, done):
+            calls.append(task)
+            return f"new {task}"
+
+        results = run_dag(CHAPTER_DEPENDENCIES, run, completed={"domain": "old domain", "service": "old service"})
+
+        assert sorted(calls) == ["api", "app", "test"]
+        assert results["domain"] == "old domain"
+        assert results["api"] == "new api"
+
+
+class TestProgressManifest:
+    """测试 PSM 章节进度的保存和读取"""
+
+    @pytest.fixture
+    def generator(self):
+        return ChapterBasedGenerator(GeneratorConfig(name="chapter", api_key="test-key", model="test-model"))
+
+    def test_resume_completed_chapters(self, generator, tmp_path):
+        """进度清单中的章节在续传时作为已完成结果，run_dag 只执行其余章节"""
+        key = generator._progress_key("# PIM", "fastapi")
+        generator._save_progress(tmp_path, key, 0, "domain", "domain 内容")
+        generator._save_progress(tmp_path, key, 1, "service", "service 内容")
+
+        completed = generator._load_progress(tmp_path, key)
+        assert completed == {"domain": "domain 内容", "service": "service 内容"}
+
+        calls = []
+
+        def run(task, done):
+            calls.append(task)
+            return task
+
+        dependencies = {ch['key']: ch['depends_on'] for ch in generator.PSM_CHAPTERS}
+        results = run_dag(dependencies, run, completed=completed)
+        assert sorted(calls) == ["api", "app", "test"]
+        assert results["service"] == "service 内容"
+
+    def test_progress_for_other_input_is_ignored(self, generator, tmp_path):
+        """PIM 或平台变化后旧的进度不能续传"""
+        key = generator._progress_key("# PIM", "fastapi")
+        generator._save_progress(tmp_path, key, 0, "domain", "domain 内容")
+
+        assert generator._load_progress(tmp_path, generator._progress_key("# PIM v2", "fastapi")) == {}
+        assert generator._load_progress(tmp_path, generator._progress_key("# PIM", "django")) == {}
+
+    def test_missing_chapter_file_is_not_completed(self, generator, tmp_path):
+        """清单中有记录但章节文件丢失时该章节需要重新生成"""
+        key = generator._progress_key("# PIM", "fastapi")
+        generator._save_progress(tmp_path, key, 0, "domain", "domain 内容")
+        generator._save_progress(tmp_path, key, 1, "service", "service 内容")
+        (tmp_path / "psm_progress_2.md").unlink()
+
+        assert generator._load_progress(tmp_path, key) == {"domain": "domain 内容"}
+
+    def test_no_manifest(self, generator, tmp_path):
+        assert generator._load_progress(tmp_path, "any") == {}
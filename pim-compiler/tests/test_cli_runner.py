@@ -0,0 +1,155 @@
+"""测试异步 CLI 子进程运行器：重试、超时和并发限制"""
+
+import sys
+import time
+import uuid
+import asyncio
+import threading
+
+import pytest
+
+from src.compiler.core import cli_runner
+from src.compiler.core.cli_runner import run_cli, run_cli_sync
+
+
+def python_cmd(code: str):
+    return [sys.executable, "-c", code]
+
+
+@pytest.fixture
+def concurrency_key():
+    """每个测试使用独立的并发限制键，避免共享的信号量互相影响"""
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+class TestRunCliSync:
+    """测试 run_cli_sync"""
+
+    def test_success_merges_output(self, tmp_path, concurrency_key):
+        """stdout 和 stderr 合并，输出写入日志文件"""
+        log_path = tmp_path / "cli.log"
+        result = run_cli_sync(
+            python_cmd("import sys; print('out'); print('err', file=sys.stderr); print('中文')"),
+            log_path=log_path, log_header="=== header ===\n", concurrency_key=concurrency_key)
+
+        assert result.success
+        assert result.attempts == 1
+        assert "out" in result.output and "err" in result.output and "中文" in result.output
+        log = log_path.read_text(encoding="utf-8")
+        assert log.startswith("=== header ===\n")
+        assert "中文" in log
+
+    def test_failure(self, concurrency_key):
+        result = run_cli_sync(python_cmd("import sys; sys.exit(3)"), concurrency_key=concurrency_key)
+        assert not result.success
+        assert result.returncode == 3
+
+    def test_retries_matching_errors(self, tmp_path, concurrency_key):
+        """输出匹配 retry_on 时按退避重试，直到成功"""
+        counter = tmp_path / "count"
+        code = (
+            "import pathlib, sys\n"
+            f"p = pathlib.Path({str(counter)!r})\n"
+            "n = int(p.read_text()) + 1 if p.exists() else 1\n"
+            "p.write_text(str(n))\n"
+            "if n < 3:\n"
+            "    print('API Error: 500 Internal Server Error')\n"
+            "    sys.exit(1)\n"
+            "print('done')\n"
+        )
+        result = run_cli_sync(python_cmd(code), max_retries=5, retry_delay=0.05,
+                              retry_on=["500"], concurrency_key=concurrency_key)
+        assert result.success
+        assert result.attempts == 3
+        assert result.output.strip() == "done"  # 只保留最后一次尝试的输出
+
+    def test_does_not_retry_other_errors(self, concurrency_key):
+        result = run_cli_sync(python_cmd("import sys; print('bad request'); sys.exit(1)"),
+                              max_retries=3, retry_delay=0.05, retry_on=["500"],
+                              concurrency_key=concurrency_key)
+        assert result.attempts == 1
+
+    def test_gives_up_after_max_retries(self, concurrency_key):
+        result = run_cli_sync(python_cmd("import sys; print('500'); sys.exit(1)"),
+                              max_retries=2, retry_delay=0.05, retry_on=["500"],
+                              concurrency_key=concurrency_key)
+        assert not result.success
+        assert result.attempts == 2
+
+    def test_timeout_terminates_process(self, concurrency_key):
+        """超时后结束子进程，保留已经读到的输出，不重试"""
+        start = time.monotonic()
+        result = run_cli_sync(python_cmd("import time; print('started', flush=True); time.sleep(30)"),
+                              timeout=1, max_retries=3, retry_on=["started"],
+                              concurrency_key=concurrency_key)
+        assert result.timed_out
+        assert not result.success
+        assert result.attempts == 1
+        assert "started" in result.output
+        assert "TIMEOUT" in result.output
+        assert time.monotonic() - start < 10
+
+    def test_stop_when(self, concurrency_key):
+        """stop_when 返回 True 时提前结束子进程"""
+        result = run_cli_sync(python_cmd("import time; time.sleep(30)"),
+                              stop_when=lambda: True, check_interval=0.1,
+                              concurrency_key=concurrency_key)
+        assert result.stopped
+        assert not result.timed_out
+        assert not result.success
+
+    def test_on_output_streams_chunks(self, concurrency_key):
+        chunks = []
+        run_cli_sync(python_cmd("print('a' * 10)"), on_output=chunks.append, concurrency_key=concurrency_key)
+        assert "".join(chunks).strip() == "a" * 10
+
+
+class TestConcurrency:
+    """测试按 concurrency_key 共享的并发限制"""
+
+    def test_limit_from_environment(self, monkeypatch, tmp_path, concurrency_key):
+        """同一个键同时运行的子进程数不超过 PIM_CLI_CONCURRENCY_<KEY>"""
+        monkeypatch.setenv("PIM_CLI_CONCURRENCY_" + concurrency_key.upper().replace("-", "_"), "2")
+        # 每个子进程记录开始和结束时间
+        code = (
+            "import sys, time, pathlib\n"
+            "start = time.time(); time.sleep(0.3)\n"
+            f"pathlib.Path({str(tmp_path)!r}, sys.argv[1]).write_text(f'{{start}} {{time.time()}}')\n"
+        )
+        threads = [
+            threading.Thread(target=run_cli_sync, args=(python_cmd(code) + [str(i)],),
+                             kwargs={"concurrency_key": concurrency_key})
+            for i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        intervals = [tuple(map(float, (tmp_path / str(i)).read_text().split())) for i in range(5)]
+        events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+        running = peak = 0
+        for _, delta in events:
+            running += delta
+            peak = max(peak, running)
+        assert peak == 2
+
+    def test_async_calls_share_event_loop(self, concurrency_key):
+        """协程中 await run_cli 与同步调用使用同一个事件循环"""
+        async def main():
+            return await asyncio.gather(*(run_cli(python_cmd(f"print({i})"), concurrency_key=concurrency_key)
+                                          for i in range(3)))
+
+        results = asyncio.run(main())
+        assert [r.output.strip() for r in results] == ["0", "1", "2"]
+        assert cli_runner._loop is not None
+
+    def test_sync_call_rejected_on_runner_thread(self):
+        """在共享事件循环线程中同步调用会死锁，直接报错"""
+        loop = cli_runner._get_loop()
+
+        async def call_sync():
+            run_cli_sync(python_cmd("pass"))
+
+        with pytest.raises(RuntimeError):
+            asyncio.run_coroutine_threadsafe(call_sync(), loop).result(timeout=10)
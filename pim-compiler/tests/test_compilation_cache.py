@@ -0,0 +1,105 @@
+"""测试内容寻址的编译缓存"""
+
+import os
+import time
+
+import pytest
+
+from src.compiler.core.compilation_cache import CompilationCache, snapshot_directory
+
+
+def make_key(content: str, model: str = "gemini-2.0-flash-exp", prompt: str = "prompt") -> str:
+    return CompilationCache.make_key("pim_to_psm", content, "gemini-cli", model, prompt, "fastapi")
+
+
+class TestCompilationCache:
+    """测试缓存命中、未命中和 LRU 淘汰"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return CompilationCache(tmp_path / "cache")
+
+    def test_miss_then_hit(self, cache):
+        """未写入时未命中，写入后命中"""
+        key = make_key("# PIM")
+        assert cache.get_psm(key) is None
+
+        cache.put_psm(key, "# PSM\n中文内容")
+        assert cache.get_psm(key) == "# PSM\n中文内容"
+        assert cache.get_stats() == {"cache_hits": 1, "cache_misses": 1, "cache_hit_rate": 0.5}
+
+    def test_key_depends_on_content_model_and_prompt(self):
+        """内容、模型或提示词变化时缓存键不同，相同输入的键稳定"""
+        key = make_key("# PIM")
+        assert key == make_key("# PIM")
+        assert key != make_key("# PIM changed")
+        assert key != make_key("# PIM", model="gemini-2.5-pro")
+        assert key != make_key("# PIM", prompt="new prompt")
+
+    def test_persists_across_instances(self, tmp_path):
+        """缓存存放在磁盘上，新实例也能命中"""
+        key = make_key("# PIM")
+        CompilationCache(tmp_path / "cache").put_psm(key, "# PSM")
+        assert CompilationCache(tmp_path / "cache").get_psm(key) == "# PSM"
+
+    def test_restore_files(self, cache, tmp_path):
+        """代码条目恢复为目录中的文件"""
+        key = make_key("# PSM")
+        cache.put_files(key, "code", {"app/main.py": b"print('hi')\n", "README.md": "文档"})
+
+        written = cache.restore_files(key, tmp_path / "out")
+        assert sorted(written) == sorted([str(tmp_path / "out" / "app" / "main.py"),
+                                          str(tmp_path / "out" / "README.md")])
+        assert (tmp_path / "out" / "README.md").read_text(encoding="utf-8") == "文档"
+
+    def test_empty_file_set_is_a_hit(self, cache):
+        """空的文件集合也是有效的缓存条目"""
+        key = make_key("# PSM")
+        cache.put_files(key, "code", {})
+        assert cache.get_files(key) == {}
+        assert cache.hits == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """超出大小上限时先淘汰最久未使用的条目"""
+        cache = CompilationCache(tmp_path / "cache", max_bytes=2500)
+        # 随机内容几乎无法压缩，每个条目约 1KB
+        keys = [make_key(f"# PIM {i}") for i in range(3)]
+        cache.put_files(keys[0], "code", {"a.py": os.urandom(1000)})
+        time.sleep(0.01)
+        cache.put_files(keys[1], "code", {"b.py": os.urandom(1000)})
+        time.sleep(0.01)
+        assert cache.get_files(keys[0]) is not None  # keys[0] 变为最近使用
+        time.sleep(0.01)
+        cache.put_files(keys[2], "code", {"c.py": os.urandom(1000)})
+
+        assert cache.get_files(keys[1]) is None
+        assert cache.get_files(keys[0]) is not None
+        assert cache.get_files(keys[2]) is not None
+
+    def test_shared_blobs_survive_eviction(self, tmp_path):
+        """多个条目共享的数据块在其中一个条目被淘汰后仍然可用"""
+        cache = CompilationCache(tmp_path / "cache", max_bytes=2500)
+        shared = os.urandom(1000)
+        keys = [make_key(f"# PIM {i}") for i in range(3)]
+        cache.put_files(keys[0], "code", {"shared.py": shared, "a.py": os.urandom(1000)})
+        time.sleep(0.01)
+        cache.put_files(keys[1], "code", {"shared.py": shared})
+        time.sleep(0.01)
+        cache.put_files(keys[2], "code", {"c.py": os.urandom(1000)})
+
+        assert cache.get_files(keys[0]) is None
+        assert cache.get_files(keys[1]) == {"shared.py": shared}
+
+
+def test_snapshot_directory_skips_virtualenv_and_excluded(tmp_path):
+    """快照跳过虚拟环境、缓存目录和显式排除的文件"""
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "main.py").write_text("x = 1\n")
+    (tmp_path / "venv" / "lib").mkdir(parents=True)
+    (tmp_path / "venv" / "lib" / "site.py").write_text("")
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"\0")
+    (tmp_path / "psm.md").write_text("# PSM")
+
+    files = snapshot_directory(tmp_path, exclude=["psm.md"])
+    assert files == {"app/main.py": b"x = 1\n"}
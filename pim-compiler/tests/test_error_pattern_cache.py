@@ -0,0 +1,149 @@
+"""测试错误模式缓存：字面量预过滤、延迟批量写入和进程退出时的写入"""
+
+import gc
+import json
+import re
+import time
+import weakref
+
+import pytest
+
+from src.compiler.core import error_pattern_cache
+from src.compiler.core.error_pattern_cache import (
+    PATTERN_FLAGS, ErrorPattern, ErrorPatternCache, fold_text, required_literal
+)
+
+# (模式, 应该匹配的文本, 不应该匹配的文本)
+PATTERNS = [
+    (r"foo|barbaz", ["foo", "xx BARBAZ"], ["bar", "ba"]),
+    (r"prefix(abc|xyz)suffix", ["PREFIXxyzSUFFIX"], ["prefixsuffix"]),
+    (r"module(_name)?error", ["moduleerror", "Module_NameError"], ["module error"]),
+    (r"colou?r", ["color", "COLOUR"], ["colr"]),
+    (r"a\.b\(c\)d", ["A.B(C)D"], ["axb(c)d"]),
+    (r"version [0-9]+\.[0-9]+", ["Version 3.11"], ["version x"]),
+    (r"[Ee]rror: \w+ not found", ["ERROR: foo not found"], ["error:  not found"]),
+    (r"no attribute '(get_by_\w+|search)'", ["has no attribute 'get_by_id'"], ["no attribute 'x'"]),
+    (r"(?:abc)+def", ["abcabcdef"], ["def"]),
+    (r"x{0}hello", ["hello"], ["hell"]),
+    (r"^traceback.*line \d+$", ["foo\nTraceback in line 3"], ["traceback"]),
+    (r"(?=importerror)import", ["ImportError"], ["import"]),
+    (r"数据库连接失败", ["错误：数据库连接失败"], ["数据库"]),
+    (r"Straße", ["STRAẞE"], ["strasse"]),  # ß 有大小写区分，不参与字面量
+    (r"class not found", ["claſſ not found"], ["cls not found"]),
+    (r"missing item", ["mıssıng ıtem"], ["missng item"]),
+]
+
+
+class TestRequiredLiteral:
+    """测试 required_literal：预过滤只能跳过不可能匹配的模式"""
+
+    @pytest.mark.parametrize("pattern, matching, other", PATTERNS)
+    def test_never_drops_a_match(self, pattern, matching, other):
+        compiled = re.compile(pattern, PATTERN_FLAGS)
+        literal = required_literal(pattern)
+        for text in matching + other:
+            if compiled.search(text):
+                assert literal is None or literal in fold_text(text), (pattern, text, literal)
+        assert all(compiled.search(text) for text in matching)
+
+    def test_alternation_and_optional_parts_are_not_required(self):
+        assert required_literal(r"foo|barbaz") is None
+        assert required_literal(r"module(_name)?error") == "module"
+        assert required_literal(r"prefix(abc|xyz)suffix") == "prefix"
+
+    def test_required_groups_and_escapes(self):
+        """必选分组（含重复至少一次的分组）中的字面量可以使用，转义字符按字面量处理"""
+        assert required_literal(r"ab(cdefg)h") == "cdefg"
+        assert required_literal(r"x(?:abcd)+y") == "abcd"
+        assert required_literal(r"sqlalchemy\.exc\.InvalidRequestError.*x") == "sqlalchemy.exc.invalidrequesterror"
+        assert required_literal(r"[Ee]rror: \w+ not found") == " not found"
+
+    def test_short_or_invalid(self):
+        assert required_literal(r"ab.cd") is None  # 不足 MIN_LITERAL_LENGTH
+        assert required_literal(r"(unclosed") is None
+
+    def test_cache_matches_same_as_plain_regex(self, tmp_path):
+        """带预过滤的 find_pattern_match 与逐个正则匹配结果一致"""
+        cache = ErrorPatternCache(tmp_path, save_delay=0)
+        cache.patterns.clear()
+        for pattern, _, _ in PATTERNS:
+            cache.add_pattern(ErrorPattern(pattern, "t", "", ""))
+        texts = [text for _, matching, other in PATTERNS for text in matching + other]
+        for text in texts:
+            expected = next((p for p in cache.patterns if re.search(p, text, PATTERN_FLAGS)), None)
+            found = cache.find_pattern_match(text)
+            assert (found.pattern if found else None) == expected, text
+        cache.close()
+
+
+class TestDelayedSave:
+    """测试延迟批量写入"""
+
+    def test_save_after_delay(self, tmp_path):
+        """修改先只在内存中，save_delay 秒后写入磁盘"""
+        cache = ErrorPatternCache(tmp_path, save_delay=0.2)
+        cache.flush()
+        cache.add_fix_result("Error: boom", "app.py", "fix", success=True)
+        assert not cache.fixes_file.exists()
+
+        time.sleep(0.5)
+        saved = json.loads(cache.fixes_file.read_text(encoding="utf-8"))
+        assert [fix["fix_content"] for fix in saved] == ["fix"]
+        cache.close()
+
+    def test_flush_writes_immediately(self, tmp_path):
+        cache = ErrorPatternCache(tmp_path, save_delay=60)
+        cache.add_fix_result("Error: boom", "app.py", "fix", success=True)
+        assert not cache.fixes_file.exists()
+
+        cache.flush()
+        reloaded = ErrorPatternCache(tmp_path, save_delay=60)
+        assert reloaded.find_cached_fix("Error: boom", "app.py").fix_content == "fix"
+        assert len(reloaded.patterns) == len(cache.patterns)
+        cache.close()
+        reloaded.close()
+
+    def test_write_is_atomic(self, tmp_path, monkeypatch):
+        """写入中途失败时保留原来的文件，不留下写了一半的内容"""
+        cache = ErrorPatternCache(tmp_path, save_delay=60)
+        cache.add_fix_result("Error: one", "app.py", "fix 1", success=True)
+        cache.flush()
+        before = cache.fixes_file.read_text(encoding="utf-8")
+
+        def broken_dump(data, f, **kwargs):
+            f.write("[{")
+            raise OSError("disk full")
+
+        cache.add_fix_result("Error: two", "app.py", "fix 2", success=True)
+        monkeypatch.setattr(error_pattern_cache.json, "dump", broken_dump)
+        with pytest.raises(OSError):
+            cache.flush()
+        assert cache.fixes_file.read_text(encoding="utf-8") == before
+
+        # 失败的修改仍标记为未保存，下次写入时保存
+        monkeypatch.undo()
+        cache.flush()
+        saved = json.loads(cache.fixes_file.read_text(encoding="utf-8"))
+        assert [fix["fix_content"] for fix in saved] == ["fix 1", "fix 2"]
+        cache.close()
+
+    def test_exit_hook_flushes_live_caches(self, tmp_path):
+        """进程退出时的钩子写入所有仍存活的缓存"""
+        cache = ErrorPatternCache(tmp_path, save_delay=60)
+        cache.add_fix_result("Error: boom", "app.py", "fix", success=True)
+        error_pattern_cache._flush_all()
+        assert cache.fixes_file.exists()
+        cache.close()
+
+    def test_caches_are_not_kept_alive(self, tmp_path):
+        """退出钩子只持有弱引用，不再使用的缓存可以被回收"""
+        cache = ErrorPatternCache(tmp_path, save_delay=0)
+        ref = weakref.ref(cache)
+        del cache
+        gc.collect()
+        assert ref() is None
+
+    def test_close_unregisters(self, tmp_path):
+        cache = ErrorPatternCache(tmp_path, save_delay=60)
+        cache.close()
+        assert cache not in error_pattern_cache._live_caches
@@ -0,0 +1,184 @@
+"""测试增量修复器：结构化测试结果定位出错文件、并发修复与回滚"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.compiler.core.incremental_fixer import FileToFix, IncrementalFixer
+from src.compiler.core.pytest_runner import WarmTestRunner
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    # 保证 mtime 变化可被检测到
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def project(tmp_path):
+    """pricing.total 调用 tax.rate（有 bug）；失败的断言在测试文件中，调用栈里没有源文件"""
+    write(tmp_path / "app" / "__init__.py", "")
+    write(tmp_path / "app" / "services" / "__init__.py", "")
+    write(tmp_path / "app" / "services" / "tax.py", "def rate():\n    return 0.5\n")
+    write(tmp_path / "app" / "services" / "pricing.py",
+          "from app.services.tax import rate\n\n\n"
+          "def base(amount):\n    return amount\n\n\n"
+          "def total(amount):\n    return base(amount) * (1 + rate())\n")
+    write(tmp_path / "tests" / "test_pricing.py",
+          "from app.services.pricing import base, total\n\n\n"
+          "def test_base():\n    assert base(100) == 100\n\n\n"
+          "def test_total():\n    assert total(100) == 125\n")
+    return tmp_path
+
+
+@pytest.fixture
+def fixer(project):
+    runner = WarmTestRunner(project, python=sys.executable, timeout=120)
+    yield IncrementalFixer(project, test_runner=runner)
+    runner.stop()
+
+
+class TestSuspiciousness:
+    """测试 Ochiai 可疑度"""
+
+    def test_ochiai_scores(self):
+        coverage = {
+            "t::fail1": ["a.py", "b.py"],
+            "t::fail2": ["a.py"],
+            "t::pass1": ["a.py", "c.py"],
+        }
+        scores, passed_counts = IncrementalFixer.suspiciousness(coverage, {"t::fail1", "t::fail2"})
+
+        # a.py: 2 个失败 1 个通过 -> 2 / sqrt(2 * 3)
+        assert scores["a.py"] == pytest.approx(2 / 6 ** 0.5)
+        # b.py: 1 个失败 0 个通过 -> 1 / sqrt(2 * 1)
+        assert scores["b.py"] == pytest.approx(1 / 2 ** 0.5)
+        # c.py 只被通过的测试执行
+        assert scores["c.py"] == 0
+        assert passed_counts == {"a.py": 1, "c.py": 1}
+
+    def test_no_failures(self):
+        scores, _ = IncrementalFixer.suspiciousness({"t::pass": ["a.py"]}, set())
+        assert scores == {"a.py": 0}
+
+
+class TestErrorsFromResult:
+    """测试从结构化结果构造错误"""
+
+    def test_locates_source_file_by_coverage(self, fixer):
+        """调用栈中没有源文件时，按覆盖信息定位到只被失败测试执行的文件"""
+        result = fixer.test_runner.run()
+        errors = fixer.errors_from_result(result)
+
+        assert len(errors) == 1
+        assert errors[0].test_id == "tests/test_pricing.py::test_total"
+        assert errors[0].file_path == "app/services/tax.py"
+
+    def test_without_coverage_falls_back_to_test_file(self, fixer):
+        result = fixer.test_runner.run()
+        errors = fixer.errors_from_result(result, use_coverage=False)
+        assert errors[0].file_path == "tests/test_pricing.py"
+
+    def test_uses_deepest_source_frame(self, fixer, project):
+        """调用栈中有源文件时直接使用最深的源文件帧"""
+        write(project / "app" / "services" / "tax.py", "def rate():\n    raise ValueError('no rate')\n")
+        result = fixer.test_runner.run()
+        errors = fixer.errors_from_result(result)
+
+        assert errors[0].file_path == "app/services/tax.py"
+        assert errors[0].line_number == 2
+        assert errors[0].error_type == "ValueError"
+
+
+class TestFixFilesConcurrently:
+    """测试并发修复、冲突检测和回滚"""
+
+    @pytest.fixture
+    def previous(self, fixer, project):
+        """再加一个独立的有 bug 的模块，返回修复前的全量测试结果"""
+        write(project / "app" / "services" / "greeting.py", "def hello(name):\n    return name\n")
+        write(project / "tests" / "test_greeting.py",
+              "from app.services.greeting import hello\n\n\n"
+              "def test_hello():\n    assert hello('a') == 'hello a'\n")
+        result = fixer.test_runner.run()
+        assert len(result.failures) == 2
+        return result
+
+    @staticmethod
+    def files(*paths):
+        return [FileToFix(path=Path(path), errors=[], priority=i) for i, path in enumerate(paths)]
+
+    @staticmethod
+    def fix_tax(file, workspace):
+        write(workspace / "app" / "services" / "tax.py", "def rate():\n    return 0.25\n")
+        return True
+
+    @staticmethod
+    def fix_greeting(file, workspace):
+        write(workspace / "app" / "services" / "greeting.py", "def hello(name):\n    return f'hello {name}'\n")
+        return True
+
+    def test_applies_independent_fixes(self, fixer, project, previous):
+        """各修复在独立副本中进行，修改一起写回项目"""
+        def fix(file, workspace):
+            fix_one = self.fix_tax if file.path.name == "tax.py" else self.fix_greeting
+            return fix_one(file, workspace)
+
+        report = fixer.fix_files_concurrently(
+            self.files("app/services/tax.py", "app/services/greeting.py"), fix, previous=previous)
+
+        assert [o.status for o in report.outcomes] == ["applied", "applied"]
+        assert [o.changed_files for o in report.outcomes] == [["app/services/tax.py"],
+                                                               ["app/services/greeting.py"]]
+        assert report.test_result.passed
+        assert "0.25" in (project / "app" / "services" / "tax.py").read_text()
+
+    def test_rolls_back_fix_that_breaks_passing_test(self, fixer, project, previous):
+        """修复后新出现的失败测试归因到对应的修复，只回滚这个修复"""
+        def fix(file, workspace):
+            if file.path.name == "tax.py":
+                return self.fix_tax(file, workspace)
+            # 修好了 greeting，但同时破坏了原本通过的 test_base
+            self.fix_greeting(file, workspace)
+            pricing = workspace / "app" / "services" / "pricing.py"
+            write(pricing, pricing.read_text().replace("return amount\n", "return amount + 1\n"))
+            return True
+
+        original_pricing = (project / "app" / "services" / "pricing.py").read_text()
+        original_greeting = (project / "app" / "services" / "greeting.py").read_text()
+        report = fixer.fix_files_concurrently(
+            self.files("app/services/tax.py", "app/services/greeting.py"), fix, previous=previous)
+
+        tax_outcome, greeting_outcome = report.outcomes
+        assert tax_outcome.status == "applied"
+        assert greeting_outcome.status == "rolled_back"
+        assert greeting_outcome.new_failures == ["tests/test_pricing.py::test_base"]
+        assert (project / "app" / "services" / "pricing.py").read_text() == original_pricing
+        assert (project / "app" / "services" / "greeting.py").read_text() == original_greeting
+        assert "0.25" in (project / "app" / "services" / "tax.py").read_text()
+
+    def test_conflicting_fixes_are_deferred(self, fixer, project, previous):
+        """修改了同一文件的修复只应用优先级高的一个"""
+        report = fixer.fix_files_concurrently(
+            self.files("app/services/tax.py", "app/services/pricing.py"), self.fix_tax, previous=previous)
+        assert [o.status for o in report.outcomes] == ["applied", "conflict"]
+
+    def test_failed_and_unchanged_fixes(self, fixer, project, previous):
+        """修复失败或抛出异常时不应用任何修改"""
+        def fix(file, workspace):
+            if file.path.name == "tax.py":
+                (workspace / "app" / "services" / "tax.py").write_text("broken")
+                raise RuntimeError("LLM error")
+            return True
+
+        before = (project / "app" / "services" / "tax.py").read_text()
+        report = fixer.fix_files_concurrently(
+            self.files("app/services/tax.py", "app/services/greeting.py"), fix, previous=previous)
+
+        assert [o.status for o in report.outcomes] == ["failed", "no_change"]
+        assert report.test_result is None
+        assert (project / "app" / "services" / "tax.py").read_text() == before
@@ -0,0 +1,122 @@
+"""测试 PIM 分节、差异比较和受影响目标的计算"""
+
+from src.compiler.core.pim_diff import (
+    OVERVIEW, affected_targets, dependent_targets, diff_pim, load_state,
+    parse_pim_sections, save_state
+)
+
+PIM = """# 博客系统
+
+一个简单的博客。
+
+## 业务实体
+
+### 文章 (Article)
+- 标题
+- 内容
+
+### 作者 (Author)
+- 姓名
+
+## 业务服务
+
+### 文章服务
+- 发布文章
+
+## 业务规则
+
+- 标题不能为空
+"""
+
+# PSM 章节 -> 依赖的 PIM 分类
+CHAPTER_CATEGORIES = {
+    "domain": ["entities"],
+    "service": ["entities", "services", "rules"],
+    "api": ["services"],
+    "app": [OVERVIEW],
+}
+
+# PSM 章节 -> 依赖的章节（DAG）
+CHAPTER_DEPENDENCIES = {
+    "domain": [],
+    "service": ["domain"],
+    "api": ["service"],
+    "app": ["api"],
+}
+
+
+class TestParseAndDiff:
+    """测试 parse_pim_sections 和 diff_pim"""
+
+    def test_sections(self):
+        """二级标题归类，三级标题作为条目"""
+        sections = parse_pim_sections(PIM)
+        assert set(sections["entities"]) == {"", "文章 (Article)", "作者 (Author)"}
+        assert set(sections["services"]) == {"", "文章服务"}
+        assert "" in sections["rules"]
+        assert "" in sections[OVERVIEW]
+
+    def test_whitespace_changes_are_ignored(self):
+        """行尾空白和空行的变化不算修改"""
+        changed = PIM.replace("- 标题\n", "- 标题   \n\n")
+        assert diff_pim(parse_pim_sections(PIM), parse_pim_sections(changed)).is_empty()
+
+    def test_modified_added_removed(self):
+        """识别修改、新增和删除的条目"""
+        new = (PIM.replace("- 姓名", "- 姓名\n- 邮箱")
+               .replace("### 作者 (Author)", "### 用户 (User)")
+               .replace("- 发布文章", "- 发布文章\n- 删除文章"))
+        diff = diff_pim(parse_pim_sections(PIM), parse_pim_sections(new))
+
+        assert diff.added == {"entities": ["用户 (User)"]}
+        assert diff.removed == {"entities": ["作者 (Author)"]}
+        assert diff.modified == {"services": ["文章服务"]}
+        assert diff.changed_categories == ["entities", "services"]
+        assert "业务服务 修改: 文章服务" in diff.reasons()
+
+
+class TestAffectedTargets:
+    """测试差异 → 受影响的目标"""
+
+    def test_only_targets_using_changed_categories(self):
+        """只有依赖变更分类的目标需要重新生成"""
+        new = PIM.replace("- 发布文章", "- 发布文章\n- 删除文章")
+        diff = diff_pim(parse_pim_sections(PIM), parse_pim_sections(new))
+
+        affected = affected_targets(diff, CHAPTER_CATEGORIES)
+        assert set(affected) == {"service", "api"}
+        assert affected["api"] == ["业务服务 修改: 文章服务"]
+
+    def test_no_change_no_targets(self):
+        diff = diff_pim(parse_pim_sections(PIM), parse_pim_sections(PIM))
+        assert affected_targets(diff, CHAPTER_CATEGORIES) == {}
+
+    def test_dependents_of_affected_targets(self):
+        """上游章节重新生成时，直接和间接下游章节也要重新生成"""
+        new = PIM.replace("- 姓名", "- 姓名\n- 邮箱")
+        diff = diff_pim(parse_pim_sections(PIM), parse_pim_sections(new))
+        affected = affected_targets(diff, CHAPTER_CATEGORIES)
+        assert set(affected) == {"domain", "service"}
+
+        dependents = dependent_targets(affected, CHAPTER_DEPENDENCIES)
+        assert dependents == {
+            "api": ["依赖的 service 将重新生成"],
+            "app": ["依赖的 api 将重新生成"],
+        }
+
+    def test_dependents_collect_all_reasons(self):
+        """有多个上游重新生成时记录每一个原因，且不包含目标本身"""
+        dependencies = {"a": [], "b": [], "c": ["a", "b"], "d": ["c"]}
+        dependents = dependent_targets(["a", "b"], dependencies)
+        assert sorted(dependents["c"]) == ["依赖的 a 将重新生成", "依赖的 b 将重新生成"]
+        assert dependents["d"] == ["依赖的 c 将重新生成"]
+        assert "a" not in dependents and "b" not in dependents
+
+
+def test_state_round_trip(tmp_path):
+    """状态文件只在 base 一致时有效"""
+    path = tmp_path / "state.json"
+    save_state(path, "base-1", sections={"entities": {"": "x"}})
+    assert load_state(path, "base-1")["sections"] == {"entities": {"": "x"}}
+    assert load_state(path, "base-2") is None
+    assert load_state(tmp_path / "missing.json", "base-1") is None
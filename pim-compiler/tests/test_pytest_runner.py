@@ -0,0 +1,110 @@
+"""测试常驻 pytest 工作进程和按 import 关系选择测试"""
+
+import os
+import sys
+
+import pytest
+
+from src.compiler.core.pytest_runner import ImportGraph, WarmTestRunner
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    # 保证 mtime 变化可被检测到
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def project(tmp_path):
+    """两个互不相关的模块，各有一个测试文件；math_utils 有一个 bug"""
+    write(tmp_path / "app" / "__init__.py", "")
+    write(tmp_path / "app" / "math_utils.py", "def add(a, b):\n    return a - b\n")
+    write(tmp_path / "app" / "greeting.py", "def hello(name):\n    return f'hello {name}'\n")
+    write(tmp_path / "tests" / "test_math.py",
+          "from app.math_utils import add\n\n\ndef test_add():\n    assert add(1, 2) == 3\n")
+    write(tmp_path / "tests" / "test_greeting.py",
+          "from app.greeting import hello\n\n\ndef test_hello():\n    assert hello('a') == 'hello a'\n")
+    return tmp_path
+
+
+@pytest.fixture
+def runner(project):
+    runner = WarmTestRunner(project, python=sys.executable, timeout=120)
+    yield runner
+    runner.stop()
+
+
+class TestImportGraph:
+    """测试 ImportGraph"""
+
+    def test_affected_tests(self, project):
+        """只选择直接或间接导入变化文件的测试"""
+        graph = ImportGraph(project)
+        assert graph.affected_tests(["app/math_utils.py"]) == ["tests/test_math.py"]
+        assert graph.affected_tests(["app/greeting.py"]) == ["tests/test_greeting.py"]
+
+    def test_package_init_affects_all_importers(self, project):
+        """导入子模块会执行包的 __init__.py"""
+        graph = ImportGraph(project)
+        assert graph.affected_tests(["app/__init__.py"]) == ["tests/test_greeting.py", "tests/test_math.py"]
+
+    def test_unknown_scope_runs_everything(self, project):
+        """非 Python 文件或 conftest.py 变化时无法判断影响范围"""
+        write(project / "tests" / "conftest.py", "")
+        graph = ImportGraph(project)
+        assert graph.affected_tests(["config.yaml"]) is None
+        assert graph.affected_tests(["tests/conftest.py"]) is None
+
+
+class TestWarmTestRunner:
+    """测试 WarmTestRunner"""
+
+    def test_structured_failures(self, runner):
+        """失败的测试带有异常类型和项目内的位置"""
+        result = runner.run()
+        assert not result.passed
+        assert result.counts["passed"] == 1
+        assert [f.nodeid for f in result.failures] == ["tests/test_math.py::test_add"]
+        failure = result.failures[0]
+        assert failure.exc_type == "AssertionError"
+        assert failure.when == "call"
+        assert runner.failing == {"tests/test_math.py"}
+
+    def test_reloads_changed_module_in_warm_worker(self, runner, project):
+        """修复后工作进程重新导入变化的模块，并且只运行受影响的测试"""
+        assert not runner.run().passed
+        write(project / "app" / "math_utils.py", "def add(a, b):\n    return a + b\n")
+
+        result = runner.run_affected()
+        assert result.passed
+        assert result.selected == ["tests/test_math.py"]
+        assert result.changed == ["app/math_utils.py"]
+        assert runner.failing == set()
+
+    def test_no_affected_tests(self, runner, project):
+        """变化不影响任何测试且没有失败的测试时不运行 pytest"""
+        write(project / "app" / "math_utils.py", "def add(a, b):\n    return a + b\n")
+        assert runner.run().passed
+        write(project / "app" / "unused.py", "VALUE = 1\n")
+
+        result = runner.run_affected()
+        assert result.passed
+        assert result.selected == []
+
+    def test_trace_records_coverage(self, runner):
+        """trace 时记录每个测试执行到的项目文件"""
+        result = runner.run(trace=True)
+        covered = result.coverage["tests/test_math.py::test_add"]
+        assert any(path.endswith("app/math_utils.py") for path in covered)
+        assert not any(path.endswith("app/greeting.py") for path in covered)
+
+    def test_collection_error(self, runner, project):
+        """语法错误作为收集错误报告"""
+        write(project / "app" / "greeting.py", "def hello(name:\n")
+        result = runner.run()
+        assert not result.passed
+        errors = [f for f in result.failures if f.when == "collect"]
+        assert [f.nodeid for f in errors] == ["tests/test_greeting.py"]
+        assert errors[0].exc_type == "SyntaxError"
@@ -0,0 +1,214 @@
+"""测试从 PIM 确定性生成结构化 PSM，以及混合生成器对 LLM 返回方法的解析"""
+
+import json
+
+import pytest
+
+from src.compiler.generators.base_generator import GeneratorConfig
+from src.compiler.generators.impl.hybrid_template_generator import HybridTemplateGenerator
+from src.compiler.generators.structured_psm import load_psm, parse_pim, render_psm
+
+PIM = """# 图书管理系统
+
+一个小型图书馆的借阅系统。
+
+## 业务实体
+
+### 图书 (Book)
+- 书名 (文本，必填)
+- ISBN（必填，唯一）
+- 库存数量
+- 价格
+- 是否可借
+- 出版日期
+
+### 读者
+- 姓名（必填）
+- 邮箱（唯一）
+- 信用分（默认100）
+
+### 借阅记录 (BorrowRecord)
+- 图书（关联到图书）
+- 读者（关联到读者）
+- 应还日期
+- 创建时间
+
+## 业务服务
+
+### 图书服务
+- 添加图书
+- 查询图书列表
+- 更新图书信息
+- 删除图书
+- 借阅图书 - 读者借一本书
+- 统计库存
+
+### 读者管理服务 (ReaderService)
+1. **创建读者**：注册新读者
+   - 规则：邮箱不能重复
+2. **续借**
+
+## 业务规则
+- 每位读者最多借5本
+
+## 业务流程
+
+### 借阅流程
+1. 检查库存
+"""
+
+
+@pytest.fixture(scope="module")
+def model():
+    return parse_pim(PIM)
+
+
+def attributes(entity):
+    return {attr.name: attr for attr in entity.attributes}
+
+
+def methods(service):
+    return {method["name"]: method for method in service.methods}
+
+
+class TestEntities:
+    """测试实体和字段的解析"""
+
+    def test_entity_names(self, model):
+        """英文名优先，否则按术语表翻译；表名为复数的蛇形命名"""
+        assert [(e.name, e.table_name) for e in model.entities] == [
+            ("Book", "books"), ("Reader", "readers"), ("BorrowRecord", "borrow_records")]
+
+    def test_field_types_and_constraints(self, model):
+        """类型来自显式声明或名称，必填、唯一、默认值变为约束"""
+        book = attributes(model.entities[0])
+        assert book["title"].pim_type == "string"
+        assert book["title"].constraints["nullable"] is False
+        assert book["isbn"].constraints["unique"] is True
+        assert book["stock_count"].pim_type == "integer"
+        assert book["price"].pim_type == "float"
+        assert book["is_available"].pim_type == "boolean"
+        assert book["publish_date"].pim_type == "date"
+
+        reader = attributes(model.entities[1])
+        assert reader["email"].pim_type == "email"
+        assert reader["credit_score"].constraints["default"] == 100
+
+    def test_auto_fields_and_foreign_keys(self, model):
+        """主键和时间戳字段自动添加且不重复，"关联到X" 变为外键"""
+        record = model.entities[2]
+        names = [attr.name for attr in record.attributes]
+        assert names == ["id", "book_id", "reader_id", "due_date", "created_at", "updated_at"]
+        assert attributes(record)["book_id"].constraints["foreign_key"] == "books.id"
+
+    def test_untranslatable_names_are_numbered(self):
+        """无法翻译的名称按类别编号，不会生成非法标识符"""
+        model = parse_pim("# X\n## 业务实体\n### 馆藏\n- 甲乙\n## 业务服务\n### 馆藏服务\n- 丙丁\n")
+        assert model.entities[0].name == "Entity1"
+        assert "field_1" in attributes(model.entities[0])
+        assert list(methods(model.services[0])) == ["method_1"]
+
+
+class TestServices:
+    """测试服务和方法分类"""
+
+    def test_service_names_and_paths(self, model):
+        assert [(s.name, s.base_path) for s in model.services] == [
+            ("BookService", "/books"), ("ReaderService", "/readers")]
+
+    def test_crud_methods_use_templates(self, model):
+        """标准 CRUD 操作按实体命名，由模板生成"""
+        book = methods(model.services[0])
+        assert {name: (m["operation"], m["http_method"], m["path"]) for name, m in book.items()
+                if not m["complex"]} == {
+            "create_book": ("create", "POST", ""),
+            "list_books": ("list", "GET", ""),
+            "update_book": ("update", "PUT", "/{id}"),
+            "delete_book": ("delete", "DELETE", "/{id}"),
+        }
+
+    def test_other_methods_are_complex(self, model):
+        """非 CRUD 操作交给 LLM，并带上相关的业务流程"""
+        book = methods(model.services[0])
+        assert book["borrow_book"]["complex"]
+        assert book["borrow_book"]["description"] == "借阅图书 - 读者借一本书"
+        assert book["borrow_book"]["flows"] == ["借阅流程"]
+        assert book["stats_stock"]["complex"]
+
+    def test_operations_with_rules_are_complex(self, model):
+        """带有业务规则的 CRUD 操作也交给 LLM"""
+        reader = methods(model.services[1])
+        assert reader["create_reader"]["complex"]
+        assert reader["create_reader"]["rules"] == ["邮箱不能重复"]
+        assert reader["renew"]["complex"]
+
+    def test_summary(self, model):
+        assert model.base_model.domain == "图书管理系统"
+        assert model.base_model.description == "一个小型图书馆的借阅系统。"
+        assert model.base_model.flows == {"借阅流程": "1. 检查库存"}
+
+    def test_unsupported_platform(self):
+        with pytest.raises(ValueError):
+            parse_pim(PIM, platform="cobol")
+
+
+class TestRenderAndLoad:
+    """测试 Markdown 输出和读回"""
+
+    def test_round_trip(self, model):
+        loaded = load_psm(render_psm(model))
+        assert loaded.entities == model.entities
+        assert loaded.services == model.services
+        assert loaded.base_model == model.base_model
+
+    def test_without_spec(self):
+        assert load_psm("# PSM\n没有结构化模型") is None
+        assert load_psm("<!-- psm-spec -->\n没有代码块") is None
+
+
+class TestParseMethods:
+    """测试 HybridTemplateGenerator._parse_methods 对 LLM 返回内容的处理"""
+
+    METHODS = [{"name": "borrow_book"}, {"name": "stats_stock"}]
+
+    @pytest.fixture
+    def generator(self, monkeypatch):
+        monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+        return HybridTemplateGenerator(GeneratorConfig(name="hybrid"))
+
+    def test_fenced_json(self, generator):
+        """代码块中的 JSON，方法体缩进被规范化"""
+        content = "说明文字\n```json\n" + json.dumps({
+            "borrow_book": "    async def borrow_book(self, data):\n        return data",
+            "stats_stock": "async def stats_stock(self, data):\n    return 0",
+        }) + "\n```\n"
+        assert generator._parse_methods(content, self.METHODS) == {
+            "borrow_book": "async def borrow_book(self, data):\n    return data",
+            "stats_stock": "async def stats_stock(self, data):\n    return 0",
+        }
+
+    def test_invalid_json_keeps_stubs(self, generator):
+        assert generator._parse_methods("```json\n{\"borrow_book\": \n```", self.METHODS) == {}
+        assert generator._parse_methods("抱歉，我无法完成", self.METHODS) == {}
+
+    def test_partial_response(self, generator):
+        """只保留返回了的方法，缺失的方法保留桩"""
+        content = json.dumps({"borrow_book": "async def borrow_book(self, data):\n    return data"})
+        assert list(generator._parse_methods(content, self.METHODS)) == ["borrow_book"]
+
+    def test_rejects_invalid_definitions(self, generator):
+        """语法错误、名称不符、多个定义或非字符串的值都被丢弃"""
+        content = json.dumps({
+            "borrow_book": "async def borrow_book(self, data):\n    return (",
+            "stats_stock": "async def other(self):\n    pass",
+        })
+        assert generator._parse_methods(content, self.METHODS) == {}
+
+        content = json.dumps({
+            "borrow_book": "import os\nasync def borrow_book(self, data):\n    pass",
+            "stats_stock": 42,
+        })
+        assert generator._parse_methods(content, self.METHODS) == {}
+
+    def test_non_object_json(self, generator):
+        assert generator._parse_methods(json.dumps(["borrow_book"]), self.METHODS) == {}
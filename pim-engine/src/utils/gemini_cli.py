@@ -1,35 +1,40 @@
 """Gemini CLI utility functions"""
 
-import subprocess
 import os
 import asyncio
 import logging
-from typing import Optional
+import weakref
+from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
-async def call_gemini_cli(prompt: str, model: Optional[str] = None, gemini_cli_path: str = "/home/guci/.nvm/versions/node/v22.17.0/bin/gemini") -> str:
-    """
-    调用 Gemini CLI
-    
-    Args:
-        prompt: 提示内容
-        model: 模型名称，默认从环境变量 GEMINI_MODEL 获取
-        gemini_cli_path: Gemini CLI 路径
-        
-    Returns:
-        Gemini 响应内容
-        
-    Raises:
-        FileNotFoundError: 如果 Gemini CLI 不存在
-        Exception: 如果 Gemini CLI 执行失败
-    """
-    # 确保 Gemini CLI 存在
-    if not os.path.exists(gemini_cli_path):
-        raise FileNotFoundError(f"Gemini CLI not found at: {gemini_cli_path}")
-    
-    # 设置环境变量（包括代理）
+# API 500 类错误：按指数退避重试（与 pim-compiler 的 API_ERROR_PATTERNS 一致）
+API_ERROR_PATTERNS = [
+    "status: INTERNAL",
+    "code\":500",
+    "Internal error has occurred",
+    "API Error: got status: INTERNAL"
+]
+DEFAULT_GEMINI_CLI_PATH = "/home/guci/.nvm/versions/node/v22.17.0/bin/gemini"
+DEFAULT_TIMEOUT = 600
+MAX_RETRIES = 3
+RETRY_DELAY = 5  # 初始延迟秒数，之后每次翻倍
+
+# 同时运行的 Gemini CLI 进程数（按事件循环创建，信号量不能跨事件循环使用）
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(int(os.getenv("GEMINI_CLI_CONCURRENCY", "4")))
+    return semaphore
+
+
+def _build_env() -> dict:
+    """Gemini CLI 的环境变量（包括代理和 API key）"""
     env = os.environ.copy()
     
     # 设置代理（如果配置了）
@@ -48,86 +53,106 @@ async def call_gemini_cli(prompt: str, model: Optional[str] = None, gemini_cli_p
     # 如果有 GOOGLE_AI_STUDIO_KEY，将其设置为 GEMINI_API_KEY
     if "GOOGLE_AI_STUDIO_KEY" in env and "GEMINI_API_KEY" not in env:
         env["GEMINI_API_KEY"] = env["GOOGLE_AI_STUDIO_KEY"]
-    
-    # 构建命令 - 使用 -p 参数传递提示，-m 参数指定模型
-    if model is None:
-        model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-    
-    cmd = [gemini_cli_path, "-m", model, "-p", prompt]
-    
-    logger.info(f"Calling Gemini CLI with model: {model}")
-    logger.debug(f"Command: {' '.join(cmd[:3])}...")  # 只记录命令前几个参数
-    
-    # 执行命令
+    return env
+
+
+async def _run_once(cmd: list, env: dict, timeout: float) -> Tuple[int, str, str]:
+    """运行一次命令，超时后先 terminate，5 秒内没有退出再 kill"""
     process = await asyncio.create_subprocess_exec(
         *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
         env=env
     )
-    
-    stdout, stderr = await process.communicate()
-    
-    if process.returncode != 0:
-        error_msg = stderr.decode('utf-8')
-        logger.error(f"Gemini CLI error: {error_msg}")
-        raise Exception(f"Gemini CLI failed: {error_msg}")
-    
-    result = stdout.decode('utf-8')
-    logger.debug(f"Gemini CLI response length: {len(result)} characters")
-    
-    return result
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        if process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        raise
+    return process.returncode, stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
 
 
-def call_gemini_cli_sync(prompt: str, model: Optional[str] = None, gemini_cli_path: str = "/home/guci/.nvm/versions/node/v22.17.0/bin/gemini") -> str:
+async def call_gemini_cli(prompt: str, model: Optional[str] = None, gemini_cli_path: str = DEFAULT_GEMINI_CLI_PATH,
+                          timeout: float = DEFAULT_TIMEOUT) -> str:
     """
-    同步版本的 Gemini CLI 调用
+    调用 Gemini CLI
+    
+    同时运行的进程数受 GEMINI_CLI_CONCURRENCY 限制，API 500 错误时指数退避重试。
     
     Args:
         prompt: 提示内容
         model: 模型名称，默认从环境变量 GEMINI_MODEL 获取
         gemini_cli_path: Gemini CLI 路径
+        timeout: 单次调用的超时（秒）
         
     Returns:
         Gemini 响应内容
+        
+    Raises:
+        FileNotFoundError: 如果 Gemini CLI 不存在
+        TimeoutError: 如果 Gemini CLI 超时
+        Exception: 如果 Gemini CLI 执行失败
     """
     # 确保 Gemini CLI 存在
     if not os.path.exists(gemini_cli_path):
         raise FileNotFoundError(f"Gemini CLI not found at: {gemini_cli_path}")
     
-    # 设置环境变量（包括代理）
-    env = os.environ.copy()
+    env = _build_env()
     
-    # 设置代理（如果配置了）
-    proxy_host = os.getenv("PROXY_HOST", "127.0.0.1")
-    proxy_port = os.getenv("PROXY_PORT", "7890")
-    if proxy_host and proxy_port:
-        proxy_url = f"http://{proxy_host}:{proxy_port}"
-        env["HTTP_PROXY"] = proxy_url
-        env["HTTPS_PROXY"] = proxy_url
-    
-    # API key 设置
-    if "GOOGLE_AI_STUDIO_KEY" in env and "GEMINI_API_KEY" not in env:
-        env["GEMINI_API_KEY"] = env["GOOGLE_AI_STUDIO_KEY"]
-    
-    # 构建命令
+    # 构建命令 - 使用 -p 参数传递提示，-m 参数指定模型
     if model is None:
         model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
     
     cmd = [gemini_cli_path, "-m", model, "-p", prompt]
     
-    # 执行命令
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        env=env
-    )
+    logger.info(f"Calling Gemini CLI with model: {model}")
+    logger.debug(f"Command: {' '.join(cmd[:3])}...")  # 只记录命令前几个参数
     
-    if result.returncode != 0:
-        raise Exception(f"Gemini CLI failed: {result.stderr}")
+    delay = RETRY_DELAY
+    for attempt in range(1, MAX_RETRIES + 1):
+        async with _semaphore():
+            try:
+                returncode, result, error_msg = await _run_once(cmd, env, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Gemini CLI timed out after {timeout} seconds")
+        
+        if returncode == 0:
+            logger.debug(f"Gemini CLI response length: {len(result)} characters")
+            return result
+        
+        if attempt < MAX_RETRIES and any(pattern in error_msg for pattern in API_ERROR_PATTERNS):
+            # 退避期间不占用并发名额
+            logger.warning(f"Gemini API 500 error detected, will retry after {delay} seconds")
+            await asyncio.sleep(delay)
+            delay *= 2
+            continue
+        
+        logger.error(f"Gemini CLI error: {error_msg}")
+        raise Exception(f"Gemini CLI failed: {error_msg}")
+
+
+def call_gemini_cli_sync(prompt: str, model: Optional[str] = None, gemini_cli_path: str = DEFAULT_GEMINI_CLI_PATH,
+                         timeout: float = DEFAULT_TIMEOUT) -> str:
+    """
+    同步版本的 Gemini CLI 调用（在新的事件循环中运行 call_gemini_cli）
     
-    return result.stdout
+    Args:
+        prompt: 提示内容
+        model: 模型名称，默认从环境变量 GEMINI_MODEL 获取
+        gemini_cli_path: Gemini CLI 路径
+        timeout: 单次调用的超时（秒）
+        
+    Returns:
+        Gemini 响应内容
+    """
+    return asyncio.run(call_gemini_cli(prompt, model, gemini_cli_path, timeout))
 
 def main():
     